@@ -0,0 +1,80 @@
+"""Benchmarks for the :meth:`wrf.getvar` products."""
+from __future__ import (absolute_import, division, print_function)
+
+from wrf import getvar, omp_set_num_threads, set_memo_size, ALL_TIMES
+from wrf.routines import _FUNC_MAP
+
+from .common import (GRID_SIZES, THREAD_COUNTS, FILE_COUNTS, open_input,
+                     close_input)
+
+# Products that spend most of their time in the Fortran kernels and are
+# worth timing with several OpenMP thread counts
+THREADED_PRODUCTS = ["avo", "cape2d", "cape3d", "cloudfrac", "ctt", "dbz",
+                     "omega", "pvo", "pw", "rh", "slp", "srh", "theta_e",
+                     "twb", "uhel", "uvmet"]
+
+# Products used to time the sequence aggregation code
+MULTIFILE_PRODUCTS = ["lat", "slp", "tk", "cape2d", "uvmet10"]
+
+
+class Products(object):
+    """Every registered product, single file, all times."""
+    params = (sorted(_FUNC_MAP), GRID_SIZES, [True, False])
+    param_names = ["product", "size", "meta"]
+    timeout = 600
+
+    def setup(self, product, size, meta):
+        # Time the computation, not the memoized multi-product results
+        set_memo_size(0)
+        omp_set_num_threads(1)
+        self.wrfin = open_input(size)
+
+    def teardown(self, product, size, meta):
+        close_input(self.wrfin)
+
+    def time_getvar(self, product, size, meta):
+        getvar(self.wrfin, product, ALL_TIMES, meta=meta)
+
+    def peakmem_getvar(self, product, size, meta):
+        getvar(self.wrfin, product, ALL_TIMES, meta=meta)
+
+
+class ThreadScaling(object):
+    """Kernel heavy products with several OpenMP thread counts."""
+    params = (THREADED_PRODUCTS, GRID_SIZES[1:], THREAD_COUNTS)
+    param_names = ["product", "size", "threads"]
+    timeout = 600
+
+    def setup(self, product, size, threads):
+        set_memo_size(0)
+        omp_set_num_threads(threads)
+        self.wrfin = open_input(size)
+
+    def teardown(self, product, size, threads):
+        omp_set_num_threads(1)
+        close_input(self.wrfin)
+
+    def time_getvar(self, product, size, threads):
+        getvar(self.wrfin, product, ALL_TIMES, meta=False)
+
+
+class MultiFile(object):
+    """Products read from a sequence of files."""
+    params = (MULTIFILE_PRODUCTS, FILE_COUNTS, ["cat", "join"],
+              [True, False])
+    param_names = ["product", "nfiles", "method", "meta"]
+    timeout = 600
+
+    def setup(self, product, nfiles, method, meta):
+        set_memo_size(0)
+        omp_set_num_threads(1)
+        self.wrfin = open_input(GRID_SIZES[1], nfiles)
+
+    def teardown(self, product, nfiles, method, meta):
+        close_input(self.wrfin)
+
+    def time_getvar(self, product, nfiles, method, meta):
+        getvar(self.wrfin, product, ALL_TIMES, method=method, meta=meta)
+
+    def peakmem_getvar(self, product, nfiles, method, meta):
+        getvar(self.wrfin, product, ALL_TIMES, method=method, meta=meta)
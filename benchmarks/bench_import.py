@@ -0,0 +1,49 @@
+"""Startup benchmarks.
+
+Each timeraw_ benchmark runs its code in a fresh interpreter, so the time
+includes every module imported for the first time.  Short-lived workers
+and command line tools pay this on every run.
+
+"""
+from __future__ import (absolute_import, division, print_function)
+
+from .common import synthetic_file, GRID_SIZES
+
+
+class Import(object):
+    # The import times are tiny compared to asv's default timeout, but each
+    # sample starts a new interpreter
+    repeat = 10
+
+    def timeraw_import_wrf(self):
+        return "import wrf"
+
+    def timeraw_import_getvar(self):
+        return "from wrf import getvar"
+
+    def timeraw_import_all(self):
+        return "from wrf import *"
+
+
+class FirstCall(object):
+    """Time from a cold interpreter to the first computed product.
+
+    Opening the file is part of the untimed setup code.
+
+    """
+    repeat = 5
+
+    def setup(self):
+        self.path = synthetic_file(GRID_SIZES[0])
+
+    def _open(self):
+        return "from netCDF4 import Dataset\nwrfnc = Dataset({!r})".format(
+            self.path)
+
+    def timeraw_first_slp(self):
+        return ("from wrf import getvar\n"
+                "getvar(wrfnc, 'slp', meta=False)"), self._open()
+
+    def timeraw_first_slp_meta(self):
+        return ("from wrf import getvar\n"
+                "getvar(wrfnc, 'slp')"), self._open()
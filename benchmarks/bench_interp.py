@@ -0,0 +1,64 @@
+"""Benchmarks for the interpolation routines."""
+from __future__ import (absolute_import, division, print_function)
+
+from wrf import (getvar, interplevel, vertcross, interpline, vinterp,
+                 VerticalInterpolator, CoordPair, omp_set_num_threads,
+                 ALL_TIMES)
+
+from .common import GRID_SIZES, open_input, close_input
+
+
+class Interpolation(object):
+    params = (GRID_SIZES, [True, False])
+    param_names = ["size", "meta"]
+    timeout = 600
+
+    def setup(self, size, meta):
+        omp_set_num_threads(1)
+        self.wrfin = open_input(size)
+        self.p = getvar(self.wrfin, "pressure", ALL_TIMES, meta=meta)
+        self.z = getvar(self.wrfin, "z", ALL_TIMES, meta=meta)
+        self.tk = getvar(self.wrfin, "tk", ALL_TIMES, meta=meta)
+        self.t2 = getvar(self.wrfin, "T2", ALL_TIMES, meta=meta)
+        self.levels = [1000., 850., 700., 500., 300., 200.]
+
+        nx = self.z.shape[-1]
+        ny = self.z.shape[-2]
+        self.start = CoordPair(x=0, y=ny // 4)
+        self.end = CoordPair(x=nx - 1, y=3 * ny // 4)
+
+    def teardown(self, size, meta):
+        close_input(self.wrfin)
+
+    def time_interplevel(self, size, meta):
+        interplevel(self.tk, self.p, self.levels, meta=meta)
+
+    def peakmem_interplevel(self, size, meta):
+        interplevel(self.tk, self.p, self.levels, meta=meta)
+
+    def time_vertical_interpolator(self, size, meta):
+        interp = VerticalInterpolator(self.p, self.levels)
+        interp(self.tk, meta=meta)
+        interp(self.z, meta=meta)
+
+    def time_vertcross(self, size, meta):
+        vertcross(self.tk, self.z, wrfin=self.wrfin, start_point=self.start,
+                  end_point=self.end, timeidx=ALL_TIMES, meta=meta)
+
+    def peakmem_vertcross(self, size, meta):
+        vertcross(self.tk, self.z, wrfin=self.wrfin, start_point=self.start,
+                  end_point=self.end, timeidx=ALL_TIMES, meta=meta)
+
+    def time_interpline(self, size, meta):
+        interpline(self.t2, wrfin=self.wrfin, start_point=self.start,
+                   end_point=self.end, timeidx=ALL_TIMES, meta=meta)
+
+    def time_vinterp(self, size, meta):
+        vinterp(self.wrfin, self.tk, "theta", [290., 300., 310., 320.],
+                extrapolate=True, field_type="tk", timeidx=ALL_TIMES,
+                meta=meta)
+
+    def peakmem_vinterp(self, size, meta):
+        vinterp(self.wrfin, self.tk, "theta", [290., 300., 310., 320.],
+                extrapolate=True, field_type="tk", timeidx=ALL_TIMES,
+                meta=meta)
@@ -0,0 +1,439 @@
+"""Thread and process scaling of the Fortran kernels.
+
+Each kernel is called directly through its :mod:`wrf.extension` wrapper,
+so the times cover the compiled routine plus the decorator stack, but not
+the file reads or the metadata.  The inputs for every kernel are made once
+per grid size from the synthetic files.
+
+Besides the asv suite, this module can be run as a script to print a
+scaling report for the current node:
+
+    python -m benchmarks.bench_kernels --sizes 200 400 --threads 1 2 4 8
+
+The report gives the speedup, parallel efficiency and effective memory
+bandwidth for every thread count and schedule, and the throughput when the
+kernel runs in several processes at once.  Kernels whose efficiency at the
+largest thread count falls below a threshold are flagged, along with the
+routines that use a bare ``!$OMP PARALLEL`` region in the Fortran source.
+
+"""
+from __future__ import (absolute_import, division, print_function)
+
+import argparse
+import multiprocessing
+import os
+import re
+import sys
+import timeit
+from collections import OrderedDict
+
+import numpy as np
+
+from wrf import (getvar, extract_vars, omp_threads, omp_enabled,
+                 omp_get_num_procs, default_fill, OMP_SCHED_STATIC,
+                 OMP_SCHED_DYNAMIC, OMP_SCHED_GUIDED)
+from wrf.extension import (_tk, _td, _rh, _slp, _eth, _tv, _wetbulb,
+                           _omega, _pw, _avo, _pvo, _srhel, _udhel, _dbz,
+                           _cape, _cloudfrac, _ctt, _interpz3d, _vintrp,
+                           _uvmet, _smooth2d)
+
+from .common import (GRID_SIZES, THREAD_COUNTS, open_input, close_input,
+                     synthetic_file)
+
+FORTRAN_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "fortran")
+
+SCHEDULES = OrderedDict((("static", OMP_SCHED_STATIC),
+                         ("dynamic", OMP_SCHED_DYNAMIC),
+                         ("guided", OMP_SCHED_GUIDED)))
+
+# Kernels below this parallel efficiency at the largest thread count are
+# flagged in the report
+EFFICIENCY_THRESHOLD = 0.5
+
+G = 9.81
+
+
+def kernel_inputs(wrfnc):
+    """Return the kernel input arrays for the first time in *wrfnc*."""
+    ncvars = extract_vars(wrfnc, 0, ("P", "PB", "T", "PH", "PHB", "QVAPOR",
+                                     "QCLOUD", "QICE", "QRAIN", "QSNOW",
+                                     "QGRAUP", "U", "V", "W", "HGT", "PSFC",
+                                     "XLAT", "XLONG", "MAPFAC_U", "MAPFAC_V",
+                                     "MAPFAC_M", "F"),
+                          meta=False)
+
+    inputs = dict(ncvars)
+    inputs["full_p"] = ncvars["P"] + ncvars["PB"]
+    inputs["p_hpa"] = inputs["full_p"] * 0.01
+    inputs["theta"] = ncvars["T"] + 300.
+    inputs["tk"] = getvar(wrfnc, "tk", meta=False)
+    inputs["tv"] = getvar(wrfnc, "tv", meta=False)
+    inputs["rh"] = getvar(wrfnc, "rh", meta=False)
+    inputs["z"] = getvar(wrfnc, "z", meta=False)
+    inputs["height_agl"] = getvar(wrfnc, "height_agl", meta=False)
+    inputs["zstag"] = (ncvars["PH"] + ncvars["PHB"]) / G
+    inputs["psfc_hpa"] = ncvars["PSFC"] * 0.01
+    inputs["ua"] = getvar(wrfnc, "ua", meta=False)
+    inputs["va"] = getvar(wrfnc, "va", meta=False)
+    inputs["wa"] = getvar(wrfnc, "wa", meta=False)
+    inputs["dx"] = wrfnc.getncattr("DX")
+    inputs["dy"] = wrfnc.getncattr("DY")
+    inputs["cen_lon"] = wrfnc.getncattr("STAND_LON")
+
+    return inputs
+
+
+def _flip(arr):
+    return np.ascontiguousarray(arr[::-1, :, :])
+
+
+_MISSING = default_fill(np.float64)
+_LEVELS = np.asarray([850., 700., 500., 300., 250.])
+
+# Fortran routine -> function of the kernel inputs that returns the
+# extension wrapper and its arguments
+KERNELS = OrderedDict((
+    ("dcomputetk", lambda i: (_tk, (i["full_p"], i["theta"]))),
+    ("dcomputetd", lambda i: (_td, (i["p_hpa"], i["QVAPOR"]))),
+    ("dcomputerh", lambda i: (_rh, (i["QVAPOR"], i["full_p"], i["tk"]))),
+    ("dcomputeseaprs", lambda i: (_slp, (i["z"], i["tk"], i["full_p"],
+                                         i["QVAPOR"]))),
+    ("deqthecalc", lambda i: (_eth, (i["QVAPOR"], i["tk"], i["full_p"]))),
+    ("virtual_temp", lambda i: (_tv, (i["tk"], i["QVAPOR"]))),
+    ("wetbulbcalc", lambda i: (_wetbulb, (i["full_p"], i["tk"],
+                                          i["QVAPOR"]))),
+    ("omgcalc", lambda i: (_omega, (i["QVAPOR"], i["tk"], i["wa"],
+                                    i["full_p"]))),
+    ("dcomputepw", lambda i: (_pw, (i["full_p"], i["tv"], i["QVAPOR"],
+                                    i["zstag"]))),
+    ("dcomputeabsvort", lambda i: (_avo, (i["U"], i["V"], i["MAPFAC_U"],
+                                          i["MAPFAC_V"], i["MAPFAC_M"],
+                                          i["F"], i["dx"], i["dy"]))),
+    ("dcomputepv", lambda i: (_pvo, (i["U"], i["V"], i["theta"],
+                                     i["full_p"], i["MAPFAC_U"],
+                                     i["MAPFAC_V"], i["MAPFAC_M"], i["F"],
+                                     i["dx"], i["dy"]))),
+    ("dcalrelhl", lambda i: (_srhel, (_flip(i["ua"]), _flip(i["va"]),
+                                      _flip(i["z"]), i["HGT"], i["XLAT"],
+                                      3000.))),
+    ("dcalcuh", lambda i: (_udhel, (i["zstag"], i["MAPFAC_M"], i["ua"],
+                                    i["va"], i["W"], i["dx"], i["dy"],
+                                    2000., 5000.))),
+    ("calcdbz", lambda i: (_dbz, (i["full_p"], i["tk"], i["QVAPOR"],
+                                  i["QRAIN"], i["QSNOW"], i["QGRAUP"], 1, 0,
+                                  0))),
+    ("dcapecalc2d", lambda i: (_cape, (i["p_hpa"], i["tk"], i["QVAPOR"],
+                                       i["z"], i["HGT"], i["psfc_hpa"],
+                                       _MISSING, 0, 1))),
+    ("dcapecalc3d", lambda i: (_cape, (i["p_hpa"], i["tk"], i["QVAPOR"],
+                                       i["z"], i["HGT"], i["psfc_hpa"],
+                                       _MISSING, 1, 1))),
+    ("dcloudfrac2", lambda i: (_cloudfrac, (i["height_agl"], i["rh"], 1,
+                                            300., 2000., 6000., _MISSING))),
+    ("wrfcttcalc", lambda i: (_ctt, (i["p_hpa"], i["tk"],
+                                     i["QICE"] * 1000.,
+                                     i["QCLOUD"] * 1000.,
+                                     i["QVAPOR"] * 1000., i["z"], i["HGT"],
+                                     1, 0, _MISSING, 1.0))),
+    ("dinterp3dz", lambda i: (_interpz3d, (i["tk"], i["p_hpa"], _LEVELS,
+                                           _MISSING))),
+    ("wrf_vintrp", lambda i: (_vintrp, (i["tk"], i["full_p"], i["tk"],
+                                        i["QVAPOR"], i["z"], i["HGT"],
+                                        i["psfc_hpa"], i["psfc_hpa"],
+                                        i["p_hpa"], _LEVELS, 4, 1, 1, 1,
+                                        _MISSING))),
+    ("dcomputeuvmet", lambda i: (_uvmet, (i["ua"], i["va"], i["XLAT"],
+                                          i["XLONG"], i["cen_lon"], 0.7))),
+    ("dfilter2d", lambda i: (_smooth2d, (i["psfc_hpa"], 50, 2.0))),
+))
+
+
+def _nbytes(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (tuple, list)):
+        return sum(_nbytes(x) for x in obj)
+    return 0
+
+
+def time_call(func, args, repeat=3, number=1):
+    """Return the fastest time in seconds for one call of *func*."""
+    timer = timeit.Timer(lambda: func(*args))
+    return min(timer.repeat(repeat, number)) / number
+
+
+def bare_parallel_regions(fortran_dir=FORTRAN_DIR):
+    """Return the Fortran routines with a bare ``!$OMP PARALLEL`` region.
+
+    A bare region starts a team without a worksharing construct on the same
+    directive, so its scaling depends on the ``!$OMP DO`` loops inside it.
+
+    Returns:
+
+        :obj:`dict`: A mapping of lower case routine name to a list of
+        (file name, line number) tuples.  The mapping is empty if the
+        Fortran source is not available.
+
+    """
+    routine_re = re.compile(r"^\s*(?:recursive\s+)?subroutine\s+(\w+)", re.I)
+    bare_re = re.compile(r"^\s*!\$omp\s+parallel\s*(?:&|private|shared|"
+                         r"default|firstprivate|$)", re.I)
+
+    result = {}
+    if not os.path.isdir(fortran_dir):
+        return result
+
+    for fname in sorted(os.listdir(fortran_dir)):
+        if not fname.lower().endswith((".f90", ".f")):
+            continue
+        routine = None
+        with open(os.path.join(fortran_dir, fname)) as f:
+            for lineno, line in enumerate(f, 1):
+                match = routine_re.match(line)
+                if match:
+                    routine = match.group(1).lower()
+                elif routine is not None and bare_re.match(line):
+                    result.setdefault(routine, []).append((fname, lineno))
+
+    return result
+
+
+def _process_worker(path, routine, repeat, barrier, queue):
+    from netCDF4 import Dataset
+
+    wrfnc = Dataset(path)
+    func, args = KERNELS[routine](kernel_inputs(wrfnc))
+    with omp_threads(1):
+        func(*args)
+        barrier.wait()
+        start = timeit.default_timer()
+        for _ in range(repeat):
+            func(*args)
+        queue.put(timeit.default_timer() - start)
+    wrfnc.close()
+
+
+def process_scaling(path, routine, nprocs, repeat=3):
+    """Return the wall time for *repeat* calls of a kernel in each of
+    *nprocs* single threaded processes started together.
+
+    """
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(nprocs)
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=_process_worker,
+                         args=(path, routine, repeat, barrier, queue))
+             for _ in range(nprocs)]
+    for proc in procs:
+        proc.start()
+    times = [queue.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+
+    return max(times)
+
+
+def scaling_report(sizes=None, thread_counts=None, schedules=None,
+                   process_counts=(), kernels=None, repeat=3,
+                   threshold=EFFICIENCY_THRESHOLD):
+    """Return the scaling results for the kernels.
+
+    Args:
+
+        sizes (sequence of :obj:`int`, optional): The grid sizes.  Default
+            is the benchmark grid sizes.
+
+        thread_counts (sequence of :obj:`int`, optional): The OpenMP thread
+            counts.  Default is 1 and the powers of 2 up to the number of
+            processors.
+
+        schedules (sequence of :obj:`str`, optional): The schedule names
+            from :data:`SCHEDULES`.  Default is all of them.
+
+        process_counts (sequence of :obj:`int`, optional): The process
+            counts used for the process scaling.  Default is none.
+
+        kernels (sequence of :obj:`str`, optional): The Fortran routine
+            names from :data:`KERNELS`.  Default is all of them.
+
+        repeat (:obj:`int`, optional): The number of times each call is
+            timed.  The fastest time is used.  Default is 3.
+
+        threshold (:obj:`float`, optional): The parallel efficiency below
+            which a kernel is flagged.  Default is 0.5.
+
+    Returns:
+
+        :obj:`tuple`: A list of result rows and a list of flagged kernels.
+        Each row is a :obj:`dict` with the keys 'kernel', 'size', 'mode'
+        ('threads' or 'processes'), 'workers', 'schedule', 'time',
+        'speedup', 'efficiency', and 'bandwidth' (GB/s).  Each flag is a
+        :obj:`dict` with the keys 'kernel', 'size', 'efficiency', and
+        'reasons'.
+
+    """
+    if sizes is None:
+        sizes = GRID_SIZES
+    if thread_counts is None:
+        nprocs = max(omp_get_num_procs(), 1)
+        thread_counts = [1]
+        while thread_counts[-1] * 2 <= nprocs:
+            thread_counts.append(thread_counts[-1] * 2)
+    if not omp_enabled():
+        # Without OpenMP every thread count runs the same serial code
+        thread_counts = [1]
+    thread_counts = sorted(set(thread_counts) | {1})
+    if schedules is None:
+        schedules = list(SCHEDULES)
+    if kernels is None:
+        kernels = list(KERNELS)
+
+    bare = bare_parallel_regions()
+
+    rows = []
+    flags = []
+    for size in sizes:
+        wrfin = open_input(size)
+        try:
+            inputs = kernel_inputs(wrfin)
+        finally:
+            close_input(wrfin)
+
+        for routine in kernels:
+            func, args = KERNELS[routine](inputs)
+            with omp_threads(1):
+                result = func(*args)
+            nbytes = _nbytes(list(args)) + _nbytes(result)
+
+            best = {}
+            base = None
+            for schedule in schedules:
+                for num_threads in thread_counts:
+                    with omp_threads(num_threads, SCHEDULES[schedule]):
+                        elapsed = time_call(func, args, repeat)
+                    if num_threads == 1 and base is None:
+                        base = elapsed
+                    speedup = base / elapsed
+                    efficiency = speedup / num_threads
+                    rows.append({"kernel": routine, "size": size,
+                                 "mode": "threads", "workers": num_threads,
+                                 "schedule": schedule, "time": elapsed,
+                                 "speedup": speedup,
+                                 "efficiency": efficiency,
+                                 "bandwidth": nbytes / elapsed / 1.0e9})
+                    if num_threads == thread_counts[-1]:
+                        best[schedule] = efficiency
+
+            proc_efficiency = None
+            for nprocs in process_counts:
+                wall = process_scaling(synthetic_file(size), routine,
+                                       nprocs, repeat)
+                speedup = nprocs * repeat * base / wall
+                proc_efficiency = speedup / nprocs
+                rows.append({"kernel": routine, "size": size,
+                             "mode": "processes", "workers": nprocs,
+                             "schedule": "", "time": wall / repeat,
+                             "speedup": speedup,
+                             "efficiency": proc_efficiency,
+                             "bandwidth": (nprocs * repeat * nbytes / wall /
+                                           1.0e9)})
+
+            if len(thread_counts) < 2:
+                continue
+
+            efficiency = max(best.values())
+            if efficiency < threshold:
+                reasons = ["efficiency {:.2f} at {} threads".format(
+                    efficiency, thread_counts[-1])]
+                if routine in bare:
+                    reasons.append("bare !$OMP PARALLEL at " + ", ".join(
+                        "{}:{}".format(*loc) for loc in bare[routine]))
+                if proc_efficiency is not None:
+                    if proc_efficiency < threshold:
+                        reasons.append("processes also scale poorly, "
+                                       "likely memory bandwidth bound")
+                    else:
+                        reasons.append("processes scale, so the OpenMP "
+                                       "regions are the limit")
+                flags.append({"kernel": routine, "size": size,
+                              "efficiency": efficiency, "reasons": reasons})
+
+    return rows, flags
+
+
+def format_report(rows, flags):
+    """Return the results from :meth:`scaling_report` as a text table."""
+    header = "{:<16} {:>6} {:<10} {:>7} {:<8} {:>11} {:>8} {:>6} " \
+             "{:>8}".format("kernel", "size", "mode", "workers",
+                            "schedule", "time (ms)", "speedup", "eff",
+                            "GB/s")
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        lines.append("{:<16} {:>6} {:<10} {:>7} {:<8} {:>11.3f} {:>8.2f} "
+                     "{:>6.2f} {:>8.2f}".format(
+                         row["kernel"], row["size"], row["mode"],
+                         row["workers"], row["schedule"],
+                         row["time"] * 1000., row["speedup"],
+                         row["efficiency"], row["bandwidth"]))
+
+    if flags:
+        lines += ["", "Kernels that do not scale:"]
+        for flag in flags:
+            lines.append("  {} ({}x{}): {}".format(
+                flag["kernel"], flag["size"], flag["size"],
+                "; ".join(flag["reasons"])))
+
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Thread and process scaling of the Fortran kernels")
+    parser.add_argument("--sizes", type=int, nargs="+", default=None,
+                        help="grid sizes (default: %(default)s)")
+    parser.add_argument("--threads", type=int, nargs="+", default=None,
+                        help="OpenMP thread counts")
+    parser.add_argument("--schedules", nargs="+", default=None,
+                        choices=list(SCHEDULES), help="OpenMP schedules")
+    parser.add_argument("--processes", type=int, nargs="+", default=(),
+                        help="process counts for the process scaling")
+    parser.add_argument("--kernels", nargs="+", default=None,
+                        choices=list(KERNELS), help="Fortran routines")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threshold", type=float,
+                        default=EFFICIENCY_THRESHOLD,
+                        help="flag kernels below this efficiency")
+    args = parser.parse_args(argv)
+
+    if not omp_enabled():
+        print("wrf-python was built without OpenMP, so only a single "
+              "thread is timed", file=sys.stderr)
+
+    rows, flags = scaling_report(args.sizes, args.threads, args.schedules,
+                                 args.processes, args.kernels, args.repeat,
+                                 args.threshold)
+    print(format_report(rows, flags))
+
+    return 1 if flags else 0
+
+
+class KernelScaling(object):
+    """Every kernel with several OpenMP thread counts."""
+    params = (list(KERNELS), GRID_SIZES[1:], THREAD_COUNTS)
+    param_names = ["kernel", "size", "threads"]
+    timeout = 600
+
+    def setup(self, kernel, size, threads):
+        wrfin = open_input(size)
+        try:
+            self.func, self.args = KERNELS[kernel](kernel_inputs(wrfin))
+        finally:
+            close_input(wrfin)
+
+    def time_kernel(self, kernel, size, threads):
+        with omp_threads(threads):
+            self.func(*self.args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
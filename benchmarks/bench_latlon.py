@@ -0,0 +1,33 @@
+"""Benchmarks for the lat/lon to/from xy routines."""
+from __future__ import (absolute_import, division, print_function)
+
+import numpy as np
+
+from wrf import getvar, ll_to_xy, xy_to_ll, to_np
+
+from .common import GRID_SIZES, open_input, close_input
+
+
+class LatLon(object):
+    params = (GRID_SIZES, [1, 1000], [True, False])
+    param_names = ["size", "npoints", "meta"]
+
+    def setup(self, size, npoints, meta):
+        self.wrfin = open_input(size)
+        lats = to_np(getvar(self.wrfin, "lat", meta=False))
+        lons = to_np(getvar(self.wrfin, "lon", meta=False))
+
+        rng = np.random.RandomState(0)
+        self.y = rng.randint(0, lats.shape[-2], npoints)
+        self.x = rng.randint(0, lats.shape[-1], npoints)
+        self.lats = lats[self.y, self.x]
+        self.lons = lons[self.y, self.x]
+
+    def teardown(self, size, npoints, meta):
+        close_input(self.wrfin)
+
+    def time_ll_to_xy(self, size, npoints, meta):
+        ll_to_xy(self.wrfin, self.lats, self.lons, meta=meta)
+
+    def time_xy_to_ll(self, size, npoints, meta):
+        xy_to_ll(self.wrfin, self.x, self.y, meta=meta)
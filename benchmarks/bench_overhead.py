@@ -0,0 +1,46 @@
+"""Benchmarks for the Python overhead of the decorator stack.
+
+The arrays are tiny, so the times are almost all argument binding, type
+casting and transposing rather than compiled code.
+
+"""
+from __future__ import (absolute_import, division, print_function)
+
+import numpy as np
+
+from wrf import tk, rh, slp
+from wrf.extension import _wspd
+
+
+class SmallArrays(object):
+    params = [True, False]
+    param_names = ["meta"]
+
+    def setup(self, meta):
+        rng = np.random.RandomState(0)
+        # A 2 x 2 column block, since size 1 dimensions make an array both
+        # C and Fortran contiguous
+        nz = 30
+        shape = (nz, 2, 2)
+        self.pres = np.broadcast_to(
+            np.linspace(100000., 10000., nz)[:, None, None], shape).copy()
+        self.theta = np.broadcast_to(
+            np.linspace(290., 400., nz)[:, None, None], shape).copy()
+        self.qv = np.full(shape, 0.005)
+        self.tkel = tk(self.pres, self.theta, meta=False)
+        self.height = np.broadcast_to(
+            np.linspace(10., 16000., nz)[:, None, None], shape).copy()
+        self.u = rng.uniform(-20, 20, nz)
+        self.v = rng.uniform(-20, 20, nz)
+
+    def time_tk_column(self, meta):
+        tk(self.pres, self.theta, meta=meta)
+
+    def time_rh_column(self, meta):
+        rh(self.qv, self.pres, self.tkel, meta=meta)
+
+    def time_slp_column(self, meta):
+        slp(self.height, self.tkel, self.pres, self.qv, meta=meta)
+
+    def time_wspd_column(self, meta):
+        _wspd(self.u, self.v)
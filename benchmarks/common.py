@@ -0,0 +1,72 @@
+"""Shared input files for the benchmark suite.
+
+The inputs are synthetic WRF-ARW files written by
+test/ci_tests/make_synthetic_file.py, so every grid size is reproducible
+without shipping real model output.
+
+"""
+from __future__ import (absolute_import, division, print_function)
+
+import os
+import sys
+import tempfile
+
+from netCDF4 import Dataset
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir,
+                                "test", "ci_tests"))
+from make_synthetic_file import make_synthetic_file  # noqa: E402
+
+
+# Horizontal grid sizes (nx = ny)
+GRID_SIZES = [100, 200, 400]
+
+NUM_LEVELS = 30
+
+NUM_TIMES = 2
+
+THREAD_COUNTS = [1, 2, 4]
+
+FILE_COUNTS = [1, 4]
+
+
+def _cache_dir():
+    path = os.environ.get("WRF_BENCH_DATA",
+                          os.path.join(tempfile.gettempdir(),
+                                       "wrf-python-bench"))
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    return path
+
+
+def synthetic_file(size):
+    """Return the path to a synthetic file with a *size* x *size* grid.
+
+    The file is created on first use and reused afterwards.
+
+    """
+    path = os.path.join(_cache_dir(), "wrfout_{0}x{0}x{1}_t{2}.nc".format(
+        size, NUM_LEVELS, NUM_TIMES))
+    if os.path.exists(path):
+        return path
+
+    tmp = path + ".{}.tmp".format(os.getpid())
+    make_synthetic_file(tmp, size, size, NUM_LEVELS, NUM_TIMES)
+    os.rename(tmp, path)
+
+    return path
+
+
+def open_input(size, nfiles=1):
+    """Return a Dataset, or a list of *nfiles* Datasets, for the grid."""
+    path = synthetic_file(size)
+    if nfiles == 1:
+        return Dataset(path)
+
+    return [Dataset(path) for _ in range(nfiles)]
+
+
+def close_input(wrfin):
+    for wrfnc in (wrfin if isinstance(wrfin, list) else [wrfin]):
+        wrfnc.close()
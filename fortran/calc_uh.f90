@@ -157,3 +157,125 @@ SUBROUTINE DCALCUH(nx, ny, nz, nzp1, zp, mapfct, dx, dy, uhmnhgt, uhmxhgt, us, &
     RETURN
 
 END SUBROUTINE DCALCUH
+
+
+! Same as DCALCUH, but computes the updraft helicity for several
+! integration layers at once.  The vertical vorticity and the mid-level
+! heights are computed once and shared by all of the layers.
+
+!NCLFORTSTART
+SUBROUTINE DCALCUH_LAYERS(nx, ny, nz, nzp1, nlayers, zp, mapfct, dx, dy, &
+                          uhmnhgt, uhmxhgt, us, vs, w, uh, tem1, tem2)
+
+    IMPLICIT NONE
+
+    !f2py threadsafe
+    !f2py intent(in,out) :: uh
+
+    INTEGER, INTENT(IN) :: nx, ny, nz, nzp1, nlayers
+    REAL(KIND=8), DIMENSION(nx,ny,nzp1), INTENT(IN)  :: zp
+    REAL(KIND=8), DIMENSION(nx,ny), INTENT(IN) :: mapfct
+    REAL(KIND=8), INTENT(IN) :: dx, dy
+    REAL(KIND=8), DIMENSION(nlayers), INTENT(IN) :: uhmnhgt, uhmxhgt
+    REAL(KIND=8), DIMENSION(nx,ny,nz), INTENT(IN)  :: us
+    REAL(KIND=8), DIMENSION(nx,ny,nz), INTENT(IN)  :: vs
+    REAL(KIND=8), DIMENSION(nx,ny,nzp1), INTENT(IN)  :: w
+    REAL(KIND=8), DIMENSION(nx,ny,nlayers), INTENT(OUT) :: uh
+    REAL(KIND=8), DIMENSION(nx,ny,nz), INTENT(INOUT) :: tem1
+    REAL(KIND=8), DIMENSION(nx,ny,nz), INTENT(INOUT) :: tem2
+
+!NCLEND
+
+    ! Misc local variables
+    INTEGER :: i, j, k, l, kbot, ktop
+    REAL(KIND=8) :: twodx, twody, wgtlw, sum, wmean, wsum
+    REAL(KIND=8) :: helbot, heltop, wbot, wtop
+    REAL(KIND=8) :: zbot, ztop
+
+    ! Initialize arrays
+    uh = 0.0
+    tem1 = 0.0
+
+    twodx = 2.0*dx
+    twody = 2.0*dy
+
+    !$OMP PARALLEL
+
+    !$OMP DO COLLAPSE(3) SCHEDULE(runtime)
+    DO k=2,nz-2
+        DO j=2,ny-1
+            DO i=2,nx-1
+                tem1(i,j,k) = (0.5*(w(i,j,k)+w(i,j,k+1)))*((vs(i+1,j,k) - &
+                              vs(i-1,j,k))/(twodx*mapfct(i,j)) - &
+                              (us(i,j+1,k) - us(i,j-1,k))/(twody*mapfct(i,j)))
+                tem2(i,j,k) = 0.5*(zp(i,j,k) + zp(i,j,k+1))
+            END DO
+        END DO
+    END DO
+    !$OMP END DO
+
+    !$OMP DO COLLAPSE(2) PRIVATE(i, j, k, l, zbot, ztop, kbot, ktop, &
+    !$OMP wgtlw, wbot, wtop, wsum, wmean, sum, helbot, heltop) SCHEDULE(runtime)
+    DO j=2,ny-2
+        DO i=2,nx-2
+            DO l=1,nlayers
+                zbot = zp(i,j,2) + uhmnhgt(l)
+                ztop = zp(i,j,2) + uhmxhgt(l)
+
+                DO k=2,nz-3
+                    IF(zp(i,j,k) > zbot) EXIT
+                END DO
+                kbot = k
+                wgtlw = (zp(i,j,kbot) - zbot)/(zp(i,j,kbot) - zp(i,j,kbot-1))
+                wbot = (wgtlw*w(i,j,kbot-1)) + ((1. - wgtlw)*w(i,j,kbot))
+
+                DO k=2,nz-3
+                    IF(zp(i,j,k) > ztop) EXIT
+                END DO
+                ktop = k
+                wgtlw = (zp(i,j,ktop) - ztop)/(zp(i,j,ktop) - zp(i,j,ktop-1))
+                wtop = (wgtlw*w(i,j,ktop-1)) + ((1. - wgtlw)*w(i,j,ktop))
+
+                wsum = 0.5*(w(i,j,kbot) + wbot)*(zp(i,j,kbot) - zbot)
+
+                DO k=(kbot+1),(ktop-1)
+                    wsum = wsum + 0.5*(w(i,j,k) + w(i,j,k-1))*(zp(i,j,k) - zp(i,j,k-1))
+                END DO
+
+                wsum = wsum + 0.5*(wtop + w(i,j,ktop-1))*(ztop - zp(i,j,ktop-1))
+                wmean = wsum/(uhmxhgt(l) - uhmnhgt(l))
+
+                IF (wmean > 0.) THEN    ! column updraft, not downdraft
+
+                    DO k=2,nz-3
+                        IF (tem2(i,j,k) > zbot) EXIT
+                    END DO
+                    kbot = k
+                    wgtlw = (tem2(i,j,kbot) - zbot)/(tem2(i,j,kbot) - tem2(i,j,kbot-1))
+                    helbot = (wgtlw*tem1(i,j,kbot-1)) + ((1. - wgtlw)*tem1(i,j,kbot))
+
+                    DO k=2,nz-3
+                        IF (tem2(i,j,k) > ztop) EXIT
+                    END DO
+                    ktop = k
+                    wgtlw = (tem2(i,j,ktop) - ztop)/(tem2(i,j,ktop) - tem2(i,j,ktop-1))
+                    heltop = (wgtlw*tem1(i,j,ktop-1)) + ((1. - wgtlw)*tem1(i,j,ktop))
+
+                    sum = 0.5*(tem1(i,j,kbot) + helbot)*(tem2(i,j,kbot) - zbot)
+
+                    DO k=(kbot+1),(ktop-1)
+                        sum = sum + 0.5*(tem1(i,j,k) + tem1(i,j,k-1))*(tem2(i,j,k) - tem2(i,j,k-1))
+                    END DO
+
+                    uh(i,j,l) = sum + 0.5*(heltop + tem1(i,j,ktop-1))*(ztop - tem2(i,j,ktop-1))
+                END IF
+            END DO
+        END DO
+    END DO
+    !$OMP END DO
+
+    !$OMP END PARALLEL
+
+    RETURN
+
+END SUBROUTINE DCALCUH_LAYERS
@@ -263,9 +263,12 @@ END SUBROUTINE DPFCALC
 !
 
 
-! Important!  The z-indexes must be arranged so that mkzh (max z-index) is the
-! surface pressure.  So, pressure must be ordered in ascending order before
-! calling this routine.  Other variables must be ordered the same (p,tk,q,z).
+! Important!  The z-indexes are expected to be arranged so that mkzh (max
+! z-index) is the surface pressure, with pressure in ascending order.  Other
+! variables must be ordered the same (p,tk,q,z).  Set bottom_up to 1 when the
+! input arrays are in descending pressure order instead (WRF model order), and
+! they will be read in reverse.  For the 3D routine, the cape and cin outputs
+! are then also written in the input order.
 
 ! Also, be advised that missing data values are not checked during the computation.
 ! Also also, Pressure must be hPa
@@ -273,7 +276,7 @@ END SUBROUTINE DPFCALC
 ! NCLFORTSTART
 SUBROUTINE DCAPECALC3D(prs,tmk,qvp,ght,ter,sfp,cape,cin,&
             prsf, prs_new, tmk_new, qvp_new, ght_new,&
-            cmsg,mix,mjy,mkzh,ter_follow,&
+            cmsg,mix,mjy,mkzh,ter_follow,bottom_up,&
             psafile, errstat, errmsg)
     USE wrf_constants, ONLY : CELKEL, G, EZERO, ESLCON1, ESLCON2, &
                           EPS, RD, CP, GAMMA, CPMD, RGASMD, GAMMAMD, TLCLC1, &
@@ -285,7 +288,7 @@ SUBROUTINE DCAPECALC3D(prs,tmk,qvp,ght,ter,sfp,cape,cin,&
     !f2py threadsafe
     !f2py intent(in,out) :: cape, cin
 
-    INTEGER, INTENT(IN) :: mix, mjy, mkzh, ter_follow
+    INTEGER, INTENT(IN) :: mix, mjy, mkzh, ter_follow, bottom_up
     REAL(KIND=8), DIMENSION(mix,mjy,mkzh), INTENT(IN) :: prs
     REAL(KIND=8), DIMENSION(mix,mjy,mkzh), INTENT(IN) :: tmk
     REAL(KIND=8), DIMENSION(mix,mjy,mkzh), INTENT(IN) :: qvp
@@ -310,6 +313,7 @@ SUBROUTINE DCAPECALC3D(prs,tmk,qvp,ght,ter,sfp,cape,cin,&
 ! NCLFORTEND
 
     ! local variables
+    INTEGER :: k0, kstep
     INTEGER :: i, j, k, ilcl, kel, kk, klcl, klev, klfc, kmax, kpar
     REAL(KIND=8) :: tlcl, zlcl
     REAL(KIND=8) :: ethpari, qvppari, tmkpari
@@ -359,14 +363,24 @@ SUBROUTINE DCAPECALC3D(prs,tmk,qvp,ght,ter,sfp,cape,cin,&
     !  calculated the pressure at full sigma levels (a set of pressure
     !  levels that bound the layers represented by the vertical grid points)
 
+    ! The column copies are always in ascending pressure order.  When the
+    ! input arrays go from the bottom to the top, they are read in reverse.
+    IF (bottom_up .NE. 0) THEN
+        k0 = mkzh + 1
+        kstep = -1
+    ELSE
+        k0 = 0
+        kstep = 1
+    END IF
+
     !$OMP PARALLEL DO COLLAPSE(3) SCHEDULE(runtime)
     DO j = 1,mjy
         DO i = 1,mix
             DO k = 1,mkzh
-                prs_new(k,i,j) = prs(i,j,k)
-                tmk_new(k,i,j) = tmk(i,j,k)
-                qvp_new(k,i,j) = qvp(i,j,k)
-                ght_new(k,i,j) = ght(i,j,k)
+                prs_new(k,i,j) = prs(i,j,k0+kstep*k)
+                tmk_new(k,i,j) = tmk(i,j,k0+kstep*k)
+                qvp_new(k,i,j) = qvp(i,j,k0+kstep*k)
+                ght_new(k,i,j) = ght(i,j,k0+kstep*k)
             END DO
         END DO
     END DO
@@ -391,8 +405,8 @@ SUBROUTINE DCAPECALC3D(prs,tmk,qvp,ght,ter,sfp,cape,cin,&
     !$OMP i, j, k, kpar) SCHEDULE(runtime)
     DO j = 1,mjy
         DO i = 1,mix
-            cape(i,j,1) = 0.D0
-            cin(i,j,1) = 0.D0
+            cape(i,j,k0+kstep) = 0.D0
+            cin(i,j,k0+kstep) = 0.D0
              
             !!$OMP SIMD
             DO kpar = 2, mkzh
@@ -434,7 +448,7 @@ SUBROUTINE DCAPECALC3D(prs,tmk,qvp,ght,ter,sfp,cape,cin,&
                         tvenv = tmk_new(k,i,j)*(EPS + qvp_new(k,i,j))/(EPS*(1.D0 + qvp_new(k,i,j)))
                         tvlift = tmklift*(EPS + qvp_new(kpar,i,j))/(EPS*(1.D0 + qvp_new(kpar,i,j)))
                         ghtlift = ght_new(k,i,j)
-                    ELSE IF (ght(i,j,k) .GE. zlcl .AND. ilcl .EQ. 0) THEN
+                    ELSE IF (ght_new(k,i,j) .GE. zlcl .AND. ilcl .EQ. 0) THEN
                         ! This model level and previous model level straddle the lcl,
                         ! so first create a new level in the bottom-up array, at the lcl.
                         facden = 1.0/(ght_new(k,i,j) - ght_new(k+1,i,j))
@@ -529,8 +543,8 @@ SUBROUTINE DCAPECALC3D(prs,tmk,qvp,ght,ter,sfp,cape,cin,&
 
                 IF (.NOT. elfound) THEN
                     !print *,'el not found'
-                    cape(i,j,kpar) = cmsg
-                    cin(i,j,kpar)  = cmsg
+                    cape(i,j,k0+kstep*kpar) = cmsg
+                    cin(i,j,k0+kstep*kpar)  = cmsg
                     klfc = kmax
                     CYCLE
                 END IF
@@ -556,8 +570,8 @@ SUBROUTINE DCAPECALC3D(prs,tmk,qvp,ght,ter,sfp,cape,cin,&
 
                 ! Now we can assign values to cape and cin
 
-                cape(i,j,kpar) = MAX(benaccum(kel)-benamin, 0.1D0)
-                cin(i,j,kpar) = MAX(-benamin, 0.1D0)
+                cape(i,j,k0+kstep*kpar) = MAX(benaccum(kel)-benamin, 0.1D0)
+                cin(i,j,k0+kstep*kpar) = MAX(-benamin, 0.1D0)
 
                 ! cin is uninteresting when cape is small (< 100 j/kg), so set
                 ! cin to -0.1 (see note about missing values in v6.1.0) in
@@ -568,7 +582,7 @@ SUBROUTINE DCAPECALC3D(prs,tmk,qvp,ght,ter,sfp,cape,cin,&
                 ! to a more appropriate missing value, which is passed into this
                 ! routine as cmsg.
 
-                IF (cape(i,j,kpar) .LT. 100.D0) cin(i,j,kpar) = cmsg
+                IF (cape(i,j,k0+kstep*kpar) .LT. 100.D0) cin(i,j,k0+kstep*kpar) = cmsg
 
             END DO
         END DO
@@ -593,9 +607,11 @@ END SUBROUTINE DCAPECALC3D
 !   the cape and cin arrays.  Also, LCL and LFC heights
 !   are put in the k=mkzh-1 and k=mkzh-2 slabs of the cin array.
 !
-! Important!  The z-indexes must be arranged so that mkzh (max z-index) is the
-! surface pressure.  So, pressure must be ordered in ascending order before
-! calling this routine.  Other variables must be ordered the same (p,tk,q,z).
+! Important!  The z-indexes are expected to be arranged so that mkzh (max
+! z-index) is the surface pressure, with pressure in ascending order.  Other
+! variables must be ordered the same (p,tk,q,z).  Set bottom_up to 1 when the
+! input arrays are in descending pressure order instead (WRF model order), and
+! they will be read in reverse.
 
 ! Also, be advised that missing data values are not checked during the
 ! computation.
@@ -604,7 +620,7 @@ END SUBROUTINE DCAPECALC3D
 ! NCLFORTSTART
 SUBROUTINE DCAPECALC2D(prs,tmk,qvp,ght,ter,sfp,cape,cin,&
             prsf, prs_new, tmk_new, qvp_new, ght_new,&
-            cmsg,mix,mjy,mkzh,ter_follow,&
+            cmsg,mix,mjy,mkzh,ter_follow,bottom_up,&
             psafile, errstat, errmsg)
     USE wrf_constants, ONLY : CELKEL, G, EZERO, ESLCON1, ESLCON2, &
                           EPS, RD, CP, GAMMA, CPMD, RGASMD, GAMMAMD, TLCLC1, &
@@ -616,7 +632,7 @@ SUBROUTINE DCAPECALC2D(prs,tmk,qvp,ght,ter,sfp,cape,cin,&
     !f2py threadsafe
     !f2py intent(in,out) :: cape, cin
 
-    INTEGER, INTENT(IN) :: mix, mjy, mkzh, ter_follow
+    INTEGER, INTENT(IN) :: mix, mjy, mkzh, ter_follow, bottom_up
     REAL(KIND=8), DIMENSION(mix,mjy,mkzh), INTENT(IN) :: prs
     REAL(KIND=8), DIMENSION(mix,mjy,mkzh), INTENT(IN) :: tmk
     REAL(KIND=8), DIMENSION(mix,mjy,mkzh), INTENT(IN) :: qvp
@@ -641,6 +657,7 @@ SUBROUTINE DCAPECALC2D(prs,tmk,qvp,ght,ter,sfp,cape,cin,&
 
 
     ! local variables
+    INTEGER :: k0, kstep
     INTEGER :: i, j, k, ilcl, kel, kk, klcl, klev, klfc, kmax, kpar, kpar1, kpar2
     REAL(KIND=8) :: ethmax, p, e, tlcl, zlcl
     REAL(KIND=8) :: pavg, tvirtual, p1, p2, pp1, pp2, th, totthe, totqvp, totprs
@@ -690,14 +707,24 @@ SUBROUTINE DCAPECALC2D(prs,tmk,qvp,ght,ter,sfp,cape,cin,&
     !           kg/kg (should range from 0.000 to 0.025)
     !
 
+    ! The column copies are always in ascending pressure order.  When the
+    ! input arrays go from the bottom to the top, they are read in reverse.
+    IF (bottom_up .NE. 0) THEN
+        k0 = mkzh + 1
+        kstep = -1
+    ELSE
+        k0 = 0
+        kstep = 1
+    END IF
+
     !$OMP PARALLEL DO COLLAPSE(3) SCHEDULE(runtime)
     DO j = 1,mjy
         DO i = 1,mix
             DO k = 1,mkzh
-                prs_new(k,i,j) = prs(i,j,k)
-                tmk_new(k,i,j) = tmk(i,j,k)
-                qvp_new(k,i,j) = qvp(i,j,k)
-                ght_new(k,i,j) = ght(i,j,k)
+                prs_new(k,i,j) = prs(i,j,k0+kstep*k)
+                tmk_new(k,i,j) = tmk(i,j,k0+kstep*k)
+                qvp_new(k,i,j) = qvp(i,j,k0+kstep*k)
+                ght_new(k,i,j) = ght(i,j,k0+kstep*k)
             END DO
         END DO
     END DO
@@ -831,7 +858,7 @@ SUBROUTINE DCAPECALC2D(prs,tmk,qvp,ght,ter,sfp,cape,cin,&
                         tvenv = tmk_new(k,i,j)*(EPS + qvp_new(k,i,j))/(EPS*(1.D0 + qvp_new(k,i,j)))
                         tvlift = tmklift*(EPS + qvp_new(kpar,i,j))/(EPS*(1.D0 + qvp_new(kpar,i,j)))
                         ghtlift = ght_new(k,i,j)
-                    ELSE IF (ght(i,j,k) .GE. zlcl .AND. ilcl .EQ. 0) THEN
+                    ELSE IF (ght_new(k,i,j) .GE. zlcl .AND. ilcl .EQ. 0) THEN
                         ! This model level and previous model level straddle the lcl,
                         ! so first create a new level in the bottom-up array, at the lcl.
                         facden = 1/(ght_new(k,i,j) - ght_new(k+1,i,j))
@@ -986,3 +1013,559 @@ SUBROUTINE DCAPECALC2D(prs,tmk,qvp,ght,ter,sfp,cape,cin,&
 
     RETURN
 END SUBROUTINE DCAPECALC2D
+
+
+! Returns the pressure bracket in the pseudoadiabat lookup table for prs,
+! as used by TONPSADIABAT.  The bracket only depends on the pressure, so it
+! is shared by every parcel lifted through a level.  ip is set to 0 when the
+! pressure is above the top of the table, where the dry formula is used.
+
+! NCLFORTSTART
+SUBROUTINE DPSADIPRSIDX(prs, psadiprs, ip, fracip)
+
+    !f2py threadsafe
+
+    IMPLICIT NONE
+    REAL(KIND=8), INTENT(IN) :: prs
+    REAL(KIND=8), DIMENSION(150), INTENT(IN) :: psadiprs
+    INTEGER, INTENT(OUT) :: ip
+    REAL(KIND=8), INTENT(OUT) :: fracip
+
+! NCLEND
+
+    INTEGER :: l2, h2, mid2, rang2
+
+    IF (prs .LE. psadiprs(150)) THEN
+        ip = 0
+        fracip = 0.D0
+        RETURN
+    END IF
+
+    l2 = 1
+    h2 = 149
+    rang2 = h2 - l2
+    mid2 = (h2 + l2) / 2
+    DO WHILE(rang2 .GT. 1)
+        IF (prs .LE. psadiprs(mid2)) THEN
+           l2 = mid2
+        ELSE
+           h2 = mid2
+        END IF
+        rang2 = h2 - l2
+        mid2 = (h2 + l2) / 2
+    END DO
+    ip = l2
+
+    fracip = (psadiprs(ip)-prs) / (psadiprs(ip)-psadiprs(ip+1))
+
+    RETURN
+
+END SUBROUTINE DPSADIPRSIDX
+
+
+! Same as TONPSADIABAT, but with the pressure bracket from DPSADIPRSIDX.
+
+! NCLFORTSTART
+REAL(KIND=8) FUNCTION TONPSADIABATIP(thte, prs, ip, fracip, psadithte, &
+                                     psaditmk, gamma, errstat, errmsg)
+    USE wrf_constants, ONLY : ALGERR
+
+    !f2py threadsafe
+
+    IMPLICIT NONE
+    REAL(KIND=8), INTENT(IN) :: thte
+    REAL(KIND=8), INTENT(IN) :: prs
+    INTEGER, INTENT(IN) :: ip
+    REAL(KIND=8), INTENT(IN) :: fracip
+    REAL(KIND=8), DIMENSION(150), INTENT(IN) :: psadithte
+    REAL(KIND=8), DIMENSION(150,150), INTENT(IN) :: psaditmk
+    REAL(KIND=8), INTENT(IN) :: gamma
+    INTEGER, INTENT(INOUT) :: errstat
+    CHARACTER(LEN=*), INTENT(INOUT) :: errmsg
+
+! NCLEND
+
+    REAL(KIND=8) :: fracjt, fracjt2, fracip2
+    INTEGER :: l1, h1, mid1, rang1, jt
+
+    IF (ip .EQ. 0) THEN
+        TONPSADIABATIP = thte * (prs/1000.D0)**gamma
+        RETURN
+    END IF
+
+    l1 = 1
+    h1 = 149
+    rang1 = h1 - l1
+    mid1 = (h1 + l1) / 2
+    DO WHILE(rang1 .GT. 1)
+        IF (thte .GE. psadithte(mid1)) THEN
+           l1 = mid1
+        ELSE
+           h1 = mid1
+        END IF
+        rang1 = h1 - l1
+        mid1 = (h1 + l1) / 2
+    END DO
+    jt = l1
+
+    fracjt = (thte-psadithte(jt)) / (psadithte(jt+1)-psadithte(jt))
+    fracjt2 = 1.D0 - fracjt
+    fracip2 = 1.D0 - fracip
+
+    IF (psaditmk(ip,jt) .GT. 1D9 .OR. psaditmk(ip+1,jt) .GT. 1D9 .OR. &
+        psaditmk(ip,jt+1) .GT. 1D9 .OR. psaditmk(ip+1,jt+1) .GT. 1D9) THEN
+        ! Set the error and return
+        TONPSADIABATIP = -1
+        errstat = ALGERR
+        WRITE(errmsg, *) "capeparcels: Tried to access missing temperature in lookup table. ", &
+                 "Prs and Thte probably unreasonable. prs,thte=", prs, thte
+        RETURN
+    END IF
+
+    TONPSADIABATIP = fracip2*fracjt2*psaditmk(ip,jt) + fracip*fracjt2*psaditmk(ip+1,jt) + &
+            fracip2*fracjt*psaditmk(ip,jt+1) + fracip*fracjt*psaditmk(ip+1,jt+1)
+
+    RETURN
+
+END FUNCTION TONPSADIABATIP
+
+
+! Lifts a single parcel through a column and returns its CAPE, CIN, and the
+! LCL and LFC heights above ground.  The column is in ascending pressure
+! order (k=mkzh is the lowest level), and the parcel starts at level kpar
+! with temperature tmkpari and mixing ratio qvppari.  This follows the
+! buoyancy integration in DCAPECALC2D.
+!
+! Before any moist ascent, an upper bound for the parcel's virtual
+! temperature above the LCL is checked against the environment.  Theta-e
+! is never less than theta, so the parcel can be no warmer than the dry
+! adiabat of its theta-e.  When even that bound is colder than the
+! environment at every level, the parcel has no equilibrium level and the
+! table lookups are skipped.
+
+! NCLFORTSTART
+SUBROUTINE DLIFTPARCEL(prs, tmk, qvp, ght, ip, fracip, ter, mkzh, kpar, &
+                       tmkpari, qvppari, psadithte, psadiprs, psaditmk, &
+                       cmsg, cape, cin, lcl, lfc, errstat, errmsg)
+    USE wrf_constants, ONLY : CELKEL, G, EZERO, ESLCON1, ESLCON2, &
+                          EPS, CP, GAMMA, CPMD, GAMMAMD, TLCLC1, &
+                          TLCLC2, TLCLC3, TLCLC4, THTECON1, THTECON2, THTECON3
+
+    !f2py threadsafe
+
+    IMPLICIT NONE
+    INTEGER, INTENT(IN) :: mkzh, kpar
+    REAL(KIND=8), DIMENSION(mkzh), INTENT(IN) :: prs, tmk, qvp, ght
+    INTEGER, DIMENSION(mkzh), INTENT(IN) :: ip
+    REAL(KIND=8), DIMENSION(mkzh), INTENT(IN) :: fracip
+    REAL(KIND=8), INTENT(IN) :: ter, tmkpari, qvppari, cmsg
+    REAL(KIND=8), DIMENSION(150), INTENT(IN) :: psadithte, psadiprs
+    REAL(KIND=8), DIMENSION(150,150), INTENT(IN) :: psaditmk
+    REAL(KIND=8), INTENT(OUT) :: cape, cin, lcl, lfc
+    INTEGER, INTENT(INOUT) :: errstat
+    CHARACTER(LEN=*), INTENT(INOUT) :: errmsg
+
+! NCLEND
+
+    REAL(KIND=8), EXTERNAL :: TONPSADIABATIP
+
+    INTEGER :: k, kk, ilcl, klcl, kmax, kel, klfc, kstr
+    REAL(KIND=8) :: cpm, e, tlcl, ethpari, zlcl, facden, tmkenv, qvpenv
+    REAL(KIND=8) :: tmklift, eslift, qvplift, tvenv, tvlift, ghtlift
+    REAL(KIND=8) :: benamin, dz, tbound
+    REAL(KIND=8), DIMENSION(2*mkzh + 1) :: buoy, zrel, benaccum
+    LOGICAL :: elfound, stable
+
+    cpm = CP * (1.D0 + CPMD*qvppari)
+
+    e = MAX(1.D-20,qvppari*prs(kpar)/(EPS + qvppari))
+    tlcl = TLCLC1/(LOG(tmkpari**TLCLC2/e) - TLCLC3) + TLCLC4
+    ethpari = tmkpari*(1000.D0/prs(kpar))**(GAMMA*(1.D0 + GAMMAMD*qvppari))*&
+              EXP((THTECON1/tlcl - THTECON2)*qvppari*(1.D0 + THTECON3*qvppari))
+    zlcl = ght(kpar) + (tmkpari - tlcl)/(G/cpm)
+
+    ! Check for a trivially stable parcel.  The bound is only used inside
+    ! the lookup table, and only when the column reaches the LCL.
+    stable = (zlcl .LE. ght(1) .AND. ethpari .GE. psadithte(1) .AND. &
+              ethpari .LT. psadithte(149))
+
+    kstr = kpar
+    IF (stable .AND. ght(kpar) .LT. zlcl) THEN
+        ! Buoyancy at the LCL, between levels kstr+1 and kstr
+        DO k = kpar-1,1,-1
+            IF (ght(k) .GE. zlcl) THEN
+                kstr = k
+                EXIT
+            END IF
+        END DO
+        facden = 1/(ght(kstr) - ght(kstr+1))
+        tmkenv = tmk(kstr+1)*((ght(kstr)-zlcl)*facden) + tmk(kstr)*&
+                 ((zlcl-ght(kstr+1))*facden)
+        qvpenv = qvp(kstr+1)*((ght(kstr)-zlcl)*facden) + qvp(kstr)*&
+                 ((zlcl-ght(kstr+1))*facden)
+        tvenv = tmkenv*(EPS + qvpenv)/(EPS*(1.D0 + qvpenv))
+        tvlift = tlcl*(EPS + qvppari)/(EPS*(1.D0 + qvppari))
+        IF (tvlift .GE. tvenv) stable = .FALSE.
+
+        ! The level straddling the LCL is replaced by the LCL
+        kstr = kstr - 1
+    END IF
+
+    IF (stable) THEN
+        DO k = kstr,1,-1
+            IF (prs(k) .GT. psadiprs(1)) THEN
+                stable = .FALSE.
+                EXIT
+            END IF
+            tbound = ethpari*(prs(k)/1000.D0)**GAMMA + 0.1D0
+            eslift = EZERO*EXP(ESLCON1*(tbound - CELKEL)/(tbound - ESLCON2))
+            IF (eslift .GE. prs(k)) THEN
+                stable = .FALSE.
+                EXIT
+            END IF
+            qvplift = EPS*eslift/(prs(k) - eslift)
+            ! The environment's virtual temperature is at least tmk
+            IF (tbound*(EPS + qvplift)/(EPS*(1.D0 + qvplift)) .GE. tmk(k)) THEN
+                stable = .FALSE.
+                EXIT
+            END IF
+        END DO
+    END IF
+
+    IF (stable) THEN
+        cape = cmsg
+        cin = cmsg
+        lcl = MAX(zlcl, ght(kpar)) - ter
+        lfc = ght(1) - ter
+        RETURN
+    END IF
+
+    ! Calculate buoyancy and relative height of lifted parcel at all levels,
+    ! and store in bottom up arrays.  Add a level at the lcl, and at all
+    ! points where buoyancy is zero.
+    kk = 0
+    ilcl = 0
+    klcl = 0
+
+    IF (ght(kpar) .GE. zlcl) THEN
+        ! Initial parcel already saturated or supersaturated.
+        ilcl = 2
+        klcl = 1
+    END IF
+
+    DO k = kpar,1,-1
+        kk = kk + 1
+
+        IF (ght(k) .LT. zlcl) THEN
+            ! Model level is below lcl
+            tmklift = tmkpari - G/cpm*(ght(k) - ght(kpar))
+            tvenv = tmk(k)*(EPS + qvp(k))/(EPS*(1.D0 + qvp(k)))
+            tvlift = tmklift*(EPS + qvppari)/(EPS*(1.D0 + qvppari))
+            ghtlift = ght(k)
+        ELSE IF (ght(k) .GE. zlcl .AND. ilcl .EQ. 0) THEN
+            ! This model level and previous model level straddle the lcl,
+            ! so first create a new level in the bottom-up array, at the lcl.
+            facden = 1/(ght(k) - ght(k+1))
+            tmkenv = tmk(k+1)*((ght(k)-zlcl)*facden) + tmk(k)*&
+                     ((zlcl-ght(k+1))*facden)
+            qvpenv = qvp(k+1)*((ght(k)-zlcl)*facden) + qvp(k)*&
+                     ((zlcl-ght(k+1))*facden)
+            tvenv = tmkenv*(EPS + qvpenv)/(EPS*(1.D0 + qvpenv))
+            tvlift = tlcl*(EPS + qvppari)/(EPS*(1.D0 + qvppari))
+            ghtlift = zlcl
+            ilcl = 1
+        ELSE
+            tmklift = TONPSADIABATIP(ethpari, prs(k), ip(k), fracip(k), &
+                                     psadithte, psaditmk, GAMMA, errstat, errmsg)
+            eslift = EZERO*EXP(ESLCON1*(tmklift - CELKEL)/(tmklift - ESLCON2))
+            qvplift = EPS*eslift/(prs(k) - eslift)
+            tvenv = tmk(k)*(EPS + qvp(k))/(EPS*(1.D0 + qvp(k)))
+            tvlift = tmklift*(EPS + qvplift)/(EPS*(1.D0 + qvplift))
+            ghtlift = ght(k)
+        END IF
+
+        ! Buoyancy
+        buoy(kk) = G*(tvlift - tvenv)/tvenv
+        zrel(kk) = ghtlift - ght(kpar)
+        IF ((kk .GT. 1) .AND. (buoy(kk)*buoy(kk-1) .LT. 0.0D0)) THEN
+            ! Parcel ascent curve crosses sounding curve, so create a new
+            ! level in the bottom-up array at the crossing.
+            kk = kk + 1
+            buoy(kk) = buoy(kk-1)
+            zrel(kk) = zrel(kk-1)
+            buoy(kk-1) = 0.D0
+            zrel(kk-1) = zrel(kk-2) + buoy(kk-2)/&
+                         (buoy(kk-2) - buoy(kk))*(zrel(kk) - zrel(kk-2))
+        END IF
+        IF (ilcl .EQ. 1) THEN
+            klcl = kk
+            ilcl = 2
+            CYCLE
+        END IF
+    END DO
+
+    kmax = kk
+
+    ! If no lcl was found, set klcl to kmax.
+    IF (ilcl .EQ. 0) klcl = kmax
+
+    ! Get the accumulated buoyant energy from the parcel's starting point,
+    ! at all levels up to the top level.
+    benaccum(1) = 0.0D0
+    DO k = 2,kmax
+        dz = zrel(k) - zrel(k-1)
+        benaccum(k) = benaccum(k-1) + .5D0*dz*(buoy(k-1) + buoy(k))
+    END DO
+
+    ! The equilibrium level (el) is the highest level of non-negative
+    ! buoyancy above the lcl.
+    elfound = .FALSE.
+    kel = kmax
+    DO k = kmax,klcl,-1
+        IF (buoy(k) .GE. 0.D0) THEN
+            kel = k
+            elfound = .TRUE.
+            EXIT
+        END IF
+    END DO
+
+    lcl = zrel(klcl) + ght(kpar) - ter
+
+    IF (.NOT. elfound) THEN
+        cape = cmsg
+        cin = cmsg
+        lfc = zrel(kmax) + ght(kpar) - ter
+        RETURN
+    END IF
+
+    ! The lfc is the point below the el, but at or above the lcl, where
+    ! the accumulated buoyant energy is a minimum.
+    benamin = 9D9
+    klfc = kmax
+    DO k = klcl,kel
+        IF (benaccum(k) .LT. benamin) THEN
+            benamin = benaccum(k)
+            klfc = k
+        END IF
+    END DO
+
+    cape = MAX(benaccum(kel)-benamin, 0.1D0)
+    cin = MAX(-benamin, 0.1D0)
+
+    ! cin is uninteresting when cape is small (< 100 j/kg)
+    IF (cape .LT. 100.D0) cin = cmsg
+
+    lfc = zrel(klfc) + ght(kpar) - ter
+
+    RETURN
+
+END SUBROUTINE DLIFTPARCEL
+
+!======================================================================
+!
+! !IROUTINE: capeparcels -- Calculate CAPE and CIN for standard parcels
+!
+! !DESCRIPTION:
+!
+!   Calculates CAPE, CIN, and the LCL and LFC heights above ground for
+!   each requested parcel type in a single pass over the columns.  The
+!   parcel types are:
+!
+!       1 - surface based: the lowest model level.
+!       2 - mixed layer: the pressure weighted mean potential temperature
+!           and mixing ratio of the lowest 100 hPa, lifted from the lowest
+!           model level.
+!       3 - most unstable: the level with the highest theta-e in the
+!           lowest 300 hPa.
+!
+!   The lookup table is read once, the pressure brackets in the table are
+!   found once for each level and shared by all of the parcels, and the
+!   most unstable parcel reuses the surface based result when both start
+!   at the lowest level.
+!
+!   The res output holds cape, cin, lcl, and lfc for each parcel type in
+!   the order requested.
+!
+! The z-indexes are expected to be arranged so that mkzh (max z-index) is the
+! surface pressure, with pressure in ascending order.  Set bottom_up to 1 when
+! the input arrays are in descending pressure order instead (WRF model order),
+! and they will be read in reverse.
+
+! Also, be advised that missing data values are not checked during the
+! computation.
+! Also also, Pressure must be hPa
+
+! NCLFORTSTART
+SUBROUTINE DCAPEPARCELS(prs,tmk,qvp,ght,ter,sfp,parcels,res,&
+            cmsg,mix,mjy,mkzh,nparcel,ter_follow,bottom_up,&
+            psafile, errstat, errmsg)
+    USE wrf_constants, ONLY : GAMMA, GAMMAMD, EPS, TLCLC1, TLCLC2, &
+                          TLCLC3, TLCLC4, THTECON1, THTECON2, THTECON3
+
+    IMPLICIT NONE
+
+    !f2py threadsafe
+    !f2py intent(in,out) :: res
+
+    INTEGER, INTENT(IN) :: mix, mjy, mkzh, nparcel, ter_follow, bottom_up
+    REAL(KIND=8), DIMENSION(mix,mjy,mkzh), INTENT(IN) :: prs
+    REAL(KIND=8), DIMENSION(mix,mjy,mkzh), INTENT(IN) :: tmk
+    REAL(KIND=8), DIMENSION(mix,mjy,mkzh), INTENT(IN) :: qvp
+    REAL(KIND=8), DIMENSION(mix,mjy,mkzh), INTENT(IN) :: ght
+    REAL(KIND=8), DIMENSION(mix,mjy), INTENT(IN) :: ter
+    REAL(KIND=8), DIMENSION(mix,mjy), INTENT(IN) :: sfp
+    INTEGER, DIMENSION(nparcel), INTENT(IN) :: parcels
+    REAL(KIND=8), DIMENSION(mix,mjy,nparcel,4), INTENT(OUT) :: res
+    REAL(KIND=8), INTENT(IN) :: cmsg
+    CHARACTER(LEN=*), INTENT(IN) :: psafile
+    INTEGER, INTENT(INOUT) :: errstat
+    CHARACTER(LEN=*), INTENT(INOUT) :: errmsg
+
+! NCLEND
+
+    ! local variables
+    INTEGER :: k0, kstep
+    INTEGER :: i, j, k, n, kmu
+    REAL(KIND=8) :: psfc, p1, p2, pup, pdn, pp1, pp2, th, totthe, totqvp, totprs
+    REAL(KIND=8) :: tlcl, eth, ethmax, q, tmkpari, qvppari
+    REAL(KIND=8), DIMENSION(mkzh) :: prsc, tmkc, qvpc, ghtc, pfc, fracip
+    INTEGER, DIMENSION(mkzh) :: ip
+    REAL(KIND=8), DIMENSION(4) :: sbres
+    LOGICAL :: havesb
+    REAL(KIND=8), DIMENSION(150) :: psadithte, psadiprs
+    REAL(KIND=8), DIMENSION(150,150) :: psaditmk
+
+    errstat = 0
+
+    ! The column copies are always in ascending pressure order.  When the
+    ! input arrays go from the bottom to the top, they are read in reverse.
+    IF (bottom_up .NE. 0) THEN
+        k0 = mkzh + 1
+        kstep = -1
+    ELSE
+        k0 = 0
+        kstep = 1
+    END IF
+
+    CALL DLOOKUP_TABLE(psadithte, psadiprs, psaditmk, psafile, errstat, errmsg)
+
+    IF (errstat .NE. 0) THEN
+        RETURN
+    END IF
+
+    !$OMP PARALLEL DO COLLAPSE(2) PRIVATE(i, j, k, n, kmu, psfc, p1, p2, &
+    !$OMP pup, pdn, pp1, pp2, th, totthe, totqvp, totprs, tlcl, eth, ethmax, &
+    !$OMP q, tmkpari, qvppari, prsc, tmkc, qvpc, ghtc, pfc, fracip, ip, &
+    !$OMP sbres, havesb) SCHEDULE(runtime)
+    DO j = 1,mjy
+        DO i = 1,mix
+            DO k = 1,mkzh
+                prsc(k) = prs(i,j,k0+kstep*k)
+                tmkc(k) = tmk(i,j,k0+kstep*k)
+                qvpc(k) = qvp(i,j,k0+kstep*k)
+                ghtc(k) = ght(i,j,k0+kstep*k)
+                CALL DPSADIPRSIDX(prsc(k), psadiprs, ip(k), fracip(k))
+            END DO
+
+            ! Pressure at the lower bound of each layer (see DPFCALC)
+            DO k = 1,mkzh-1
+                pfc(k) = .5D0 * (prsc(k+1) + prsc(k))
+            END DO
+            IF (ter_follow .EQ. 1) THEN
+                pfc(mkzh) = sfp(i,j)
+            ELSE
+                pfc(mkzh) = .5D0 * (3.D0*prsc(mkzh) - prsc(mkzh-1))
+            END IF
+            psfc = pfc(mkzh)
+
+            havesb = .FALSE.
+            DO n = 1,nparcel
+                SELECT CASE (parcels(n))
+                CASE (1)
+                    tmkpari = tmkc(mkzh)
+                    qvppari = MAX(qvpc(mkzh), 1.D-15)
+                    CALL DLIFTPARCEL(prsc, tmkc, qvpc, ghtc, ip, fracip, &
+                                     ter(i,j), mkzh, mkzh, tmkpari, qvppari, &
+                                     psadithte, psadiprs, psaditmk, cmsg, &
+                                     sbres(1), sbres(2), sbres(3), sbres(4), &
+                                     errstat, errmsg)
+                    havesb = .TRUE.
+                    res(i,j,n,:) = sbres
+                CASE (2)
+                    ! Mean potential temperature and mixing ratio of the
+                    ! lowest 100 hPa
+                    p2 = psfc
+                    p1 = p2 - 100.D0
+                    totthe = 0.D0
+                    totqvp = 0.D0
+                    totprs = 0.D0
+                    DO k = mkzh,1,-1
+                        pdn = pfc(k)
+                        IF (pdn .LE. p1) EXIT
+                        IF (k .GT. 1) THEN
+                            pup = pfc(k-1)
+                        ELSE
+                            pup = p1
+                        END IF
+                        q = MAX(qvpc(k), 1.D-15)
+                        th = tmkc(k)*(1000.D0/prsc(k))**(GAMMA*(1.D0 + GAMMAMD*q))
+                        pp1 = MAX(p1, pup)
+                        pp2 = MIN(p2, pdn)
+                        IF (pp2 .GT. pp1) THEN
+                            totqvp = totqvp + q*(pp2 - pp1)
+                            totthe = totthe + th*(pp2 - pp1)
+                            totprs = totprs + (pp2 - pp1)
+                        END IF
+                    END DO
+                    qvppari = totqvp/totprs
+                    tmkpari = (totthe/totprs)*&
+                              (prsc(mkzh)/1000.D0)**(GAMMA*(1.D0 + GAMMAMD*qvppari))
+                    CALL DLIFTPARCEL(prsc, tmkc, qvpc, ghtc, ip, fracip, &
+                                     ter(i,j), mkzh, mkzh, tmkpari, qvppari, &
+                                     psadithte, psadiprs, psaditmk, cmsg, &
+                                     res(i,j,n,1), res(i,j,n,2), res(i,j,n,3), &
+                                     res(i,j,n,4), errstat, errmsg)
+                CASE (3)
+                    ! Highest theta-e in the lowest 300 hPa
+                    kmu = mkzh
+                    ethmax = -1.D0
+                    DO k = mkzh,1,-1
+                        IF (prsc(k) .LT. psfc - 300.D0) EXIT
+                        q = MAX(qvpc(k), 1.D-15)
+                        tlcl = TLCLC1/(LOG(tmkc(k)**TLCLC2/(q*prsc(k)/(EPS + q))) - &
+                               TLCLC3) + TLCLC4
+                        eth = tmkc(k)*(1000.D0/prsc(k))**(GAMMA*(1.D0 + GAMMAMD*q))*&
+                              EXP((THTECON1/tlcl - THTECON2)*q*(1.D0 + THTECON3*q))
+                        IF (eth .GT. ethmax) THEN
+                            kmu = k
+                            ethmax = eth
+                        END IF
+                    END DO
+
+                    IF (kmu .EQ. mkzh .AND. havesb) THEN
+                        res(i,j,n,:) = sbres
+                    ELSE
+                        tmkpari = tmkc(kmu)
+                        qvppari = MAX(qvpc(kmu), 1.D-15)
+                        CALL DLIFTPARCEL(prsc, tmkc, qvpc, ghtc, ip, fracip, &
+                                         ter(i,j), mkzh, kmu, tmkpari, qvppari, &
+                                         psadithte, psadiprs, psaditmk, cmsg, &
+                                         res(i,j,n,1), res(i,j,n,2), &
+                                         res(i,j,n,3), res(i,j,n,4), &
+                                         errstat, errmsg)
+                        IF (kmu .EQ. mkzh) THEN
+                            sbres = res(i,j,n,:)
+                            havesb = .TRUE.
+                        END IF
+                    END IF
+                CASE DEFAULT
+                    res(i,j,n,:) = cmsg
+                END SELECT
+            END DO
+        END DO
+    END DO
+    !$OMP END PARALLEL DO
+
+    RETURN
+
+END SUBROUTINE DCAPEPARCELS
@@ -64,7 +64,8 @@ END SUBROUTINE DCLOUDFRAC
 
 ! NCLFORTSTART
 SUBROUTINE DCLOUDFRAC2(vert, rh, vert_inc_w_height, low_thresh, mid_thresh, &
-                       high_thresh, msg, lowc, midc, highc, nz, ns, ew)
+                       high_thresh, msg, lowc, midc, highc, bottom_up, nz, &
+                       ns, ew)
     IMPLICIT NONE
 
     !f2py threadsafe
@@ -73,19 +74,30 @@ SUBROUTINE DCLOUDFRAC2(vert, rh, vert_inc_w_height, low_thresh, mid_thresh, &
     INTEGER  nz, ns, ew
     REAL(KIND=8), DIMENSION(ew, ns, nz), INTENT(IN) :: rh, vert
     REAL(KIND=8), INTENT(IN) :: low_thresh, mid_thresh, high_thresh, msg
-    INTEGER, INTENT(IN) :: vert_inc_w_height
+    INTEGER, INTENT(IN) :: vert_inc_w_height, bottom_up
     REAL(KIND=8), DIMENSION(ew, ns), INTENT(OUT) :: lowc, midc, highc
 
 ! NCLEND
 
     INTEGER i, j, k
     INTEGER kchi, kcmi, kclo
+    INTEGER k0, kstep
 
     ! Initialize the output
     lowc = 0
     midc = 0
     highc = 0
 
+    ! The routine works from the bottom of the column up.  When the input
+    ! arrays go from the top to the bottom, they are read in reverse.
+    IF (bottom_up .NE. 0) THEN
+        k0 = 0
+        kstep = 1
+    ELSE
+        k0 = nz + 1
+        kstep = -1
+    END IF
+
     !$OMP PARALLEL DO COLLAPSE(2) PRIVATE(i, j, k, kchi, kcmi, kclo) &
     !$OMP SCHEDULE(runtime)
     DO j = 1,ns
@@ -99,25 +111,25 @@ SUBROUTINE DCLOUDFRAC2(vert, rh, vert_inc_w_height, low_thresh, mid_thresh, &
 
             IF (vert_inc_w_height .NE. 0) THEN ! Vert coord increase with height
                 DO k = 1,nz
-                    IF (vert(i,j,k) .LT. low_thresh) kclo=k
-                    IF (vert(i,j,k) .LT. mid_thresh) kcmi=k
-                    IF (vert(i,j,k) .LT. high_thresh) kchi=k
+                    IF (vert(i,j,k0+kstep*k) .LT. low_thresh) kclo=k
+                    IF (vert(i,j,k0+kstep*k) .LT. mid_thresh) kcmi=k
+                    IF (vert(i,j,k0+kstep*k) .LT. high_thresh) kchi=k
                 END DO
             ELSE ! Vert coord decrease with height
                 DO k = 1,nz
-                    IF (vert(i,j,k) .GT. low_thresh) kclo=k
-                    IF (vert(i,j,k) .GT. mid_thresh) kcmi=k
-                    IF (vert(i,j,k) .GT. high_thresh) kchi=k
+                    IF (vert(i,j,k0+kstep*k) .GT. low_thresh) kclo=k
+                    IF (vert(i,j,k0+kstep*k) .GT. mid_thresh) kcmi=k
+                    IF (vert(i,j,k0+kstep*k) .GT. high_thresh) kchi=k
                 END DO
             ENDIF
 
             DO k = 1,nz
                 IF (k .GE. kclo .AND. k .LT. kcmi) THEN
-                    lowc(i,j) = MAX(rh(i,j,k), lowc(i,j))
+                    lowc(i,j) = MAX(rh(i,j,k0+kstep*k), lowc(i,j))
                 ELSE IF (k .GE. kcmi .AND. k .LT. kchi) THEN ! mid cloud
-                    midc(i,j) = MAX(rh(i,j,k), midc(i,j))
+                    midc(i,j) = MAX(rh(i,j,k0+kstep*k), midc(i,j))
                 ELSE if (k .GE. kchi) THEN                  ! high cloud
-                    highc(i,j) = MAX(rh(i,j,k), highc(i,j))
+                    highc(i,j) = MAX(rh(i,j,k0+kstep*k), highc(i,j))
                 END IF
             END DO
 
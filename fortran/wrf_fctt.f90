@@ -1,6 +1,6 @@
 !NCLFORTSTART
 SUBROUTINE wrfcttcalc(prs, tk, qci, qcw, qvp, ght, ter, ctt, pf, haveqci,&
-             fill_nocloud, missing, opt_thresh, nz, ns, ew)
+             fill_nocloud, missing, opt_thresh, bottom_up, nz, ns, ew)
     USE wrf_constants, ONLY : EPS, USSALR, RD, G, ABSCOEFI, ABSCOEF, CELKEL
 
     IMPLICIT NONE
@@ -8,7 +8,7 @@ SUBROUTINE wrfcttcalc(prs, tk, qci, qcw, qvp, ght, ter, ctt, pf, haveqci,&
     !f2py threadsafe
     !f2py intent(in,out) :: ctt
 
-    INTEGER, INTENT(IN) :: nz, ns, ew, haveqci, fill_nocloud
+    INTEGER, INTENT(IN) :: nz, ns, ew, haveqci, fill_nocloud, bottom_up
     REAL(KIND=8), DIMENSION(ew,ns,nz), INTENT(IN) :: ght, prs, tk, qci, qcw, qvp
     REAL(KIND=8), DIMENSION(ew,ns), INTENT(IN) :: ter
     REAL(KIND=8), DIMENSION(ew,ns), INTENT(OUT) :: ctt
@@ -22,12 +22,22 @@ SUBROUTINE wrfcttcalc(prs, tk, qci, qcw, qvp, ght, ter, ctt, pf, haveqci,&
     !     REAL(KIND=8) ::     znfac(nz)
 
     ! LOCAL VARIABLES
-    INTEGER i,j,k,ripk
+    INTEGER i,j,k,ripk,k0,kstep
     REAL(KIND=8) :: opdepthu, opdepthd, dp, arg1, fac, prsctt, ratmix
     REAL(KIND=8) :: arg2, agl_hgt, vt
 
     REAL(KIND=8) :: p1, p2
 
+    ! The routine works from the bottom of the column up.  When the input
+    ! arrays go from the top to the bottom, they are read in reverse.
+    IF (bottom_up .NE. 0) THEN
+        k0 = 0
+        kstep = 1
+    ELSE
+        k0 = nz + 1
+        kstep = -1
+    END IF
+
     !$OMP PARALLEL
 
     ! Calculate the surface pressure
@@ -35,13 +45,13 @@ SUBROUTINE wrfcttcalc(prs, tk, qci, qcw, qvp, ght, ter, ctt, pf, haveqci,&
     !$OMP SCHEDULE(runtime)
     DO j=1,ns
         DO i=1,ew
-           ratmix = .001D0*qvp(i,j,1)
+           ratmix = .001D0*qvp(i,j,k0+kstep)
            arg1 = EPS + ratmix
            arg2 = EPS*(1. + ratmix)
-           vt = tk(i,j,1)*arg1/arg2 !Virtual temperature
-           agl_hgt = ght(i,j,nz) - ter(i,j)
+           vt = tk(i,j,k0+kstep)*arg1/arg2 !Virtual temperature
+           agl_hgt = ght(i,j,k0+kstep*nz) - ter(i,j)
            arg1 = -G/(RD*USSALR)
-           pf(i,j,nz) = prs(i,j,1)*(vt/(vt + USSALR*(agl_hgt)))**(arg1)
+           pf(i,j,nz) = prs(i,j,k0+kstep)*(vt/(vt + USSALR*(agl_hgt)))**(arg1)
         END DO
     END DO
     !$OMP END DO
@@ -51,7 +61,7 @@ SUBROUTINE wrfcttcalc(prs, tk, qci, qcw, qvp, ght, ter, ctt, pf, haveqci,&
         DO j=1,ns
             DO i=1,ew
                 ripk = nz-k+1
-                pf(i,j,k) = .5D0*(prs(i,j,ripk) + prs(i,j,ripk-1))
+                pf(i,j,k) = .5D0*(prs(i,j,k0+kstep*ripk) + prs(i,j,k0+kstep*(ripk-1)))
             END DO
         END DO
     END DO
@@ -75,18 +85,18 @@ SUBROUTINE wrfcttcalc(prs, tk, qci, qcw, qvp, ght, ter, ctt, pf, haveqci,&
                 IF (k .NE. 1) THEN
                     dp = 100.D0*(pf(i,j,k) - pf(i,j,k-1))  ! should be in Pa
                 ELSE
-                    dp = 200.D0*(pf(i,j,1) - prs(i,j,nz))  ! should be in Pa
+                    dp = 200.D0*(pf(i,j,1) - prs(i,j,k0+kstep*nz))  ! should be in Pa
                 END IF
 
                 IF (haveqci .EQ. 0) then
-                    IF (tk(i,j,ripk) .LT. CELKEL) then
+                    IF (tk(i,j,k0+kstep*ripk) .LT. CELKEL) then
                         ! Note: abscoefi is m**2/g, qcw is g/kg, so no convrsion needed
-                        opdepthd = opdepthu + ABSCOEFI*qcw(i,j,ripk) * dp/G
+                        opdepthd = opdepthu + ABSCOEFI*qcw(i,j,k0+kstep*ripk) * dp/G
                     ELSE
-                        opdepthd = opdepthu + ABSCOEF*qcw(i,j,ripk) * dp/G
+                        opdepthd = opdepthu + ABSCOEF*qcw(i,j,k0+kstep*ripk) * dp/G
                     END IF
                 ELSE
-                    opdepthd = opdepthd + (ABSCOEF*qcw(i,j,ripk) + ABSCOEFI*qci(i,j,ripk))*dp/G
+                    opdepthd = opdepthd + (ABSCOEF*qcw(i,j,k0+kstep*ripk) + ABSCOEFI*qci(i,j,k0+kstep*ripk))*dp/G
                 END IF
 
                 IF (opdepthd .LT. opt_thresh .AND. k .LT. nz) THEN
@@ -94,13 +104,13 @@ SUBROUTINE wrfcttcalc(prs, tk, qci, qcw, qvp, ght, ter, ctt, pf, haveqci,&
 
                 ELSE IF (opdepthd .LT. opt_thresh .AND. k .EQ. nz) THEN
                     IF (fill_nocloud .EQ. 0) THEN
-                        prsctt = prs(i,j,1)
+                        prsctt = prs(i,j,k0+kstep)
                     ENDIF
                     EXIT
                 ELSE
                     fac = (1. - opdepthu)/(opdepthd - opdepthu)
                     prsctt = pf(i,j,k-1) + fac*(pf(i,j,k) - pf(i,j,k-1))
-                    prsctt = MIN(prs(i,j,1), MAX(prs(i,j,nz), prsctt))
+                    prsctt = MIN(prs(i,j,k0+kstep), MAX(prs(i,j,k0+kstep*nz), prsctt))
                     EXIT
                 END IF
             END DO
@@ -109,12 +119,12 @@ SUBROUTINE wrfcttcalc(prs, tk, qci, qcw, qvp, ght, ter, ctt, pf, haveqci,&
             IF (prsctt .GT. -1) THEN
                 DO k=2,nz
                     ripk = nz - k + 1
-                    p1 = prs(i,j,ripk+1)
-                    p2 = prs(i,j,ripk)
+                    p1 = prs(i,j,k0+kstep*(ripk+1))
+                    p2 = prs(i,j,k0+kstep*ripk)
                     IF (prsctt .GE. p1 .AND. prsctt .LE. p2) THEN
                         fac = (prsctt - p1)/(p2 - p1)
-                        arg1 = fac*(tk(i,j,ripk) - tk(i,j,ripk+1)) - CELKEL
-                        ctt(i,j) = tk(i,j,ripk+1) + arg1
+                        arg1 = fac*(tk(i,j,k0+kstep*ripk) - tk(i,j,k0+kstep*(ripk+1))) - CELKEL
+                        ctt(i,j) = tk(i,j,k0+kstep*(ripk+1)) + arg1
                         EXIT
                     END IF
                 END DO
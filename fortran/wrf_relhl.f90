@@ -31,7 +31,8 @@
 !   ***************************************************************
 
 ! NCLFORTSTART
-SUBROUTINE DCALRELHL(u, v, ght, ter, lat, top, sreh, miy, mjx, mkzh)
+SUBROUTINE DCALRELHL(u, v, ght, ter, lat, top, sreh, bottom_up, miy, mjx, &
+                     mkzh)
     USE wrf_constants, ONLY : PI, RAD_PER_DEG, DEG_PER_RAD
 
     IMPLICIT NONE
@@ -39,7 +40,7 @@ SUBROUTINE DCALRELHL(u, v, ght, ter, lat, top, sreh, miy, mjx, mkzh)
     !f2py threadsafe
     !f2py intent(in,out) :: sreh
 
-    INTEGER, INTENT(IN) :: miy, mjx, mkzh
+    INTEGER, INTENT(IN) :: miy, mjx, mkzh, bottom_up
     REAL(KIND=8), DIMENSION(miy,mjx,mkzh), INTENT(IN) :: u, v, ght
     REAL(KIND=8), INTENT(IN) :: top
     REAL(KIND=8), DIMENSION(miy,mjx), INTENT(IN) :: ter
@@ -54,9 +55,19 @@ SUBROUTINE DCALRELHL(u, v, ght, ter, lat, top, sreh, miy, mjx, mkzh)
 
     REAL(KIND=8) :: dh, sdh, su, sv, ua, va, asp, adr, bsp, bdr
     REAL(KIND=8) :: cu, cv, x, sum
-    INTEGER :: i, j, k, k10, k3, ktop
+    INTEGER :: i, j, k, k10, k3, ktop, k0, kstep
     !REAL(KIND=8), PARAMETER :: DTR=PI/180.d0, DPR=180.d0/PI
 
+    ! The routine works from the top of the column down.  When the input
+    ! arrays go from the bottom to the top, they are read in reverse.
+    IF (bottom_up .NE. 0) THEN
+        k0 = mkzh + 1
+        kstep = -1
+    ELSE
+        k0 = 0
+        kstep = 1
+    END IF
+
     !$OMP PARALLEL DO COLLAPSE(2) PRIVATE(i,j,k,k10,k3,ktop, cu, cv, x, &
     !$OMP sum, dh, sdh, su, sv, ua, va, asp, adr, bsp, bdr) SCHEDULE(runtime)
     DO j=1, mjx
@@ -68,14 +79,14 @@ SUBROUTINE DCALRELHL(u, v, ght, ter, lat, top, sreh, miy, mjx, mkzh)
             k10 = 0
             ktop = 0
             DO k = mkzh, 2, -1
-                IF (((ght(i,j,k) - ter(i,j)) .GT. 10000.D0) .AND. (k10 .EQ. 0)) THEN
+                IF (((ght(i,j,k0+kstep*k) - ter(i,j)) .GT. 10000.D0) .AND. (k10 .EQ. 0)) THEN
                     k10 = k
                     EXIT
                 ENDIF
-                IF (((ght(i,j,k) - ter(i,j)) .GT. top) .AND. (ktop .EQ. 0)) THEN
+                IF (((ght(i,j,k0+kstep*k) - ter(i,j)) .GT. top) .AND. (ktop .EQ. 0)) THEN
                     ktop = k
                 ENDIF
-                IF (((ght(i,j,k) - ter(i,j)) .GT. 3000.D0) .AND. (k3 .EQ. 0)) THEN
+                IF (((ght(i,j,k0+kstep*k) - ter(i,j)) .GT. 3000.D0) .AND. (k3 .EQ. 0)) THEN
                     k3 = k
                 ENDIF
             END DO
@@ -85,10 +96,10 @@ SUBROUTINE DCALRELHL(u, v, ght, ter, lat, top, sreh, miy, mjx, mkzh)
             ENDIF
 
             DO k = k3, k10, -1
-                dh = ght(i,j,k-1) - ght(i,j,k)
+                dh = ght(i,j,k0+kstep*(k-1)) - ght(i,j,k0+kstep*k)
                 sdh = sdh + dh
-                su = su + 0.5D0*dh*(u(i,j,k-1) + u(i,j,k))
-                sv = sv + 0.5D0*dh*(v(i,j,k-1) + v(i,j,k))
+                su = su + 0.5D0*dh*(u(i,j,k0+kstep*(k-1)) + u(i,j,k0+kstep*k))
+                sv = sv + 0.5D0*dh*(v(i,j,k0+kstep*(k-1)) + v(i,j,k0+kstep*k))
             END DO
 
             ua = su/sdh
@@ -116,8 +127,8 @@ SUBROUTINE DCALRELHL(u, v, ght, ter, lat, top, sreh, miy, mjx, mkzh)
             cv = -bsp*COS(bdr * RAD_PER_DEG)
             sum = 0.D0
             DO k = mkzh-1, ktop, -1
-                x = ((u(i,j,k) - cu)*(v(i,j,k) - v(i,j,k+1))) - &
-                    ((v(i,j,k) - cv)*(u(i,j,k) - u(i,j,k+1)))
+                x = ((u(i,j,k0+kstep*k) - cu)*(v(i,j,k0+kstep*k) - v(i,j,k0+kstep*(k+1)))) - &
+                    ((v(i,j,k0+kstep*k) - cv)*(u(i,j,k0+kstep*k) - u(i,j,k0+kstep*(k+1))))
                 sum = sum + x
             END DO
             sreh(i,j) = -sum
@@ -128,3 +139,142 @@ SUBROUTINE DCALRELHL(u, v, ght, ter, lat, top, sreh, miy, mjx, mkzh)
     RETURN
 
 END SUBROUTINE DCALRELHL
+
+
+! Same as DCALRELHL, but computes the helicity for several integration
+! tops at once.  The storm motion is computed once per column and the
+! helicity sum is accumulated in a single pass up the column, with the
+! value for each layer stored when its top level is reached.
+
+! NCLFORTSTART
+SUBROUTINE DCALRELHL_LAYERS(u, v, ght, ter, lat, tops, sreh, bottom_up, &
+                            miy, mjx, mkzh, nlayers)
+    USE wrf_constants, ONLY : PI, RAD_PER_DEG, DEG_PER_RAD
+
+    IMPLICIT NONE
+
+    !f2py threadsafe
+    !f2py intent(in,out) :: sreh
+
+    INTEGER, INTENT(IN) :: miy, mjx, mkzh, bottom_up, nlayers
+    REAL(KIND=8), DIMENSION(miy,mjx,mkzh), INTENT(IN) :: u, v, ght
+    REAL(KIND=8), DIMENSION(nlayers), INTENT(IN) :: tops
+    REAL(KIND=8), DIMENSION(miy,mjx), INTENT(IN) :: ter
+    REAL(KIND=8), DIMENSION(miy,mjx), INTENT(IN) :: lat
+    REAL(KIND=8), DIMENSION(miy,mjx,nlayers), INTENT(OUT) :: sreh
+
+! NCLEND
+
+    REAL(KIND=8) :: dh, sdh, su, sv, ua, va, asp, adr, bsp, bdr
+    REAL(KIND=8) :: cu, cv, x, sum
+    INTEGER :: i, j, k, k10, k3, klim, kmin, l, k0, kstep
+    INTEGER, DIMENSION(nlayers) :: ktop
+
+    ! The routine works from the top of the column down.  When the input
+    ! arrays go from the bottom to the top, they are read in reverse.
+    IF (bottom_up .NE. 0) THEN
+        k0 = mkzh + 1
+        kstep = -1
+    ELSE
+        k0 = 0
+        kstep = 1
+    END IF
+
+    !$OMP PARALLEL DO COLLAPSE(2) PRIVATE(i,j,k,k10,k3,klim,kmin,l,ktop, &
+    !$OMP cu, cv, x, sum, dh, sdh, su, sv, ua, va, asp, adr, bsp, bdr) &
+    !$OMP SCHEDULE(runtime)
+    DO j=1, mjx
+        DO i=1, miy
+            sdh = 0.D0
+            su = 0.D0
+            sv = 0.D0
+            k3 = 0
+            k10 = 0
+            DO k = mkzh, 2, -1
+                IF ((ght(i,j,k0+kstep*k) - ter(i,j)) .GT. 10000.D0) THEN
+                    k10 = k
+                    EXIT
+                ENDIF
+                IF (((ght(i,j,k0+kstep*k) - ter(i,j)) .GT. 3000.D0) .AND. (k3 .EQ. 0)) THEN
+                    k3 = k
+                ENDIF
+            END DO
+
+            ! The layer tops are only searched below the 10 km level
+            IF (k10 .EQ. 0) THEN
+                k10 = 2
+                klim = 2
+            ELSE
+                klim = k10 + 1
+            ENDIF
+
+            kmin = mkzh
+            DO l = 1, nlayers
+                ktop(l) = 0
+                DO k = mkzh, klim, -1
+                    IF ((ght(i,j,k0+kstep*k) - ter(i,j)) .GT. tops(l)) THEN
+                        ktop(l) = k
+                        EXIT
+                    ENDIF
+                END DO
+                ! Tops above 10 km are integrated through the column
+                ktop(l) = MAX(ktop(l), 1)
+                kmin = MIN(kmin, ktop(l))
+            END DO
+
+            DO k = k3, k10, -1
+                dh = ght(i,j,k0+kstep*(k-1)) - ght(i,j,k0+kstep*k)
+                sdh = sdh + dh
+                su = su + 0.5D0*dh*(u(i,j,k0+kstep*(k-1)) + u(i,j,k0+kstep*k))
+                sv = sv + 0.5D0*dh*(v(i,j,k0+kstep*(k-1)) + v(i,j,k0+kstep*k))
+            END DO
+
+            ua = su/sdh
+            va = sv/sdh
+            asp = SQRT(ua*ua + va*va)
+            IF (ua .EQ. 0.D0 .AND. va .EQ. 0.D0) THEN
+                adr = 0.D0
+            ELSE
+                adr = DEG_PER_RAD * (PI + ATAN2(ua,va))
+            ENDIF
+
+            bsp = 0.75D0*asp
+
+            IF (lat(i,j) .GE. 0) THEN ! Northern hemisphern
+                bdr = adr + 30.D0
+            ELSE ! Southern hemisphere
+                bdr = adr - 30.D0
+            END IF
+
+            IF (bdr .GT. 360.D0) THEN
+                bdr = bdr - 360.D0
+            ENDIF
+
+            cu = -bsp*SIN(bdr * RAD_PER_DEG)
+            cv = -bsp*COS(bdr * RAD_PER_DEG)
+
+            ! Layers with the top at the lowest level have no integration
+            DO l = 1, nlayers
+                IF (ktop(l) .EQ. mkzh) THEN
+                    sreh(i,j,l) = 0.D0
+                ENDIF
+            END DO
+
+            sum = 0.D0
+            DO k = mkzh-1, kmin, -1
+                x = ((u(i,j,k0+kstep*k) - cu)*(v(i,j,k0+kstep*k) - v(i,j,k0+kstep*(k+1)))) - &
+                    ((v(i,j,k0+kstep*k) - cv)*(u(i,j,k0+kstep*k) - u(i,j,k0+kstep*(k+1))))
+                sum = sum + x
+                DO l = 1, nlayers
+                    IF (ktop(l) .EQ. k) THEN
+                        sreh(i,j,l) = -sum
+                    ENDIF
+                END DO
+            END DO
+        END DO
+    END DO
+    !$OMP END PARALLEL DO
+
+    RETURN
+
+END SUBROUTINE DCALRELHL_LAYERS
@@ -63,6 +63,218 @@ SUBROUTINE DCOMPUTETK(tk, pressure, theta, nx)
 END SUBROUTINE DCOMPUTETK
 
 
+! Full pressure from the perturbation and base state pressure, multiplied
+! by scale (e.g. to convert to hPa).  The inputs are read once and fullp
+! can be the same array as p.
+! NCLFORTSTART
+SUBROUTINE DFULLPRS(p, pb, scale, fullp, n)
+
+    IMPLICIT NONE
+
+    !f2py threadsafe
+    !f2py intent(in,out) :: fullp
+
+    INTEGER, INTENT(IN) :: n
+    REAL(KIND=8), DIMENSION(n), INTENT(IN) :: p, pb
+    REAL(KIND=8), INTENT(IN) :: scale
+    REAL(KIND=8), DIMENSION(n), INTENT(OUT) :: fullp
+
+! NCLEND
+
+    INTEGER :: i
+
+    !$OMP PARALLEL DO SCHEDULE(runtime)
+    DO i = 1,n
+        fullp(i) = (p(i) + pb(i))*scale
+    END DO
+    !$OMP END PARALLEL DO
+
+    RETURN
+
+END SUBROUTINE DFULLPRS
+
+! Single precision version. If you make a change here, you
+! must make the same change above to dfullprs.
+! NCLFORTSTART
+SUBROUTINE FULLPRS(p, pb, scale, fullp, n)
+
+    IMPLICIT NONE
+
+    !f2py threadsafe
+    !f2py intent(in,out) :: fullp
+
+    INTEGER, INTENT(IN) :: n
+    REAL(KIND=4), DIMENSION(n), INTENT(IN) :: p, pb
+    REAL(KIND=4), INTENT(IN) :: scale
+    REAL(KIND=4), DIMENSION(n), INTENT(OUT) :: fullp
+
+! NCLEND
+
+    INTEGER :: i
+
+    !$OMP PARALLEL DO SCHEDULE(runtime)
+    DO i = 1,n
+        fullp(i) = (p(i) + pb(i))*scale
+    END DO
+    !$OMP END PARALLEL DO
+
+    RETURN
+
+END SUBROUTINE FULLPRS
+
+! Full potential temperature from the perturbation potential temperature.
+! fullt can be the same array as t.
+! NCLFORTSTART
+SUBROUTINE DFULLTHETA(t, tbase, fullt, n)
+
+    IMPLICIT NONE
+
+    !f2py threadsafe
+    !f2py intent(in,out) :: fullt
+
+    INTEGER, INTENT(IN) :: n
+    REAL(KIND=8), DIMENSION(n), INTENT(IN) :: t
+    REAL(KIND=8), INTENT(IN) :: tbase
+    REAL(KIND=8), DIMENSION(n), INTENT(OUT) :: fullt
+
+! NCLEND
+
+    INTEGER :: i
+
+    !$OMP PARALLEL DO SCHEDULE(runtime)
+    DO i = 1,n
+        fullt(i) = t(i) + tbase
+    END DO
+    !$OMP END PARALLEL DO
+
+    RETURN
+
+END SUBROUTINE DFULLTHETA
+
+! Single precision version. If you make a change here, you
+! must make the same change above to dfulltheta.
+! NCLFORTSTART
+SUBROUTINE FULLTHETA(t, tbase, fullt, n)
+
+    IMPLICIT NONE
+
+    !f2py threadsafe
+    !f2py intent(in,out) :: fullt
+
+    INTEGER, INTENT(IN) :: n
+    REAL(KIND=4), DIMENSION(n), INTENT(IN) :: t
+    REAL(KIND=4), INTENT(IN) :: tbase
+    REAL(KIND=4), DIMENSION(n), INTENT(OUT) :: fullt
+
+! NCLEND
+
+    INTEGER :: i
+
+    !$OMP PARALLEL DO SCHEDULE(runtime)
+    DO i = 1,n
+        fullt(i) = t(i) + tbase
+    END DO
+    !$OMP END PARALLEL DO
+
+    RETURN
+
+END SUBROUTINE FULLTHETA
+
+! Height from the perturbation and base state geopotential.  When destag is
+! 1, the staggered levels (nzs) are averaged to the nz = nzs - 1 mass
+! levels.  The leftmost dimensions are combined in to nl, and the horizontal
+! dimensions in to nxy.  The output must not overlap the inputs when
+! destaggering.
+! NCLFORTSTART
+SUBROUTINE DGEOPTHGT(ph, phb, g, destag, z, nxy, nzs, nz, nl)
+
+    IMPLICIT NONE
+
+    !f2py threadsafe
+    !f2py intent(in,out) :: z
+
+    INTEGER, INTENT(IN) :: nxy, nzs, nz, nl, destag
+    REAL(KIND=8), DIMENSION(nxy,nzs,nl), INTENT(IN) :: ph, phb
+    REAL(KIND=8), INTENT(IN) :: g
+    REAL(KIND=8), DIMENSION(nxy,nz,nl), INTENT(OUT) :: z
+
+! NCLEND
+
+    INTEGER :: i, k, l
+
+    IF (destag .NE. 0) THEN
+        !$OMP PARALLEL DO COLLAPSE(2) PRIVATE(i, k, l) SCHEDULE(runtime)
+        DO l = 1,nl
+            DO k = 1,nz
+                DO i = 1,nxy
+                    z(i,k,l) = (.5*((ph(i,k,l) + phb(i,k,l)) + &
+                               (ph(i,k+1,l) + phb(i,k+1,l))))/g
+                END DO
+            END DO
+        END DO
+        !$OMP END PARALLEL DO
+    ELSE
+        !$OMP PARALLEL DO COLLAPSE(2) PRIVATE(i, k, l) SCHEDULE(runtime)
+        DO l = 1,nl
+            DO k = 1,nz
+                DO i = 1,nxy
+                    z(i,k,l) = (ph(i,k,l) + phb(i,k,l))/g
+                END DO
+            END DO
+        END DO
+        !$OMP END PARALLEL DO
+    END IF
+
+    RETURN
+
+END SUBROUTINE DGEOPTHGT
+
+! Single precision version. If you make a change here, you
+! must make the same change above to dgeopthgt.
+! NCLFORTSTART
+SUBROUTINE GEOPTHGT(ph, phb, g, destag, z, nxy, nzs, nz, nl)
+
+    IMPLICIT NONE
+
+    !f2py threadsafe
+    !f2py intent(in,out) :: z
+
+    INTEGER, INTENT(IN) :: nxy, nzs, nz, nl, destag
+    REAL(KIND=4), DIMENSION(nxy,nzs,nl), INTENT(IN) :: ph, phb
+    REAL(KIND=4), INTENT(IN) :: g
+    REAL(KIND=4), DIMENSION(nxy,nz,nl), INTENT(OUT) :: z
+
+! NCLEND
+
+    INTEGER :: i, k, l
+
+    IF (destag .NE. 0) THEN
+        !$OMP PARALLEL DO COLLAPSE(2) PRIVATE(i, k, l) SCHEDULE(runtime)
+        DO l = 1,nl
+            DO k = 1,nz
+                DO i = 1,nxy
+                    z(i,k,l) = (.5*((ph(i,k,l) + phb(i,k,l)) + &
+                               (ph(i,k+1,l) + phb(i,k+1,l))))/g
+                END DO
+            END DO
+        END DO
+        !$OMP END PARALLEL DO
+    ELSE
+        !$OMP PARALLEL DO COLLAPSE(2) PRIVATE(i, k, l) SCHEDULE(runtime)
+        DO l = 1,nl
+            DO k = 1,nz
+                DO i = 1,nxy
+                    z(i,k,l) = (ph(i,k,l) + phb(i,k,l))/g
+                END DO
+            END DO
+        END DO
+        !$OMP END PARALLEL DO
+    END IF
+
+    RETURN
+
+END SUBROUTINE GEOPTHGT
+
 ! NCLFORTSTART
 SUBROUTINE DINTERP3DZ(data3d, out2d, zdata, levels, nx, ny, nz, nlev, missingval)
     IMPLICIT NONE
@@ -180,6 +392,171 @@ SUBROUTINE DINTERP3DZ_2DLEV(data3d, out2d, zdata, levs2d, nx, ny, nz, missingval
 
 END SUBROUTINE DINTERP3DZ_2DLEV
 
+! Computes the bracketing vertical indexes and interpolation weights used by
+! DINTERP3DZ so that they can be reused for many fields with
+! DINTERP3DZ_APPLY.  A k1 value of 0 indicates that the level could not be
+! bracketed and the output should be set to missing.
+
+! NCLFORTSTART
+SUBROUTINE DINTERP3DZ_WEIGHTS(zdata, levels, k1, k2, weights, nx, ny, nz, nlev)
+    IMPLICIT NONE
+
+    !f2py threadsafe
+    !f2py intent(in,out) :: k1, k2, weights
+
+    INTEGER, INTENT(IN) :: nx, ny, nz, nlev
+    REAL(KIND=8), DIMENSION(nx,ny,nz), INTENT(IN) :: zdata
+    REAL(KIND=8), DIMENSION(nlev), INTENT(IN) :: levels
+    INTEGER, DIMENSION(nx,ny,nlev), INTENT(OUT) :: k1, k2
+    REAL(KIND=8), DIMENSION(nx,ny,nlev), INTENT(OUT) :: weights
+
+! NCLEND
+
+    INTEGER :: i,j,kp,ip,im,lev
+    LOGICAL :: dointerp
+    REAL(KIND=8) :: desiredloc
+
+    ! does vertical coordinate increase or decrease with increasing k?
+    ! set offset appropriately
+
+    ip = 0
+    im = 1
+    IF (zdata(1,1,1) .GT. zdata(1,1,nz)) THEN
+        ip = 1
+        im = 0
+    END IF
+
+    !$OMP PARALLEL DO COLLAPSE(3) PRIVATE(i,j,lev,kp,dointerp,desiredloc) &
+    !$OMP FIRSTPRIVATE(ip,im) SCHEDULE(runtime)
+    DO lev = 1,nlev
+        DO j = 1,ny
+            DO i = 1,nx
+                k1(i,j,lev) = 0
+                k2(i,j,lev) = 0
+                weights(i,j,lev) = 0.D0
+                dointerp = .FALSE.
+                kp = nz
+                desiredloc = levels(lev)
+
+                DO WHILE ((.NOT. dointerp) .AND. (kp >= 2))
+                    IF (((zdata(i,j,kp-im) < desiredloc) .AND. (zdata(i,j,kp-ip) > desiredloc))) THEN
+                        weights(i,j,lev) = (desiredloc - zdata(i,j,kp-im))/(zdata(i,j,kp-ip) - zdata(i,j,kp-im))
+                        k1(i,j,lev) = kp - im
+                        k2(i,j,lev) = kp - ip
+                        dointerp = .TRUE.
+                    END IF
+                    kp = kp - 1
+                END DO
+            END DO
+        END DO
+    END DO
+    !$OMP END PARALLEL DO
+
+    RETURN
+
+END SUBROUTINE DINTERP3DZ_WEIGHTS
+
+
+! NCLFORTSTART
+SUBROUTINE DINTERP3DZ_2DLEV_WEIGHTS(zdata, levs2d, k1, k2, weights, nx, ny, nz)
+    IMPLICIT NONE
+
+    !f2py threadsafe
+    !f2py intent(in,out) :: k1, k2, weights
+
+    INTEGER, INTENT(IN) :: nx, ny, nz
+    REAL(KIND=8), DIMENSION(nx,ny,nz), INTENT(IN) :: zdata
+    REAL(KIND=8), DIMENSION(nx,ny), INTENT(IN) :: levs2d
+    INTEGER, DIMENSION(nx,ny), INTENT(OUT) :: k1, k2
+    REAL(KIND=8), DIMENSION(nx,ny), INTENT(OUT) :: weights
+
+! NCLEND
+
+    INTEGER :: i,j,kp,ip,im
+    LOGICAL :: dointerp
+    REAL(KIND=8) :: desiredloc
+
+    ! does vertical coordinate increase or decrease with increasing k?
+    ! set offset appropriately
+
+    ip = 0
+    im = 1
+    IF (zdata(1,1,1) .GT. zdata(1,1,nz)) THEN
+        ip = 1
+        im = 0
+    END IF
+
+    !$OMP PARALLEL DO COLLAPSE(2) PRIVATE(i,j,kp,dointerp,desiredloc) &
+    !$OMP FIRSTPRIVATE(ip,im) SCHEDULE(runtime)
+    DO j = 1,ny
+        DO i = 1,nx
+            k1(i,j) = 0
+            k2(i,j) = 0
+            weights(i,j) = 0.D0
+            dointerp = .FALSE.
+            kp = nz
+            desiredloc = levs2d(i,j)
+
+            DO WHILE ((.NOT. dointerp) .AND. (kp >= 2))
+                IF (((zdata(i,j,kp-im) < desiredloc) .AND. (zdata(i,j,kp-ip) > desiredloc))) THEN
+                    weights(i,j) = (desiredloc - zdata(i,j,kp-im))/(zdata(i,j,kp-ip) - zdata(i,j,kp-im))
+                    k1(i,j) = kp - im
+                    k2(i,j) = kp - ip
+                    dointerp = .TRUE.
+                END IF
+                kp = kp - 1
+            END DO
+        END DO
+    END DO
+    !$OMP END PARALLEL DO
+
+    RETURN
+
+END SUBROUTINE DINTERP3DZ_2DLEV_WEIGHTS
+
+
+! Applies the indexes and weights computed by DINTERP3DZ_WEIGHTS (or
+! DINTERP3DZ_2DLEV_WEIGHTS with nlev=1) to a field.
+
+! NCLFORTSTART
+SUBROUTINE DINTERP3DZ_APPLY(data3d, out2d, k1, k2, weights, nx, ny, nz, nlev, missingval)
+    IMPLICIT NONE
+
+    !f2py threadsafe
+    !f2py intent(in,out) :: out2d
+
+    INTEGER, INTENT(IN) :: nx, ny, nz, nlev
+    REAL(KIND=8), DIMENSION(nx,ny,nz), INTENT(IN) ::  data3d
+    REAL(KIND=8), DIMENSION(nx,ny,nlev), INTENT(OUT) :: out2d
+    INTEGER, DIMENSION(nx,ny,nlev), INTENT(IN) :: k1, k2
+    REAL(KIND=8), DIMENSION(nx,ny,nlev), INTENT(IN) :: weights
+    REAL(KIND=8), INTENT(IN) :: missingval
+
+! NCLEND
+
+    INTEGER :: i,j,lev
+    REAL(KIND=8) :: w1,w2
+
+    !$OMP PARALLEL DO COLLAPSE(3) PRIVATE(i,j,lev,w1,w2) SCHEDULE(runtime)
+    DO lev = 1,nlev
+        DO j = 1,ny
+            DO i = 1,nx
+                IF (k1(i,j,lev) .EQ. 0) THEN
+                    out2d(i,j,lev) = missingval
+                ELSE
+                    w2 = weights(i,j,lev)
+                    w1 = 1.D0 - w2
+                    out2d(i,j,lev) = w1*data3d(i,j,k1(i,j,lev)) + w2*data3d(i,j,k2(i,j,lev))
+                END IF
+            END DO
+        END DO
+    END DO
+    !$OMP END PARALLEL DO
+
+    RETURN
+
+END SUBROUTINE DINTERP3DZ_APPLY
+
 ! PORT DZSTAG HERE
 
 ! NCLFORTSTART
@@ -615,6 +992,124 @@ SUBROUTINE DFILTER2D(a, b, nx, ny, it, missing, cenweight)
 
 END SUBROUTINE DFILTER2D
 
+! One smoothing pass of DFILTER2D for a batch of nz slices, reading src and
+! writing the interior of dst.  The border values of dst are not modified.
+! This is an orphaned work-sharing loop, so it is shared by the threads of
+! the calling parallel region.
+
+! NCLFORTSTART
+SUBROUTINE DFILTER2D_STEP(src, dst, nx, ny, nz, missing, coef, cenmult)
+
+    IMPLICIT NONE
+
+    !f2py threadsafe
+
+    INTEGER, INTENT(IN) :: nx, ny, nz
+    REAL(KIND=8), DIMENSION(nx, ny, nz), INTENT(IN) :: src
+    REAL(KIND=8), DIMENSION(nx, ny, nz), INTENT(INOUT) :: dst
+    REAL(KIND=8), INTENT(IN) :: missing, coef, cenmult
+
+! NCLEND
+
+    INTEGER :: i, j, k
+    REAL(KIND=8) :: tmp
+
+    !$OMP DO COLLAPSE(2) PRIVATE(i, j, k, tmp) SCHEDULE(runtime)
+    DO k=1,nz
+        DO j=2,ny-1
+            DO i=2,nx-1
+                IF (src(i,j-1,k) .EQ. missing .OR. src(i,j,k) .EQ. missing .OR. &
+                    src(i,j+1,k) .EQ. missing) THEN
+                    tmp = src(i,j,k)
+                ELSE
+                    tmp = coef*(src(i,j-1,k) + cenmult*src(i,j,k) + src(i,j+1,k))
+                END IF
+
+                IF (src(i-1,j,k) .EQ. missing .OR. src(i,j,k) .EQ. missing .OR. &
+                    src(i+1,j,k) .EQ. missing) THEN
+                    dst(i,j,k) = tmp
+                ELSE
+                    dst(i,j,k) = tmp + coef*(src(i-1,j,k) + cenmult*src(i,j,k) + src(i+1,j,k))
+                END IF
+            END DO
+        END DO
+    END DO
+    !$OMP END DO
+
+    RETURN
+
+END SUBROUTINE DFILTER2D_STEP
+
+
+! Batched version of DFILTER2D, which smooths nz two-dimensional slices.
+! Each slice gives the same result as DFILTER2D.  Instead of copying a to b
+! on every pass, the passes alternate between a and b, and all of the
+! slices and passes are computed inside a single parallel region.
+
+! NCLFORTSTART
+SUBROUTINE DFILTER2D_BATCH(a, b, nx, ny, nz, it, missing, cenweight)
+
+    IMPLICIT NONE
+
+    !f2py threadsafe
+    !f2py intent(in,out) :: a
+
+    INTEGER, INTENT(IN) :: nx, ny, nz, it
+    REAL(KIND=8), DIMENSION(nx, ny, nz), INTENT(INOUT) :: a
+    REAL(KIND=8), INTENT(IN) :: missing, cenweight
+    REAL(KIND=8), DIMENSION(nx, ny, nz), INTENT(INOUT) :: b
+
+! NCLEND
+
+    INTEGER :: i, j, k, iter
+    REAL(KIND=8) :: cenmult, coef
+
+    cenmult = (cenweight) / 2.
+    coef = 1.0 / (4. + cenweight)
+
+    IF (it .LE. 0) THEN
+        RETURN
+    END IF
+
+    !$OMP PARALLEL PRIVATE(iter)
+
+    ! The border values are never smoothed, so they only need to be
+    ! copied once
+    !$OMP DO COLLAPSE(2) PRIVATE(i, j, k) SCHEDULE(runtime)
+    DO k=1,nz
+        DO j=1,ny
+            DO i=1,nx
+                b(i,j,k) = a(i,j,k)
+            END DO
+        END DO
+    END DO
+    !$OMP END DO
+
+    DO iter=1,it/2
+        CALL DFILTER2D_STEP(a, b, nx, ny, nz, missing, coef, cenmult)
+        CALL DFILTER2D_STEP(b, a, nx, ny, nz, missing, coef, cenmult)
+    END DO
+
+    IF (MOD(it, 2) .EQ. 1) THEN
+        CALL DFILTER2D_STEP(a, b, nx, ny, nz, missing, coef, cenmult)
+
+        !$OMP DO COLLAPSE(2) PRIVATE(i, j, k) SCHEDULE(runtime)
+        DO k=1,nz
+            DO j=1,ny
+                DO i=1,nx
+                    a(i,j,k) = b(i,j,k)
+                END DO
+            END DO
+        END DO
+        !$OMP END DO
+    END IF
+
+    !$OMP END PARALLEL
+
+    RETURN
+
+END SUBROUTINE DFILTER2D_BATCH
+
 ! Single precision version. If you make a change here, you
 ! must make the same change below to dfilter2d.
 
@@ -934,6 +1429,117 @@ SUBROUTINE DCOMPUTEUVMET(u, v, uvmet, longca,longcb,flong,flat, &
 
 END SUBROUTINE DCOMPUTEUVMET
 
+! NCLFORTSTART
+SUBROUTINE DUVMETROTATION(rot, flong, flat, cen_long, cone, rpd, nx, ny)
+    IMPLICIT NONE
+
+    ! Computes the cosine (rot(:,:,1)) and sine (rot(:,:,2)) of the angle
+    ! used to rotate grid relative winds to earth coordinates.  These only
+    ! depend on the domain, so they can be computed once and reused.
+
+    !f2py threadsafe
+    !f2py intent(in,out) :: rot
+
+    INTEGER,INTENT(IN) :: nx, ny
+    REAL(KIND=8), DIMENSION(nx,ny), INTENT(IN) :: flong
+    REAL(KIND=8), DIMENSION(nx,ny), INTENT(IN) :: flat
+    REAL(KIND=8), INTENT(IN) :: cen_long, cone, rpd
+    REAL(KIND=8), DIMENSION(nx,ny,2), INTENT(OUT) :: rot
+
+! NCLEND
+
+    INTEGER :: i,j
+    REAL(KIND=8) :: longca, longcb
+
+    !$OMP PARALLEL DO COLLAPSE(2) PRIVATE(longca, longcb) SCHEDULE(runtime)
+    DO j = 1,ny
+        DO i = 1,nx
+
+            longca = flong(i,j) - cen_long
+            IF (longca.GT.180.D0) THEN
+                longca = longca - 360.D0
+            END IF
+            IF (longca.LT.-180.D0) THEN
+                longca = longca + 360.D0
+            END IF
+            IF (flat(i,j).LT.0.D0) THEN
+                longcb = -longca*cone*rpd
+            ELSE
+                longcb = longca*cone*rpd
+            END IF
+
+            rot(i,j,1) = COS(longcb)
+            rot(i,j,2) = SIN(longcb)
+
+        END DO
+    END DO
+    !$OMP END PARALLEL DO
+
+    RETURN
+
+END SUBROUTINE DUVMETROTATION
+
+
+! NCLFORTSTART
+SUBROUTINE DUVMETROTATE(u, v, rot, uvout1, uvout2, nx, ny, nz, wspd_wdir, &
+                        is_msg_val, umsg, vmsg, uvmetmsg)
+    USE wrf_constants, ONLY : DEG_PER_RAD
+
+    IMPLICIT NONE
+
+    ! Rotates the unstaggered u,v winds to earth coordinates using the
+    ! coefficients from DUVMETROTATION.  All levels and times that share the
+    ! same rotation are passed in as NZ.  When WSPD_WDIR is set, the wind
+    ! speed and direction of the rotated wind are written instead of the
+    ! rotated components.
+
+    !f2py threadsafe
+    !f2py intent(in,out) :: uvout1, uvout2
+
+    INTEGER,INTENT(IN) :: nx, ny, nz
+    LOGICAL,INTENT(IN) :: wspd_wdir, is_msg_val
+    REAL(KIND=8), DIMENSION(nx,ny,nz), INTENT(IN) :: u
+    REAL(KIND=8), DIMENSION(nx,ny,nz), INTENT(IN) :: v
+    REAL(KIND=8), DIMENSION(nx,ny,2), INTENT(IN) :: rot
+    REAL(KIND=8), INTENT(IN) :: umsg, vmsg, uvmetmsg
+    REAL(KIND=8), DIMENSION(nx,ny,nz), INTENT(OUT) :: uvout1
+    REAL(KIND=8), DIMENSION(nx,ny,nz), INTENT(OUT) :: uvout2
+
+! NCLEND
+
+    INTEGER :: i,j,k
+    REAL(KIND=8) :: ue, ve
+
+    !$OMP PARALLEL DO COLLAPSE(3) PRIVATE(ue, ve) SCHEDULE(runtime)
+    DO k = 1,nz
+        DO j = 1,ny
+            DO i = 1,nx
+                IF (is_msg_val .AND. (u(i,j,k) .EQ. umsg .OR. &
+                                      v(i,j,k) .EQ. vmsg)) THEN
+                    uvout1(i,j,k) = uvmetmsg
+                    uvout2(i,j,k) = uvmetmsg
+                ELSE
+                    ue = v(i,j,k)*rot(i,j,2) + u(i,j,k)*rot(i,j,1)
+                    ve = v(i,j,k)*rot(i,j,1) - u(i,j,k)*rot(i,j,2)
+
+                    IF (wspd_wdir) THEN
+                        uvout1(i,j,k) = SQRT(ue*ue + ve*ve)
+                        uvout2(i,j,k) = MOD(270.0 - ATAN2(ve, ue)*DEG_PER_RAD, &
+                                            360.)
+                    ELSE
+                        uvout1(i,j,k) = ue
+                        uvout2(i,j,k) = ve
+                    END IF
+                END IF
+            END DO
+        END DO
+    END DO
+    !$OMP END PARALLEL DO
+
+    RETURN
+
+END SUBROUTINE DUVMETROTATE
+
 
 
 
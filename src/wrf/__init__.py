@@ -1,25 +1,51 @@
 from __future__ import (absolute_import, division, print_function)
 import os
-import pkg_resources
+from importlib import import_module
+from sys import version_info
 
-try:
-    from . import api
-    from .api import *
-except ImportError:
-    # For gfortran+msvc combination, extra shared libraries may exist
-    # (stored by numpy.distutils)
-    if os.name == "nt":
+if os.name == "nt":
+    try:
+        from . import _wrffortran
+    except ImportError:
+        # For gfortran+msvc combination, extra shared libraries may exist
+        # (stored by numpy.distutils)
+        import pkg_resources
         req = pkg_resources.Requirement.parse("wrf-python")
         extra_dll_dir = pkg_resources.resource_filename(req,
                                                         "wrf-python/.libs")
         if os.path.isdir(extra_dll_dir):
             os.environ["PATH"] += os.pathsep + extra_dll_dir
 
-        from . import api
-        from .api import *
-    else:
-        raise
+        from . import _wrffortran
 
+from . import api
 
 __all__ = []
 __all__.extend(api.__all__)
+
+
+def __getattr__(name):
+    # Public names and submodules are imported on first use
+    if name in api._API_MODULES:
+        value = api.load_api_name(name)
+    else:
+        try:
+            value = import_module("." + name, __name__)
+        except ImportError as e:
+            if getattr(e, "name", None) != "{}.{}".format(__name__, name):
+                raise
+            raise AttributeError("module '{}' has no attribute "
+                                 "'{}'".format(__name__, name))
+
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+# Module __getattr__ needs Python 3.7, so older versions load everything
+if version_info < (3, 7):
+    from .api import *
@@ -1,112 +1,133 @@
-from .config import (xarray_enabled, disable_xarray, enable_xarray,
-                     cartopy_enabled, disable_cartopy, enable_cartopy,
-                     basemap_enabled, disable_basemap, enable_basemap,
-                     pyngl_enabled, enable_pyngl, disable_pyngl,
-                     set_cache_size, get_cache_size, omp_enabled)
-from .constants import (ALL_TIMES, Constants, ConversionFactors,
-                        ProjectionTypes, default_fill,
-                        OMP_SCHED_STATIC, OMP_SCHED_DYNAMIC,
-                        OMP_SCHED_GUIDED, OMP_SCHED_AUTO)
-from .destag import destagger
-from .routines import getvar
-from .computation import (xy, interp1d, interp2dxy, interpz3d, slp, tk, td, rh,
-                          uvmet, smooth2d, cape_2d, cape_3d, cloudfrac, ctt,
-                          dbz, srhel, udhel, avo, pvo, eth, wetbulb, tvirtual,
-                          omega, pw)
-from .extension import (DiagnosticError, omp_set_num_threads,
-                        omp_get_num_threads,
-                        omp_get_max_threads, omp_get_thread_num,
-                        omp_get_num_procs, omp_in_parallel,
-                        omp_set_dynamic, omp_get_dynamic, omp_set_nested,
-                        omp_get_nested, omp_set_schedule,
-                        omp_get_schedule, omp_get_thread_limit,
-                        omp_set_max_active_levels,
-                        omp_get_max_active_levels, omp_get_level,
-                        omp_get_ancestor_thread_num, omp_get_team_size,
-                        omp_get_active_level, omp_in_final,
-                        omp_init_lock, omp_init_nest_lock,
-                        omp_destroy_lock, omp_destroy_nest_lock,
-                        omp_set_lock, omp_set_nest_lock,
-                        omp_unset_lock, omp_unset_nest_lock,
-                        omp_test_lock, omp_test_nest_lock,
-                        omp_get_wtime, omp_get_wtick)
-from .interp import (interplevel, vertcross, interpline, vinterp)
-from .g_latlon import (xy_to_ll, ll_to_xy, xy_to_ll_proj, ll_to_xy_proj)
-from .py3compat import (viewitems, viewkeys, viewvalues, isstr, py2round,
-                        py3range, ucode)
-from .util import (to_np, extract_global_attrs, is_standard_wrf_var,
-                   extract_dim, extract_vars, extract_times, combine_files,
-                   extract_times, npbytes_to_str, is_moving_domain,
-                   is_staggered, get_left_indexes, iter_left_indexes,
-                   get_right_slices, get_proj_params, from_args,
-                   args_to_list, arg_location, psafilepath, get_id,
-                   from_var, combine_dims, either, get_iterable,
-                   IterWrapper, is_coordvar, latlon_coordvars, is_mapping,
-                   has_time_coord, is_multi_file, is_multi_time_req,
-                   get_coord_pairs, is_time_coord_var, geo_bounds,
-                   get_cartopy, get_basemap, get_pyngl, cartopy_xlim,
-                   cartopy_ylim, latlon_coords, ll_points, pairs_to_latlon)
-from .geobnds import GeoBounds, NullGeoBounds
-from .projection import (WrfProj, NullProjection, LambertConformal, Mercator,
-                         PolarStereographic, LatLon, RotatedLatLon,
-                         getproj)
-from .coordpair import CoordPair
-from .interputils import to_xy_coords
-from .cache import cache_item, get_cached_item
-from .version import __version__
-
-__all__ = []
-__all__ += ["xarray_enabled", "disable_xarray", "enable_xarray",
-            "cartopy_enabled", "disable_cartopy", "enable_cartopy",
-            "basemap_enabled", "disable_basemap", "enable_basemap",
-            "pyngl_enabled", "enable_pyngl", "disable_pyngl",
-            "set_cache_size", "get_cache_size", "omp_enabled"]
-__all__ += ["ALL_TIMES", "Constants", "ConversionFactors", "ProjectionTypes",
-            "default_fill", "OMP_SCHED_STATIC", "OMP_SCHED_DYNAMIC",
-            "OMP_SCHED_GUIDED", "OMP_SCHED_AUTO"]
-__all__ += ["destagger"]
-__all__ += ["getvar"]
-__all__ += ["xy", "interp1d", "interp2dxy", "interpz3d", "slp", "tk", "td",
-            "rh", "uvmet", "smooth2d", "cape_2d", "cape_3d", "cloudfrac",
-            "ctt", "dbz", "srhel", "udhel", "avo", "pvo", "eth", "wetbulb",
-            "tvirtual", "omega", "pw"]
-__all__ += ["DiagnosticError", "omp_set_num_threads",
-            "omp_get_num_threads",
-            "omp_get_max_threads", "omp_get_thread_num",
-            "omp_get_num_procs", "omp_in_parallel",
-            "omp_set_dynamic", "omp_get_dynamic", "omp_set_nested",
-            "omp_get_nested", "omp_set_schedule",
-            "omp_get_schedule", "omp_get_thread_limit",
-            "omp_set_max_active_levels",
-            "omp_get_max_active_levels", "omp_get_level",
-            "omp_get_ancestor_thread_num", "omp_get_team_size",
-            "omp_get_active_level", "omp_in_final",
-            "omp_init_lock", "omp_init_nest_lock",
-            "omp_destroy_lock", "omp_destroy_nest_lock",
-            "omp_set_lock", "omp_set_nest_lock",
-            "omp_unset_lock", "omp_unset_nest_lock",
-            "omp_test_lock", "omp_test_nest_lock",
-            "omp_get_wtime", "omp_get_wtick"]
-__all__ += ["interplevel", "vertcross", "interpline", "vinterp"]
-__all__ += ["xy_to_ll", "ll_to_xy", "xy_to_ll_proj", "ll_to_xy_proj"]
-__all__ += ["viewitems", "viewkeys", "viewvalues", "isstr", "py2round",
-            "py3range", "ucode"]
-__all__ += ["to_np", "extract_global_attrs", "is_standard_wrf_var",
-            "extract_dim", "extract_vars", "extract_times", "combine_files",
-            "extract_times", "npbytes_to_str", "is_moving_domain",
-            "is_staggered", "get_left_indexes", "iter_left_indexes",
-            "get_right_slices", "get_proj_params", "from_args",
-            "args_to_list", "arg_location", "psafilepath", "get_id",
-            "from_var", "combine_dims", "either", "get_iterable",
-            "IterWrapper", "is_coordvar", "latlon_coordvars", "is_mapping",
-            "has_time_coord", "is_multi_file", "is_multi_time_req",
-            "get_coord_pairs", "is_time_coord_var", "geo_bounds",
-            "get_cartopy", "get_basemap", "get_pyngl", "cartopy_xlim",
-            "cartopy_ylim", "latlon_coords", "ll_points", "pairs_to_latlon"]
-__all__ += ["GeoBounds", "NullGeoBounds"]
-__all__ += ["WrfProj", "NullProjection", "LambertConformal", "Mercator",
-            "PolarStereographic", "LatLon", "RotatedLatLon", "getproj"]
-__all__ += ["CoordPair"]
-__all__ += ["to_xy_coords"]
-__all__ += ["cache_item", "get_cached_item"]
-__all__ += ["__version__"]
+from __future__ import (absolute_import, division, print_function)
+
+from importlib import import_module
+from sys import version_info
+
+# The public API, grouped by the submodule that defines it.  The submodules
+# are only imported when one of their names is first used, so importing
+# wrf does not pay for numpy, xarray, or the compiled extension.
+_EXPORTS = (
+    ("config", ["xarray_enabled", "disable_xarray", "enable_xarray",
+                "cartopy_enabled", "disable_cartopy", "enable_cartopy",
+                "basemap_enabled", "disable_basemap", "enable_basemap",
+                "pyngl_enabled", "enable_pyngl", "disable_pyngl",
+                "set_cache_size", "get_cache_size", "set_memo_size",
+                "get_memo_size", "omp_enabled"]),
+    ("diskcache", ["enable_disk_cache", "disable_disk_cache",
+                   "disk_cache_enabled", "clear_disk_cache"]),
+    ("constants", ["ALL_TIMES", "Constants", "ConversionFactors",
+                   "ProjectionTypes", "default_fill", "OMP_SCHED_STATIC",
+                   "OMP_SCHED_DYNAMIC", "OMP_SCHED_GUIDED",
+                   "OMP_SCHED_AUTO"]),
+    ("destag", ["destagger"]),
+    ("routines", ["getvar", "reduce_getvar"]),
+    ("ensemble", ["ens_getvar"]),
+    ("computation", ["xy", "interp1d", "interp2dxy", "interpz3d", "slp",
+                     "tk", "td", "rh", "uvmet", "smooth2d", "cape_2d",
+                     "cape_3d", "cape_parcels", "cloudfrac", "ctt", "dbz",
+                     "srhel", "udhel", "avo", "pvo", "eth", "wetbulb",
+                     "tvirtual", "omega", "pw"]),
+    ("extension", ["DiagnosticError", "omp_set_num_threads",
+                   "omp_get_num_threads",
+                   "omp_get_max_threads", "omp_get_thread_num",
+                   "omp_get_num_procs", "omp_in_parallel",
+                   "omp_set_dynamic", "omp_get_dynamic", "omp_set_nested",
+                   "omp_get_nested", "omp_set_schedule",
+                   "omp_get_schedule", "omp_get_thread_limit",
+                   "omp_set_max_active_levels",
+                   "omp_get_max_active_levels", "omp_get_level",
+                   "omp_get_ancestor_thread_num", "omp_get_team_size",
+                   "omp_get_active_level", "omp_in_final",
+                   "omp_init_lock", "omp_init_nest_lock",
+                   "omp_destroy_lock", "omp_destroy_nest_lock",
+                   "omp_set_lock", "omp_set_nest_lock",
+                   "omp_unset_lock", "omp_unset_nest_lock",
+                   "omp_test_lock", "omp_test_nest_lock",
+                   "omp_get_wtime", "omp_get_wtick"]),
+    ("interp", ["interplevel", "vertcross", "interpline", "vinterp",
+                "VerticalInterpolator"]),
+    ("g_latlon", ["xy_to_ll", "ll_to_xy", "xy_to_ll_proj", "ll_to_xy_proj"]),
+    ("py3compat", ["viewitems", "viewkeys", "viewvalues", "isstr",
+                   "py2round", "py3range", "ucode"]),
+    ("util", ["to_np", "extract_global_attrs", "is_standard_wrf_var",
+              "extract_dim", "extract_vars", "extract_times",
+              "combine_files", "npbytes_to_str", "is_moving_domain",
+              "is_staggered", "get_left_indexes", "iter_left_indexes",
+              "get_right_slices", "get_proj_params", "from_args",
+              "args_to_list", "arg_location", "psafilepath", "get_id",
+              "from_var", "combine_dims", "either", "get_iterable",
+              "IterWrapper", "is_coordvar", "latlon_coordvars", "is_mapping",
+              "has_time_coord", "is_multi_file", "is_multi_time_req",
+              "get_coord_pairs", "is_time_coord_var", "geo_bounds",
+              "get_cartopy", "get_basemap", "get_pyngl", "cartopy_xlim",
+              "cartopy_ylim", "latlon_coords", "ll_points",
+              "pairs_to_latlon"]),
+    ("geobnds", ["GeoBounds", "NullGeoBounds"]),
+    ("projection", ["WrfProj", "NullProjection", "LambertConformal",
+                    "Mercator", "PolarStereographic", "LatLon",
+                    "RotatedLatLon", "getproj"]),
+    ("coordpair", ["CoordPair"]),
+    ("interputils", ["to_xy_coords"]),
+    ("cache", ["cache_item", "get_cached_item"]),
+    ("profiler", ["profile", "Profile"]),
+    ("omptuning", ["omp_threads", "set_omp_tuning", "get_omp_tuning",
+                   "set_omp_tuning_table", "clear_omp_tuning",
+                   "calibrate_omp"]),
+    ("planner", ["plan", "Plan"]),
+    ("workspace", ["set_workspace_size", "get_workspace_size",
+                   "workspace_stats", "clear_workspace"]),
+    ("version", ["__version__"]),
+)
+
+# The asynchronous routines use syntax from Python 3.5
+if version_info >= (3, 5):
+    _EXPORTS += (("aroutines", ["agetvar", "agetvars", "aextract_vars",
+                                "set_async_executor"]), )
+
+# Public name -> submodule name
+_API_MODULES = {name: modname
+                for modname, names in _EXPORTS for name in names}
+
+__all__ = [name for _, names in _EXPORTS for name in names]
+
+
+def load_api_name(name):
+    """Return a public wrf name, importing its submodule if necessary.
+
+    Args:
+
+        name (:obj:`str`): A name from :data:`wrf.api.__all__`.
+
+    Returns:
+
+        The object for *name*.
+
+    Raises:
+
+        :class:`AttributeError`: If *name* is not part of the public API.
+
+    """
+    try:
+        modname = _API_MODULES[name]
+    except KeyError:
+        raise AttributeError("module '{}' has no attribute "
+                             "'{}'".format(__name__, name))
+
+    value = getattr(import_module("." + modname, __package__), name)
+    globals()[name] = value
+
+    return value
+
+
+def __getattr__(name):
+    return load_api_name(name)
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+# Module __getattr__ needs Python 3.7, so older versions load everything
+if version_info < (3, 7):
+    for _name in __all__:
+        load_api_name(_name)
@@ -0,0 +1,438 @@
+from __future__ import (absolute_import, division, print_function)
+
+import asyncio
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+
+import numpy as np
+
+from .config import (_get_local_settings, _set_local_settings,
+                     _set_cancel_event, _RequestCancelled)
+from .cache import _copy_cache, _swap_cache, _merge_cache
+from .util import is_mapping, is_multi_file, extract_vars
+from .py3compat import viewitems, isstr
+
+_executor = None
+_executor_owned = False
+_executor_lock = Lock()
+
+# (event loop, request key) -> _Request, for the requests in flight
+_inflight = {}
+
+
+def set_async_executor(executor=None, max_workers=None):
+    """Set the executor used by the asynchronous routines.
+
+    The executor that wrf-python creates is shut down when it is replaced.
+    An executor passed in by the caller is never shut down by wrf-python.
+
+    Args:
+
+        executor (:class:`concurrent.futures.Executor`, optional): The
+            executor.  It must run the work in threads of the calling
+            process.  Default is None, which makes a
+            :class:`concurrent.futures.ThreadPoolExecutor` the next time one
+            is needed.
+
+        max_workers (:obj:`int`, optional): The number of threads for the
+            executor made by wrf-python.  Default is None, which uses the
+            number of processors, up to 4.  Ignored if *executor* is not
+            None.
+
+    Returns:
+
+        None
+
+    """
+    global _executor, _executor_owned
+
+    if max_workers is not None and max_workers < 1:
+        raise ValueError("'max_workers' must be a positive integer")
+
+    with _executor_lock:
+        prev = _executor if _executor_owned else None
+
+        if executor is None:
+            if max_workers is None:
+                max_workers = min(os.cpu_count() or 1, 4)
+            executor = ThreadPoolExecutor(max_workers=max_workers,
+                                          thread_name_prefix="wrf")
+            _executor_owned = True
+        else:
+            _executor_owned = False
+
+        _executor = executor
+
+    if prev is not None:
+        prev.shutdown(wait=False)
+
+
+def _get_executor():
+    if _executor is None:
+        set_async_executor()
+
+    return _executor
+
+
+def _freeze(value):
+    """Return a hashable version of an argument, used to find identical
+    requests.
+
+    Raises :class:`TypeError` for the arguments that can't be compared
+    cheaply.
+
+    """
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        return value
+
+    if isinstance(value, np.ndarray):
+        return ("ndarray", value.shape, value.dtype.str, value.tobytes())
+
+    if isinstance(value, (tuple, list)):
+        return tuple(_freeze(x) for x in value)
+
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(val))
+                            for key, val in viewitems(value)))
+
+    raise TypeError("unhashable argument")
+
+
+def _input_key(wrfin):
+    """Return a key for the file objects in *wrfin*.
+
+    The file objects themselves are compared, so the key never needs to
+    touch the files.
+
+    """
+    if is_multi_file(wrfin):
+        if is_mapping(wrfin):
+            return tuple((key, _input_key(val))
+                         for key, val in viewitems(wrfin))
+        return tuple(id(wrfnc) for wrfnc in wrfin)
+
+    return id(wrfin)
+
+
+class _Request(object):
+    """A computation running on the executor.
+
+    The computation runs with the settings and a copy of the cache of the
+    thread that started it.  The items it adds to the cache are merged back
+    into that thread's cache when it finishes.  Identical requests made
+    while it is running wait for the same computation.
+
+    """
+    def __init__(self, loop, key, func, args, kwargs):
+        self.loop = loop
+        self.key = key
+        self.settings = _get_local_settings()
+        self.cache = _copy_cache()
+        self.cancel_event = Event()
+        self.waiters = 0
+
+        self.future = loop.run_in_executor(_get_executor(), self._run,
+                                           func, args, kwargs)
+        self.future.add_done_callback(self._done)
+
+        if key is not None:
+            _inflight[(loop, key)] = self
+
+    def _run(self, func, args, kwargs):
+        saved_settings = _get_local_settings()
+        _set_local_settings(self.settings)
+        saved_cache = _swap_cache(self.cache)
+        _set_cancel_event(self.cancel_event)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _set_cancel_event(None)
+            self.cache = _swap_cache(saved_cache)
+            _set_local_settings(saved_settings)
+
+    def _done(self, future):
+        # Runs in the event loop thread, which started the request
+        if self.key is not None:
+            _inflight.pop((self.loop, self.key), None)
+
+        if not future.cancelled() and future.exception() is None:
+            if self.cache:
+                _merge_cache(self.cache)
+
+    async def wait(self):
+        self.waiters += 1
+        try:
+            return await asyncio.shield(self.future)
+        except _RequestCancelled:
+            raise asyncio.CancelledError()
+        except asyncio.CancelledError:
+            # Stop the computation at the next left iteration slice once
+            # nobody is waiting for it
+            if self.waiters == 1 and not self.future.done():
+                self.cancel_event.set()
+                self.future.cancel()
+            raise
+        finally:
+            self.waiters -= 1
+
+
+async def _submit(func, args, kwargs, key=None):
+    """Run *func* on the executor and return its result, sharing the
+    computation with any identical request in flight."""
+    loop = asyncio.get_event_loop()
+
+    request = None
+    if key is not None:
+        key = (func.__name__, key, _freeze(_get_local_settings()))
+        request = _inflight.get((loop, key))
+
+    if request is None:
+        request = _Request(loop, key, func, args, kwargs)
+        return await request.wait()
+
+    result = await request.wait()
+
+    # The first request owns the result, the others get their own object
+    # that shares the data
+    copy = getattr(result, "copy", None)
+    if copy is not None:
+        try:
+            return copy(deep=False)
+        except TypeError:
+            pass
+
+    return result
+
+
+def _request_key(wrfin, *args, **kwargs):
+    """Return the key for coalescing a request, or None if it can't be
+    compared with other requests."""
+    if kwargs.get("cache") is not None:
+        return None
+
+    try:
+        return (_input_key(wrfin), _freeze(args), _freeze(kwargs))
+    except TypeError:
+        return None
+
+
+async def agetvar(wrfin, varname, timeidx=0, method="cat", squeeze=True,
+                  cache=None, meta=True, **kwargs):
+    """Return a :meth:`wrf.getvar` product without blocking the event loop.
+
+    The file reads and the computation run on the executor set by
+    :meth:`wrf.set_async_executor`, using the xarray, cache size, and
+    OpenMP settings of the thread that awaits this routine.  The thread
+    local cache works as if :meth:`wrf.getvar` had been called from the
+    awaiting thread: the computation starts with a copy of that thread's
+    cache, and the items it caches are added to that thread's cache when
+    it finishes.
+
+    Identical requests that are in flight at the same time share a single
+    computation.  Requests are identical if they use the same file objects
+    and the same arguments, and *cache* is None.  Each request gets its own
+    result object, but the data is shared, so it should not be modified
+    in place.
+
+    Cancelling the awaiting task stops the computation between left
+    iteration slices, unless another task is waiting for the same request.
+
+    Note:
+
+        Some netCDF and HDF5 builds are not thread safe.  Use
+        :meth:`wrf.set_async_executor` with *max_workers* set to 1 to make
+        a single file read at a time with those builds.
+
+    Args:
+
+        wrfin (:class:`netCDF4.Dataset`, :class:`Nio.NioFile`, or an \
+            iterable): WRF-ARW NetCDF
+            data as a :class:`netCDF4.Dataset`, :class:`Nio.NioFile`
+            or an iterable sequence of the aforementioned types.
+
+        varname (:obj:`str`): The variable name.
+
+        timeidx (:obj:`int` or :data:`wrf.ALL_TIMES`, optional): The
+            desired time index. This value can be a positive integer,
+            negative integer, or
+            :data:`wrf.ALL_TIMES` (an alias for None) to return
+            all times in the file or sequence. The default is 0.
+
+        method (:obj:`str`, optional): The aggregation method to use for
+            sequences.  Must be either 'cat' or 'join'.
+            'cat' combines the data along the Time dimension.
+            'join' creates a new dimension for the file index.
+            The default is 'cat'.
+
+        squeeze (:obj:`bool`, optional): Set to False to prevent dimensions
+            with a size of 1 from being automatically removed from the shape
+            of the output. Default is True.
+
+        cache (:obj:`dict`, optional): A dictionary of (varname, ndarray)
+            that can be used to supply pre-extracted NetCDF variables to the
+            computational routines.  Default is None.
+
+        meta (:obj:`bool`, optional): Set to False to disable metadata and
+            return :class:`numpy.ndarray` instead of
+            :class:`xarray.DataArray`.  Default is True.
+
+        **kwargs: Optional keyword arguments for the product.  See
+            :meth:`wrf.getvar`.
+
+    Returns:
+
+        :class:`xarray.DataArray` or :class:`numpy.ndarray`: The same
+        result as :meth:`wrf.getvar`.
+
+    Examples:
+
+        .. code-block:: python
+
+            import asyncio
+            from netCDF4 import Dataset
+            from wrf import agetvar
+
+            wrfnc = Dataset("wrfout_d02_2010-06-13_21:00:00")
+
+            async def main():
+                slp, cape = await asyncio.gather(agetvar(wrfnc, "slp"),
+                                                 agetvar(wrfnc, "cape_2d"))
+
+            asyncio.get_event_loop().run_until_complete(main())
+
+    """
+    from .routines import getvar
+
+    args = (wrfin, varname, timeidx, method, squeeze, cache, meta)
+    key = _request_key(wrfin, varname, timeidx, method, squeeze, meta,
+                       cache=cache, **kwargs)
+
+    return await _submit(getvar, args, kwargs, key)
+
+
+async def agetvars(wrfin, names, timeidx=0, method="cat", squeeze=True,
+                   cache=None, meta=True, **kwargs):
+    """Return several :meth:`wrf.getvar` products without blocking the
+    event loop.
+
+    The products are computed concurrently with :meth:`wrf.agetvar`.
+    Cancelling the awaiting task cancels all of them.
+
+    Args:
+
+        wrfin (:class:`netCDF4.Dataset`, :class:`Nio.NioFile`, or an \
+            iterable): WRF-ARW NetCDF
+            data as a :class:`netCDF4.Dataset`, :class:`Nio.NioFile`
+            or an iterable sequence of the aforementioned types.
+
+        names (sequence or mapping): A sequence of product names, or a
+            mapping of product name to a :obj:`dict` of keyword arguments
+            for that product.
+
+        timeidx (:obj:`int` or :data:`wrf.ALL_TIMES`, optional): The
+            desired time index. This value can be a positive integer,
+            negative integer, or
+            :data:`wrf.ALL_TIMES` (an alias for None) to return
+            all times in the file or sequence. The default is 0.
+
+        method (:obj:`str`, optional): The aggregation method to use for
+            sequences.  Must be either 'cat' or 'join'.
+            'cat' combines the data along the Time dimension.
+            'join' creates a new dimension for the file index.
+            The default is 'cat'.
+
+        squeeze (:obj:`bool`, optional): Set to False to prevent dimensions
+            with a size of 1 from being automatically removed from the shape
+            of the output. Default is True.
+
+        cache (:obj:`dict`, optional): A dictionary of (varname, ndarray)
+            that can be used to supply pre-extracted NetCDF variables to the
+            computational routines.  Default is None.
+
+        meta (:obj:`bool`, optional): Set to False to disable metadata and
+            return :class:`numpy.ndarray` instead of
+            :class:`xarray.DataArray`.  Default is True.
+
+        **kwargs: Optional keyword arguments used for every product.  The
+            keyword arguments in a *names* mapping take precedence.
+
+    Returns:
+
+        :class:`collections.OrderedDict`: A mapping of product name to
+        product.
+
+    """
+    if isstr(names):
+        names = [names]
+
+    requests = []
+    for name in names:
+        product_kwargs = dict(kwargs)
+        if is_mapping(names):
+            product_kwargs.update(names[name] or {})
+        requests.append(agetvar(wrfin, name, timeidx, method, squeeze,
+                                cache, meta, **product_kwargs))
+
+    results = await asyncio.gather(*requests)
+
+    return OrderedDict(zip(names, results))
+
+
+async def aextract_vars(wrfin, timeidx, varnames, method="cat",
+                        squeeze=True, cache=None, meta=True):
+    """Extract variables from a NetCDF file object or a sequence of NetCDF
+    file objects without blocking the event loop.
+
+    This runs :meth:`wrf.extract_vars` on the executor set by
+    :meth:`wrf.set_async_executor`, in the same way as
+    :meth:`wrf.agetvar`.
+
+    Args:
+
+        wrfin (:class:`netCDF4.Dataset`, :class:`Nio.NioFile`, or an \
+            iterable): WRF-ARW NetCDF
+            data as a :class:`netCDF4.Dataset`, :class:`Nio.NioFile`
+            or an iterable sequence of the aforementioned types.
+
+        timeidx (:obj:`int` or :data:`wrf.ALL_TIMES`, optional): The
+            desired time index. This value can be a positive integer,
+            negative integer, or
+            :data:`wrf.ALL_TIMES` (an alias for None) to return
+            all times in the file or sequence.
+
+        varnames (:obj:`str` or sequence of :obj:`str`): A single
+            variable name or a sequence of variable names.
+
+        method (:obj:`str`, optional): The aggregation method to use for
+            sequences.  Must be either 'cat' or 'join'.
+            'cat' combines the data along the Time dimension.
+            'join' creates a new dimension for the file index.
+            The default is 'cat'.
+
+        squeeze (:obj:`bool`, optional): Set to False to prevent dimensions
+            with a size of 1 from being automatically removed from the shape
+            of the output. Default is True.
+
+        cache (:obj:`dict`, optional): A dictionary of (varname, ndarray)
+            that can be used to supply pre-extracted NetCDF variables to the
+            computational routines.  Default is None.
+
+        meta (:obj:`bool`, optional): Set to False to disable metadata and
+            return :class:`numpy.ndarray` instead of
+            :class:`xarray.DataArray`.  Default is True.
+
+    Returns:
+
+        :obj:`dict`: A mapping of variable name to an array object.
+
+    """
+    args = (wrfin, timeidx, varnames, method, squeeze, cache, meta)
+    key = _request_key(wrfin, timeidx, varnames, method, squeeze, meta,
+                       cache=cache)
+
+    result = await _submit(extract_vars, args, {}, key)
+
+    # Each request gets its own mapping
+    return dict(result)
@@ -161,3 +161,53 @@ def _get_cache():
 
     _shrink_cache()
     return getattr(_local_storage, "cache", None)
+
+
+def _copy_cache():
+    """Return a copy of the threadlocal cache.
+
+    The cached values are not copied.
+
+    Returns:
+
+        :class:`collections.OrderedDict`: The copy.
+
+    """
+    cache = _get_cache()
+    if cache is None:
+        return OrderedDict()
+
+    return OrderedDict((key, OrderedDict(prods))
+                       for key, prods in cache.items())
+
+
+def _swap_cache(cache):
+    """Replace the threadlocal cache with *cache* and return the previous
+    cache, or None if there was no cache.
+
+    """
+    global _local_storage
+
+    prev = getattr(_local_storage, "cache", None)
+    if cache is None:
+        try:
+            del _local_storage.cache
+        except AttributeError:
+            pass
+    else:
+        _local_storage.cache = cache
+
+    return prev
+
+
+def _merge_cache(cache):
+    """Add the items in *cache* to the threadlocal cache.
+
+    Returns:
+
+        None
+
+    """
+    for key, prods in cache.items():
+        for product, value in prods.items():
+            cache_item(key, product, value)
@@ -5,15 +5,17 @@ import numpy.ma as ma
 
 from .constants import default_fill
 from .extension import (_interpz3d, _interp2dxy, _interp1d, _slp, _tk, _td,
-                        _rh, _uvmet, _smooth2d, _cape, _cloudfrac, _ctt, _dbz,
-                        _srhel, _udhel, _avo, _pvo, _eth, _wetbulb, _tv,
-                        _omega, _pw)
+                        _rh, _uvmet, _smooth2d, _smooth2d_closed_form, _cape,
+                        _cape_parcels, _cloudfrac, _ctt, _dbz, _srhel,
+                        _udhel, _avo, _pvo, _eth, _wetbulb, _tv, _omega, _pw)
 from .decorators import convert_units
 from .metadecorators import (set_alg_metadata, set_uvmet_alg_metadata,
                              set_interp_metadata, set_cape_alg_metadata,
                              set_cloudfrac_alg_metadata,
                              set_smooth_metdata)
 from .interputils import get_xy
+from .util import to_np, _parcel_codes
+from .profiler import masked_values
 
 
 @set_interp_metadata("xy")
@@ -678,7 +680,7 @@ def uvmet(u, v, lat, lon, cen_long, cone, meta=True, units="m s-1"):
 
 
 @set_smooth_metdata()
-def smooth2d(field, passes, cenweight=2.0, meta=True):
+def smooth2d(field, passes, cenweight=2.0, method="passes", meta=True):
     """Return the field smoothed.
 
     The smoothing kernel applied is:
@@ -694,6 +696,13 @@ def smooth2d(field, passes, cenweight=2.0, meta=True):
     Data values along the borders are left unchanged. This routine does not
     modify the original data supplied by the *field* parameter..
 
+    All of the two-dimensional slices and smoothing passes are computed in a
+    single call to the compiled routine.  For large numbers of passes, the
+    'closed_form' *method* computes the result of all of the passes at once
+    using discrete sine transforms, so the cost does not depend on
+    *passes*.  The result matches the 'passes' method to within rounding
+    error.  Fields with missing values always use the 'passes' method.
+
     If you need more general purpose multidimensional filtering tools,
     try the :meth:`scipy.ndimage.convolve` method.
 
@@ -710,6 +719,10 @@ def smooth2d(field, passes, cenweight=2.0, meta=True):
         cenweight (:obj:`float`, optional): The weight to apply to the
             center of the smoothing kernel. Default is 2.0.
 
+        method (:obj:`str`, optional): Set to 'passes' to apply the
+            smoothing kernel once per pass, or 'closed_form' to compute
+            the result of all passes at once.  Default is 'passes'.
+
         meta (:obj:`bool`): Set to False to disable metadata and return
             :class:`numpy.ndarray` instead of
             :class:`xarray.DataArray`.  Default is True.
@@ -729,6 +742,15 @@ def smooth2d(field, passes, cenweight=2.0, meta=True):
 
 
     """
+    if method == "closed_form":
+        # The closed form does not skip missing values
+        values = to_np(field)
+        if not (ma.is_masked(values) or
+                np.any(np.asarray(values) == default_fill(np.float64))):
+            return _smooth2d_closed_form(values, passes, cenweight)
+    elif method != "passes":
+        raise ValueError("'method' must be 'passes' or 'closed_form'")
+
     return _smooth2d(field, passes, cenweight)
 
 
@@ -876,7 +898,7 @@ def cape_2d(pres_hpa, tkel, qv, height, terrain, psfc_hpa, ter_follow,
     result[2, ..., :, :] = cape_cin[1, ..., -2, :, :]
     result[3, ..., :, :] = cape_cin[1, ..., -3, :, :]
 
-    return ma.masked_values(result, missing)
+    return masked_values(result, missing)
 
 
 @set_cape_alg_metadata(is2d=False, copyarg="pres_hpa")
@@ -997,7 +1019,145 @@ def cape_3d(pres_hpa, tkel, qv, height, terrain, psfc_hpa, ter_follow,
     cape_cin = _cape(pres_hpa, tkel, qv, height, terrain, psfc_hpa,
                      missing, i3dflag, ter_follow)
 
-    return ma.masked_values(cape_cin, missing)
+    return masked_values(cape_cin, missing)
+
+
+@set_cape_alg_metadata(is2d=True, copyarg="pres_hpa", parcel_arg="parcels")
+def cape_parcels(pres_hpa, tkel, qv, height, terrain, psfc_hpa, ter_follow,
+                 parcels=("sb", "ml", "mu"), missing=default_fill(np.float64),
+                 meta=True):
+    """Return the CAPE, CIN, LCL, and LFC for several parcel types.
+
+    This function calculates the convective available potential energy
+    (CAPE), convective inhibition (CIN), lifted condensation level (LCL),
+    and level of free convection (LFC) for the surface based ('sb'), mixed
+    layer ('ml'), and most unstable ('mu') parcels using the RIP
+    [Read/Interpolate/plot] parcel lifting code.  All of the requested
+    parcels are lifted in a single pass over the columns, so the lookup
+    table search for each level is shared between them.
+
+    The surface based parcel starts at the lowest model level.  The mixed
+    layer parcel uses the pressure weighted mean potential temperature and
+    mixing ratio of the lowest 100 hPa and is lifted from the lowest model
+    level.  The most unstable parcel starts at the level with the highest
+    theta-e in the lowest 300 hPa.
+
+    The parcels are lifted as in :meth:`wrf.cape_2d`, including its LCL
+    height, which uses the moist dry-adiabatic lapse rate g/cpm.
+    :meth:`wrf.cape_3d` divides by (g/cp)*(1 + 0.887*qv) instead, so the
+    surface based values differ slightly from the lowest level of
+    :meth:`wrf.cape_3d`, typically by a few J kg-1.
+
+    The leftmost dimension of the returned array represents four different
+    quantities:
+
+        - return_val[0,...] will contain CAPE [J kg-1]
+        - return_val[1,...] will contain CIN [J kg-1]
+        - return_val[2,...] will contain LCL [m]
+        - return_val[3,...] will contain LFC [m]
+
+    The next dimension is the parcel type, in the order given by *parcels*.
+
+    This is the raw computational algorithm and does not extract any variables
+    from WRF output files.  Use :meth:`wrf.getvar` to both extract and compute
+    diagnostic variables.
+
+    Args:
+
+        pres_hpa (:class:`xarray.DataArray` or :class:`numpy.ndarray`): Full
+            pressure (perturbation + base state pressure) in [hPa] with at
+            least three dimensions. The rightmost dimensions can be
+            top_bottom x south_north x west_east or bottom_top x south_north x
+            west_east.
+
+            Note:
+
+                The units for *pres_hpa* are [hPa].
+
+            Note:
+
+                This variable must be
+                supplied as a :class:`xarray.DataArray` in order to copy the
+                dimension names to the output.  Otherwise, default names will
+                be used.
+
+        tkel (:class:`xarray.DataArray` or :class:`numpy.ndarray`): Temperature
+            in [K] with same dimensionality as *pres_hpa*.
+
+        qv (:class:`xarray.DataArray` or :class:`numpy.ndarray`): Water vapor
+            mixing ratio in [kg/kg] with the same dimensionality as *pres_hpa*.
+
+        height (:class:`xarray.DataArray` or :class:`numpy.ndarray`):
+            Geopotential height in [m] with the same dimensionality as
+            *pres_hpa*.
+
+        terrain (:class:`xarray.DataArray` or :class:`numpy.ndarray`):
+            Terrain height in [m].  This is at least a two-dimensional array
+            with the same dimensionality as *pres_hpa*, excluding the vertical
+            (bottom_top/top_bottom) dimension.
+
+        psfc_hpa (:class:`xarray.DataArray` or :class:`numpy.ndarray`):
+            The surface pressure in [hPa].  This is at least a two-dimensional
+            array with the same dimensionality as *pres_hpa*, excluding the
+            vertical (bottom_top/top_bottom) dimension.
+
+            Note:
+
+                The units for *psfc_hpa* are [hPa].
+
+        ter_follow (:obj:`bool`): A boolean that should be set to True if the
+            data uses terrain following coordinates (WRF data).  Set to
+            False for pressure level data.
+
+        parcels (:obj:`str` or a sequence of :obj:`str`, optional): The
+            parcel types, which can be 'sb', 'ml', or 'mu'.  Default is
+            ('sb', 'ml', 'mu').
+
+        missing (:obj:`float`, optional): The fill value to use for the
+            output.  Default is :data:`wrf.default_fill(numpy.float64)`.
+
+        meta (:obj:`bool`): Set to False to disable metadata and return
+            :class:`numpy.ndarray` instead of
+            :class:`xarray.DataArray`.  Default is True.
+
+    Warning:
+
+        The input arrays must not contain any missing/fill values or
+        :data:`numpy.nan` values.
+
+    Returns:
+
+        :class:`xarray.DataArray` or :class:`numpy.ndarray`: The
+        cape, cin, lcl, and lfc values as an array whose
+        leftmost dimension is 4 (0=CAPE, 1=CIN, 2=LCL, 3=LFC), followed by
+        the parcel type dimension.  If xarray is
+        enabled and the *meta* parameter is True, then the result will be an
+        :class:`xarray.DataArray` object.  Otherwise, the result will
+        be a :class:`numpy.ndarray` object with no metadata.
+
+    See Also:
+
+        :meth:`wrf.getvar`, :meth:`wrf.cape_2d`, :meth:`wrf.cape_3d`
+
+    """
+
+    if isinstance(ter_follow, bool):
+        ter_follow = 1 if ter_follow else 0
+
+    codes = _parcel_codes(parcels)
+
+    bot_idxs = (0,) * pres_hpa.ndim
+    top_idxs = bot_idxs[:-3] + (-1, 0, 0)
+    bottom_up = int(float(pres_hpa[bot_idxs]) > float(pres_hpa[top_idxs]))
+
+    result = _cape_parcels(pres_hpa, tkel, qv, height, terrain, psfc_hpa,
+                           codes, missing, ter_follow, bottom_up=bottom_up)
+
+    # Move the product and parcel dimensions to the left of the extra
+    # leftmost dimensions
+    result = np.ascontiguousarray(np.moveaxis(result, (-4, -3), (0, 1)))
+
+    return masked_values(result, missing)
 
 
 @set_cloudfrac_alg_metadata(copyarg="vert")
@@ -1020,6 +1180,9 @@ def cloudfrac(vert, relh, vert_inc_w_height, low_thresh, mid_thresh,
     threshold.  When this happens, a fill value will be used in the output at
     that location.
 
+    The vertical levels may be ordered either from the surface upward or
+    from the model top downward.
+
     This is the raw computational algorithm and does not extract any variables
     from WRF output files.  Use :meth:`wrf.getvar` to both extract and compute
     diagnostic variables.
@@ -1081,10 +1244,16 @@ def cloudfrac(vert, relh, vert_inc_w_height, low_thresh, mid_thresh,
         :meth:`wrf.getvar`, :meth:`wrf.rh`
 
     """
+    # The kernel reads the columns in whichever order they are supplied
+    bot_idxs = (0,) * vert.ndim
+    top_idxs = bot_idxs[:-3] + (-1, 0, 0)
+    bottom_up = int((float(vert[top_idxs]) > float(vert[bot_idxs])) ==
+                    bool(vert_inc_w_height))
+
     cfrac = _cloudfrac(vert, relh, vert_inc_w_height, low_thresh, mid_thresh,
-                       high_thresh, missing)
+                       high_thresh, missing, bottom_up=bottom_up)
 
-    return ma.masked_values(cfrac, missing)
+    return masked_values(cfrac, missing)
 
 
 @set_alg_metadata(2, "pres_hpa", refvarndims=3,
@@ -1095,6 +1264,9 @@ def ctt(pres_hpa, tkel, qv, qcld, height, terrain, qice=None,
         opt_thresh=1.0, meta=True, units="degC"):
     """Return the cloud top temperature.
 
+    The vertical levels may be ordered either from the surface upward or
+    from the model top downward.
+
     This is the raw computational algorithm and does not extract any variables
     from WRF output files.  Use :meth:`wrf.getvar` to both extract and compute
     diagnostic variables.
@@ -1196,10 +1368,15 @@ def ctt(pres_hpa, tkel, qv, qcld, height, terrain, qice=None,
 
     _fill_nocloud = 1 if fill_nocloud else 0
 
+    # The kernel reads the columns in whichever order they are supplied
+    bot_idxs = (0,) * pres_hpa.ndim
+    top_idxs = bot_idxs[:-3] + (-1, 0, 0)
+    bottom_up = int(float(pres_hpa[bot_idxs]) > float(pres_hpa[top_idxs]))
+
     ctt = _ctt(pres_hpa, tkel, qice, qcld, qv, height, terrain, haveqci,
-               _fill_nocloud, missing, opt_thresh)
+               _fill_nocloud, missing, opt_thresh, bottom_up=bottom_up)
 
-    return ma.masked_values(ctt, missing)
+    return masked_values(ctt, missing)
 
 
 @set_alg_metadata(3, "pres", units="dBZ",
@@ -1373,17 +1550,12 @@ def srhel(u, v, height, terrain, top=3000.0, lats=None, meta=True):
 
     """
 
-    # u, v get swapped in vertical
-    _u = np.ascontiguousarray(u[..., ::-1, :, :])
-    _v = np.ascontiguousarray(v[..., ::-1, :, :])
-    _height = np.ascontiguousarray(height[..., ::-1, :, :])
-
     if lats is None:
         _lats = np.ones_like(terrain)
     else:
         _lats = lats
 
-    return _srhel(_u, _v, _height, terrain, _lats, top)
+    return _srhel(u, v, height, terrain, _lats, top, bottom_up=1)
 
 
 @set_alg_metadata(2, "u", refvarndims=3, units="m2 s-2",
@@ -1,44 +1,66 @@
 from __future__ import (absolute_import, division, print_function)
 
+from importlib import import_module
 from threading import local
 import wrapt
 
 from ._wrffortran import (fomp_enabled, fomp_set_num_threads,
                           fomp_set_schedule, fomp_set_dynamic,
+                          fomp_get_max_threads, fomp_get_schedule,
                           omp_constants)
 
 _local_config = local()
 
+# The thread local settings copied to the worker threads used by the
+# asynchronous routines
+_LOCAL_SETTINGS = ("xarray_enabled", "cartopy_enabled", "basemap_enabled",
+                   "pyngl_enabled", "cache_size", "memo_size")
 
-def _init_local():
-    global _local_config
+# The module imported to check for each optional package
+_OPTIONAL_MODULES = {"xarray": "xarray",
+                     "cartopy": "cartopy.crs",
+                     "basemap": "mpl_toolkits.basemap",
+                     "pyngl": "Ngl"}
 
-    _local_config.xarray_enabled = True
-    _local_config.cartopy_enabled = True
-    _local_config.basemap_enabled = True
-    _local_config.pyngl_enabled = True
-    _local_config.cache_size = 20
-    _local_config.initialized = True
+# Results of the optional package checks, shared by all threads
+_package_found = {}
 
-    try:
-        from xarray import DataArray
-    except ImportError:
-        _local_config.xarray_enabled = False
 
-    try:
-        from cartopy import crs
-    except ImportError:
-        _local_config.cartopy_enabled = False
+def _package_available(package):
+    """Return True if an optional package can be imported.
+
+    The package is only imported the first time this is called, so
+    importing wrf does not pay for the optional packages.
 
+    """
     try:
-        from mpl_toolkits.basemap import Basemap
-    except ImportError:
-        _local_config.basemap_enabled = False
+        return _package_found[package]
+    except KeyError:
+        pass
 
     try:
-        from Ngl import Resources
+        import_module(_OPTIONAL_MODULES[package])
     except ImportError:
-        _local_config.pyngl_enabled = False
+        found = False
+    else:
+        found = True
+
+    _package_found[package] = found
+
+    return found
+
+
+def _init_local():
+    global _local_config
+
+    # None means the package has not been checked yet
+    _local_config.xarray_enabled = None
+    _local_config.cartopy_enabled = None
+    _local_config.basemap_enabled = None
+    _local_config.pyngl_enabled = None
+    _local_config.cache_size = 20
+    _local_config.memo_size = 2
+    _local_config.initialized = True
 
 
 # Initialize the main thread's configuration
@@ -51,7 +73,7 @@ def init_local():
     def func_wrapper(wrapped, instance, args, kwargs):
         global _local_config
         try:
-            init = _local_config.init
+            init = _local_config.initialized
         except AttributeError:
             _init_local()
         else:
@@ -73,6 +95,8 @@ def xarray_enabled():
 
     """
     global _local_config
+    if _local_config.xarray_enabled is None:
+        _local_config.xarray_enabled = _package_available("xarray")
     return _local_config.xarray_enabled
 
 
@@ -100,6 +124,8 @@ def cartopy_enabled():
 
     """
     global _local_config
+    if _local_config.cartopy_enabled is None:
+        _local_config.cartopy_enabled = _package_available("cartopy")
     return _local_config.cartopy_enabled
 
 
@@ -114,7 +140,7 @@ def enable_cartopy():
 def disable_cartopy():
     """Disable cartopy."""
     global _local_config
-    _local_config.cartopy_enabled = True
+    _local_config.cartopy_enabled = False
 
 
 @init_local()
@@ -127,6 +153,8 @@ def basemap_enabled():
 
     """
     global _local_config
+    if _local_config.basemap_enabled is None:
+        _local_config.basemap_enabled = _package_available("basemap")
     return _local_config.basemap_enabled
 
 
@@ -141,7 +169,7 @@ def enable_basemap():
 def disable_basemap():
     """Disable basemap."""
     global _local_config
-    _local_config.basemap_enabled = True
+    _local_config.basemap_enabled = False
 
 
 @init_local()
@@ -154,6 +182,8 @@ def pyngl_enabled():
 
     """
     global _local_config
+    if _local_config.pyngl_enabled is None:
+        _local_config.pyngl_enabled = _package_available("pyngl")
     return _local_config.pyngl_enabled
 
 
@@ -168,7 +198,7 @@ def enable_pyngl():
 def disable_pyngl():
     """Disable pyngl."""
     global _local_config
-    _local_config.pyngl_enabled = True
+    _local_config.pyngl_enabled = False
 
 
 @init_local()
@@ -204,6 +234,106 @@ def get_cache_size():
     return int(_local_config.cache_size)
 
 
+@init_local()
+def set_memo_size(size):
+    """Set the number of results retained for each product and sequence by
+    the diagnostics that return several products in one array.
+
+    These results are kept in the threadlocal cache, so that products such
+    as lcl and lfc are sliced from a single cape_2d computation.  Setting
+    the size to 0 disables the memoization.
+
+    Args:
+
+        size (:obj:`int`): The number of results to retain.
+
+    Returns:
+
+        None
+
+    """
+    global _local_config
+    _local_config.memo_size = size
+
+
+@init_local()
+def get_memo_size():
+    """Return the number of results retained for each product and sequence
+    by the diagnostics that return several products in one array.
+
+    Returns:
+
+        :obj:`int`: The number of results retained.
+
+    """
+    global _local_config
+    return int(_local_config.memo_size)
+
+
+@init_local()
+def _get_local_settings():
+    """Return the calling thread's settings, including OpenMP's.
+
+    Returns:
+
+        :obj:`dict`: The settings, which can be applied to another thread
+        with :meth:`_set_local_settings`.
+
+    """
+    global _local_config
+    settings = {name: getattr(_local_config, name)
+                for name in _LOCAL_SETTINGS}
+
+    if fomp_enabled():
+        settings["omp"] = (fomp_get_max_threads(), fomp_get_schedule())
+
+    return settings
+
+
+@init_local()
+def _set_local_settings(settings):
+    """Apply settings from :meth:`_get_local_settings` to the calling thread.
+
+    Returns:
+
+        None
+
+    """
+    global _local_config
+    for name in _LOCAL_SETTINGS:
+        setattr(_local_config, name, settings[name])
+
+    omp = settings.get("omp")
+    if omp is not None:
+        fomp_set_num_threads(omp[0])
+        fomp_set_schedule(*omp[1])
+
+
+class _RequestCancelled(Exception):
+    """Raised in a worker thread when the asynchronous request running the
+    computation has been cancelled."""
+    pass
+
+
+def _set_cancel_event(event):
+    """Set the :class:`threading.Event` that cancels the computation running
+    in the calling thread, or None to remove it."""
+    global _local_config
+    _local_config.cancel_event = event
+
+
+def _check_cancelled():
+    """Raise :class:`_RequestCancelled` if the computation running in the
+    calling thread has been cancelled.
+
+    This is called between the left iteration slices.
+
+    """
+    event = getattr(_local_config, "cancel_event", None)
+    if event is not None and event.is_set():
+        raise _RequestCancelled("the request was cancelled")
+
+
 def omp_enabled():
     """Return True if OpenMP is enabled.
 
@@ -1,19 +1,28 @@
 from __future__ import (absolute_import, division, print_function)
 
+from sys import version_info
 from collections import Iterable, OrderedDict
 
 import wrapt
 import numpy as np
-import numpy.ma as ma
 
 from .units import do_conversion, check_units, dealias_and_clean_unit
-from .util import iter_left_indexes, from_args, to_np, combine_dims
+from .util import (iter_left_indexes, from_args, to_np, combine_dims,
+                   _get_argspec, args_to_list, _is_all_masked,
+                   is_multi_file, is_mapping)
+from .cache import cache_item, get_cached_item
 from .py3compat import viewitems, viewvalues, isstr
-from .config import xarray_enabled
+from .config import xarray_enabled, get_memo_size, _check_cancelled
 from .constants import default_fill
+from .profiler import (profile_stage, profiling_enabled, masked_values,
+                       nbytes)
+from .omptuning import kernel_omp_settings
+from .planner import planning, plan_cast, plan_kernel
 
-if xarray_enabled():
+try:
     from xarray import DataArray
+except ImportError:
+    pass
 
 
 def convert_units(unit_type, alg_unit):
@@ -48,6 +57,105 @@ def convert_units(unit_type, alg_unit):
     return func_wrapper
 
 
+def _input_files(wrfin):
+    """Return a tuple of the file objects in *wrfin*, or None if *wrfin* is
+    an iterator that can only be traversed once."""
+    if not is_multi_file(wrfin):
+        return (wrfin,)
+
+    if is_mapping(wrfin):
+        files = ()
+        for val in viewvalues(wrfin):
+            val_files = _input_files(val)
+            if val_files is None:
+                return None
+            files += val_files
+        return files
+
+    if not isinstance(wrfin, (list, tuple)):
+        return None
+
+    return tuple(wrfin)
+
+
+def memoize(product):
+    """A decorator that memoizes the result of a diagnostic that returns
+    several products in one array.
+
+    Products such as lcl and lfc are slices of the cape_2d result, so
+    requesting each of them separately would otherwise compute the parent
+    diagnostic every time.  The result is stored in the threadlocal cache
+    for the sequence, keyed by the time index, method, whether metadata is
+    returned, and the remaining arguments.  A result is only reused for
+    the same file objects it was computed from, so a file that is reopened
+    at the same path is computed again.  Only the most recent results are
+    retained for each sequence (see :meth:`wrf.set_memo_size`), and nothing
+    is memoized when a variable *cache* is supplied, when *wrfin* is an
+    iterator, or while planning.
+
+    The wrapped function must use the standard getter signature, which is
+    (wrfin, timeidx, method, squeeze, cache, meta, _key, ...).
+
+    Args:
+
+        product (:obj:`str`): The product name used as the inner cache key.
+
+    Returns:
+
+        :class:`xarray.DataArray` or :class:`numpy.ndarray`: A copy of the
+        wrapped function's output, so the memoized result is never modified
+        by the caller.
+
+    """
+    @wrapt.decorator
+    def func_wrapper(wrapped, instance, args, kwargs):
+        memo_size = get_memo_size()
+        all_args = args_to_list(wrapped, args, kwargs)
+        cache = all_args[4]
+        _key = all_args[6]
+
+        if (memo_size <= 0 or _key is None or cache is not None or
+                planning()):
+            return wrapped(*args, **kwargs)
+
+        files = _input_files(all_args[0])
+        if files is None:
+            return wrapped(*args, **kwargs)
+
+        # The metadata flag is combined with the xarray setting, since the
+        # result type depends on both
+        memokey = (tuple(all_args[1:4]) +
+                   (bool(all_args[5] and xarray_enabled()),) +
+                   tuple(all_args[7:]))
+        try:
+            hash(memokey)
+        except TypeError:
+            return wrapped(*args, **kwargs)
+
+        # The asynchronous routines share the cached values between threads,
+        # so the stored mapping is replaced rather than modified
+        memo = OrderedDict(get_cached_item(_key, product) or ())
+
+        # The cache key comes from the file paths, so the stored file
+        # objects are compared to catch files that were reopened
+        memo_files, result = memo.pop(memokey, (None, None))
+        if (memo_files is None or len(memo_files) != len(files) or
+                any(memo_file is not wrfnc
+                    for memo_file, wrfnc in zip(memo_files, files))):
+            result = wrapped(*args, **kwargs)
+
+            while len(memo) >= memo_size:
+                memo.popitem(last=False)
+
+        # Most recently used last
+        memo[memokey] = (files, result)
+        cache_item(_key, product, memo)
+
+        return result.copy()
+
+    return func_wrapper
+
+
 def left_iteration(ref_var_expected_dims,
                    ref_var_right_ndims,
                    insert_dims=None,
@@ -132,8 +240,10 @@ def left_iteration(ref_var_expected_dims,
         ref_var_shape = ref_var.shape
         extra_dim_num = ref_var.ndim - ref_var_expected_dims
 
-        # No special left side iteration, return the function result
-        if (extra_dim_num == 0):
+        # No special left side iteration, return the function result.  While
+        # planning, the output views are always made so that the kernel
+        # outputs are known without running it.
+        if extra_dim_num == 0 and not planning():
             return wrapped(*args, **kwargs)
 
         # Start by getting the left-most 'extra' dims
@@ -156,6 +266,8 @@ def left_iteration(ref_var_expected_dims,
 
         mask_output = False
         for left_idxs in iter_left_indexes(extra_dims):
+            _check_cancelled()
+
             # Make the left indexes plus a single slice object
             # The single slice will handle all the dimensions to
             # the right (e.g. [1,1,:])
@@ -181,18 +293,12 @@ def left_iteration(ref_var_expected_dims,
                 else:
                     arr = to_np(arg)
 
-                try:
-                    all_masked = arr.mask.all()
-                except AttributeError:
-                    pass  # Not a masked array
-                else:
-                    if all_masked:
-                        for output in viewvalues(outd):
-                            output[left_and_slice_idxs] = (
-                                default_fill(np.float64))
-                        skip_missing = True
-                        mask_output = True
-                        break
+                if _is_all_masked(arr):
+                    for output in viewvalues(outd):
+                        output[left_and_slice_idxs] = default_fill(np.float64)
+                    skip_missing = True
+                    mask_output = True
+                    break
 
             if skip_missing:
                 continue
@@ -225,9 +331,9 @@ def left_iteration(ref_var_expected_dims,
         # Mostly when used with join
         if mask_output:
             if isinstance(output, np.ndarray):
-                output = ma.masked_values(output, default_fill(np.float64))
+                output = masked_values(output, default_fill(np.float64))
             else:
-                output = tuple(ma.masked_values(arr, default_fill(np.float64))
+                output = tuple(masked_values(arr, default_fill(np.float64))
                                for arr in output)
 
         return output
@@ -235,6 +341,31 @@ def left_iteration(ref_var_expected_dims,
     return func_wrapper
 
 
+def _has_outview(wrapped, outkeys, args, kwargs):
+    """Return True if any of the *outkeys* output views were supplied.
+
+    The output views are almost always passed by keyword, so the argument
+    positions are only looked up when there are enough positional arguments
+    to reach them.
+
+    """
+    if version_info < (3, ):
+        outvals = from_args(wrapped, outkeys, *args, **kwargs)
+        return any(val is not None for val in outvals.values())
+
+    argspec = _get_argspec(wrapped)
+    nargs = len(args)
+    for outkey in outkeys:
+        if kwargs.get(outkey) is not None:
+            return True
+
+        idx = argspec.index.get(outkey)
+        if idx is not None and idx < nargs and args[idx] is not None:
+            return True
+
+    return False
+
+
 def cast_type(ref_idx=0, arg_idxs=None, karg_names=None,
               alg_dtype=np.float64, outviews="outview"):
     """A decorator to handle type casting.
@@ -278,36 +409,45 @@ def cast_type(ref_idx=0, arg_idxs=None, karg_names=None,
 
         # Handle output views if applicable
         _outkeys = [outviews] if isstr(outviews) else outviews
-        _outviews = from_args(wrapped, _outkeys, *args, **kwargs)
-
-        has_outview = False
-        for outkey in _outkeys:
-            _outview = _outviews[outkey]
-            if _outview is not None:
-                has_outview = True
+        has_outview = _has_outview(wrapped, _outkeys, args, kwargs)
 
         orig_type = args[ref_idx].dtype
 
-        new_args = [arg.astype(alg_dtype)
-                    if i in _arg_idxs else arg
-                    for i, arg in enumerate(args)]
+        with profile_stage("cast_type") as stage:
+            if planning():
+                new_args, new_kargs = plan_cast(args, kwargs, _arg_idxs,
+                                                _karg_names, alg_dtype)
+            else:
+                new_args = [arg.astype(alg_dtype)
+                            if i in _arg_idxs else arg
+                            for i, arg in enumerate(args)]
 
-        new_kargs = {key: (val.astype(alg_dtype)
-                           if key in _karg_names else val)
-                     for key, val in viewitems(kwargs)}
+                new_kargs = {key: (val.astype(alg_dtype)
+                                   if key in _karg_names else val)
+                             for key, val in viewitems(kwargs)}
 
-        result = wrapped(*new_args, **new_kargs)
+            if profiling_enabled():
+                stage.add_bytes(
+                    alloc=sum(nbytes(new_args[i]) for i in _arg_idxs
+                              if i < len(new_args)) +
+                    sum(nbytes(new_kargs[key]) for key in _karg_names
+                        if key in new_kargs))
 
-        # Do nothing for supplied output views
-        if not has_outview:
-            if isinstance(result, np.ndarray):
-                if result.dtype == orig_type:
-                    return result
-                return result.astype(orig_type)
-            elif isinstance(result, Iterable):  # got back a sequence of arrays
-                return tuple(arr.astype(orig_type)
-                             if arr.dtype != orig_type else arr
-                             for arr in result)
+            result = wrapped(*new_args, **new_kargs)
+
+            # Do nothing for supplied output views
+            if not has_outview:
+                if isinstance(result, np.ndarray):
+                    if result.dtype == orig_type:
+                        return result
+                    stage.add_bytes(alloc=result.nbytes)
+                    return result.astype(orig_type)
+                elif isinstance(result, Iterable):  # a sequence of arrays
+                    stage.add_bytes(alloc=sum(arr.nbytes for arr in result
+                                              if arr.dtype != orig_type))
+                    return tuple(arr.astype(orig_type)
+                                 if arr.dtype != orig_type else arr
+                                 for arr in result)
 
         return result
 
@@ -337,14 +477,15 @@ def _extract_and_transpose(arg, do_transpose):
 
     """
 
-    if xarray_enabled():
-        if isinstance(arg, DataArray):
-            arg = to_np(arg)
+    # Fast path for arrays, which skips the xarray check
+    if not isinstance(arg, np.ndarray):
+        if not xarray_enabled() or not isinstance(arg, DataArray):
+            return arg
+        arg = to_np(arg)
 
     if do_transpose:
-        if isinstance(arg, np.ndarray):
-            if not arg.flags.f_contiguous and arg.ndim > 1:
-                return arg.T
+        if not arg.flags.f_contiguous and arg.ndim > 1:
+            return arg.T
 
     return arg
 
@@ -376,31 +517,33 @@ def extract_and_transpose(do_transpose=True, outviews="outview"):
 
         # Handle output views if applicable
         _outkeys = [outviews] if isstr(outviews) else outviews
-        _outviews = from_args(wrapped, _outkeys, *args, **kwargs)
-
-        has_outview = False
-        for outkey in _outkeys:
-            _outview = _outviews[outkey]
-            if _outview is not None:
-                has_outview = True
+        has_outview = _has_outview(wrapped, _outkeys, args, kwargs)
 
-        new_args = [_extract_and_transpose(arg, do_transpose) for arg in args]
+        with profile_stage("extract_and_transpose"):
+            new_args = [_extract_and_transpose(arg, do_transpose)
+                        for arg in args]
 
-        new_kargs = {key: _extract_and_transpose(val, do_transpose)
-                     for key, val in viewitems(kwargs)}
+            new_kargs = {key: _extract_and_transpose(val, do_transpose)
+                         for key, val in viewitems(kwargs)}
 
-        result = wrapped(*new_args, **new_kargs)
+            kernel = wrapped.__name__
+            if planning():
+                result = plan_kernel(wrapped, new_args, new_kargs, _outkeys)
+            else:
+                with kernel_omp_settings(kernel, new_args):
+                    with profile_stage("kernel:" + kernel, "kernel"):
+                        result = wrapped(*new_args, **new_kargs)
 
-        # Do nothing for supplied output views
-        if has_outview:
-            return result
+            # Do nothing for supplied output views
+            if has_outview:
+                return result
 
-        if isinstance(result, np.ndarray):
-            if result.flags.f_contiguous and result.ndim > 1:
-                return result.T
-        elif isinstance(result, Iterable):
-            return tuple(x.T if x.flags.f_contiguous and x.ndim > 1 else x
-                         for x in result)
+            if isinstance(result, np.ndarray):
+                if result.flags.f_contiguous and result.ndim > 1:
+                    return result.T
+            elif isinstance(result, Iterable):
+                return tuple(x.T if x.flags.f_contiguous and x.ndim > 1 else x
+                             for x in result)
 
         return result
 
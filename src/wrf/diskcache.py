@@ -0,0 +1,340 @@
+from __future__ import (absolute_import, division, print_function)
+
+import os
+import hashlib
+import tempfile
+from threading import Lock
+from collections import OrderedDict
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+import numpy as np
+import numpy.ma as ma
+
+from .config import xarray_enabled
+from .util import is_multi_file, is_mapping, get_iterable
+from .py3compat import viewitems
+from .version import __version__
+
+try:
+    from xarray import DataArray
+except ImportError:
+    pass
+
+# Unlike the threadlocal cache, the disk cache settings are shared by all
+# threads since the cache directory itself is shared.
+_disk_config = {"path": None, "max_bytes": 0}
+_disk_lock = Lock()
+
+# os.replace also overwrites an existing entry atomically on Windows
+_replace = getattr(os, "replace", os.rename)
+
+_DATA_EXT = ".npy"
+_MASK_EXT = ".mask.npy"
+_META_EXT = ".pkl"
+
+
+def enable_disk_cache(path=None, max_bytes=2**30):
+    """Enable the persistent disk cache for :meth:`wrf.getvar`.
+
+    When enabled, diagnostic results computed by :meth:`wrf.getvar` are
+    written to *path* and reused by later calls (including calls from
+    other processes) that request the same product from the same
+    unmodified files.  Files are identified by their path, size, and
+    modification time, so changing a file invalidates its entries.
+
+    Cached arrays are memory-mapped when read back (copy-on-write), so
+    only the portions of a result that are accessed are read from disk.
+
+    Args:
+
+        path (:obj:`str`, optional): The cache directory.  It is created
+            if it does not exist.  Default is None, which uses
+            '~/.cache/wrf-python'.
+
+        max_bytes (:obj:`int`, optional): The maximum size of the cache
+            directory in bytes.  When exceeded, the least recently used
+            results are removed.  Default is 1 GiB.
+
+    Returns:
+
+        None
+
+    """
+    if path is None:
+        path = os.path.join(os.path.expanduser("~"), ".cache", "wrf-python")
+
+    path = os.path.abspath(path)
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    _disk_config["path"] = path
+    _disk_config["max_bytes"] = int(max_bytes)
+
+
+def disable_disk_cache():
+    """Disable the persistent disk cache.
+
+    Existing cache files are left in place.  Use :meth:`clear_disk_cache`
+    to remove them.
+
+    Returns:
+
+        None
+
+    """
+    _disk_config["path"] = None
+
+
+def disk_cache_enabled():
+    """Return True if the persistent disk cache is enabled.
+
+    Returns:
+
+        :obj:`bool`: True if the disk cache is enabled.
+
+    """
+    return _disk_config["path"] is not None
+
+
+def clear_disk_cache():
+    """Remove all results from the persistent disk cache.
+
+    Returns:
+
+        None
+
+    """
+    with _disk_lock:
+        for key in _list_keys():
+            _remove_entry(key)
+
+
+def _file_identity(wrfnc):
+    """Return a (path, size, mtime) tuple for a NetCDF file object, or None
+    if the object is not backed by a file on disk."""
+    try:
+        path = wrfnc.filepath()
+    except AttributeError:
+        try:
+            path = wrfnc.file.path
+        except AttributeError:
+            return None
+    except ValueError:
+        # netCDF4 raises ValueError when the path is unavailable
+        return None
+
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return None
+
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime)
+
+
+def _input_identity(wrfin):
+    """Return a hashable identity for a file, sequence, or mapping of
+    files, or None if any file cannot be identified."""
+    if not is_multi_file(wrfin):
+        return _file_identity(wrfin)
+
+    if is_mapping(wrfin):
+        items = []
+        for key, val in sorted(viewitems(wrfin), key=lambda item: item[0]):
+            ident = _input_identity(val)
+            if ident is None:
+                return None
+            items.append((key, ident))
+        return ("mapping",) + tuple(items)
+
+    idents = []
+    for wrfnc in get_iterable(wrfin):
+        ident = _input_identity(wrfnc)
+        if ident is None:
+            return None
+        idents.append(ident)
+
+    return tuple(idents)
+
+
+def disk_cache_key(wrfin, varname, timeidx, method, squeeze, meta, kwargs):
+    """Return the disk cache key for a :meth:`wrf.getvar` request.
+
+    Returns None if the disk cache is disabled or if the input files cannot
+    be identified on disk.
+
+    """
+    if not disk_cache_enabled():
+        return None
+
+    ident = _input_identity(wrfin)
+    if ident is None:
+        return None
+
+    meta = meta and xarray_enabled()
+    request = (__version__, ident, varname, timeidx, method.lower(),
+               bool(squeeze), bool(meta),
+               tuple(sorted((key, repr(val))
+                            for key, val in viewitems(kwargs))))
+
+    return hashlib.sha1(repr(request).encode("utf-8")).hexdigest()
+
+
+def _entry_path(key, ext):
+    return os.path.join(_disk_config["path"], key + ext)
+
+
+def _list_keys():
+    path = _disk_config["path"]
+    if path is None:
+        return []
+
+    return [name[:-len(_META_EXT)] for name in os.listdir(path)
+            if name.endswith(_META_EXT)]
+
+
+def _remove_entry(key):
+    # The metadata file marks a complete entry, so remove it first
+    for ext in (_META_EXT, _DATA_EXT, _MASK_EXT):
+        try:
+            os.remove(_entry_path(key, ext))
+        except OSError:
+            pass
+
+
+def _entry_size(key):
+    size = 0
+    for ext in (_META_EXT, _DATA_EXT, _MASK_EXT):
+        try:
+            size += os.path.getsize(_entry_path(key, ext))
+        except OSError:
+            pass
+
+    return size
+
+
+def _evict():
+    """Remove the least recently used entries until the cache is within
+    its byte budget."""
+    entries = []
+    total = 0
+    for key in _list_keys():
+        try:
+            atime = os.path.getmtime(_entry_path(key, _META_EXT))
+        except OSError:
+            continue
+        size = _entry_size(key)
+        total += size
+        entries.append((atime, size, key))
+
+    entries.sort()
+    for _, size, key in entries:
+        if total <= _disk_config["max_bytes"]:
+            break
+        _remove_entry(key)
+        total -= size
+
+
+def _atomic_save(path, writer):
+    # Each save gets its own temporary file, so threads storing the same
+    # entry never write to the same file
+    fd, tmp = tempfile.mkstemp(suffix=".tmp",
+                               prefix=os.path.basename(path) + ".",
+                               dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            writer(f)
+        _replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def store_disk_cache(key, result):
+    """Store a :meth:`wrf.getvar` result in the disk cache.
+
+    Results that cannot be stored (for example, object arrays) are
+    silently skipped.
+
+    """
+    if key is None or not disk_cache_enabled():
+        return
+
+    info = {}
+    if xarray_enabled() and isinstance(result, DataArray):
+        data = result.values
+        info["name"] = result.name
+        info["dims"] = result.dims
+        info["attrs"] = result.attrs
+        info["coords"] = [(name, coord.dims, coord.values, coord.attrs)
+                          for name, coord in viewitems(result.coords)]
+    else:
+        data = result
+
+    if not isinstance(data, np.ndarray) or data.dtype.hasobject:
+        return
+
+    mask = None
+    if isinstance(data, ma.MaskedArray):
+        info["fill_value"] = data.fill_value
+        mask = ma.getmaskarray(data)
+        data = data.data
+
+    try:
+        _atomic_save(_entry_path(key, _DATA_EXT),
+                     lambda f: np.save(f, np.ascontiguousarray(data)))
+        if mask is not None:
+            _atomic_save(_entry_path(key, _MASK_EXT),
+                         lambda f: np.save(f, mask))
+        _atomic_save(_entry_path(key, _META_EXT),
+                     lambda f: pickle.dump(info, f,
+                                           pickle.HIGHEST_PROTOCOL))
+    except (IOError, OSError, pickle.PicklingError, TypeError,
+            AttributeError):
+        _remove_entry(key)
+        return
+
+    with _disk_lock:
+        _evict()
+
+
+def load_disk_cache(key):
+    """Return a :meth:`wrf.getvar` result from the disk cache, or None if
+    the result is not in the cache."""
+    if key is None or not disk_cache_enabled():
+        return None
+
+    metapath = _entry_path(key, _META_EXT)
+    try:
+        with open(metapath, "rb") as f:
+            info = pickle.load(f)
+
+        data = np.load(_entry_path(key, _DATA_EXT), mmap_mode="c")
+
+        if "fill_value" in info:
+            mask = np.load(_entry_path(key, _MASK_EXT))
+            data = ma.masked_array(data, mask=mask,
+                                   fill_value=info["fill_value"])
+
+        # Mark the entry as recently used for the LRU eviction
+        os.utime(metapath, None)
+    except (IOError, OSError, EOFError, ValueError, pickle.UnpicklingError):
+        return None
+
+    if "dims" not in info:
+        return data
+
+    if not xarray_enabled():
+        return None
+
+    coords = OrderedDict((name, (dims, values, attrs))
+                         for name, dims, values, attrs in info["coords"])
+
+    return DataArray(data, name=info["name"], dims=info["dims"],
+                     coords=coords, attrs=info["attrs"])
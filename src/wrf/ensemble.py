@@ -0,0 +1,468 @@
+from __future__ import (absolute_import, division, print_function)
+
+import re
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import numpy.ma as ma
+
+from .config import xarray_enabled
+from .routines import getvar
+from .util import is_mapping, is_multi_file, to_np
+from .py3compat import viewvalues, py3range, isstr
+
+_SIMPLE_STATS = ("mean", "std", "min", "max")
+_PROB_STAT = re.compile(r"^prob(>=|<=|>|<)(.+)$")
+_PERCENTILE_STAT = re.compile(r"^p(\d+(?:\.\d*)?)$")
+_PROB_OPS = {">": np.greater, ">=": np.greater_equal, "<": np.less,
+             "<=": np.less_equal}
+
+
+def _parse_stat(stat):
+    """Return the (kind, argument) pair for an ensemble statistic name.
+
+    Raises:
+
+        :class:`ValueError`: Raised when the statistic is not recognized.
+
+    """
+    if stat in _SIMPLE_STATS:
+        return stat, None
+
+    match = _PROB_STAT.match(stat)
+    if match is not None:
+        try:
+            threshold = float(match.group(2))
+        except ValueError:
+            raise ValueError("'{}' has an invalid threshold".format(stat))
+        return "prob", (match.group(1), threshold)
+
+    match = _PERCENTILE_STAT.match(stat)
+    if match is not None:
+        q = float(match.group(1))
+        if q > 100.:
+            raise ValueError("'{}' is not between 0 and 100".format(stat))
+        return "percentile", q
+
+    raise ValueError("'{}' is not a valid ensemble statistic".format(stat))
+
+
+def _neighborhood(exceed, radius):
+    """Return True where any point within *radius* grid points exceeds.
+
+    The neighborhood is a disc over the two rightmost dimensions.  Each row
+    of the disc is a horizontal run, so the runs are found with a
+    cumulative sum along the rows and the result takes O(*radius*) passes
+    instead of one pass per point in the disc.
+
+    """
+    if radius == 0:
+        return exceed
+
+    nx = exceed.shape[-1]
+    ny = exceed.shape[-2]
+    counts = np.zeros(exceed.shape[:-1] + (nx + 1,), np.int32)
+    np.cumsum(exceed, axis=-1, out=counts[..., 1:])
+    cols = np.arange(nx)
+
+    result = np.zeros(exceed.shape, bool)
+    for dy in py3range(0, radius + 1):
+        width = int(np.sqrt(radius*radius - dy*dy))
+        lower = np.clip(cols - width, 0, nx)
+        upper = np.clip(cols + width + 1, 0, nx)
+        runs = (counts[..., upper] - counts[..., lower]) > 0
+
+        for shift in set((dy, -dy)):
+            if abs(shift) >= ny:
+                continue
+            if shift >= 0:
+                result[..., shift:, :] |= runs[..., 0:ny-shift, :]
+            else:
+                result[..., 0:ny+shift, :] |= runs[..., -shift:, :]
+
+    return result
+
+
+class _EnsembleStats(object):
+    """The running accumulators used by :meth:`ens_getvar`.
+
+    Members are folded one at a time, so only the current member and the
+    running state are held in memory.  The mean and standard deviation
+    use Welford's update.  A percentile needs the two order statistics
+    around its rank, so only the smallest or largest members (whichever
+    side is closer to the rank) are kept in a sorted buffer.  The buffer
+    holds at most about half of the members, for the median, and only a
+    few members for the tail percentiles.
+
+    The result is masked wherever any member is masked.
+
+    """
+    def __init__(self, stats, nmembers, radius=0):
+        self.stats = [(stat, ) + _parse_stat(stat) for stat in stats]
+        self.nmembers = nmembers
+        self.radius = radius
+        self.count = 0
+        self.mask = ma.nomask
+        self.mean = None
+        self.m2 = None
+        self.min = None
+        self.max = None
+        self.probs = OrderedDict()
+
+        # Percentile -> (position, lower rank, upper rank)
+        self.ranks = OrderedDict()
+        self.nlow = 0
+        self.nhigh = 0
+        for stat, kind, arg in self.stats:
+            if kind != "percentile":
+                continue
+            pos = (nmembers - 1) * arg / 100.
+            lower = int(np.floor(pos))
+            upper = min(lower + 1, nmembers - 1)
+            self.ranks[stat] = (pos, lower, upper)
+            if upper + 1 <= nmembers - lower:
+                self.nlow = max(self.nlow, upper + 1)
+            else:
+                self.nhigh = max(self.nhigh, nmembers - lower)
+        self.low = None
+        self.high = None
+
+    def _insert(self, buf, field, keep):
+        """Insert *field* into the sorted *buf*, dropping the value that
+        *keep* (:func:`numpy.minimum` or :func:`numpy.maximum`) rejects."""
+        carry = field.copy()
+        kept = np.empty_like(carry)
+        for row in buf:
+            keep(row, carry, out=kept)
+            if keep is np.minimum:
+                np.maximum(row, carry, out=carry)
+            else:
+                np.minimum(row, carry, out=carry)
+            row[...] = kept
+
+    def update(self, field):
+        mask = ma.getmask(field)
+        if mask is not ma.nomask:
+            if self.mask is ma.nomask:
+                self.mask = mask.copy()
+            else:
+                self.mask |= mask
+
+        data = np.asarray(ma.filled(field, 0), np.float64)
+        self.count += 1
+
+        if self.count == 1:
+            shape = data.shape
+            self.mean = np.zeros(shape, np.float64)
+            self.m2 = np.zeros(shape, np.float64)
+            self.min = ma.getdata(field).copy()
+            self.max = ma.getdata(field).copy()
+            if self.nlow:
+                self.low = np.full((self.nlow, ) + shape, np.inf)
+            if self.nhigh:
+                self.high = np.full((self.nhigh, ) + shape, -np.inf)
+        else:
+            np.minimum(self.min, ma.getdata(field), out=self.min)
+            np.maximum(self.max, ma.getdata(field), out=self.max)
+
+        delta = data - self.mean
+        self.mean += delta / self.count
+        delta *= data - self.mean
+        self.m2 += delta
+
+        for stat, kind, arg in self.stats:
+            if kind != "prob":
+                continue
+            op, threshold = arg
+            exceed = ma.filled(_PROB_OPS[op](field, threshold), False)
+            exceed = _neighborhood(np.asarray(exceed, bool), self.radius)
+            if stat not in self.probs:
+                self.probs[stat] = np.zeros(data.shape, np.int32)
+            self.probs[stat] += exceed
+
+        if self.low is not None:
+            self._insert(self.low, data, np.minimum)
+        if self.high is not None:
+            self._insert(self.high, data, np.maximum)
+
+    def _order_stat(self, rank):
+        if rank < self.nlow:
+            return self.low[rank]
+        return self.high[self.nmembers - 1 - rank]
+
+    def results(self):
+        if self.count != self.nmembers:
+            raise ValueError("expected {} members, got {}".format(
+                self.nmembers, self.count))
+
+        results = OrderedDict()
+        for stat, kind, arg in self.stats:
+            if kind == "mean":
+                result = self.mean
+            elif kind == "std":
+                result = np.sqrt(self.m2 / self.count)
+            elif kind == "min":
+                result = self.min
+            elif kind == "max":
+                result = self.max
+            elif kind == "prob":
+                result = self.probs[stat] / float(self.count)
+            else:
+                pos, lower, upper = self.ranks[stat]
+                below = self._order_stat(lower)
+                above = self._order_stat(upper)
+                result = below + (pos - lower) * (above - below)
+
+            if self.mask is not ma.nomask and self.mask.any():
+                result = ma.masked_array(result, mask=self.mask)
+
+            results[stat] = result
+
+        return results
+
+
+def _is_path_member(member):
+    """Return True if the ensemble member is a path or sequence of paths."""
+    if isstr(member):
+        return True
+
+    return (is_multi_file(member) and not is_mapping(member) and
+            all(isstr(path) for path in member))
+
+
+@contextmanager
+def _open_member(member):
+    """Return a context manager that opens an ensemble member given as
+    file paths with :class:`netCDF4.Dataset`, and closes it afterwards."""
+    if not _is_path_member(member):
+        yield member
+        return
+
+    from netCDF4 import Dataset
+
+    paths = [member] if isstr(member) else list(member)
+    files = []
+    try:
+        for path in paths:
+            files.append(Dataset(path))
+        yield files[0] if isstr(member) else files
+    finally:
+        for wrfnc in files:
+            wrfnc.close()
+
+
+def _member_var(member, varname, timeidx, method, squeeze, meta, kwargs):
+    """Return the diagnostic for one ensemble member.
+
+    This is run in the worker processes when :meth:`ens_getvar` is called
+    with *processes*.
+
+    """
+    with _open_member(member) as wrfin:
+        var = getvar(wrfin, varname, timeidx, method, squeeze, meta=meta,
+                     **kwargs)
+
+    return var
+
+
+def _iter_members(members, varname, timeidx, method, squeeze, meta,
+                  processes, kwargs):
+    """Yield the diagnostic for each member in order.
+
+    Only the first member is returned with metadata.  With *processes*,
+    at most *processes* members are computed or waiting at a time.
+
+    """
+    if processes is None or processes <= 1:
+        for i, member in enumerate(members):
+            yield _member_var(member, varname, timeidx, method, squeeze,
+                              meta and i == 0, kwargs)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+
+    # The OpenMP runtime cannot be used in a forked child once the parent
+    # has started its threads
+    with ProcessPoolExecutor(max_workers=processes,
+                             mp_context=get_context("spawn")) as executor:
+        pending = deque()
+        for i, member in enumerate(members):
+            pending.append(executor.submit(_member_var, member, varname,
+                                           timeidx, method, squeeze,
+                                           meta and i == 0, kwargs))
+            if len(pending) == processes:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+def _ens_meta(template, result, stat, kind, nmembers, radius):
+    """Return a :class:`xarray.DataArray` for an ensemble statistic.
+
+    The dimensions, coordinates, and attributes are taken from the
+    *template* :class:`xarray.DataArray` produced by :meth:`getvar` for the
+    first member.
+
+    """
+    from xarray import DataArray
+
+    attrs = OrderedDict(template.attrs)
+    attrs.pop("_FillValue", None)
+    attrs.pop("missing_value", None)
+    attrs["ensemble_statistic"] = stat
+    attrs["ensemble_size"] = nmembers
+    if kind == "prob":
+        attrs["units"] = ""
+        attrs["neighborhood_radius"] = radius
+
+    if isinstance(result, ma.MaskedArray):
+        attrs["_FillValue"] = result.fill_value
+        attrs["missing_value"] = result.fill_value
+
+    name = template.name
+    if name is not None:
+        name = "{}_{}".format(name, stat)
+
+    return DataArray(result, name=name, dims=template.dims,
+                     coords=template.coords, attrs=attrs)
+
+
+def ens_getvar(members, varname, timeidx=0,
+               stats=("mean", "std", "min", "max"), radius=0,
+               method="cat", squeeze=True, meta=True, processes=None,
+               **kwargs):
+    """Return ensemble statistics for a diagnostic.
+
+    The diagnostic is computed for one member at a time with
+    :meth:`getvar` and folded into running accumulators, so the members
+    are never joined into a single array.  This is useful for products
+    like the ensemble mean and spread, exceedance probabilities, and
+    percentiles from large ensembles.
+
+    Args:
+
+        members (sequence or mapping): The ensemble members.  Each member
+            is any input accepted by :meth:`getvar` (a
+            :class:`netCDF4.Dataset`, :class:`Nio.NioFile`, or a sequence
+            of these), or a file path or sequence of file paths, which
+            are opened with :class:`netCDF4.Dataset` and closed once the
+            diagnostic is computed.  If a mapping is used, the values are
+            the members.
+
+        varname (:obj:`str`) : The variable name.  See :meth:`getvar` for
+            the available diagnostics.
+
+        timeidx (:obj:`int` or :data:`wrf.ALL_TIMES`, optional): The
+            desired time index for each member.  Default is 0.
+
+        stats (sequence of :obj:`str`, optional): The statistics to
+            compute.  Each must be one of 'mean', 'std' (the population
+            standard deviation), 'min', 'max', a probability such as
+            'prob>40' or 'prob<=0' (the fraction of members beyond the
+            threshold, in the units of the diagnostic), or a percentile
+            such as 'p10' or 'p90' (using linear interpolation, as in
+            :func:`numpy.percentile`).  Default is ('mean', 'std', 'min',
+            'max').
+
+        radius (:obj:`int`, optional): The neighborhood radius in grid
+            points for the probabilities.  When greater than 0, a member
+            counts at a point if it is beyond the threshold anywhere
+            within *radius* points along the two rightmost dimensions,
+            which gives the neighborhood maximum ensemble probability.
+            Default is 0.
+
+        method (:obj:`str`, optional): The aggregation method to use for
+            members that are sequences of files.  See :meth:`getvar`.
+            Default is 'cat'.
+
+        squeeze (:obj:`bool`, optional): Set to False to prevent dimensions
+            with a size of 1 from being automatically removed from the
+            shape of the output.  Default is True.
+
+        meta (:obj:`bool`, optional): Set to False to disable metadata and
+            return :class:`numpy.ndarray` instead of
+            :class:`xarray.DataArray`.  Default is True.
+
+        processes (:obj:`int`, optional): The number of worker processes
+            used to compute the members.  The members must be file paths,
+            since open files cannot be sent to other processes.  The
+            members are still folded in order, with at most *processes*
+            members in flight.  The workers are spawned, so a script that
+            uses this must guard its entry point with
+            ``if __name__ == "__main__":``.  Default is None, which
+            computes the members in the calling process.
+
+        **kwargs: Optional keyword arguments for the diagnostic.
+            See :meth:`getvar`.
+
+    Returns:
+
+        :obj:`dict`: A mapping of statistic name to the statistic.  If
+        xarray is enabled and the *meta* parameter is True, then each
+        statistic is a :class:`xarray.DataArray` object with the metadata
+        from :meth:`getvar`.  Otherwise, each statistic is a
+        :class:`numpy.ndarray` object with no metadata.  A statistic is
+        masked wherever any member is masked.
+
+    Raises:
+
+        :class:`ValueError`: Raised when an invalid statistic, radius, or
+            member is passed to the routine.
+
+    Examples:
+
+        .. code-block:: python
+
+            from wrf import ens_getvar
+
+            members = ["mem{:02d}/wrfout_d01_2010-06-13_21:00:00".format(i)
+                       for i in range(1, 31)]
+
+            # Mean, spread and 90th percentile of the sea level pressure
+            slp = ens_getvar(members, "slp", stats=("mean", "std", "p90"))
+
+            # Probability of reflectivity above 40 dBZ within 5 points
+            mdbz = ens_getvar(members, "mdbz", stats=("prob>40", ),
+                              radius=5, processes=4)
+
+    """
+    if is_mapping(members):
+        members = list(viewvalues(members))
+    else:
+        members = list(members)
+
+    if not members:
+        raise ValueError("no ensemble members were supplied")
+
+    if isstr(stats):
+        stats = (stats, )
+
+    if int(radius) < 0:
+        raise ValueError("'radius' must be a non-negative integer")
+
+    if processes is not None and processes > 1:
+        if not all(_is_path_member(member) for member in members):
+            raise ValueError("the members must be file paths when "
+                             "'processes' is used")
+
+    accum = _EnsembleStats(stats, len(members), int(radius))
+
+    do_meta = meta and xarray_enabled()
+    template = None
+    for var in _iter_members(members, varname, timeidx, method, squeeze,
+                             do_meta, processes, kwargs):
+        if do_meta and template is None:
+            template = var
+
+        accum.update(to_np(var))
+
+    results = accum.results()
+    if not do_meta:
+        return results
+
+    return OrderedDict((stat, _ens_meta(template, results[stat], stat,
+                                        kind, len(members), int(radius)))
+                       for stat, kind, _ in accum.stats)
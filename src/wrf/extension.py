@@ -4,15 +4,21 @@ import numpy as np
 
 from .constants import Constants, default_fill
 
-from wrf._wrffortran import (dcomputetk, dinterp3dz, dinterp2dxy, dinterp1d,
-                             dcomputeseaprs, dfilter2d, dcomputerh,
+from wrf._wrffortran import (dcomputetk, dfullprs, fullprs, dfulltheta,
+                             fulltheta, dgeopthgt, geopthgt, dinterp3dz,
+                             dinterp2dxy, dinterp1d,
+                             dcomputeseaprs, dfilter2d_batch, dcomputerh,
                              dcomputeuvmet, dcomputetd, dcapecalc2d,
-                             dcapecalc3d, dcloudfrac2, wrfcttcalc, calcdbz,
-                             dcalrelhl, dcalcuh, dcomputepv, dcomputeabsvort,
+                             dcapecalc3d, dcapeparcels, dcloudfrac2,
+                             wrfcttcalc, calcdbz,
+                             dcalrelhl, dcalcuh, dcalrelhl_layers,
+                             dcalcuh_layers, dcomputepv, dcomputeabsvort,
                              dlltoij, dijtoll, deqthecalc, omgcalc,
                              virtual_temp, wetbulbcalc, dcomputepw,
                              wrf_monotonic, wrf_vintrp, dcomputewspd,
                              dcomputewdir, dinterp3dz_2dlev,
+                             dinterp3dz_weights, dinterp3dz_2dlev_weights,
+                             dinterp3dz_apply, duvmetrotation, duvmetrotate,
                              fomp_set_num_threads, fomp_get_num_threads,
                              fomp_get_max_threads, fomp_get_thread_num,
                              fomp_get_num_procs, fomp_in_parallel,
@@ -33,10 +39,13 @@ from wrf._wrffortran import (dcomputetk, dinterp3dz, dinterp2dxy, dinterp1d,
 from .decorators import (left_iteration, cast_type,
                          extract_and_transpose, check_args)
 from .util import combine_dims, npbytes_to_str, psafilepath
+from .workspace import scratch
 from .py3compat import py3range
 from .specialdec import (uvmet_left_iter, cape_left_iter,
                          cloudfrac_left_iter, check_cape_args,
-                         interplevel_left_iter, check_interplevel_args)
+                         interplevel_left_iter, check_interplevel_args,
+                         interpz3d_weights_left_iter,
+                         uvmet_rotate_left_iter, smooth2d_left_iter)
 
 
 class DiagnosticError(Exception):
@@ -119,6 +128,64 @@ def _interpz3d_lev2d(field3d, z, lev2d, missingval, outview=None):
     return result
 
 
+@interpz3d_weights_left_iter(is2dlev=False)
+@cast_type(arg_idxs=(0, 1), outviews=("k1view", "k2view", "wview"))
+@extract_and_transpose(outviews=("k1view", "k2view", "wview"))
+def _interpz3d_weights(z, desiredloc, k1view=None, k2view=None, wview=None):
+    """Wrapper for dinterp3dz_weights.
+
+    Located in wrf_user.f90.
+
+    """
+    result = dinterp3dz_weights(z,
+                                desiredloc,
+                                k1view,
+                                k2view,
+                                wview)
+    return result
+
+
+@interpz3d_weights_left_iter(is2dlev=True)
+@cast_type(arg_idxs=(0, 1), outviews=("k1view", "k2view", "wview"))
+@extract_and_transpose(outviews=("k1view", "k2view", "wview"))
+def _interpz3d_lev2d_weights(z, lev2d, k1view=None, k2view=None,
+                             wview=None):
+    """Wrapper for dinterp3dz_2dlev_weights.
+
+    Located in wrf_user.f90.
+
+    """
+    result = dinterp3dz_2dlev_weights(z,
+                                      lev2d,
+                                      k1view,
+                                      k2view,
+                                      wview)
+    return result
+
+
+@left_iteration(3, combine_dims([(3, (-3, )), (0, (-2, -1))]),
+                ref_var_idx=0, ignore_args=(4, ))
+@cast_type(arg_idxs=(0, 3))
+@extract_and_transpose()
+def _interpz3d_apply(field3d, k1, k2, weights, missingval, outview=None):
+    """Wrapper for dinterp3dz_apply.
+
+    Located in wrf_user.f90.
+
+    """
+    if outview is None:
+        outshape = field3d.shape[0:2] + weights.shape[2:]
+        outview = np.empty(outshape, np.float64, order="F")
+
+    result = dinterp3dz_apply(field3d,
+                              outview,
+                              k1,
+                              k2,
+                              weights,
+                              missingval)
+    return result
+
+
 @check_args(0, 3, (3, ))
 @left_iteration(3, combine_dims([(0, -3), (1, -2)]), ref_var_idx=0,
                 ignore_args=(1, ))
@@ -252,6 +319,123 @@ def _slp(z, t, p, q, outview=None):
     return result
 
 
+def _fused_kernel(kernel32, kernel64, *arrays):
+    """Return the kernel and input arrays for a fused arithmetic kernel.
+
+    The single precision kernel is used when all of the arrays are single
+    precision, so the result is the same as the numpy arithmetic on the
+    NetCDF variables.  Otherwise, the arrays are cast to double precision.
+    Masked arrays are replaced by their data, since the kernels ignore the
+    mask.
+
+    """
+    arrays = tuple(np.ma.getdata(arr) for arr in arrays)
+    if all(arr.dtype == np.float32 for arr in arrays):
+        return kernel32, arrays
+
+    return kernel64, tuple(arr.astype(np.float64) for arr in arrays)
+
+
+def _fused_mask(result, arrays, destag=False):
+    """Return the fused kernel result as a masked array when any of the
+    input arrays is masked.
+
+    The mask is the union of the input masks, destaggered along the third
+    Fortran ordered dimension if *destag* is True.
+
+    """
+    if not any(isinstance(arr, np.ma.MaskedArray) for arr in arrays):
+        return result
+
+    mask = np.ma.nomask
+    for arr in arrays:
+        mask = np.ma.mask_or(mask, np.ma.getmask(arr))
+
+    if destag and mask is not np.ma.nomask:
+        mask = mask[:, :, 0:-1] | mask[:, :, 1:]
+
+    return np.ma.masked_array(result, mask=mask)
+
+
+@extract_and_transpose()
+def _full_pressure(p, pb, scale=1.0, outview=None):
+    """Wrapper for dfullprs and fullprs.
+
+    Located in wrf_user.f90.
+
+    Returns (p + pb) * scale without any intermediate arrays.  The
+    *outview* can be *p* to compute the result in place.
+
+    """
+    # Raveled in Fortran order, since a sliced view may not be contiguous
+    shape = p.shape
+    kernel, (p_data, pb_data) = _fused_kernel(fullprs, dfullprs, p, pb)
+    if outview is None:
+        outview = np.empty(shape, p_data.dtype, order="F")
+    result = kernel(p_data.ravel(order="F"),
+                    pb_data.ravel(order="F"),
+                    scale,
+                    np.ma.getdata(outview).ravel(order="F"))
+    result = np.reshape(result, shape, order="F")
+
+    return _fused_mask(result, (p, pb))
+
+
+@extract_and_transpose()
+def _full_theta(t, outview=None):
+    """Wrapper for dfulltheta and fulltheta.
+
+    Located in wrf_user.f90.
+
+    Returns t + T_BASE.  The *outview* can be *t* to compute the result in
+    place.
+
+    """
+    # Raveled in Fortran order, since a sliced view may not be contiguous
+    shape = t.shape
+    kernel, (t_data, ) = _fused_kernel(fulltheta, dfulltheta, t)
+    if outview is None:
+        outview = np.empty(shape, t_data.dtype, order="F")
+    result = kernel(t_data.ravel(order="F"),
+                    Constants.T_BASE,
+                    np.ma.getdata(outview).ravel(order="F"))
+    result = np.reshape(result, shape, order="F")
+
+    return _fused_mask(result, (t, ))
+
+
+@check_args(0, 3, (3, 3))
+@extract_and_transpose()
+def _height_from_geopotential(ph, phb, destag=True, outview=None):
+    """Wrapper for dgeopthgt and geopthgt.
+
+    Located in wrf_user.f90.
+
+    Returns the height from the perturbation and base state geopotential,
+    destaggered to the mass levels when *destag* is True, without any
+    intermediate arrays.  The *outview* can be *ph* to compute the result
+    in place only when *destag* is False.
+
+    """
+    # The leftmost dimensions are combined, so any number can be used
+    nx, ny, nzs = ph.shape[0:3]
+    nz = nzs - 1 if destag else nzs
+    outshape = (nx, ny, nz) + ph.shape[3:]
+
+    kernel, (ph_data, phb_data) = _fused_kernel(geopthgt, dgeopthgt, ph, phb)
+    if outview is None:
+        outview = np.empty(outshape, ph_data.dtype, order="F")
+    result = kernel(ph_data.reshape((nx*ny, nzs, -1), order="F"),
+                    phb_data.reshape((nx*ny, nzs, -1), order="F"),
+                    Constants.G,
+                    1 if destag else 0,
+                    np.ma.getdata(outview).reshape((nx*ny, nz, -1),
+                                                   order="F"))
+    result = np.reshape(result, outshape, order="F")
+
+    return _fused_mask(result, (ph, phb), destag)
+
+
 @check_args(0, 3, (3, 3))
 @left_iteration(3, 3, ref_var_idx=0)
 @cast_type(arg_idxs=(0, 1))
@@ -440,6 +624,65 @@ def _uvmet(u, v, lat, lon, cen_long, cone, isstag=0, has_missing=False,
     return result
 
 
+@left_iteration(2, 2, ref_var_idx=0, insert_dims=(2,), ignore_args=(2, 3),
+                cast_output=False)
+@cast_type(arg_idxs=(0, 1))
+@extract_and_transpose()
+def _uvmet_rotation(lat, lon, cen_long, cone, outview=None):
+    """Wrapper for duvmetrotation.
+
+    Located in wrf_user.f90.
+
+    """
+    rpd = Constants.PI/180.
+
+    if outview is None:
+        outdims = lat.shape + (2,)
+        outview = np.empty(outdims, np.float64, order="F")
+
+    result = duvmetrotation(outview,
+                            lon,
+                            lat,
+                            cen_long,
+                            cone,
+                            rpd)
+
+    return result
+
+
+@uvmet_rotate_left_iter()
+@cast_type(arg_idxs=(0, 1, 2), outviews=("uview", "vview"))
+@extract_and_transpose(outviews=("uview", "vview"))
+def _uvmet_rotate(u, v, rot, wspd_wdir=False, has_missing=False,
+                  umissing=default_fill(np.float64),
+                  vmissing=default_fill(np.float64),
+                  uvmetmissing=default_fill(np.float64),
+                  uview=None, vview=None):
+    """Wrapper for duvmetrotate.
+
+    Located in wrf_user.f90.
+
+    """
+    if uview is None:
+        uview = np.empty(u.shape, np.float64, order="F")
+
+    if vview is None:
+        vview = np.empty(v.shape, np.float64, order="F")
+
+    result = duvmetrotate(u,
+                          v,
+                          rot,
+                          uview,
+                          vview,
+                          wspd_wdir,
+                          has_missing,
+                          umissing,
+                          vmissing,
+                          uvmetmissing)
+
+    return result
+
+
 @check_args(0, 3, (3, 3, 3, 3))
 @left_iteration(3, 3, ref_var_idx=0)
 @cast_type(arg_idxs=(0, 1, 2, 3))
@@ -513,10 +756,11 @@ def _wetbulb(p, tk, qv,  psafile=psafilepath(), outview=None):
 
 
 @check_args(0, 3, (3, 3, 3, 2, 2))
-@left_iteration(3, 2, ref_var_idx=0, ignore_args=(5, ))
+@left_iteration(3, 2, ref_var_idx=0, ignore_args=(5, ),
+                ignore_kargs=("bottom_up", ))
 @cast_type(arg_idxs=(0, 1, 2, 3, 4))
 @extract_and_transpose()
-def _srhel(u, v, z, ter, lats, top, outview=None):
+def _srhel(u, v, z, ter, lats, top, bottom_up=0, outview=None):
     """Wrapper for dcalrelhl.
 
     Located in wrf_relhl.f90.
@@ -531,7 +775,34 @@ def _srhel(u, v, z, ter, lats, top, outview=None):
                        ter,
                        lats,
                        top,
-                       outview)
+                       outview,
+                       bottom_up)
+
+    return result
+
+
+@check_args(0, 3, (3, 3, 3, 2, 2))
+@left_iteration(3, combine_dims([(5, (-1, )), (0, (-2, -1))]),
+                ref_var_idx=0, ignore_args=(5, ), ignore_kargs=("bottom_up", ))
+@cast_type(arg_idxs=(0, 1, 2, 3, 4, 5))
+@extract_and_transpose()
+def _srhel_layers(u, v, z, ter, lats, tops, bottom_up=0, outview=None):
+    """Wrapper for dcalrelhl_layers.
+
+    Located in wrf_relhl.f90.
+
+    """
+    if outview is None:
+        outview = np.empty(ter.shape + tops.shape, np.float64, order="F")
+
+    result = dcalrelhl_layers(u,
+                              v,
+                              z,
+                              ter,
+                              lats,
+                              tops,
+                              outview,
+                              bottom_up)
 
     return result
 
@@ -570,6 +841,42 @@ def _udhel(zstag, mapfct, u, v, wstag, dx, dy, bottom, top, outview=None):
     return result
 
 
+@check_args(2, 3, (3, 2, 3, 3, 3), stagger=(-3, None, None, None, -3))
+@left_iteration(3, combine_dims([(8, (-1, )), (1, (-2, -1))]),
+                ref_var_idx=2, ignore_args=(5, 6, 7, 8))
+@cast_type(arg_idxs=(0, 1, 2, 3, 4, 7, 8))
+@extract_and_transpose()
+def _udhel_layers(zstag, mapfct, u, v, wstag, dx, dy, bottoms, tops,
+                  outview=None):
+    """Wrapper for dcalcuh_layers.
+
+    Located in calc_uh.f90.
+
+    """
+    if outview is None:
+        outview = np.empty(mapfct.shape + tops.shape, np.float64, order="F")
+
+    tem1 = np.zeros((u.shape[0], u.shape[1], u.shape[2]), np.float64,
+                    order="F")
+    tem2 = np.zeros((u.shape[0], u.shape[1], u.shape[2]), np.float64,
+                    order="F")
+
+    result = dcalcuh_layers(zstag,
+                            mapfct,
+                            dx,
+                            dy,
+                            bottoms,
+                            tops,
+                            u,
+                            v,
+                            wstag,
+                            outview,
+                            tem1,
+                            tem2)
+
+    return result
+
+
 @check_args(0, 3, (3, 3, 3, 3), stagger=(None, None, None, -3))
 @left_iteration(3, 2, ref_var_idx=0)
 @cast_type(arg_idxs=(0, 1, 2, 3))
@@ -624,7 +931,7 @@ def _dbz(p, tk, qv, qr, qs, qg, sn0, ivarint, iliqskin, outview=None):
 @cast_type(arg_idxs=(0, 1, 2, 3, 4, 5), outviews=("capeview", "cinview"))
 @extract_and_transpose(outviews=("capeview", "cinview"))
 def _cape(p_hpa, tk, qv, ht, ter, sfp, missing, i3dflag, ter_follow,
-          psafile=psafilepath(), capeview=None, cinview=None):
+          psafile=psafilepath(), bottom_up=0, capeview=None, cinview=None):
     """Wrapper for dcapecalc3d.
 
     Located in rip_cape.f90.
@@ -646,28 +953,66 @@ def _cape(p_hpa, tk, qv, ht, ter, sfp, missing, i3dflag, ter_follow,
 
     # Work arrays
     k_left_shape = (p_hpa.shape[2], p_hpa.shape[0], p_hpa.shape[1])
-    prsf = np.empty(k_left_shape, np.float64, order="F")
-    prs_new = np.empty(k_left_shape, np.float64, order="F")
-    tmk_new = np.empty(k_left_shape, np.float64, order="F")
-    qvp_new = np.empty(k_left_shape, np.float64, order="F")
-    ght_new = np.empty(k_left_shape, np.float64, order="F")
-
-    # note that p_hpa, tk, qv, and ht have the vertical flipped
-    result = cape_routine(p_hpa,
+    with scratch(k_left_shape, count=5) as work:
+        prsf, prs_new, tmk_new, qvp_new, ght_new = work
+
+        result = cape_routine(p_hpa,
+                              tk,
+                              qv,
+                              ht,
+                              ter,
+                              sfp,
+                              capeview,
+                              cinview,
+                              prsf,
+                              prs_new,
+                              tmk_new,
+                              qvp_new,
+                              ght_new,
+                              missing,
+                              ter_follow,
+                              bottom_up,
+                              psafile,
+                              errstat,
+                              errmsg)
+
+    if int(errstat) != 0:
+        raise DiagnosticError("".join(npbytes_to_str(errmsg)).strip())
+
+    return result
+
+
+@check_args(0, 3, (3, 3, 3, 3, 2, 2))
+@left_iteration(3, combine_dims([(6, (-1, )), (0, (-2, -1))]),
+                insert_dims=(4, ), ref_var_idx=0, ignore_args=(6, 7, 8),
+                ignore_kargs=("bottom_up", ))
+@cast_type(arg_idxs=(0, 1, 2, 3, 4, 5))
+@extract_and_transpose()
+def _cape_parcels(p_hpa, tk, qv, ht, ter, sfp, parcels, missing, ter_follow,
+                  psafile=psafilepath(), bottom_up=0, outview=None):
+    """Wrapper for dcapeparcels.
+
+    Located in rip_cape.f90.
+
+    """
+    if outview is None:
+        outview = np.empty(ter.shape + (parcels.shape[0], 4), np.float64,
+                           order="F")
+
+    errstat = np.array(0)
+    errmsg = np.zeros(Constants.ERRLEN, "c")
+
+    result = dcapeparcels(p_hpa,
                           tk,
                           qv,
                           ht,
                           ter,
                           sfp,
-                          capeview,
-                          cinview,
-                          prsf,
-                          prs_new,
-                          tmk_new,
-                          qvp_new,
-                          ght_new,
+                          parcels,
+                          outview,
                           missing,
                           ter_follow,
+                          bottom_up,
                           psafile,
                           errstat,
                           errmsg)
@@ -683,7 +1028,7 @@ def _cape(p_hpa, tk, qv, ht, ter, sfp, missing, i3dflag, ter_follow,
 @cast_type(arg_idxs=(0, 1), outviews=("lowview", "midview", "highview"))
 @extract_and_transpose(outviews=("lowview", "midview", "highview"))
 def _cloudfrac(vert, rh, vert_inc_w_height, low_thresh, mid_thresh,
-               high_thresh, missing, lowview=None, midview=None,
+               high_thresh, missing, bottom_up=1, lowview=None, midview=None,
                highview=None):
     """Wrapper for dcloudfrac2.
 
@@ -708,7 +1053,8 @@ def _cloudfrac(vert, rh, vert_inc_w_height, low_thresh, mid_thresh,
                          missing,
                          lowview,
                          midview,
-                         highview)
+                         highview,
+                         bottom_up)
 
     return result
 
@@ -795,11 +1141,12 @@ def _xytoll(map_proj, truelat1, truelat2, stdlon, lat1, lon1,
 
 
 @check_args(0, 3, (3, 3, 3, 3, 3, 3, 2))
-@left_iteration(3, 2, ref_var_idx=0, ignore_args=(7, 8, 9, 10))
+@left_iteration(3, 2, ref_var_idx=0, ignore_args=(7, 8, 9, 10),
+                ignore_kargs=("bottom_up", ))
 @cast_type(arg_idxs=(0, 1, 2, 3, 4, 5, 6))
 @extract_and_transpose()
 def _ctt(p_hpa, tk, qice, qcld, qv, ght, ter, haveqci, fill_nocloud,
-         missing, opt_thresh, outview=None):
+         missing, opt_thresh, bottom_up=1, outview=None):
     """Wrapper for wrfcttcalc.
 
     Located in wrf_fctt.f90.
@@ -808,31 +1155,31 @@ def _ctt(p_hpa, tk, qice, qcld, qv, ght, ter, haveqci, fill_nocloud,
     if outview is None:
         outview = np.empty_like(ter)
 
-    pf = np.empty(p_hpa.shape[0:3], np.float64, order="F")
-
-    result = wrfcttcalc(p_hpa,
-                        tk,
-                        qice,
-                        qcld,
-                        qv,
-                        ght,
-                        ter,
-                        outview,
-                        pf,
-                        haveqci,
-                        fill_nocloud,
-                        missing,
-                        opt_thresh)
+    with scratch(p_hpa.shape[0:3]) as (pf, ):
+        result = wrfcttcalc(p_hpa,
+                            tk,
+                            qice,
+                            qcld,
+                            qv,
+                            ght,
+                            ter,
+                            outview,
+                            pf,
+                            haveqci,
+                            fill_nocloud,
+                            missing,
+                            opt_thresh,
+                            bottom_up)
 
     return result
 
 
 @check_args(0, 2, (2, ))
-@left_iteration(2, 2, ref_var_idx=0, ignore_args=(1, 2))
+@smooth2d_left_iter()
 @cast_type(arg_idxs=(0, ))
 @extract_and_transpose()
 def _smooth2d(field, passes, cenweight, outview=None):
-    """Wrapper for dfilter2d.
+    """Wrapper for dfilter2d_batch.
 
     Located in wrf_user.f90.
 
@@ -850,17 +1197,78 @@ def _smooth2d(field, passes, cenweight, outview=None):
     else:
         outview[:] = field[:]
 
-    field_tmp = np.zeros(outview.shape, outview.dtype, order="F")
-
-    dfilter2d(outview,
-              field_tmp,
-              passes,
-              missing,
-              cenweight)
+    with scratch(outview.shape, outview.dtype) as (field_tmp, ):
+        dfilter2d_batch(outview,
+                        field_tmp,
+                        passes,
+                        missing,
+                        cenweight)
 
     return outview
 
 
+def _dst1(x, axis):
+    """Return the type-I discrete sine transform of *x* along *axis*.
+
+    The transform is computed from the FFT of the odd extension of *x*.  It
+    is its own inverse, apart from a scale factor of 2/(n+1).
+
+    """
+    x = np.moveaxis(x, axis, -1)
+    n = x.shape[-1]
+
+    ext = np.zeros(x.shape[0:-1] + (2*(n + 1), ), np.float64)
+    ext[..., 1:n+1] = x
+    ext[..., n+2:] = -x[..., ::-1]
+
+    result = -0.5 * np.fft.rfft(ext, axis=-1)[..., 1:n+1].imag
+
+    return np.moveaxis(result, -1, axis)
+
+
+@check_args(0, 2, (2, ))
+@cast_type(arg_idxs=(0, ))
+def _smooth2d_closed_form(field, passes, cenweight):
+    """Return the result of *passes* dfilter2d passes in closed form.
+
+    With the borders held fixed, each pass multiplies the interior points
+    by the same linear operator and adds a constant contribution from the
+    borders.  The type-I discrete sine transform diagonalizes the
+    operator, so any number of passes costs the same as one transform.  The
+    field must not contain missing values.
+
+    """
+    result = np.array(field, np.float64)
+    ny, nx = field.shape[-2:]
+
+    if passes <= 0 or nx < 3 or ny < 3:
+        return result
+
+    coef = 1.0 / (4. + cenweight)
+
+    # Contribution of the fixed border values to the interior points
+    border = result.copy()
+    border[..., 1:-1, 1:-1] = 0
+    forcing = coef * (border[..., 0:-2, 1:-1] + border[..., 2:, 1:-1] +
+                      border[..., 1:-1, 0:-2] + border[..., 1:-1, 2:])
+
+    # Eigenvalues of the pass operator for the interior points
+    cosx = 2.*np.cos(np.pi*np.arange(1, nx-1)/(nx-1))
+    cosy = 2.*np.cos(np.pi*np.arange(1, ny-1)/(ny-1))
+    eig = coef * (cenweight + cosy[:, np.newaxis] + cosx[np.newaxis, :])
+    eign = eig**passes
+
+    interior = _dst1(_dst1(result[..., 1:-1, 1:-1], -1), -2)
+    forcing = _dst1(_dst1(forcing, -1), -2)
+
+    interior = eign*interior + (1. - eign)/(1. - eig)*forcing
+
+    scale = (2./(nx-1)) * (2./(ny-1))
+    result[..., 1:-1, 1:-1] = scale * _dst1(_dst1(interior, -1), -2)
+
+    return result
+
+
 @check_args(0, 3, (3, 3, 2))
 @left_iteration(3, 3, ref_var_idx=0, ignore_args=(3, 4, 5))
 @cast_type(arg_idxs=(0, 1, 2))
@@ -908,30 +1316,29 @@ def _vintrp(field, pres, tk, qvp, ght, terrain, sfp, smsfp,
         outdims = field.shape[0:2] + interp_levels.shape
         outview = np.empty(outdims, field.dtype, order="F")
 
-    tempout = np.zeros(field.shape[0:2], np.float64, order="F")
-
     errstat = np.array(0)
     errmsg = np.zeros(Constants.ERRLEN, "c")
 
-    result = wrf_vintrp(field,
-                        outview,
-                        pres,
-                        tk,
-                        qvp,
-                        ght,
-                        terrain,
-                        sfp,
-                        smsfp,
-                        vcarray,
-                        interp_levels,
-                        icase,
-                        extrap,
-                        vcor,
-                        logp,
-                        tempout,
-                        missing,
-                        errstat,
-                        errmsg)
+    with scratch(field.shape[0:2]) as (tempout, ):
+        result = wrf_vintrp(field,
+                            outview,
+                            pres,
+                            tk,
+                            qvp,
+                            ght,
+                            terrain,
+                            sfp,
+                            smsfp,
+                            vcarray,
+                            interp_levels,
+                            icase,
+                            extrap,
+                            vcor,
+                            logp,
+                            tempout,
+                            missing,
+                            errstat,
+                            errmsg)
 
     if int(errstat) != 0:
         raise DiagnosticError("".join(npbytes_to_str(errmsg)).strip())
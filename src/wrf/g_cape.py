@@ -1,15 +1,17 @@
 from __future__ import (absolute_import, division, print_function)
 
 import numpy as np
-import numpy.ma as ma
 
-from .extension import _tk, _cape
-from .destag import destagger
-from .constants import default_fill, Constants, ConversionFactors
-from .util import extract_vars
+from .extension import (_tk, _cape, _cape_parcels, _full_pressure,
+                        _full_theta, _height_from_geopotential)
+from .constants import default_fill, ConversionFactors
+from .util import extract_vars, _parcel_codes
 from .metadecorators import set_cape_metadata
+from .profiler import masked_values
+from .decorators import memoize
 
 
+@memoize("memo_cape_2d")
 @set_cape_metadata(is2d=True)
 def get_2dcape(wrfin, timeidx=0, method="cat", squeeze=True, cache=None,
                meta=True, _key=None, missing=default_fill(np.float64)):
@@ -91,16 +93,17 @@ def get_2dcape(wrfin, timeidx=0, method="cat", squeeze=True, cache=None,
     ter = ncvars["HGT"]
     psfc = ncvars["PSFC"]
 
-    full_t = t + Constants.T_BASE
-    full_p = p + pb
+    full_t = _full_theta(t)
+    full_p = _full_pressure(p, pb)
     tk = _tk(full_p, full_t)
 
-    geopt = ph + phb
-    geopt_unstag = destagger(geopt, -3)
-    z = geopt_unstag/Constants.G
+    z = _height_from_geopotential(ph, phb)
 
-    # Convert pressure to hPa
-    p_hpa = ConversionFactors.PA_TO_HPA * full_p
+    # Convert pressure to hPa in place through the kernel, since full_p is
+    # no longer needed.  Scaling a masked full_p with numpy would round
+    # differently than the unmasked arrays.
+    _full_pressure(p, pb, ConversionFactors.PA_TO_HPA, outview=full_p)
+    p_hpa = full_p
     psfc_hpa = ConversionFactors.PA_TO_HPA * psfc
 
     i3dflag = 0
@@ -124,9 +127,10 @@ def get_2dcape(wrfin, timeidx=0, method="cat", squeeze=True, cache=None,
     result[2, ..., :, :] = cape_cin[1, ..., -2, :, :]
     result[3, ..., :, :] = cape_cin[1, ..., -3, :, :]
 
-    return ma.masked_values(result, missing)
+    return masked_values(result, missing)
 
 
+@memoize("memo_cape_3d")
 @set_cape_metadata(is2d=False)
 def get_3dcape(wrfin, timeidx=0, method="cat",
                squeeze=True, cache=None, meta=True,
@@ -204,16 +208,17 @@ def get_3dcape(wrfin, timeidx=0, method="cat",
     ter = ncvars["HGT"]
     psfc = ncvars["PSFC"]
 
-    full_t = t + Constants.T_BASE
-    full_p = p + pb
+    full_t = _full_theta(t)
+    full_p = _full_pressure(p, pb)
     tk = _tk(full_p, full_t)
 
-    geopt = ph + phb
-    geopt_unstag = destagger(geopt, -3)
-    z = geopt_unstag/Constants.G
+    z = _height_from_geopotential(ph, phb)
 
-    # Convert pressure to hPa
-    p_hpa = ConversionFactors.PA_TO_HPA * full_p
+    # Convert pressure to hPa in place through the kernel, since full_p is
+    # no longer needed.  Scaling a masked full_p with numpy would round
+    # differently than the unmasked arrays.
+    _full_pressure(p, pb, ConversionFactors.PA_TO_HPA, outview=full_p)
+    p_hpa = full_p
     psfc_hpa = ConversionFactors.PA_TO_HPA * psfc
 
     i3dflag = 1
@@ -222,7 +227,134 @@ def get_3dcape(wrfin, timeidx=0, method="cat",
     cape_cin = _cape(p_hpa, tk, qv, z, ter, psfc_hpa, missing, i3dflag,
                      ter_follow)
 
-    return ma.masked_values(cape_cin, missing)
+    return masked_values(cape_cin, missing)
+
+
+@memoize("memo_cape_parcels")
+@set_cape_metadata(is2d=True, parcel_arg="parcels")
+def get_cape_parcels(wrfin, timeidx=0, method="cat", squeeze=True, cache=None,
+                     meta=True, _key=None, missing=default_fill(np.float64),
+                     parcels=("sb", "ml", "mu")):
+    """Return the CAPE, CIN, LCL, and LFC for several parcel types.
+
+    The surface based ('sb'), mixed layer ('ml'), and most unstable ('mu')
+    parcels are lifted in a single pass over the columns.  The mixed layer
+    parcel uses the mean potential temperature and mixing ratio of the
+    lowest 100 hPa, and the most unstable parcel starts at the level with the
+    highest theta-e in the lowest 300 hPa.
+
+    The LCL height is computed as for cape_2d, so the surface based parcel
+    can differ from the lowest level of cape_3d by a few J kg-1 (see
+    :meth:`wrf.cape_parcels`).
+
+    The leftmost dimension of the returned array represents four different
+    quantities:
+
+        - return_val[0,...] will contain CAPE [J kg-1]
+        - return_val[1,...] will contain CIN [J kg-1]
+        - return_val[2,...] will contain LCL [m]
+        - return_val[3,...] will contain LFC [m]
+
+    The next dimension is the parcel type, in the order given by *parcels*.
+
+    This functions extracts the necessary variables from the NetCDF file
+    object in order to perform the calculation.
+
+    Args:
+
+        wrfin (:class:`netCDF4.Dataset`, :class:`Nio.NioFile`, or an \
+            iterable): WRF-ARW NetCDF
+            data as a :class:`netCDF4.Dataset`, :class:`Nio.NioFile`
+            or an iterable sequence of the aforementioned types.
+
+        timeidx (:obj:`int` or :data:`wrf.ALL_TIMES`, optional): The
+            desired time index. This value can be a positive integer,
+            negative integer, or
+            :data:`wrf.ALL_TIMES` (an alias for None) to return
+            all times in the file or sequence. The default is 0.
+
+        method (:obj:`str`, optional): The aggregation method to use for
+            sequences.  Must be either 'cat' or 'join'.
+            'cat' combines the data along the Time dimension.
+            'join' creates a new dimension for the file index.
+            The default is 'cat'.
+
+        squeeze (:obj:`bool`, optional): Set to False to prevent dimensions
+            with a size of 1 from being automatically removed from the shape
+            of the output. Default is True.
+
+        cache (:obj:`dict`, optional): A dictionary of (varname, ndarray)
+            that can be used to supply pre-extracted NetCDF variables to the
+            computational routines.  It is primarily used for internal
+            purposes, but can also be used to improve performance by
+            eliminating the need to repeatedly extract the same variables
+            used in multiple diagnostics calculations, particularly when using
+            large sequences of files.
+            Default is None.
+
+        meta (:obj:`bool`, optional): Set to False to disable metadata and
+            return :class:`numpy.ndarray` instead of
+            :class:`xarray.DataArray`.  Default is True.
+
+        _key (:obj:`int`, optional): A caching key. This is used for internal
+            purposes only.  Default is None.
+
+        missing (:obj:`float`): The fill value to use for the output.
+            Default is :data:`wrf.default_fill(np.float64)`.
+
+        parcels (:obj:`str` or a sequence of :obj:`str`, optional): The
+            parcel types, which can be 'sb', 'ml', or 'mu'.  Default is
+            ('sb', 'ml', 'mu').
+
+    Returns:
+        :class:`xarray.DataArray` or :class:`numpy.ndarray`: The
+        cape, cin, lcl, and lfc values as an array whose
+        leftmost dimension is 4 (0=CAPE, 1=CIN, 2=LCL, 3=LFC), followed by
+        the parcel type dimension.
+        If xarray is enabled and the *meta* parameter is True, then the result
+        will be a :class:`xarray.DataArray` object.  Otherwise, the result will
+        be a :class:`numpy.ndarray` object with no metadata.
+
+    """
+    codes = _parcel_codes(parcels)
+
+    varnames = ("T", "P", "PB", "QVAPOR", "PH", "PHB", "HGT", "PSFC")
+    ncvars = extract_vars(wrfin, timeidx, varnames, method, squeeze, cache,
+                          meta=False, _key=_key)
+
+    t = ncvars["T"]
+    p = ncvars["P"]
+    pb = ncvars["PB"]
+    qv = ncvars["QVAPOR"]
+    ph = ncvars["PH"]
+    phb = ncvars["PHB"]
+    ter = ncvars["HGT"]
+    psfc = ncvars["PSFC"]
+
+    full_t = _full_theta(t)
+    full_p = _full_pressure(p, pb)
+    tk = _tk(full_p, full_t)
+
+    z = _height_from_geopotential(ph, phb)
+
+    # Convert pressure to hPa in place through the kernel, since full_p is
+    # no longer needed.  Scaling a masked full_p with numpy would round
+    # differently than the unmasked arrays.
+    _full_pressure(p, pb, ConversionFactors.PA_TO_HPA, outview=full_p)
+    p_hpa = full_p
+    psfc_hpa = ConversionFactors.PA_TO_HPA * psfc
+
+    ter_follow = 1
+
+    # WRF model levels are in descending pressure order
+    result = _cape_parcels(p_hpa, tk, qv, z, ter, psfc_hpa, codes, missing,
+                           ter_follow, bottom_up=1)
+
+    # Move the product and parcel dimensions to the left of the time
+    # dimensions
+    result = np.ascontiguousarray(np.moveaxis(result, (-4, -3), (0, 1)))
+
+    return masked_values(result, missing)
 
 
 def get_cape2d_only(wrfin, timeidx=0, method="cat", squeeze=True, cache=None,
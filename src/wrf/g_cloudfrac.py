@@ -1,15 +1,17 @@
 from __future__ import (absolute_import, division, print_function)
 
 import numpy as np
-import numpy.ma as ma
 
 from .constants import Constants, default_fill
 from .extension import _tk, _rh, _cloudfrac
 from .metadecorators import set_cloudfrac_metadata
 from .util import extract_vars
 from .g_geoht import _get_geoht
+from .profiler import masked_values
+from .decorators import memoize
 
 
+@memoize("memo_cloudfrac")
 @set_cloudfrac_metadata()
 def get_cloudfrac(wrfin, timeidx=0, method="cat", squeeze=True,
                   cache=None, meta=True, _key=None,
@@ -159,7 +161,7 @@ def get_cloudfrac(wrfin, timeidx=0, method="cat", squeeze=True,
     cfrac = _cloudfrac(v_coord, rh, vert_inc_w_height,
                        _low_thresh, _mid_thresh, _high_thresh, missing)
 
-    return ma.masked_values(cfrac, missing)
+    return masked_values(cfrac, missing)
 
 
 def get_low_cloudfrac(wrfin, timeidx=0, method="cat", squeeze=True,
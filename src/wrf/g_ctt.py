@@ -1,14 +1,14 @@
 from __future__ import (absolute_import, division, print_function)
 
 import numpy as np
-import numpy.ma as ma
 
-from .extension import _ctt, _tk
-from .constants import Constants, ConversionFactors, default_fill
-from .destag import destagger
+from .extension import (_ctt, _tk, _full_pressure, _full_theta,
+                        _height_from_geopotential)
+from .constants import ConversionFactors, default_fill
 from .decorators import convert_units
 from .metadecorators import copy_and_set_metadata
 from .util import extract_vars
+from .profiler import masked_values
 
 
 @copy_and_set_metadata(copy_varname="T", name="ctt",
@@ -128,18 +128,21 @@ def get_ctt(wrfin, timeidx=0, method="cat",
     else:
         qcld = cldvars["QCLOUD"] * 1000.0  # g/kg
 
-    full_p = p + pb
-    p_hpa = full_p * ConversionFactors.PA_TO_HPA
-    full_t = t + Constants.T_BASE
+    full_p = _full_pressure(p, pb)
+    full_t = _full_theta(t)
     tk = _tk(full_p, full_t)
 
-    geopt = ph + phb
-    geopt_unstag = destagger(geopt, -3)
-    ght = geopt_unstag / Constants.G
+    # Convert pressure to hPa in place through the kernel, since full_p is
+    # no longer needed.  Scaling a masked full_p with numpy would round
+    # differently than the unmasked arrays.
+    _full_pressure(p, pb, ConversionFactors.PA_TO_HPA, outview=full_p)
+    p_hpa = full_p
+
+    ght = _height_from_geopotential(ph, phb)
 
     _fill_nocloud = 1 if fill_nocloud else 0
 
     ctt = _ctt(p_hpa, tk, qice, qcld, qv, ght, ter, haveqci, _fill_nocloud,
                missing, opt_thresh)
 
-    return ma.masked_values(ctt, missing)
+    return masked_values(ctt, missing)
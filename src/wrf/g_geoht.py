@@ -4,6 +4,7 @@ import warnings
 
 from .constants import Constants
 from .destag import destagger
+from .extension import _height_from_geopotential
 from .decorators import convert_units
 from .metadecorators import set_height_metadata
 from .util import extract_vars, either
@@ -90,6 +91,17 @@ def _get_geoht(wrfin, timeidx, method="cat", squeeze=True,
         ph = ph_vars["PH"]
         phb = ph_vars["PHB"]
         hgt = ph_vars["HGT"]
+        if height:
+            z = _height_from_geopotential(ph, phb, destag=not stag)
+            if msl:
+                return z
+            else:
+                new_dims = list(hgt.shape)
+                new_dims.insert(-2, 1)
+                hgt = hgt.reshape(new_dims)
+
+                return z - hgt
+
         geopt = ph + phb
         if not stag:
             geopt_unstag = destagger(geopt, -3)
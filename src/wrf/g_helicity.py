@@ -2,8 +2,8 @@ from __future__ import (absolute_import, division, print_function)
 
 import numpy as np
 
-from .constants import Constants
-from .extension import _srhel, _udhel
+from .extension import (_srhel, _udhel, _srhel_layers, _udhel_layers,
+                        _height_from_geopotential)
 from .destag import destagger
 from .util import extract_vars, extract_global_attrs, either
 from .metadecorators import copy_and_set_metadata
@@ -12,12 +12,15 @@ from .g_latlon import get_lat
 
 @copy_and_set_metadata(copy_varname="HGT", name="srh",
                        description="storm relative helicity",
-                       units="m2 s-2")
+                       units="m2 s-2", layer_args=("top", ))
 def get_srh(wrfin, timeidx=0, method="cat", squeeze=True,
             cache=None, meta=True, _key=None, top=3000.0):
     """Return the storm relative helicity.
 
-    The *top* argument specifies the top of the integration in [m].
+    The *top* argument specifies the top of the integration in [m].  If
+    *top* is a sequence, the helicity for every layer is computed from the
+    same storm motion estimate, and the result includes a 'layer' dimension
+    to the left of the south_north and west_east dimensions.
 
     This functions extracts the necessary variables from the NetCDF file
     object in order to perform the calculation.
@@ -61,8 +64,9 @@ def get_srh(wrfin, timeidx=0, method="cat", squeeze=True,
         _key (:obj:`int`, optional): A caching key. This is used for internal
             purposes only.  Default is None.
 
-        top (:obj:`float`, optional): The top of the integration in [m].
-            Default is 3000.0.
+        top (:obj:`float` or sequence of :obj:`float`, optional): The top of
+            the integration in [m], or a sequence of tops for several
+            layers.  Default is 3000.0.
 
     Returns:
         :class:`xarray.DataArray` or :class:`numpy.ndarray`: The
@@ -96,24 +100,26 @@ def get_srh(wrfin, timeidx=0, method="cat", squeeze=True,
                           meta=False, _key=_key)
     v = destagger(v_vars[varname], -2)
 
-    geopt = ph + phb
-    geopt_unstag = destagger(geopt, -3)
+    z = _height_from_geopotential(ph, phb)
 
-    z = geopt_unstag / Constants.G
+    # The model levels run from the surface upward, so the kernel reads the
+    # columns in reverse rather than working on flipped copies
+    if np.ndim(top) == 0:
+        srh = _srhel(u, v, z, ter, lats, top, bottom_up=1)
+    else:
+        tops = np.asarray(top, np.float64)
+        if tops.ndim != 1:
+            raise ValueError("'top' must be a scalar or a one-dimensional "
+                             "sequence")
 
-    # Re-ordering from high to low
-    u1 = np.ascontiguousarray(u[..., ::-1, :, :])
-    v1 = np.ascontiguousarray(v[..., ::-1, :, :])
-    z1 = np.ascontiguousarray(z[..., ::-1, :, :])
-
-    srh = _srhel(u1, v1, z1, ter, lats, top)
+        srh = _srhel_layers(u, v, z, ter, lats, tops, bottom_up=1)
 
     return srh
 
 
 @copy_and_set_metadata(copy_varname="MAPFAC_M", name="updraft_helicity",
                        description="updraft helicity",
-                       units="m2 s-2")
+                       units="m2 s-2", layer_args=("bottom", "top"))
 def get_uh(wrfin, timeidx=0, method="cat", squeeze=True,
            cache=None, meta=True, _key=None,
            bottom=2000.0, top=5000.0):
@@ -121,7 +127,11 @@ def get_uh(wrfin, timeidx=0, method="cat", squeeze=True,
     """Return the updraft helicity.
 
     The *bottom* and *top* arguments specify the bottom and top limits
-    for the integration in [m].
+    for the integration in [m].  If either argument is a sequence, the
+    updraft helicity for every (*bottom*, *top*) layer is computed from the
+    same vertical vorticity field, and the result includes a 'layer'
+    dimension to the left of the south_north and west_east dimensions.
+    A scalar *bottom* or *top* is used for every layer.
 
     This functions extracts the necessary variables from the NetCDF file
     object in order to perform the calculation.
@@ -165,11 +175,11 @@ def get_uh(wrfin, timeidx=0, method="cat", squeeze=True,
         _key (:obj:`int`, optional): A caching key. This is used for internal
             purposes only.  Default is None.
 
-        bottom (:obj:`float`, optional): The bottom limit for the integration
-            in [m]. Default is 2000.0.
+        bottom (:obj:`float` or sequence of :obj:`float`, optional): The
+            bottom limit for the integration in [m]. Default is 2000.0.
 
-        top (:obj:`float`, optional): The top limit for the integration in [m].
-            Default is 5000.0.
+        top (:obj:`float` or sequence of :obj:`float`, optional): The top
+            limit for the integration in [m]. Default is 5000.0.
 
     Returns:
         :class:`xarray.DataArray` or :class:`numpy.ndarray`: The
@@ -203,8 +213,24 @@ def get_uh(wrfin, timeidx=0, method="cat", squeeze=True,
                           meta=False, _key=_key)
     v = destagger(v_vars[varname], -2)
 
-    zp = (ph + phb) / Constants.G
-
-    uh = _udhel(zp, mapfct, u, v, wstag, dx, dy, bottom, top)
+    zp = _height_from_geopotential(ph, phb, destag=False)
+
+    if np.ndim(bottom) == 0 and np.ndim(top) == 0:
+        uh = _udhel(zp, mapfct, u, v, wstag, dx, dy, bottom, top)
+    else:
+        try:
+            bottoms, tops = np.broadcast_arrays(
+                np.asarray(bottom, np.float64), np.asarray(top, np.float64))
+        except ValueError:
+            raise ValueError("'bottom' and 'top' must have the same number "
+                             "of layers")
+
+        if tops.ndim != 1:
+            raise ValueError("'bottom' and 'top' must be scalars or "
+                             "one-dimensional sequences")
+
+        uh = _udhel_layers(zp, mapfct, u, v, wstag, dx, dy,
+                           np.ascontiguousarray(bottoms),
+                           np.ascontiguousarray(tops))
 
     return uh
@@ -11,8 +11,10 @@ from .metadecorators import set_latlon_metadata
 from .constants import Constants, ProjectionTypes
 from .config import xarray_enabled
 
-if xarray_enabled():
+try:
     from xarray import DataArray
+except ImportError:
+    pass
 
 
 def get_lat(wrfin, timeidx=0, method="cat", squeeze=True,
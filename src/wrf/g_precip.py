@@ -1,30 +1,262 @@
 from __future__ import (absolute_import, division, print_function)
 
-from .util import extract_vars
+import numpy as np
+import numpy.ma as ma
 
+from .constants import default_fill
+from .util import (extract_vars, extract_dim, extract_global_attrs,
+                   is_standard_wrf_var, is_multi_file, is_mapping,
+                   get_iterable)
+from .metadecorators import copy_and_set_metadata
+from .profiler import masked_values
 
-def get_accum_precip(wrfin, timeidx=0):
-    ncvars = extract_vars(wrfin, timeidx, varnames=("RAINC", "RAINNC"))
-    rainc = ncvars["RAINC"]
-    rainnc = ncvars["RAINNC"]
 
-    rainsum = rainc + rainnc
+def _bucket_size(wrfin, bucket_mm):
+    """Return the precipitation bucket size in mm, or None if the
+    bucket counters should not be used.
 
-    return rainsum
+    If *bucket_mm* is None, the BUCKET_MM global attribute is used when it
+    is available.
 
+    """
+    if bucket_mm is None:
+        bucket_mm = extract_global_attrs(wrfin, "BUCKET_MM")["BUCKET_MM"]
 
-def get_precip_diff(wrfin1, wrfin2, timeidx=0):
-    vars1 = extract_vars(wrfin1, timeidx, varnames=("RAINC", "RAINNC"))
-    vars2 = extract_vars(wrfin2, timeidx, varnames=("RAINC", "RAINNC"))
-    rainc1 = vars1["RAINC"]
-    rainnc1 = vars1["RAINNC"]
+    if bucket_mm is None or bucket_mm <= 0:
+        return None
 
-    rainc2 = vars2["RAINC"]
-    rainnc2 = vars2["RAINNC"]
+    if not is_standard_wrf_var(wrfin, "I_RAINC"):
+        return None
 
-    rainsum1 = rainc1 + rainnc1
-    rainsum2 = rainc2 + rainnc2
+    return float(bucket_mm)
 
-    return (rainsum1 - rainsum2)
 
-# TODO:  Handle bucket flipping
+def _total_precip(wrfin, timeidx, method, _key, bucket_mm):
+    """Return the total accumulated precipitation without squeezing.
+
+    The total is RAINC + RAINNC plus the amount removed by the bucket
+    counters (I_RAINC and I_RAINNC) when the bucket is in use.
+
+    The variables are not taken from the cache, since the cached arrays
+    are squeezed and can't be combined with unsqueezed ones.
+
+    """
+    bucket = _bucket_size(wrfin, bucket_mm)
+
+    varnames = ("RAINC", "RAINNC")
+    if bucket is not None:
+        varnames += ("I_RAINC", "I_RAINNC")
+
+    ncvars = extract_vars(wrfin, timeidx, varnames, method, False, None,
+                          meta=False, _key=_key)
+
+    total = ncvars["RAINC"] + ncvars["RAINNC"]
+
+    if bucket is not None:
+        total += bucket * (ncvars["I_RAINC"] + ncvars["I_RAINNC"])
+
+    return total
+
+
+def _is_join(wrfin, method):
+    """Return True if a sequence of files is combined with the 'join'
+    method."""
+    return (is_multi_file(wrfin) and not is_mapping(wrfin) and
+            method.lower() == "join")
+
+
+def _time_counts(wrfin):
+    """Return the number of times in each file."""
+    if not is_multi_file(wrfin) or is_mapping(wrfin):
+        return [extract_dim(wrfin, "Time")]
+
+    return [extract_dim(wrfnc, "Time") for wrfnc in wrfin]
+
+
+def _all_intervals(wrfin, method, _key, bucket_mm):
+    """Return the precipitation intervals for all times without squeezing.
+
+    The first time has no previous time and is masked.
+
+    """
+    total = _total_precip(wrfin, None, method, _key, bucket_mm)
+
+    # The Time dimension is always the third from the right since the
+    # totals are not squeezed
+    first = ma.masked_all(total[..., 0:1, :, :].shape, total.dtype)
+
+    return ma.concatenate((first, total[..., 1:, :, :] -
+                           total[..., :-1, :, :]), axis=-3)
+
+
+@copy_and_set_metadata(copy_varname="RAINNC", name="precip_accum",
+                       description="accumulated total precipitation",
+                       MemoryOrder="XY",
+                       units="mm")
+def get_accum_precip(wrfin, timeidx=0, method="cat", squeeze=True,
+                     cache=None, meta=True, _key=None, bucket_mm=None):
+    """Return the total accumulated precipitation since the start of the
+    simulation.
+
+    The total is the sum of the convective (RAINC) and non-convective
+    (RAINNC) precipitation.  When the precipitation bucket is used, the
+    bucket counters (I_RAINC, I_RAINNC) are applied so that the total is
+    continuous across bucket resets.
+
+    This functions extracts the necessary variables from the NetCDF file
+    object in order to perform the calculation.
+
+    Args:
+
+        wrfin (:class:`netCDF4.Dataset`, :class:`Nio.NioFile`, or an \
+            iterable): WRF-ARW NetCDF
+            data as a :class:`netCDF4.Dataset`, :class:`Nio.NioFile`
+            or an iterable sequence of the aforementioned types.
+
+        timeidx (:obj:`int` or :data:`wrf.ALL_TIMES`, optional): The
+            desired time index. This value can be a positive integer,
+            negative integer, or
+            :data:`wrf.ALL_TIMES` (an alias for None) to return
+            all times in the file or sequence. The default is 0.
+
+        method (:obj:`str`, optional): The aggregation method to use for
+            sequences.  Must be either 'cat' or 'join'.
+            'cat' combines the data along the Time dimension.
+            'join' creates a new dimension for the file index.
+            The default is 'cat'.
+
+        squeeze (:obj:`bool`, optional): Set to False to prevent dimensions
+            with a size of 1 from being automatically removed from the shape
+            of the output. Default is True.
+
+        cache (:obj:`dict`, optional): Not used.  The variables are always
+            extracted without squeezing, so pre-extracted (squeezed)
+            variables can't be used.  Default is None.
+
+        meta (:obj:`bool`, optional): Set to False to disable metadata and
+            return :class:`numpy.ndarray` instead of
+            :class:`xarray.DataArray`.  Default is True.
+
+        _key (:obj:`int`, optional): A caching key. This is used for internal
+            purposes only.  Default is None.
+
+        bucket_mm (:obj:`float`, optional): The precipitation bucket size
+            in mm (the *bucket_mm* namelist option).  If None, the
+            BUCKET_MM global attribute is used if it exists.  Set to 0 to
+            ignore the bucket counters.  Default is None.
+
+    Returns:
+        :class:`xarray.DataArray` or :class:`numpy.ndarray`: The total
+        accumulated precipitation.  If xarray is
+        enabled and the *meta* parameter is True, then the result will be a
+        :class:`xarray.DataArray` object.  Otherwise, the result will be a
+        :class:`numpy.ndarray` object with no metadata.
+
+    """
+    total = _total_precip(wrfin, timeidx, method, _key, bucket_mm)
+
+    return total.squeeze() if squeeze else total
+
+
+@copy_and_set_metadata(copy_varname="RAINNC", name="precip_interval",
+                       description="total precipitation since the "
+                                   "previous output time",
+                       MemoryOrder="XY",
+                       units="mm")
+def get_precip_interval(wrfin, timeidx=0, method="cat", squeeze=True,
+                        cache=None, meta=True, _key=None, bucket_mm=None,
+                        missing=default_fill(np.float64)):
+    """Return the total precipitation that fell since the previous output
+    time.
+
+    When all times are requested, the accumulated totals are extracted
+    once and differenced along the Time dimension, so every interval in
+    the sequence is computed in a single pass.  The first time in the
+    sequence has no previous time and is set to *missing*.  For the 'join'
+    method, each file is treated as a separate time series.
+
+    The bucket counters (I_RAINC, I_RAINNC) are applied before
+    differencing, so intervals that span a bucket reset are correct.
+
+    This functions extracts the necessary variables from the NetCDF file
+    object in order to perform the calculation.
+
+    Args:
+
+        wrfin (:class:`netCDF4.Dataset`, :class:`Nio.NioFile`, or an \
+            iterable): WRF-ARW NetCDF
+            data as a :class:`netCDF4.Dataset`, :class:`Nio.NioFile`
+            or an iterable sequence of the aforementioned types.
+
+        timeidx (:obj:`int` or :data:`wrf.ALL_TIMES`, optional): The
+            desired time index. This value can be a positive integer,
+            negative integer, or
+            :data:`wrf.ALL_TIMES` (an alias for None) to return
+            all times in the file or sequence. The default is 0.
+
+        method (:obj:`str`, optional): The aggregation method to use for
+            sequences.  Must be either 'cat' or 'join'.
+            'cat' combines the data along the Time dimension.
+            'join' creates a new dimension for the file index.
+            The default is 'cat'.
+
+        squeeze (:obj:`bool`, optional): Set to False to prevent dimensions
+            with a size of 1 from being automatically removed from the shape
+            of the output. Default is True.
+
+        cache (:obj:`dict`, optional): Not used.  The variables are always
+            extracted without squeezing, so pre-extracted (squeezed)
+            variables can't be used.  Default is None.
+
+        meta (:obj:`bool`, optional): Set to False to disable metadata and
+            return :class:`numpy.ndarray` instead of
+            :class:`xarray.DataArray`.  Default is True.
+
+        _key (:obj:`int`, optional): A caching key. This is used for internal
+            purposes only.  Default is None.
+
+        bucket_mm (:obj:`float`, optional): The precipitation bucket size
+            in mm (the *bucket_mm* namelist option).  If None, the
+            BUCKET_MM global attribute is used if it exists.  Set to 0 to
+            ignore the bucket counters.  Default is None.
+
+        missing (:obj:`float`, optional): The fill value to use for times
+            that have no previous output time.  Default is
+            :data:`wrf.default_fill(numpy.float64)`.
+
+    Returns:
+        :class:`xarray.DataArray` or :class:`numpy.ndarray`: The total
+        precipitation since the previous output time.  If xarray is
+        enabled and the *meta* parameter is True, then the result will be a
+        :class:`xarray.DataArray` object.  Otherwise, the result will be a
+        :class:`numpy.ndarray` object with no metadata.
+
+    """
+    wrfin = get_iterable(wrfin)
+
+    if timeidx is None:
+        result = _all_intervals(wrfin, method, _key, bucket_mm)
+    elif timeidx < 0 and _is_join(wrfin, method):
+        # Each file resolves a negative index against its own number of
+        # times, so the intervals for every time are needed
+        intervals = _all_intervals(wrfin, method, _key, bucket_mm)
+        result = ma.masked_all(intervals.shape[0:1] + intervals.shape[2:],
+                               intervals.dtype)
+        for fileidx, numtimes in enumerate(_time_counts(wrfin)):
+            if numtimes + timeidx >= 0:
+                result[fileidx] = intervals[fileidx, numtimes + timeidx]
+    else:
+        if timeidx < 0:
+            timeidx += sum(_time_counts(wrfin))
+
+        total = _total_precip(wrfin, timeidx, method, _key, bucket_mm)
+
+        if timeidx <= 0:
+            result = ma.masked_all(total.shape, total.dtype)
+        else:
+            result = total - _total_precip(wrfin, timeidx - 1, method,
+                                           _key, bucket_mm)
+
+    result = masked_values(ma.filled(result, missing), missing)
+
+    return result.squeeze() if squeeze else result
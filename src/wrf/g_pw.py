@@ -1,7 +1,7 @@
 from __future__ import (absolute_import, division, print_function)
 
-from .extension import _pw, _tv, _tk
-from .constants import Constants
+from .extension import (_pw, _tv, _tk, _full_pressure, _full_theta,
+                        _height_from_geopotential)
 from .util import extract_vars
 from .metadecorators import copy_and_set_metadata
 
@@ -76,9 +76,9 @@ def get_pw(wrfin, timeidx=0, method="cat", squeeze=True, cache=None,
     phb = ncvars["PHB"]
     qv = ncvars["QVAPOR"]
 
-    full_p = p + pb
-    ht = (ph + phb)/Constants.G
-    full_t = t + Constants.T_BASE
+    full_p = _full_pressure(p, pb)
+    ht = _height_from_geopotential(ph, phb, destag=False)
+    full_t = _full_theta(t)
 
     tk = _tk(full_p, full_t)
     tv = _tv(tk, qv)
@@ -1,8 +1,7 @@
 from __future__ import (absolute_import, division, print_function)
 
-from .extension import _slp, _tk
-from .constants import Constants
-from .destag import destagger
+from .extension import (_slp, _tk, _full_pressure, _full_theta,
+                        _height_from_geopotential)
 from .decorators import convert_units
 from .metadecorators import copy_and_set_metadata
 from .util import extract_vars
@@ -87,13 +86,11 @@ def get_slp(wrfin, timeidx=0, method="cat", squeeze=True,
     ph = ncvars["PH"]
     phb = ncvars["PHB"]
 
-    full_t = t + Constants.T_BASE
-    full_p = p + pb
+    full_t = _full_theta(t)
+    full_p = _full_pressure(p, pb)
     qvapor[qvapor < 0] = 0.
 
-    full_ph = (ph + phb) / Constants.G
-
-    destag_ph = destagger(full_ph, -3)
+    destag_ph = _height_from_geopotential(ph, phb)
 
     tk = _tk(full_p, full_t)
     slp = _slp(destag_ph, tk, full_p, qvapor)
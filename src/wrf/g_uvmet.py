@@ -4,13 +4,194 @@ from math import fabs, log, tan, sin, cos
 
 import numpy as np
 
-from .extension import _uvmet
+from .extension import _uvmet_rotation, _uvmet_rotate
 from .destag import destagger
 from .constants import Constants
 from .g_wind import _calc_wspd_wdir
-from .decorators import convert_units
+from .decorators import convert_units, memoize
 from .metadecorators import set_wind_metadata
-from .util import extract_vars, extract_global_attrs, either
+from .cache import cache_item, get_cached_item
+from .util import (extract_vars, extract_global_attrs, either,
+                   is_moving_domain, to_np)
+from .profiler import masked_values
+
+
+def _get_uvmet_winds(wrfin, timeidx, method, squeeze, cache, _key, ten_m):
+    """Return the u,v wind components on the mass grid.
+
+    Args:
+
+        wrfin (:class:`netCDF4.Dataset`, :class:`Nio.NioFile`, or an \
+            iterable): WRF-ARW NetCDF
+            data as a :class:`netCDF4.Dataset`, :class:`Nio.NioFile`
+            or an iterable sequence of the aforementioned types.
+
+        timeidx (:obj:`int` or :data:`wrf.ALL_TIMES`): The desired time
+            index.
+
+        method (:obj:`str`): The aggregation method to use for sequences.
+
+        squeeze (:obj:`bool`): Set to False to prevent dimensions with a
+            size of 1 from being automatically removed from the shape of
+            the output.
+
+        cache (:obj:`dict`): A dictionary of (varname, ndarray) that can be
+            used to supply pre-extracted NetCDF variables.
+
+        _key (:obj:`int`): A caching key.
+
+        ten_m (:obj:`bool`): Set to True to use the 10m surface winds.
+
+    Returns:
+
+        :obj:`tuple`: The destaggered u and v wind components.
+
+    """
+    if not ten_m:
+        varname = either("U", "UU")(wrfin)
+        u_vars = extract_vars(wrfin, timeidx, varname, method, squeeze, cache,
+                              meta=False, _key=_key)
+
+        u = destagger(u_vars[varname], -1)
+
+        varname = either("V", "VV")(wrfin)
+        v_vars = extract_vars(wrfin, timeidx, varname, method, squeeze, cache,
+                              meta=False, _key=_key)
+        v = destagger(v_vars[varname], -2)
+    else:
+        varname = either("U10", "UU")(wrfin)
+        u_vars = extract_vars(wrfin, timeidx, varname, method, squeeze, cache,
+                              meta=False, _key=_key)
+        u = (u_vars[varname] if varname == "U10" else
+             destagger(u_vars[varname][..., 0, :, :], -1))
+
+        varname = either("V10", "VV")(wrfin)
+        v_vars = extract_vars(wrfin, timeidx, varname, method, squeeze, cache,
+                              meta=False, _key=_key)
+        v = (v_vars[varname] if varname == "V10" else
+             destagger(v_vars[varname][..., 0, :, :], -2))
+
+    return u, v
+
+
+def _get_uvmet_rotation(wrfin, timeidx, method, squeeze, cache, _key,
+                        map_proj):
+    """Return the rotation coefficients used to rotate grid relative winds
+    to earth coordinates.
+
+    The leftmost dimension of the coefficients is 2 (0=cosine, 1=sine),
+    followed by the mass grid (south_north, west_east) dimensions.  The
+    coefficients only depend on the domain, so they are computed once from
+    the first time and cached.  For moving domains, the coefficients also
+    include the leftmost time dimensions for *timeidx* and are cached for
+    each (*timeidx*, *method*, *squeeze*) request.
+
+    Args:
+
+        wrfin (:class:`netCDF4.Dataset`, :class:`Nio.NioFile`, or an \
+            iterable): WRF-ARW NetCDF
+            data as a :class:`netCDF4.Dataset`, :class:`Nio.NioFile`
+            or an iterable sequence of the aforementioned types.
+
+        timeidx (:obj:`int` or :data:`wrf.ALL_TIMES`): The desired time
+            index.
+
+        method (:obj:`str`): The aggregation method to use for sequences.
+
+        squeeze (:obj:`bool`): Set to False to prevent dimensions with a
+            size of 1 from being automatically removed from the shape of
+            the output.
+
+        cache (:obj:`dict`): A dictionary of (varname, ndarray) that can be
+            used to supply pre-extracted NetCDF variables.
+
+        _key (:obj:`int`): A caching key.
+
+        map_proj (:obj:`int`): The MAP_PROJ value for the domain, which
+            must be 1 (Lambert) or 2 (Polar Stereographic).
+
+    Returns:
+
+        :class:`numpy.ndarray`: The read-only rotation coefficients.
+
+    """
+    latvar = either("XLAT_M", "XLAT")(wrfin)
+    lonvar = either("XLONG_M", "XLONG")(wrfin)
+
+    moving = is_moving_domain(wrfin, latvar=latvar, lonvar=lonvar,
+                              _key=_key)
+
+    product = "uvmet_rotation_{}_{}".format(latvar, lonvar)
+    if moving:
+        product += "_{}_{}_{}".format(timeidx, method, squeeze)
+
+    rot = get_cached_item(_key, product)
+    if rot is not None:
+        return rot
+
+    lat_attrs = extract_global_attrs(wrfin, attrs=("TRUELAT1",
+                                                   "TRUELAT2"))
+    radians_per_degree = Constants.PI/180.0
+    # Rotation needed for Lambert and Polar Stereographic
+    true_lat1 = lat_attrs["TRUELAT1"]
+    true_lat2 = lat_attrs["TRUELAT2"]
+
+    try:
+        lon_attrs = extract_global_attrs(wrfin, attrs="STAND_LON")
+    except AttributeError:
+        try:
+            cen_lon_attrs = extract_global_attrs(wrfin, attrs="CEN_LON")
+        except AttributeError:
+            raise RuntimeError("longitude attributes not found in NetCDF")
+        else:
+            cen_lon = cen_lon_attrs["CEN_LON"]
+    else:
+        cen_lon = lon_attrs["STAND_LON"]
+
+    if map_proj == 1:
+        if((fabs(true_lat1 - true_lat2) > 0.1) and
+                (fabs(true_lat2 - 90.) > 0.1)):
+            cone = (log(cos(true_lat1*radians_per_degree)) -
+                    log(cos(true_lat2*radians_per_degree)))
+            cone = (cone /
+                    (log(tan((45.-fabs(true_lat1/2.))*radians_per_degree))
+                     - log(tan((45.-fabs(true_lat2/2.)) *
+                               radians_per_degree))))
+        else:
+            cone = sin(fabs(true_lat1)*radians_per_degree)
+    else:
+        cone = 1
+
+    if moving:
+        lat = extract_vars(wrfin, timeidx, latvar, method, squeeze, cache,
+                           meta=False, _key=_key)[latvar]
+        lon = extract_vars(wrfin, timeidx, lonvar, method, squeeze, cache,
+                           meta=False, _key=_key)[lonvar]
+    else:
+        lat = extract_vars(wrfin, 0, latvar, "cat", False, cache,
+                           meta=False, _key=_key)[latvar]
+        lon = extract_vars(wrfin, 0, lonvar, "cat", False, cache,
+                           meta=False, _key=_key)[lonvar]
+
+        lat = lat[(0,)*(lat.ndim - 2)]
+        lon = lon[(0,)*(lon.ndim - 2)]
+
+    # The coefficients are computed in double precision, regardless of the
+    # precision of the coordinates
+    rot = _uvmet_rotation(to_np(lat).astype(np.float64),
+                          to_np(lon).astype(np.float64),
+                          cen_lon, cone)
+    rot.flags.writeable = False
+
+    cache_item(_key, product, rot)
+
+    return rot
+
+
+@convert_units("wind", "m s-1")
+def _uvmet_wspd_units(wspd, units="m s-1"):
+    """Return the earth rotated wind speed in the desired units."""
+    return wspd
 
 
 @convert_units("wind", "m s-1")
@@ -84,29 +265,8 @@ def _get_uvmet(wrfin, timeidx=0, method="cat", squeeze=True,
 
     """
 
-    if not ten_m:
-        varname = either("U", "UU")(wrfin)
-        u_vars = extract_vars(wrfin, timeidx, varname, method, squeeze, cache,
-                              meta=False, _key=_key)
-
-        u = destagger(u_vars[varname], -1)
-
-        varname = either("V", "VV")(wrfin)
-        v_vars = extract_vars(wrfin, timeidx, varname, method, squeeze, cache,
-                              meta=False, _key=_key)
-        v = destagger(v_vars[varname], -2)
-    else:
-        varname = either("U10", "UU")(wrfin)
-        u_vars = extract_vars(wrfin, timeidx, varname, method, squeeze, cache,
-                              meta=False, _key=_key)
-        u = (u_vars[varname] if varname == "U10" else
-             destagger(u_vars[varname][..., 0, :, :], -1))
-
-        varname = either("V10", "VV")(wrfin)
-        v_vars = extract_vars(wrfin, timeidx, varname, method, squeeze, cache,
-                              meta=False, _key=_key)
-        v = (v_vars[varname] if varname == "V10" else
-             destagger(v_vars[varname][..., 0, :, :], -2))
+    u, v = _get_uvmet_winds(wrfin, timeidx, method, squeeze, cache, _key,
+                            ten_m)
 
     map_proj_attrs = extract_global_attrs(wrfin, attrs="MAP_PROJ")
     map_proj = map_proj_attrs["MAP_PROJ"]
@@ -141,56 +301,14 @@ def _get_uvmet(wrfin, timeidx=0, method="cat", squeeze=True,
         else:
             result[idx0] = np.ma.filled(u[:], fill)
             result[idx1] = np.ma.filled(v[:], fill)
-            result = np.ma.masked_values(result, fill)
+            result = masked_values(result, fill)
 
         return result
     elif map_proj in (1, 2):
-        lat_attrs = extract_global_attrs(wrfin, attrs=("TRUELAT1",
-                                                       "TRUELAT2"))
-        radians_per_degree = Constants.PI/180.0
-        # Rotation needed for Lambert and Polar Stereographic
-        true_lat1 = lat_attrs["TRUELAT1"]
-        true_lat2 = lat_attrs["TRUELAT2"]
+        rot = _get_uvmet_rotation(wrfin, timeidx, method, squeeze, cache,
+                                  _key, map_proj)
 
-        try:
-            lon_attrs = extract_global_attrs(wrfin, attrs="STAND_LON")
-        except AttributeError:
-            try:
-                cen_lon_attrs = extract_global_attrs(wrfin, attrs="CEN_LON")
-            except AttributeError:
-                raise RuntimeError("longitude attributes not found in NetCDF")
-            else:
-                cen_lon = cen_lon_attrs["CEN_LON"]
-        else:
-            cen_lon = lon_attrs["STAND_LON"]
-
-        varname = either("XLAT_M", "XLAT")(wrfin)
-        xlat_var = extract_vars(wrfin, timeidx, varname,
-                                method, squeeze, cache, meta=False,
-                                _key=_key)
-        lat = xlat_var[varname]
-
-        varname = either("XLONG_M", "XLONG")(wrfin)
-        xlon_var = extract_vars(wrfin, timeidx, varname,
-                                method, squeeze, cache, meta=False,
-                                _key=_key)
-        lon = xlon_var[varname]
-
-        if map_proj == 1:
-            if((fabs(true_lat1 - true_lat2) > 0.1) and
-                    (fabs(true_lat2 - 90.) > 0.1)):
-                cone = (log(cos(true_lat1*radians_per_degree)) -
-                        log(cos(true_lat2*radians_per_degree)))
-                cone = (cone /
-                        (log(tan((45.-fabs(true_lat1/2.))*radians_per_degree))
-                         - log(tan((45.-fabs(true_lat2/2.)) *
-                                   radians_per_degree))))
-            else:
-                cone = sin(fabs(true_lat1)*radians_per_degree)
-        else:
-            cone = 1
-
-        result = _uvmet(u, v, lat, lon, cen_lon, cone)
+        result = _uvmet_rotate(u, v, rot)
 
         if squeeze:
             result = result.squeeze()
@@ -198,6 +316,101 @@ def _get_uvmet(wrfin, timeidx=0, method="cat", squeeze=True,
         return result
 
 
+def _get_uvmet_wspd_wdir(wrfin, timeidx=0, method="cat", squeeze=True,
+                         cache=None, meta=True, _key=None,
+                         ten_m=False, units="m s-1"):
+    """Return the wind speed and wind direction for the wind rotated to
+    earth coordinates.
+
+    For Lambert and Polar Stereographic domains, the wind speed and wind
+    direction are computed in the same pass that rotates the winds, so the
+    rotated u,v components are never stored.
+
+    The leftmost dimension of the returned array represents two different
+    quantities:
+
+        - return_val[0,...] will contain WSPD_EARTH
+        - return_val[1,...] will contain WDIR_EARTH
+
+    Args:
+
+        wrfin (:class:`netCDF4.Dataset`, :class:`Nio.NioFile`, or an \
+            iterable): WRF-ARW NetCDF
+            data as a :class:`netCDF4.Dataset`, :class:`Nio.NioFile`
+            or an iterable sequence of the aforementioned types.
+
+        timeidx (:obj:`int` or :data:`wrf.ALL_TIMES`, optional): The
+            desired time index. This value can be a positive integer,
+            negative integer, or
+            :data:`wrf.ALL_TIMES` (an alias for None) to return
+            all times in the file or sequence. The default is 0.
+
+        method (:obj:`str`, optional): The aggregation method to use for
+            sequences.  Must be either 'cat' or 'join'.
+            'cat' combines the data along the Time dimension.
+            'join' creates a new dimension for the file index.
+            The default is 'cat'.
+
+        squeeze (:obj:`bool`, optional): Set to False to prevent dimensions
+            with a size of 1 from being automatically removed from the shape
+            of the output. Default is True.
+
+        cache (:obj:`dict`, optional): A dictionary of (varname, ndarray)
+            that can be used to supply pre-extracted NetCDF variables to the
+            computational routines.  It is primarily used for internal
+            purposes, but can also be used to improve performance by
+            eliminating the need to repeatedly extract the same variables
+            used in multiple diagnostics calculations, particularly when using
+            large sequences of files.
+            Default is None.
+
+        meta (:obj:`bool`, optional): Set to False to disable metadata and
+            return :class:`numpy.ndarray` instead of
+            :class:`xarray.DataArray`.  Default is True.
+
+        _key (:obj:`int`, optional): A caching key. This is used for internal
+            purposes only.  Default is None.
+
+        ten_m (:obj:`bool`, optional): Set to True to use the 10m surface
+            winds, rather than the three-dimensional wind field.  Default is
+            False.
+
+        units (:obj:`str`): The desired units for the wind speed.  Default
+            is 'm s-1'.
+
+    Returns:
+
+        :class:`numpy.ndarray`: The wind speed and wind direction for the
+        wind rotated to earth coordinates, whose leftmost dimension is 2
+        (0=WSPD_EARTH, 1=WDIR_EARTH).
+
+    """
+    map_proj_attrs = extract_global_attrs(wrfin, attrs="MAP_PROJ")
+    map_proj = map_proj_attrs["MAP_PROJ"]
+
+    if map_proj not in (1, 2):
+        uvmet = _get_uvmet(wrfin, timeidx, method, squeeze, cache, meta,
+                           _key, ten_m, units="m s-1")
+
+        return _calc_wspd_wdir(uvmet[0, ...], uvmet[1, ...], ten_m, units)
+
+    u, v = _get_uvmet_winds(wrfin, timeidx, method, squeeze, cache, _key,
+                            ten_m)
+
+    rot = _get_uvmet_rotation(wrfin, timeidx, method, squeeze, cache,
+                              _key, map_proj)
+
+    result = _uvmet_rotate(u, v, rot, wspd_wdir=True)
+
+    if squeeze:
+        result = result.squeeze()
+
+    # Only the wind speed has units
+    result[0, ...] = _uvmet_wspd_units(result[0, ...], units)
+
+    return result
+
+
 @set_wind_metadata(copy_varname=either("P", "PRES"),
                    name="uvmet",
                    description="earth rotated u,v",
@@ -354,6 +567,7 @@ def get_uvmet10(wrfin, timeidx=0, method="cat", squeeze=True,
                       True, units)
 
 
+@memoize("memo_uvmet_wspd_wdir")
 @set_wind_metadata(copy_varname=either("P", "PRES"),
                    name="uvmet_wspd_wdir",
                    description="earth rotated wspd,wdir",
@@ -430,13 +644,11 @@ def get_uvmet_wspd_wdir(wrfin, timeidx=0, method="cat", squeeze=True,
 
     """
 
-    uvmet = _get_uvmet(wrfin, timeidx, method, squeeze,
-                       cache, meta, _key, False, units="m s-1")
-
-    return _calc_wspd_wdir(uvmet[0, ..., :, :, :], uvmet[1, ..., :, :, :],
-                           False, units)
+    return _get_uvmet_wspd_wdir(wrfin, timeidx, method, squeeze, cache, meta,
+                                _key, False, units)
 
 
+@memoize("memo_uvmet10_wspd_wdir")
 @set_wind_metadata(copy_varname=either("PSFC", "F"),
                    name="uvmet10_wspd_wdir",
                    description="10m earth rotated wspd,wdir",
@@ -513,11 +725,8 @@ def get_uvmet10_wspd_wdir(wrfin, timeidx=0, method="cat", squeeze=True,
 
     """
 
-    uvmet10 = _get_uvmet(wrfin, timeidx, method, squeeze, cache, meta, _key,
-                         True, units="m s-1")
-
-    return _calc_wspd_wdir(uvmet10[0, ..., :, :], uvmet10[1, ..., :, :],
-                           True, units)
+    return _get_uvmet_wspd_wdir(wrfin, timeidx, method, squeeze, cache, meta,
+                                _key, True, units)
 
 
 def get_uvmet_wspd(wrfin, timeidx=0, method="cat", squeeze=True,
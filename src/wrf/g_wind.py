@@ -5,7 +5,7 @@ import numpy as np
 from .extension import _wspd, _wdir
 from .destag import destagger
 from .util import extract_vars, either
-from .decorators import convert_units
+from .decorators import convert_units, memoize
 from .metadecorators import set_wind_metadata
 
 
@@ -321,6 +321,7 @@ def get_w_destag(wrfin, timeidx=0, method="cat", squeeze=True,
     return w
 
 
+@memoize("memo_wspd_wdir")
 @set_wind_metadata(copy_varname=either("P", "PRES"),
                    name="wspd_wdir",
                    description="wspd,wdir in projection space",
@@ -412,6 +413,7 @@ def get_destag_wspd_wdir(wrfin, timeidx=0, method="cat",
     return _calc_wspd_wdir(u, v, False, units)
 
 
+@memoize("memo_wspd_wdir10")
 @set_wind_metadata(copy_varname=either("PSFC", "F"),
                    name="wspd_wdir10",
                    description="10m wspd,wdir in projection space",
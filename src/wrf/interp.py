@@ -1,17 +1,22 @@
 from __future__ import (absolute_import, division, print_function)
 
+from collections import OrderedDict
+
 import numpy as np
 import numpy.ma as ma
 
 from .extension import (_interpz3d, _vertcross, _interpline, _smooth2d,
-                        _monotonic, _vintrp, _interpz3d_lev2d)
+                        _monotonic, _vintrp, _interpz3d_lev2d,
+                        _interpz3d_weights, _interpz3d_lev2d_weights,
+                        _interpz3d_apply)
 
 from .metadecorators import set_interp_metadata
 from .util import (extract_vars, is_staggered, get_id, to_np, get_iterable,
-                   is_moving_domain, is_latlon_pair)
-from .py3compat import py3range
+                   is_moving_domain, is_latlon_pair, is_mapping)
+from .py3compat import py3range, viewkeys
 from .interputils import get_xy, get_xy_z_params, to_xy_coords
 from .constants import Constants, default_fill, ConversionFactors
+from .profiler import masked_values
 from wrf.g_terrain import get_terrain
 from wrf.g_geoht import get_height
 from wrf.g_temp import get_theta, get_temp, get_eth
@@ -110,7 +115,62 @@ def interplevel(field3d, vert, desiredlev, missing=default_fill(np.float64),
     else:
         result = _interpz3d_lev2d(field3d, vert, _desiredlev, missing)
 
-    masked = ma.masked_values(result, missing)
+    masked = masked_values(result, missing)
+
+    if not meta:
+        if squeeze:
+            return masked.squeeze()
+
+    return masked
+
+
+@set_interp_metadata("horiz")
+def _apply_vert_interpolator(field3d, vert, desiredlev, missing, squeeze,
+                             meta, interpolator):
+    """Apply the precomputed weights from a
+    :class:`wrf.VerticalInterpolator` to a three-dimensional field.
+
+    The *vert* and *desiredlev* arguments are only used to build the
+    metadata.
+
+    """
+    multiproduct = field3d.ndim - interpolator._vert_ndim == 1
+
+    if multiproduct:
+        shape_to_check = field3d.shape[1:]
+    else:
+        shape_to_check = field3d.shape
+
+    if shape_to_check != interpolator._vert_shape:
+        raise ValueError("'field3d' shape {} does not match the vertical "
+                         "coordinate shape {} used to create the "
+                         "interpolator".format(field3d.shape,
+                                               interpolator._vert_shape))
+
+    k1 = interpolator._k1
+    k2 = interpolator._k2
+    weights = interpolator._weights
+
+    # The 2D level weights are applied as a single level
+    if interpolator._levsare2d:
+        k1 = k1[..., np.newaxis, :, :]
+        k2 = k2[..., np.newaxis, :, :]
+        weights = weights[..., np.newaxis, :, :]
+
+    if not multiproduct:
+        result = _interpz3d_apply(field3d, k1, k2, weights, missing)
+    else:
+        outshape = field3d.shape[0:1] + weights.shape
+        result = np.empty(outshape, dtype=field3d.dtype)
+
+        for i in py3range(field3d.shape[0]):
+            result[i, :] = _interpz3d_apply(field3d[i, :], k1, k2, weights,
+                                            missing)[:]
+
+    if interpolator._levsare2d:
+        result = result[..., 0, :, :]
+
+    masked = masked_values(result, missing)
 
     if not meta:
         if squeeze:
@@ -119,6 +179,134 @@ def interplevel(field3d, vert, desiredlev, missing=default_fill(np.float64),
     return masked
 
 
+class VerticalInterpolator(object):
+    """A reusable vertical interpolator for horizontal levels.
+
+    The bracketing vertical indexes and interpolation weights are computed
+    once from the vertical coordinate and desired levels.  The interpolator
+    can then be called with any number of fields that share the same vertical
+    coordinate, which avoids searching each column again for every field.
+
+    The results are identical to :meth:`wrf.interplevel`, except for fields
+    with a leftmost product dimension (e.g. uvmet) and a single time.  For
+    these, :meth:`wrf.interplevel` returns 64-bit floats, while the
+    interpolator keeps the field's type, so the values agree only to the
+    precision of that type.
+
+    Example:
+
+        Interpolate several fields to a set of pressure levels
+
+        .. code-block:: python
+
+            from netCDF4 import Dataset
+            from wrf import getvar, VerticalInterpolator
+
+            wrfin = Dataset("wrfout_d02_2010-06-13_21:00:00")
+
+            p = getvar(wrfin, "pressure")
+            ht = getvar(wrfin, "z", units="dm")
+            tc = getvar(wrfin, "tc")
+
+            interp = VerticalInterpolator(p, [850, 700, 500, 300])
+
+            ht_plev = interp(ht)
+            tc_plev = interp(tc)
+
+    See Also:
+
+        :meth:`wrf.interplevel`
+
+    """
+    def __init__(self, vert, desiredlev,
+                 missing=default_fill(np.float64)):
+        """Initialize a :class:`wrf.VerticalInterpolator` object.
+
+        Args:
+
+            vert (:class:`xarray.DataArray` or :class:`numpy.ndarray`): A
+                three-dimensional array for the vertical coordinate, typically
+                pressure or height, with the rightmost dimensions of
+                nz x ny x nx.  Leftmost dimensions (e.g. Time) are allowed.
+
+            desiredlev (:obj:`float`, 1D sequence, or \
+            :class:`numpy.ndarray`): The desired vertical level(s). This can
+                be a single value (e.g. 500), a sequence of values
+                (e.g. [1000, 850, 700, 500, 250]), or a multidimensional
+                array where the right two dimensions (ny x nx) must match
+                *vert*, and any leftmost dimensions match vert.shape[:-3]
+                (e.g. planetary boundary layer). Must be in the same units
+                as the *vert* parameter.
+
+            missing (:obj:`float`): The fill value to use for the output.
+                Default is :data:`wrf.default_fill(numpy.float64)`.
+
+        """
+        _desiredlev = np.asarray(desiredlev)
+        if _desiredlev.ndim == 0:
+            _desiredlev = np.array([desiredlev], np.float64)
+            levsare2d = False
+        else:
+            levsare2d = _desiredlev.ndim >= 2
+
+        if levsare2d:
+            if _desiredlev.ndim != 2:
+                if (_desiredlev.shape[0:-2] != vert.shape[0:-3] or
+                        _desiredlev.shape[-2:] != vert.shape[-2:]):
+                    raise ValueError("'vert' and 'desiredlev' must have "
+                                     "the same leftmost and rightmost "
+                                     "dimensions")
+            elif _desiredlev.shape != vert.shape[-2:]:
+                raise ValueError("'vert' and 'desiredlev' must have the "
+                                 "same rightmost dimensions")
+
+            self._k1, self._k2, self._weights = _interpz3d_lev2d_weights(
+                vert, _desiredlev)
+        else:
+            self._k1, self._k2, self._weights = _interpz3d_weights(
+                vert, _desiredlev)
+
+        self._vert = vert
+        self._vert_ndim = vert.ndim
+        self._vert_shape = vert.shape
+        self._desiredlev = desiredlev
+        self._levsare2d = levsare2d
+        self._missing = missing
+
+    def __call__(self, field3d, squeeze=True, meta=True):
+        """Return the three-dimensional field interpolated to the
+        levels used to create the interpolator.
+
+        Args:
+
+            field3d (:class:`xarray.DataArray` or :class:`numpy.ndarray`): A
+                three-dimensional field to interpolate, with the same shape
+                as the vertical coordinate used to create the interpolator.
+                An extra leftmost dimension for the product type (e.g. uvmet)
+                is also allowed.
+
+            squeeze (:obj:`bool`, optional): Set to False to prevent
+                dimensions with a size of 1 from being automatically removed
+                from the shape of the output. Default is True.
+
+            meta (:obj:`bool`): Set to False to disable metadata and return
+                :class:`numpy.ndarray` instead of
+                :class:`xarray.DataArray`.  Default is True.
+
+        Returns:
+
+            :class:`xarray.DataArray` or :class:`numpy.ndarray`: The
+            interpolated variable.  If xarray is enabled and
+            the *meta* parameter is True, then the result will be an
+            :class:`xarray.DataArray` object.  Otherwise, the result will
+            be a :class:`numpy.ndarray` object with no metadata.
+
+        """
+        return _apply_vert_interpolator(field3d, self._vert,
+                                        self._desiredlev, self._missing,
+                                        squeeze, meta, self)
+
+
 @set_interp_metadata("cross")
 def vertcross(field3d, vert, levels=None, missing=default_fill(np.float64),
               wrfin=None, timeidx=0, stagger=None, projection=None,
@@ -359,7 +547,7 @@ def vertcross(field3d, vert, levels=None, missing=default_fill(np.float64),
             result[i, :] = _vertcross(field3d[i, :], xy, var2dz, z_var2d,
                                       missing)[:]
 
-    return ma.masked_values(result, missing)
+    return masked_values(result, missing)
 
 
 @set_interp_metadata("line")
@@ -574,8 +762,11 @@ def vinterp(wrfin, field, vert_coord, interp_levels, extrapolate=False,
             :class:`Nio.NioFile` or an iterable sequence of the
             aforementioned types.
 
-        field (:class:`xarray.DataArray` or :class:`numpy.ndarray`): A
-            three-dimensional field.
+        field (:class:`xarray.DataArray`, :class:`numpy.ndarray`, sequence, \
+        or mapping): A three-dimensional field. To interpolate several
+            fields at once, this can also be a sequence or mapping of
+            three-dimensional fields. The vertical coordinate and surface
+            variables are only computed once for all of the fields.
 
         vert_coord (:obj:`str`): A string indicating the vertical coordinate
             type to interpolate to.
@@ -602,8 +793,11 @@ def vinterp(wrfin, field, vert_coord, interp_levels, extrapolate=False,
             will be used. Extrapolation is performed using standard atmosphere.
             Default is False.
 
-        field_type (:obj:`str`, optional):
-            The type of field.  Default is None.
+        field_type (:obj:`str`, sequence, or mapping, optional):
+            The type of field.  When *field* is a sequence or mapping, this
+            can also be a sequence or mapping with a type for each field,
+            otherwise the same type is used for all fields.
+            Default is None.
 
             Valid strings are:
                 * 'none': None
@@ -656,15 +850,66 @@ def vinterp(wrfin, field, vert_coord, interp_levels, extrapolate=False,
         The interpolated variable.  If xarray is enabled and
         the *meta* parameter is True, then the result will be a
         :class:`xarray.DataArray` object.  Otherwise, the result will be a
-        :class:`numpy.ndarray` object with no metadata.
+        :class:`numpy.ndarray` object with no metadata.  If *field* is a
+        sequence or mapping, then a :obj:`list` or
+        :class:`collections.OrderedDict` of the interpolated variables is
+        returned.
+
+    Example:
+
+        Interpolate several fields to potential temperature surfaces
+
+        .. code-block:: python
+
+            from netCDF4 import Dataset
+            from wrf import getvar, vinterp
+
+            wrfin = Dataset("wrfout_d02_2010-06-13_21:00:00")
+
+            fields = {"tk": getvar(wrfin, "tk"),
+                      "pvo": getvar(wrfin, "pvo"),
+                      "ua": getvar(wrfin, "ua")}
+
+            field_types = {"tk": "tk", "pvo": "none", "ua": "none"}
+
+            result = vinterp(wrfin, fields, "theta", [290, 300, 310],
+                             field_type=field_types)
+
+            tk_theta = result["tk"]
 
     """
     _key = get_id(wrfin)
 
     _wrfin = get_iterable(wrfin)
 
+    # Multiple fields share the same vertical coordinate and surface
+    # variables, which only need to be computed once
+    if is_mapping(field):
+        field_keys = list(viewkeys(field))
+        fields = [field[key] for key in field_keys]
+    elif isinstance(field, (list, tuple)):
+        field_keys = None
+        fields = list(field)
+    else:
+        field_keys = None
+        fields = [field]
+
+    if is_mapping(field_type):
+        if field_keys is None:
+            raise ValueError("'field_type' can only be a mapping when "
+                             "'field' is a mapping")
+        field_types = [field_type.get(key, None) for key in field_keys]
+    elif isinstance(field_type, (list, tuple)):
+        if len(field_type) != len(fields):
+            raise ValueError("'field_type' must contain a type for each "
+                             "field")
+        field_types = list(field_type)
+    else:
+        field_types = [field_type] * len(fields)
+
     # Remove case sensitivity
-    field_type = field_type.lower() if field_type is not None else "none"
+    field_types = [ftype.lower() if ftype is not None else "none"
+                   for ftype in field_types]
     vert_coord = vert_coord.lower() if vert_coord is not None else "none"
 
     valid_coords = ("pressure", "pres", "p", "ght_msl",
@@ -675,39 +920,6 @@ def vinterp(wrfin, field, vert_coord, interp_levels, extrapolate=False,
                          "tc", "tk", "theta", "th", "theta-e", "thetae",
                          "eth", "ght", 'z_km', 'ght_km')
 
-    icase_lookup = {"none": 0,
-                    "p": 1,
-                    "pres": 1,
-                    "pressure": 1,
-                    "p_hpa": 1,
-                    "pres_hpa": 1,
-                    "pressure_hpa": 1,
-                    "z": 2,
-                    "ght": 2,
-                    "z_km": 2,
-                    "ght_km": 2,
-                    "tc": 3,
-                    "tk": 4,
-                    "theta": 5,
-                    "th": 5,
-                    "theta-e": 6,
-                    "thetae": 6,
-                    "eth": 6}
-
-    in_unitmap = {"p_hpa": 1.0/ConversionFactors.PA_TO_HPA,
-                  "pres_hpa": 1.0/ConversionFactors.PA_TO_HPA,
-                  "pressure_hpa": 1.0/ConversionFactors.PA_TO_HPA,
-                  "z_km": 1.0/ConversionFactors.M_TO_KM,
-                  "ght_km": 1.0/ConversionFactors.M_TO_KM,
-                  }
-
-    out_unitmap = {"p_hpa": ConversionFactors.PA_TO_HPA,
-                   "pres_hpa": ConversionFactors.PA_TO_HPA,
-                   "pressure_hpa": ConversionFactors.PA_TO_HPA,
-                   "z_km": ConversionFactors.M_TO_KM,
-                   "ght_km": ConversionFactors.M_TO_KM,
-                   }
-
     # These constants match what's in the fortran code.
     rgas = Constants.RD
     ussalr = Constants.USSALR
@@ -721,8 +933,9 @@ def vinterp(wrfin, field, vert_coord, interp_levels, extrapolate=False,
         raise ValueError("'interp_levels' contains no values")
 
     # Check if field is staggered
-    if is_staggered(_wrfin, field):
-        raise ValueError("Please unstagger field in the vertical")
+    for _field in fields:
+        if is_staggered(_wrfin, _field):
+            raise ValueError("Please unstagger field in the vertical")
 
     # Check for valid coord
     if vert_coord not in valid_coords:
@@ -730,17 +943,13 @@ def vinterp(wrfin, field, vert_coord, interp_levels, extrapolate=False,
                          "coordinate type".format(vert_coord))
 
     # Check for valid field type
-    if field_type not in valid_field_types:
-        raise ValueError("'{}' is not a valid field type".format(field_type))
+    for ftype in field_types:
+        if ftype not in valid_field_types:
+            raise ValueError("'{}' is not a valid field type".format(ftype))
 
     log_p_int = 1 if log_p else 0
 
-    icase = 0
-    extrap = 0
-
-    if extrapolate:
-        extrap = 1
-        icase = icase_lookup[field_type]
+    extrap = 1 if extrapolate else 0
 
     # Extract variables
     ncvars = extract_vars(_wrfin, timeidx, ("PSFC", "QVAPOR"),
@@ -800,11 +1009,6 @@ def vinterp(wrfin, field, vert_coord, interp_levels, extrapolate=False,
 
         vcord_array = _monotonic(t, p_hpa, coriolis, idir, delta, icorsw)
 
-        # We only extrapolate temperature fields below ground
-        # if we are interpolating to pressure or height vertical surfaces.
-
-        icase = 0
-
     elif vert_coord in ("theta-e", "thetae", "eth"):
         vcor = 5
         icorsw = 0
@@ -821,8 +1025,67 @@ def vinterp(wrfin, field, vert_coord, interp_levels, extrapolate=False,
         p_hpa = p * ConversionFactors.PA_TO_HPA
 
         vcord_array = _monotonic(eth, p_hpa, coriolis, idir, delta, icorsw)
-        # We only extrapolate temperature fields below ground if we are
-        # interpolating to pressure or height vertical surfaces
+
+    results = [_vinterp_field(_field, ftype, p, tk, qv, ght, terht, sfp,
+                              smsfp, vcord_array, interp_levels, extrap,
+                              vcor, log_p_int)
+               for _field, ftype in zip(fields, field_types)]
+
+    if field_keys is not None:
+        return OrderedDict(zip(field_keys, results))
+
+    if isinstance(field, (list, tuple)):
+        return results
+
+    return results[0]
+
+
+def _vinterp_field(field, field_type, p, tk, qv, ght, terht, sfp, smsfp,
+                   vcord_array, interp_levels, extrap, vcor, log_p_int):
+    """Return a single field interpolated with :meth:`wrf.vinterp`.
+
+    The vertical coordinate and surface variables are supplied by
+    :meth:`wrf.vinterp`, so they can be shared by several fields.
+
+    """
+    icase_lookup = {"none": 0,
+                    "p": 1,
+                    "pres": 1,
+                    "pressure": 1,
+                    "p_hpa": 1,
+                    "pres_hpa": 1,
+                    "pressure_hpa": 1,
+                    "z": 2,
+                    "ght": 2,
+                    "z_km": 2,
+                    "ght_km": 2,
+                    "tc": 3,
+                    "tk": 4,
+                    "theta": 5,
+                    "th": 5,
+                    "theta-e": 6,
+                    "thetae": 6,
+                    "eth": 6}
+
+    in_unitmap = {"p_hpa": 1.0/ConversionFactors.PA_TO_HPA,
+                  "pres_hpa": 1.0/ConversionFactors.PA_TO_HPA,
+                  "pressure_hpa": 1.0/ConversionFactors.PA_TO_HPA,
+                  "z_km": 1.0/ConversionFactors.M_TO_KM,
+                  "ght_km": 1.0/ConversionFactors.M_TO_KM,
+                  }
+
+    out_unitmap = {"p_hpa": ConversionFactors.PA_TO_HPA,
+                   "pres_hpa": ConversionFactors.PA_TO_HPA,
+                   "pressure_hpa": ConversionFactors.PA_TO_HPA,
+                   "z_km": ConversionFactors.M_TO_KM,
+                   "ght_km": ConversionFactors.M_TO_KM,
+                   }
+
+    # We only extrapolate temperature fields below ground if we are
+    # interpolating to pressure or height vertical surfaces
+    if extrap and vcor not in (4, 5):
+        icase = icase_lookup[field_type]
+    else:
         icase = 0
 
     # Set the missing value
@@ -858,4 +1121,4 @@ def vinterp(wrfin, field, vert_coord, interp_levels, extrapolate=False,
     else:
         res_ = res
 
-    return ma.masked_values(res_, missing)
+    return masked_values(res_, missing)
@@ -7,22 +7,74 @@ import numpy as np
 import numpy.ma as ma
 
 from .extension import _interpline
-from .util import (extract_vars, either, from_args, arg_location,
-                   is_coordvar, latlon_coordvars, to_np,
+from .util import (extract_vars, extract_var_meta, either, from_args,
+                   arg_location, is_coordvar, latlon_coordvars, to_np,
                    from_var, iter_left_indexes, is_mapping,
-                   is_moving_domain, is_latlon_pair)
+                   is_moving_domain, is_latlon_pair, _parcel_names)
 from .coordpair import CoordPair
-from .py3compat import viewkeys, viewitems, py3range
+from .py3compat import viewkeys, viewitems, viewvalues, py3range
 from .interputils import get_xy_z_params, get_xy, to_xy_coords
 from .config import xarray_enabled
+from .profiler import masked_values, profiled_metadata
 
-if xarray_enabled():
+try:
     from xarray import DataArray
+except ImportError:
+    pass
+
+
+class _CopyVarCache(dict):
+    """The cache passed to a function wrapped by a metadata decorator.
+
+    The variable that the metadata is copied from is only read if the wrapped
+    function asks for it.  It is then returned the same way it would be if
+    it had been extracted with its metadata, but without building the
+    coordinates.
+
+    """
+    def __init__(self, cache, copy_var, extract_args):
+        super(_CopyVarCache, self).__init__(cache)
+        self._copy_var = copy_var
+        self._extract_args = extract_args
+
+    def __missing__(self, key):
+        if key != self._copy_var.name:
+            raise KeyError(key)
+
+        wrfin, timeidx, method, squeeze, cache, _key = self._extract_args
+        data = extract_vars(wrfin, timeidx, key, method, squeeze, cache,
+                            meta=False, _key=_key)[key]
+        value = to_np(DataArray(data, attrs=self._copy_var.attrs))
+        self[key] = value
+
+        return value
+
+
+def _get_copy_var(wrfin, timeidx, varname, method, squeeze, cache, _key):
+    """Return the variable to copy the metadata from and the cache to pass
+    to the wrapped function.
+
+    The metadata is built without reading the variable data when possible.
+
+    """
+    copy_var, has_data = extract_var_meta(wrfin, timeidx, varname, method,
+                                          squeeze, cache, _key)
+
+    # Make a copy so we don't modify a user supplied cache
+    if has_data:
+        new_cache = dict(cache)
+        new_cache[varname] = copy_var
+    else:
+        new_cache = _CopyVarCache(cache, copy_var,
+                                  (wrfin, timeidx, method, squeeze, cache,
+                                   _key))
+
+    return copy_var, new_cache
 
 
 def copy_and_set_metadata(copy_varname=None, delete_attrs=None, name=None,
                           remove_dims=None, dimnames=None,
-                          coords=None, **fixed_attrs):
+                          coords=None, layer_args=None, **fixed_attrs):
     """A decorator that sets the metadata for a wrapped function's output.
 
     Generally, the metadata is copied from the variable specified by
@@ -64,6 +116,13 @@ def copy_and_set_metadata(copy_varname=None, delete_attrs=None, name=None,
             value to manually specify the :attr:`xarray.DataArray.coords`
             attribute.  Default is None.
 
+        layer_args (sequence of :obj:`str`, optional): A sequence of the
+            wrapped function's argument names that accept one value per
+            layer.  If any of these arguments is a sequence, a 'layer'
+            dimension is added to the left of the two rightmost dimensions,
+            and the argument values are added as 'layer' coordinates.
+            Default is None.
+
         **fixed_attrs: These keyword arguments are added to the
             :attr:`xarray.DataArray.attrs` attribute.
 
@@ -108,18 +167,9 @@ def copy_and_set_metadata(copy_varname=None, delete_attrs=None, name=None,
         else:
             _copy_varname = copy_varname
 
-        # Extract the copy_from argument
-        var_to_copy = None if cache is None else cache.get(_copy_varname,
-                                                           None)
-
-        if var_to_copy is None:
-            var_to_copy = extract_vars(wrfin, timeidx, (_copy_varname,),
-                                       method, squeeze, cache,
-                                       meta=True, _key=_key)[_copy_varname]
-
-        # Make a copy so we don't modify a user supplied cache
-        new_cache = dict(cache)
-        new_cache[_copy_varname] = var_to_copy
+        var_to_copy, new_cache = _get_copy_var(wrfin, timeidx,
+                                               _copy_varname, method,
+                                               squeeze, cache, _key)
 
         # Don't modify the original args/kargs.  The args need to be a list
         # so it can be modified.
@@ -154,6 +204,17 @@ def copy_and_set_metadata(copy_varname=None, delete_attrs=None, name=None,
                     except KeyError:
                         pass
 
+        if layer_args is not None:
+            layer_vals = from_args(wrapped, layer_args, *args, **kwargs)
+            if any(np.ndim(val) > 0 for val in viewvalues(layer_vals)):
+                outdimnames = list(outdimnames)
+                outdimnames.insert(len(outdimnames) - 2, "layer")
+                outcoords = OrderedDict(outcoords)
+                nlayers = result.shape[-3]
+                for argname, val in viewitems(layer_vals):
+                    outcoords[argname] = ("layer",
+                                          np.broadcast_to(val, (nlayers,)))
+
         if name is not None:
             outname = name
 
@@ -177,7 +238,7 @@ def copy_and_set_metadata(copy_varname=None, delete_attrs=None, name=None,
         return DataArray(result, name=outname, coords=outcoords,
                          dims=outdimnames, attrs=outattrs)
 
-    return func_wrapper
+    return profiled_metadata(func_wrapper)
 
 
 def set_wind_metadata(copy_varname, name, description,
@@ -256,13 +317,8 @@ def set_wind_metadata(copy_varname, name, description,
         else:
             _copy_varname = copy_varname
 
-        copy_var = extract_vars(wrfin, timeidx, _copy_varname,
-                                method, squeeze, cache,
-                                meta=True, _key=_key)[_copy_varname]
-
-        # Make a copy so we don't modify a user supplied cache
-        new_cache = dict(cache)
-        new_cache[_copy_varname] = copy_var
+        copy_var, new_cache = _get_copy_var(wrfin, timeidx, _copy_varname,
+                                            method, squeeze, cache, _key)
 
         # Don't modify the original args/kargs.  The args need to be a list
         # so it can be modified.
@@ -317,10 +373,10 @@ def set_wind_metadata(copy_varname, name, description,
         return DataArray(result, name=outname, coords=outcoords,
                          dims=outdimnames, attrs=outattrs)
 
-    return func_wrapper
+    return profiled_metadata(func_wrapper)
 
 
-def set_cape_metadata(is2d):
+def set_cape_metadata(is2d, parcel_arg=None):
     """A decorator that sets the metadata for a wrapped CAPE function's output.
 
     This is a special metadata decorator for working with CAPE functions.
@@ -334,6 +390,11 @@ def set_cape_metadata(is2d):
             two-dimensional CAPE routine.  Set to False for a
             three-dimensional CAPE routine.
 
+        parcel_arg (:obj:`str`, optional): The wrapped function argument that
+            names the parcel types for a two-dimensional CAPE routine with
+            a 'parcel' dimension to the right of the product dimension.
+            Default is None.
+
     Returns:
 
         :class:`xarray.DataArray` or :class:`numpy.ndarray`: The wrapped
@@ -367,12 +428,8 @@ def set_cape_metadata(is2d):
             cache = {}
 
         _copy_varname = "P"
-        copy_var = extract_vars(wrfin, timeidx, _copy_varname, method, squeeze,
-                                cache, meta=True, _key=_key)[_copy_varname]
-
-        # Make a copy so we don't modify a user supplied cache
-        new_cache = dict(cache)
-        new_cache[_copy_varname] = copy_var
+        copy_var, new_cache = _get_copy_var(wrfin, timeidx, _copy_varname,
+                                            method, squeeze, cache, _key)
 
         # Don't modify the original args/kargs.  The args need to be a list
         # so it can be modified.
@@ -386,7 +443,20 @@ def set_cape_metadata(is2d):
         outattrs.update(copy_var.attrs)
         outdimnames = [None] * result.ndim
 
-        if is2d:
+        if parcel_arg is not None:
+            parcels = from_args(wrapped, (parcel_arg,),
+                                *args, **kwargs)[parcel_arg]
+            # Right dims
+            outdimnames[-2:] = copy_var.dims[-2:]
+            # Left dims
+            outdimnames[2:-2] = copy_var.dims[0:-3]
+            outdimnames[0] = "cape_cin_lcl_lfc"
+            outdimnames[1] = "parcel"
+            outattrs["description"] = "cape ; cin ; lcl ; lfc"
+            outattrs["MemoryOrder"] = "XY"
+            outattrs["units"] = "J kg-1 ; J kg-1 ; m ; m"
+            outname = "cape_parcels"
+        elif is2d:
             # Right dims
             outdimnames[-2:] = copy_var.dims[-2:]
             # Left dims
@@ -423,7 +493,10 @@ def set_cape_metadata(is2d):
             elif key == "Time":
                 outcoords[key] = to_np(dataarray)
 
-        if is2d:
+        if parcel_arg is not None:
+            outcoords["cape_cin_lcl_lfc"] = ["cape", "cin", "lcl", "lfc"]
+            outcoords["parcel"] = list(_parcel_names(parcels))
+        elif is2d:
             outcoords["mcape_mcin_lcl_lfc"] = ["mcape", "mcin", "lcl", "lfc"]
         else:
             outcoords["cape_cin"] = ["cape", "cin"]
@@ -431,7 +504,7 @@ def set_cape_metadata(is2d):
         return DataArray(result, name=outname, coords=outcoords,
                          dims=outdimnames, attrs=outattrs)
 
-    return func_wrapper
+    return profiled_metadata(func_wrapper)
 
 
 def set_cloudfrac_metadata():
@@ -484,12 +557,8 @@ def set_cloudfrac_metadata():
             cache = {}
 
         _copy_varname = "P"
-        copy_var = extract_vars(wrfin, timeidx, _copy_varname, method, squeeze,
-                                cache, meta=True, _key=_key)[_copy_varname]
-
-        # Make a copy so we don't modify a user supplied cache
-        new_cache = dict(cache)
-        new_cache[_copy_varname] = copy_var
+        copy_var, new_cache = _get_copy_var(wrfin, timeidx, _copy_varname,
+                                            method, squeeze, cache, _key)
 
         # Don't modify the original args/kargs.  The args need to be a list
         # so it can be modified.
@@ -550,7 +619,7 @@ def set_cloudfrac_metadata():
         return DataArray(result, name=outname, coords=outcoords,
                          dims=outdimnames, attrs=outattrs)
 
-    return func_wrapper
+    return profiled_metadata(func_wrapper)
 
 
 def set_latlon_metadata(xy=False):
@@ -638,7 +707,7 @@ def set_latlon_metadata(xy=False):
 
         return da
 
-    return func_wrapper
+    return profiled_metadata(func_wrapper)
 
 
 def set_height_metadata(geopt=False, stag=False):
@@ -705,14 +774,10 @@ def set_height_metadata(geopt=False, stag=False):
         if ht_metadata_varname == "GHT":
             is_met_em = True
 
-        ht_var = extract_vars(wrfin, timeidx, ht_metadata_varname,
-                              method, squeeze, cache, meta=True,
-                              _key=_key)
-        ht_metadata_var = ht_var[ht_metadata_varname]
-
-        # Make a copy so we don't modify a user supplied cache
-        new_cache = dict(cache)
-        new_cache[ht_metadata_varname] = ht_metadata_var
+        ht_metadata_var, new_cache = _get_copy_var(wrfin, timeidx,
+                                                   ht_metadata_varname,
+                                                   method, squeeze, cache,
+                                                   _key)
 
         # Don't modify the original args/kargs.  The args need to be a list
         # so it can be modified.
@@ -750,7 +815,7 @@ def set_height_metadata(geopt=False, stag=False):
         return DataArray(result, name=outname, dims=outdimnames,
                          coords=outcoords, attrs=outattrs)
 
-    return func_wrapper
+    return profiled_metadata(func_wrapper)
 
 
 def _set_horiz_meta(wrapped, instance, args, kwargs):
@@ -1403,6 +1468,57 @@ def _set_vinterp_meta(wrapped, instance, args, kwargs):
 
     result = wrapped(*args, **kwargs)
 
+    # Multiple fields were interpolated at once
+    if is_mapping(field):
+        if is_mapping(field_type):
+            types = {key: field_type.get(key, None) for key in viewkeys(field)}
+        elif isinstance(field_type, (list, tuple)):
+            types = dict(zip(viewkeys(field), field_type))
+        else:
+            types = {key: field_type for key in viewkeys(field)}
+
+        return OrderedDict((key, _vinterp_field_meta(val, field[key],
+                                                     types[key], vert_coord,
+                                                     interp_levels))
+                           for key, val in viewitems(result))
+
+    if isinstance(field, (list, tuple)):
+        if isinstance(field_type, (list, tuple)):
+            types = field_type
+        else:
+            types = [field_type] * len(field)
+
+        return [_vinterp_field_meta(res, _field, ftype, vert_coord,
+                                    interp_levels)
+                for res, _field, ftype in zip(result, field, types)]
+
+    return _vinterp_field_meta(result, field, field_type, vert_coord,
+                               interp_levels)
+
+
+def _vinterp_field_meta(result, field, field_type, vert_coord,
+                        interp_levels):
+    """Return a :class:`xarray.DataArray` for a single field interpolated
+    with :meth:`wrf.vinterp`.
+
+    Args:
+
+        result (:class:`numpy.ndarray`): The interpolated field.
+
+        field (:class:`xarray.DataArray` or :class:`numpy.ndarray`): The
+            field that was interpolated.
+
+        field_type (:obj:`str`): The type of field.
+
+        vert_coord (:obj:`str`): The vertical coordinate type.
+
+        interp_levels (sequence): The interpolation levels.
+
+    Returns:
+
+        :class:`xarray.DataArray`: The interpolated field with metadata.
+
+    """
     # Defaults, in case the data isn't a DataArray
     outname = None
     outdimnames = None
@@ -1741,7 +1857,7 @@ def set_interp_metadata(interp_type):
         elif interp_type == "xy":
             return _set_xy_meta(wrapped, instance, args, kwargs)
 
-    return func_wrapper
+    return profiled_metadata(func_wrapper)
 
 
 def set_alg_metadata(alg_ndims, refvarname,
@@ -1820,7 +1936,7 @@ def set_alg_metadata(alg_ndims, refvarname,
         if missingval is not None:
             outattrs["_FillValue"] = missingval
             outattrs["missing_value"] = missingval
-            result = np.ma.masked_values(result, missingval)
+            result = masked_values(result, missingval)
 
         if units is not None:
             if isinstance(units, from_var):
@@ -1895,7 +2011,7 @@ def set_alg_metadata(alg_ndims, refvarname,
 
         return out
 
-    return func_wrapper
+    return profiled_metadata(func_wrapper)
 
 
 def set_smooth_metdata():
@@ -1938,7 +2054,7 @@ def set_smooth_metdata():
         return DataArray(result, name=outname, coords=outcoords,
                          dims=outdimnames, attrs=outattrs)
 
-    return func_wrapper
+    return profiled_metadata(func_wrapper)
 
 
 def set_uvmet_alg_metadata(units=None, description="earth rotated u,v",
@@ -2018,10 +2134,10 @@ def set_uvmet_alg_metadata(units=None, description="earth rotated u,v",
 
         return out
 
-    return func_wrapper
+    return profiled_metadata(func_wrapper)
 
 
-def set_cape_alg_metadata(is2d, copyarg="pres_hpa"):
+def set_cape_alg_metadata(is2d, copyarg="pres_hpa", parcel_arg=None):
     """A decorator that sets the metadata for the wrapped raw CAPE diagnostic
     function.
 
@@ -2033,6 +2149,11 @@ def set_cape_alg_metadata(is2d, copyarg="pres_hpa"):
         copyarg (:obj:`str`): The wrapped function argument to use for
             copying dimension names.  Default is 'pres_hpa'.
 
+        parcel_arg (:obj:`str`, optional): The wrapped function argument that
+            names the parcel types for a two-dimensional CAPE calculation
+            with a 'parcel' dimension to the right of the product dimension.
+            Default is None.
+
     Returns:
 
         :class:`xarray.DataArray` or :class:`numpy.ndarray`: The wrapped
@@ -2058,6 +2179,34 @@ def set_cape_alg_metadata(is2d, copyarg="pres_hpa"):
         p = argvals[copyarg]
         missing = argvals["missing"]
 
+        if parcel_arg is not None:
+            parcels = from_args(wrapped, (parcel_arg,),
+                                *args, **kwargs)[parcel_arg]
+
+            outdims = ["dim_{}".format(i) for i in py3range(result.ndim)]
+
+            if isinstance(p, DataArray):
+                # Right dims
+                outdims[-2:] = p.dims[-2:]
+                # Left dims
+                outdims[2:-2] = p.dims[0:-3]
+
+            outdims[0] = "cape_cin_lcl_lfc"
+            outdims[1] = "parcel"
+
+            outcoords = {"cape_cin_lcl_lfc": ["cape", "cin", "lcl", "lfc"],
+                         "parcel": list(_parcel_names(parcels))}
+
+            outattrs = OrderedDict()
+            outattrs["description"] = "cape ; cin ; lcl ; lfc"
+            outattrs["units"] = "J kg-1 ; J kg-1 ; m ; m"
+            outattrs["MemoryOrder"] = "XY"
+            outattrs["_FillValue"] = missing
+            outattrs["missing_value"] = missing
+
+            return DataArray(result, name="cape_parcels", dims=outdims,
+                             coords=outcoords, attrs=outattrs)
+
         # Note: 2D/3D cape supports using only a single column of data
         is1d = p.ndim == 1
 
@@ -2122,7 +2271,7 @@ def set_cape_alg_metadata(is2d, copyarg="pres_hpa"):
 
         return out
 
-    return func_wrapper
+    return profiled_metadata(func_wrapper)
 
 
 def set_cloudfrac_alg_metadata(copyarg="vert"):
@@ -2197,7 +2346,7 @@ def set_cloudfrac_alg_metadata(copyarg="vert"):
 
         return out
 
-    return func_wrapper
+    return profiled_metadata(func_wrapper)
 
 
 def set_destag_metadata():
@@ -2265,4 +2414,4 @@ def set_destag_metadata():
 
         return out
 
-    return func_wrapper
+    return profiled_metadata(func_wrapper)
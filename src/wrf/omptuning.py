@@ -0,0 +1,397 @@
+from __future__ import (absolute_import, division, print_function)
+
+from bisect import bisect_right
+from contextlib import contextmanager
+from threading import local, Lock
+
+import numpy as np
+
+from ._wrffortran import (fomp_set_num_threads,
+                          fomp_get_max_threads, fomp_set_schedule,
+                          fomp_get_schedule, fomp_get_num_procs,
+                          omp_constants)
+from .py3compat import viewitems
+from .config import omp_enabled, get_memo_size, set_memo_size
+
+_local_omp = local()
+
+# Kernel name -> sorted list of (size, num_threads, schedule, chunk_size)
+_omp_table = {}
+_omp_lock = Lock()
+
+_DEFAULT_PRODUCTS = ("slp", "tk", "rh", "td", "eth", "avo", "pvo", "dbz",
+                     "cape_2d", "cape_3d", "ctt", "cloudfrac", "uvmet",
+                     "helicity", "updraft_helicity", "pw", "wspd_wdir",
+                     "twb", "omg")
+
+
+class _NullSettings(object):
+    """The settings used when no tuning applies.  It does nothing."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_SETTINGS = _NullSettings()
+
+
+class _KernelSettings(object):
+    """Apply a tuning table entry for the duration of a kernel call."""
+    __slots__ = ("entry", "saved")
+
+    def __init__(self, entry):
+        self.entry = entry
+
+    def __enter__(self):
+        _, num_threads, schedule, chunk_size = self.entry
+        self.saved = (fomp_get_max_threads(), fomp_get_schedule())
+        fomp_set_num_threads(num_threads)
+        fomp_set_schedule(schedule, chunk_size)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        num_threads, (schedule, chunk_size) = self.saved
+        fomp_set_num_threads(num_threads)
+        fomp_set_schedule(schedule, chunk_size)
+        return False
+
+
+def _lookup(kernel, size):
+    """Return the tuning table entry for *kernel* at *size*, or None.
+
+    The entry calibrated for the largest size not above *size* is used.
+    Smaller arrays use the smallest calibrated entry.
+
+    """
+    entries = _omp_table.get(kernel)
+    if not entries:
+        return None
+
+    idx = bisect_right([entry[0] for entry in entries], size)
+    return entries[max(idx - 1, 0)]
+
+
+def kernel_omp_settings(kernel, args):
+    """Return a context manager that applies the OpenMP tuning for a kernel.
+
+    This is used by :meth:`wrf.decorators.extract_and_transpose` around
+    every compiled routine.  The settings are not applied inside of
+    :meth:`wrf.omp_threads` or when the tuning table has no entry for
+    *kernel*.
+
+    Args:
+
+        kernel (:obj:`str`): The kernel name.
+
+        args (sequence): The kernel's positional arguments.  The size of
+            the first :class:`numpy.ndarray` is used to look up the entry.
+
+    Returns:
+
+        A context manager.
+
+    """
+    sizes = getattr(_local_omp, "sizes", None)
+    if not _omp_table and sizes is None:
+        return _NULL_SETTINGS
+
+    size = next((arg.size for arg in args if isinstance(arg, np.ndarray)),
+                0)
+
+    if sizes is not None:
+        sizes[kernel] = max(size, sizes.get(kernel, 0))
+
+    if getattr(_local_omp, "override", 0):
+        return _NULL_SETTINGS
+
+    entry = _lookup(kernel, size)
+    if entry is None or not omp_enabled():
+        return _NULL_SETTINGS
+
+    return _KernelSettings(entry)
+
+
+@contextmanager
+def omp_threads(num_threads=None, schedule=None, chunk_size=0):
+    """Return a context manager that sets the OpenMP threads and schedule.
+
+    The previous settings are restored when the context exits.  While the
+    context is active, the per-kernel tuning table set by
+    :meth:`wrf.set_omp_tuning` or :meth:`wrf.calibrate_omp` is not
+    applied, so every kernel uses these settings.
+
+    The settings only apply to the calling thread.
+
+    Args:
+
+        num_threads (:obj:`int`, optional): The number of threads.  Default
+            is None, which keeps the current number of threads.
+
+        schedule (:obj:`int`, optional): The schedule kind, which must be
+            one of :data:`wrf.OMP_SCHED_STATIC`,
+            :data:`wrf.OMP_SCHED_DYNAMIC`, :data:`wrf.OMP_SCHED_GUIDED`,
+            or :data:`wrf.OMP_SCHED_AUTO`.  Default is None, which keeps
+            the current schedule.
+
+        chunk_size (:obj:`int`, optional): The chunk size for the schedule.
+            Default is 0, which uses the OpenMP default.
+
+    Returns:
+
+        A context manager.
+
+    Examples:
+
+        .. code-block:: python
+
+            from netCDF4 import Dataset
+            from wrf import getvar, omp_threads, OMP_SCHED_GUIDED
+
+            wrfnc = Dataset("wrfout_d02_2010-06-13_21:00:00")
+
+            with omp_threads(4, OMP_SCHED_GUIDED):
+                cape = getvar(wrfnc, "cape_3d")
+
+    """
+    if num_threads is not None and num_threads < 1:
+        raise ValueError("'num_threads' must be a positive integer")
+
+    enabled = omp_enabled()
+    if enabled:
+        saved = (fomp_get_max_threads(), fomp_get_schedule())
+        if num_threads is not None:
+            fomp_set_num_threads(num_threads)
+        if schedule is not None:
+            fomp_set_schedule(schedule, chunk_size)
+
+    _local_omp.override = getattr(_local_omp, "override", 0) + 1
+    try:
+        yield
+    finally:
+        _local_omp.override -= 1
+        if enabled:
+            fomp_set_num_threads(saved[0])
+            fomp_set_schedule(*saved[1])
+
+
+def set_omp_tuning(kernel, num_threads, schedule=None, chunk_size=0,
+                   min_size=0):
+    """Set the OpenMP settings used for a kernel.
+
+    Args:
+
+        kernel (:obj:`str`): The kernel name.  This is the same name used
+            in the 'kernel:<name>' stages of :meth:`wrf.profile`, for
+            example '_cape' or '_slp'.
+
+        num_threads (:obj:`int`): The number of threads.
+
+        schedule (:obj:`int`, optional): The schedule kind.  Default is
+            None, which uses :data:`wrf.OMP_SCHED_STATIC`.
+
+        chunk_size (:obj:`int`, optional): The chunk size for the schedule.
+            Default is 0, which uses the OpenMP default.
+
+        min_size (:obj:`int`, optional): The smallest input size, in
+            elements, that the setting applies to.  Several settings can be
+            made for different sizes.  Default is 0.
+
+    Returns:
+
+        None
+
+    """
+    if num_threads < 1:
+        raise ValueError("'num_threads' must be a positive integer")
+
+    if schedule is None:
+        schedule = omp_constants.fomp_sched_static
+
+    entry = (int(min_size), int(num_threads), int(schedule), int(chunk_size))
+
+    with _omp_lock:
+        entries = [x for x in _omp_table.get(kernel, ()) if x[0] != entry[0]]
+        entries.append(entry)
+        entries.sort()
+        _omp_table[kernel] = entries
+
+
+def get_omp_tuning():
+    """Return the per-kernel OpenMP tuning table.
+
+    Returns:
+
+        :obj:`dict`: A mapping of kernel name to a list of
+        (min_size, num_threads, schedule, chunk_size) tuples, sorted by
+        min_size.  The result can be passed back to
+        :meth:`wrf.set_omp_tuning_table`.
+
+    """
+    with _omp_lock:
+        return {kernel: list(entries)
+                for kernel, entries in viewitems(_omp_table)}
+
+
+def set_omp_tuning_table(table):
+    """Replace the per-kernel OpenMP tuning table.
+
+    Args:
+
+        table (:obj:`dict`): A mapping as returned by
+            :meth:`wrf.get_omp_tuning`.
+
+    Returns:
+
+        None
+
+    """
+    clear_omp_tuning()
+    for kernel, entries in viewitems(table):
+        for min_size, num_threads, schedule, chunk_size in entries:
+            set_omp_tuning(kernel, num_threads, schedule, chunk_size,
+                           min_size)
+
+
+def clear_omp_tuning():
+    """Remove all entries from the per-kernel OpenMP tuning table.
+
+    Returns:
+
+        None
+
+    """
+    with _omp_lock:
+        _omp_table.clear()
+
+
+def calibrate_omp(wrfin, products=None, thread_counts=None,
+                  schedules=None, chunk_sizes=(0, ), repeat=3, apply=True):
+    """Find the fastest OpenMP settings for each kernel.
+
+    Each product in *products* is computed with :meth:`wrf.getvar` for the
+    first time in *wrfin* using every combination of *thread_counts*,
+    *schedules*, and *chunk_sizes*.  The fastest settings for each kernel
+    are then added to the tuning table for the kernel's input size, so
+    calling this routine with files of different grid sizes builds up a
+    table that covers all of them.
+
+    Args:
+
+        wrfin (:class:`netCDF4.Dataset`, :class:`Nio.NioFile`, or an \
+            iterable): WRF-ARW NetCDF data used for the calibration.
+
+        products (sequence of :obj:`str`, optional): The products to
+            compute.  Default is None, which uses the products for the
+            heavier diagnostics.  Products that cannot be computed from
+            *wrfin* are skipped.
+
+        thread_counts (sequence of :obj:`int`, optional): The thread
+            counts to try.  Default is None, which tries 1 and the powers
+            of 2 up to the number of processors.
+
+        schedules (sequence of :obj:`int`, optional): The schedule kinds
+            to try.  Default is None, which tries
+            :data:`wrf.OMP_SCHED_STATIC`, :data:`wrf.OMP_SCHED_DYNAMIC`,
+            and :data:`wrf.OMP_SCHED_GUIDED`.
+
+        chunk_sizes (sequence of :obj:`int`, optional): The chunk sizes to
+            try.  Default is (0, ), which uses the OpenMP default.
+
+        repeat (:obj:`int`, optional): The number of times each setting is
+            timed.  The fastest time is used.  Default is 3.
+
+        apply (:obj:`bool`, optional): Set to False to return the results
+            without changing the tuning table.  Default is True.
+
+    Returns:
+
+        :obj:`dict`: A mapping of kernel name to a :obj:`dict` with the
+        keys 'size', 'num_threads', 'schedule', 'chunk_size', and 'time'
+        (the fastest time in seconds), plus 'times', a mapping of
+        (num_threads, schedule, chunk_size) to the time for every setting.
+
+    """
+    from .routines import getvar
+    from .profiler import profile
+    from .util import is_multi_file
+
+    if products is None:
+        products = _DEFAULT_PRODUCTS
+
+    if thread_counts is None:
+        nprocs = max(fomp_get_num_procs(), 1)
+        thread_counts = [1]
+        while thread_counts[-1] * 2 <= nprocs:
+            thread_counts.append(thread_counts[-1] * 2)
+
+    if schedules is None:
+        schedules = (omp_constants.fomp_sched_static,
+                     omp_constants.fomp_sched_dynamic,
+                     omp_constants.fomp_sched_guided)
+
+    # Keep the calibration to a single time step
+    if is_multi_file(wrfin):
+        wrfin = next(iter(wrfin))
+
+    # Drop the products that can't be computed from this input
+    usable = []
+    for product in products:
+        try:
+            getvar(wrfin, product, timeidx=0, meta=False)
+        except Exception:
+            continue
+        usable.append(product)
+
+    sizes = {}
+    times = {}
+    _local_omp.sizes = sizes
+
+    # The kernels have to run for every setting, so memoized results from
+    # the multi-product diagnostics can't be used
+    memo_size = get_memo_size()
+    set_memo_size(0)
+    try:
+        for num_threads in thread_counts:
+            for schedule in schedules:
+                for chunk_size in chunk_sizes:
+                    setting = (int(num_threads), int(schedule),
+                               int(chunk_size))
+                    with omp_threads(num_threads, schedule, chunk_size):
+                        for _ in range(repeat):
+                            with profile() as prof:
+                                for product in usable:
+                                    getvar(wrfin, product, timeidx=0,
+                                           meta=False)
+
+                            for stage, vals in viewitems(
+                                    prof.stage_totals()):
+                                if not stage.startswith("kernel:"):
+                                    continue
+                                kernel = stage[len("kernel:"):]
+                                kernel_times = times.setdefault(kernel, {})
+                                kernel_times[setting] = min(
+                                    kernel_times.get(setting, vals["self"]),
+                                    vals["self"])
+    finally:
+        _local_omp.sizes = None
+        set_memo_size(memo_size)
+
+    result = {}
+    for kernel, kernel_times in viewitems(times):
+        best = min(kernel_times, key=lambda setting: kernel_times[setting])
+        result[kernel] = {"size": sizes.get(kernel, 0),
+                          "num_threads": best[0],
+                          "schedule": best[1],
+                          "chunk_size": best[2],
+                          "time": kernel_times[best],
+                          "times": kernel_times}
+
+        if apply:
+            set_omp_tuning(kernel, best[0], best[1], best[2],
+                           sizes.get(kernel, 0))
+
+    return result
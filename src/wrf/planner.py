@@ -0,0 +1,783 @@
+from __future__ import (absolute_import, division, print_function)
+
+from collections import OrderedDict, Mapping
+from threading import local
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+import numpy as np
+
+from .py3compat import viewitems, viewvalues, isstr
+from .util import (is_multi_file, is_mapping, get_iterable, is_coordvar,
+                   is_time_coord_var, from_args)
+from .profiler import nbytes
+
+_local_plan = local()
+
+# Kernel name -> rough floating point operations per grid point
+_KERNEL_FLOPS = {"_tk": 10, "_td": 20, "_rh": 30, "_slp": 60, "_avo": 15,
+                 "_pvo": 40, "_eth": 60, "_uvmet": 10, "_omega": 15,
+                 "_tv": 5, "_wetbulb": 400, "_srhel": 30, "_udhel": 30,
+                 "_pw": 10, "_dbz": 60, "_cloudfrac": 5, "_ctt": 40,
+                 "_smooth2d": 10, "_monotonic": 10, "_vintrp": 50,
+                 "_wspd": 5, "_wdir": 10, "_interpz3d": 10,
+                 "_interpz3d_lev2d": 10, "_interpz3d_weights": 10,
+                 "_interpz3d_lev2d_weights": 10, "_interpz3d_apply": 5,
+                 "_interp2dxy": 5, "_interp1d": 10, "_vertcross": 20,
+                 "_interpline": 5, "_cape": 50, "_uvmet_rotation": 20,
+                 "_uvmet_rotate": 6, "_srhel_layers": 30,
+                 "_udhel_layers": 30, "_cape_parcels": 50,
+                 "_full_pressure": 2, "_full_theta": 1,
+                 "_height_from_geopotential": 4}
+
+
+def _size2d(arr):
+    return arr.shape[0] * arr.shape[1]
+
+
+def _fused_dtype(*arrays):
+    """Return the output type of the fused kernels, which are single
+    precision only when every input is."""
+    return np.result_type(np.float32, *(arr.dtype for arr in arrays))
+
+
+# Kernel name -> function of the Fortran ordered kernel arguments that
+# returns the bytes of the work arrays allocated by the kernel wrapper in
+# wrf.extension
+_KERNEL_WORK = {
+    "_slp": lambda args: 20 * _size2d(args[0]),
+    "_uvmet": lambda args: 16 * _size2d(args[2]),
+    "_udhel": lambda args: 16 * args[2].size,
+    "_udhel_layers": lambda args: 16 * args[2].size,
+    "_cape": lambda args: 40 * args[0].size,
+    "_ctt": lambda args: 8 * args[0].size,
+    "_smooth2d": lambda args: 8 * args[0].size,
+    "_vintrp": lambda args: 8 * _size2d(args[0]),
+    "_interpline": lambda args: args[0].nbytes,
+    "_monotonic": lambda args: args[0].nbytes if args[5] else 0,
+}
+
+# Kernel name -> function of the Fortran ordered kernel arguments that
+# returns the (shape, dtype) of each output, for the kernels that can be
+# called without output views
+_KERNEL_OUTPUTS = {
+    "_uvmet": lambda args: [(args[0].shape + (2, ), np.float64)],
+    "_cape": lambda args: [(args[0].shape[0:3], args[0].dtype)] * 2,
+    "_cloudfrac": lambda args: [(args[0].shape[0:2], args[0].dtype)] * 3,
+    "_interpz3d": lambda args: [(args[0].shape[0:2] + args[2].shape,
+                                 np.float64)],
+    "_interpz3d_lev2d": lambda args: [(args[0].shape[0:2], np.float64)],
+    "_full_pressure": lambda args: [(args[0].shape,
+                                     _fused_dtype(args[0], args[1]))],
+    "_full_theta": lambda args: [(args[0].shape, _fused_dtype(args[0]))],
+}
+
+
+def planning():
+    """Return True if a :class:`wrf.Plan` is being made in the current
+    thread.
+
+    While planning, no variable data is read and the compiled kernels are
+    not run.
+
+    """
+    return getattr(_local_plan, "recorder", None) is not None
+
+
+def _placeholder(shape, dtype):
+    """Return a read-only array of zeros that uses no memory."""
+    return np.broadcast_to(np.zeros((), dtype), shape)
+
+
+def plan_cast(args, kwargs, arg_idxs, karg_names, alg_dtype):
+    """Return the arguments cast by :meth:`wrf.decorators.cast_type` while
+    planning.
+
+    The casts are recorded, but placeholders are returned instead of
+    copies.
+
+    """
+    recorder = _local_plan.recorder
+    itemsize = np.dtype(alg_dtype).itemsize
+
+    new_args = list(args)
+    for i in arg_idxs:
+        if i < len(new_args):
+            arg = new_args[i]
+            recorder.upcast += arg.size * itemsize
+            new_args[i] = _placeholder(arg.shape, alg_dtype)
+
+    new_kargs = dict(kwargs)
+    for key in karg_names:
+        if key in new_kargs:
+            arg = new_kargs[key]
+            recorder.upcast += arg.size * itemsize
+            new_kargs[key] = _placeholder(arg.shape, alg_dtype)
+
+    return new_args, new_kargs
+
+
+def plan_kernel(wrapped, args, kwargs, outkeys):
+    """Record a kernel call while planning and return its output.
+
+    This is used by :meth:`wrf.decorators.extract_and_transpose` in place
+    of the compiled routine.  The output views supplied by the left
+    iteration decorators are returned as is.
+
+    """
+    kernel = wrapped.__name__
+    recorder = _local_plan.recorder
+
+    try:
+        outvals = from_args(wrapped, outkeys, *args, **kwargs)
+    except (KeyError, TypeError, ValueError):
+        outvals = {}
+    outputs = [outvals.get(key) for key in outkeys]
+    if (any(output is None for output in outputs) and
+            kernel == "_height_from_geopotential"):
+        # The vertical dimension is one shorter when destaggering
+        destag = from_args(wrapped, "destag", *args, **kwargs)["destag"]
+        shape = list(args[0].shape)
+        shape[2] -= 1 if destag else 0
+        outputs = [np.empty(shape, _fused_dtype(args[0], args[1]),
+                            order="F")]
+    elif any(output is None for output in outputs):
+        try:
+            specs = _KERNEL_OUTPUTS[kernel](args)
+        except KeyError:
+            # Unknown output shape, so the kernel has to run
+            outputs = None
+        else:
+            outputs = [np.empty(shape, dtype, order="F")
+                       for shape, dtype in specs]
+
+    points = next((arg.size for arg in args if isinstance(arg, np.ndarray)),
+                  0)
+    if kernel == "_cape":
+        # Parcels are lifted through the whole column
+        cost = _KERNEL_FLOPS[kernel] * points * args[0].shape[-1]
+    elif kernel == "_cape_parcels":
+        # Each parcel type is lifted through the column
+        cost = _KERNEL_FLOPS[kernel] * points * args[6].shape[0]
+    elif kernel == "_smooth2d":
+        cost = _KERNEL_FLOPS[kernel] * points * args[1]
+    else:
+        cost = _KERNEL_FLOPS.get(kernel, 10) * points
+
+    work = _KERNEL_WORK[kernel](args) if kernel in _KERNEL_WORK else 0
+    recorder.kernel(kernel, points, cost, work)
+
+    if outputs is None:
+        return wrapped(*args, **kwargs)
+
+    return outputs[0] if len(outputs) == 1 else tuple(outputs)
+
+
+def _hyperslab(key, shape):
+    """Return a hashable form of a NetCDF index for a variable with *shape*.
+
+    Integers are kept and slices become (start, stop, step) tuples.
+
+    """
+    if not isinstance(key, tuple):
+        key = (key, )
+
+    for i, k in enumerate(key):
+        if k is Ellipsis:
+            fill = (slice(None), ) * (len(shape) - len(key) + 1)
+            key = key[:i] + fill + key[i+1:]
+            break
+
+    key = key + (slice(None), ) * (len(shape) - len(key))
+
+    slab = []
+    for k, n in zip(key, shape):
+        if isinstance(k, slice):
+            slab.append(k.indices(n))
+        else:
+            k = int(k)
+            slab.append(k + n if k < 0 else k)
+
+    return tuple(slab)
+
+
+def _slab_index(slab):
+    """Return the NetCDF index for a hyperslab from :func:`_hyperslab`."""
+    return tuple(slice(k[0], k[1] if k[1] >= 0 else None, k[2])
+                 if isinstance(k, tuple) else k for k in slab)
+
+
+def _slab_str(slab, shape):
+    parts = []
+    for k, n in zip(slab, shape):
+        if not isinstance(k, tuple):
+            parts.append(str(k))
+        elif k == (0, n, 1):
+            parts.append(":")
+        elif k[2] == 1:
+            parts.append("{}:{}".format(k[0], k[1]))
+        else:
+            parts.append("{}:{}:{}".format(*k))
+
+    return "[" + ", ".join(parts) + "]"
+
+
+def _slab_order(slab):
+    return tuple(k if isinstance(k, tuple) else (k, k + 1, 1) for k in slab)
+
+
+class _PlanVariable(object):
+    """A NetCDF variable whose reads go through a :class:`_PlanFile`."""
+    __slots__ = ("_var", "_name", "_file")
+
+    def __init__(self, var, name, planfile):
+        self._var = var
+        self._name = name
+        self._file = planfile
+
+    @property
+    def __dict__(self):
+        # The variable attributes, used when building the metadata
+        return self._var.__dict__
+
+    def __getattr__(self, name):
+        return getattr(self._var, name)
+
+    def __len__(self):
+        return len(self._var)
+
+    def __getitem__(self, key):
+        return self._file._read(self._var, self._name, key)
+
+
+class _PlanVariables(Mapping):
+    """The variables mapping for a :class:`_PlanFile`."""
+    def __init__(self, planfile):
+        self._file = planfile
+        self._vars = planfile._wrfnc.variables
+
+    def __getitem__(self, name):
+        return _PlanVariable(self._vars[name], name, self._file)
+
+    def __iter__(self):
+        return iter(self._vars)
+
+    def __len__(self):
+        return len(self._vars)
+
+
+class _PlanFile(object):
+    """Wraps a NetCDF file object so that its variable reads can be
+    recorded while planning, or served from the reads made in the planned
+    order while computing a plan.
+
+    """
+    def __init__(self, wrfnc, index, store=None):
+        self._wrfnc = wrfnc
+        self._index = index
+        self._store = store
+        self.variables = _PlanVariables(self)
+
+    def __getattr__(self, name):
+        if name in ("_wrfnc", "_index", "_store"):
+            raise AttributeError(name)
+
+        # Hide the file path while planning, so that the placeholder
+        # results never reach the disk cache or share the in-memory cache
+        # keys with the real results
+        if self._store is None and name == "file":
+            raise AttributeError(name)
+
+        return getattr(self._wrfnc, name)
+
+    def filepath(self):
+        try:
+            path = self._wrfnc.filepath()
+        except AttributeError:
+            path = self._wrfnc.file.path
+
+        if self._store is None:
+            return path + "#plan"
+
+        return path
+
+    def _read(self, var, name, key):
+        slab = _hyperslab(key, var.shape)
+        storekey = (self._index, name, slab)
+
+        if self._store is not None:
+            try:
+                return self._store[storekey].copy()
+            except KeyError:
+                return var[key]
+
+        data = None
+        if (is_coordvar(name) or is_time_coord_var(name) or
+                var.dtype.kind in "SU"):
+            # Coordinates and times are needed for the metadata
+            data = var[key]
+
+        _local_plan.recorder.read(self, storekey, var)
+
+        if data is None:
+            data = _placeholder(var.shape, var.dtype)[key]
+
+        return data
+
+
+def _wrap_input(wrfin, make):
+    """Return *wrfin* with every file object wrapped by *make*."""
+    if is_multi_file(wrfin):
+        if is_mapping(wrfin):
+            return OrderedDict((key, _wrap_input(val, make))
+                               for key, val in viewitems(wrfin))
+
+        return [_wrap_input(wrfnc, make) for wrfnc in get_iterable(wrfin)]
+
+    return make(wrfin)
+
+
+def _file_label(wrfnc, index):
+    try:
+        return wrfnc.filepath()
+    except (AttributeError, ValueError):
+        try:
+            return wrfnc.file.path
+        except AttributeError:
+            return "file {}".format(index)
+
+
+class _MemoryTrace(object):
+    """Measures the memory allocated while computing a product."""
+    def __init__(self):
+        self.owned = False
+        self.can_peak = False
+        self.base = 0
+
+        if tracemalloc is None:
+            return
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.owned = True
+            self.can_peak = True
+        elif hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+            self.can_peak = True
+
+        self.base = tracemalloc.get_traced_memory()[0]
+
+    def current(self):
+        if tracemalloc is None:
+            return 0
+        return max(tracemalloc.get_traced_memory()[0] - self.base, 0)
+
+    def peak(self):
+        if not self.can_peak:
+            return self.current()
+        return max(tracemalloc.get_traced_memory()[1] - self.base, 0)
+
+    def close(self):
+        if self.owned:
+            tracemalloc.stop()
+
+
+class _PlanRecorder(object):
+    """Collects the reads and kernel calls for a single product."""
+    def __init__(self, plan, product):
+        self.plan = plan
+        self.product = product
+        self.trace = _MemoryTrace()
+        self.reads = []
+        self.kernels = OrderedDict()
+        self.upcast = 0
+        self.max_upcast = 0
+        self.kernel_peak = 0
+
+    def read(self, planfile, storekey, var):
+        self.plan._add_read(planfile, storekey, var, self.product)
+        if storekey not in self.reads:
+            self.reads.append(storekey)
+
+    def kernel(self, kernel, points, cost, work):
+        stats = self.kernels.setdefault(kernel, [0, 0, 0, 0, 0])
+        stats[0] += 1
+        stats[1] += points
+        stats[2] += cost
+        stats[3] = max(stats[3], self.upcast)
+        stats[4] = max(stats[4], work)
+
+        self.max_upcast = max(self.max_upcast, self.upcast)
+        self.kernel_peak = max(self.kernel_peak,
+                               self.trace.current() + self.upcast + work)
+        self.upcast = 0
+
+
+class Plan(object):
+    """The reads, memory, and kernel cost for a set of :meth:`wrf.getvar`
+    requests, found without reading any variable data or running any
+    kernel.
+
+    Use :meth:`wrf.plan` to create a plan, and :meth:`Plan.compute` to run
+    it.
+
+    Attributes:
+
+        reads (:obj:`list`): The hyperslab reads in the order
+            :meth:`compute` makes them, grouped by file and ordered by the
+            variable position in each file.  Each entry is a :obj:`dict`
+            with the keys 'file', 'variable', 'hyperslab', 'shape',
+            'bytes', and 'products'.  A hyperslab read by several products
+            is only listed, and read, once.
+
+        bytes_read (:obj:`int`): The total bytes read.
+
+        bytes_per_file (:class:`collections.OrderedDict`): A mapping of
+            file to the bytes read from it.
+
+        kernels (:obj:`list`): The kernel calls for each product.  Each
+            entry is a :obj:`dict` with the keys 'product', 'kernel',
+            'calls', 'points' (the grid points processed), 'cost' (a rough
+            count of floating point operations, only meant for comparing
+            requests), 'upcast_bytes' (the largest float64 copy of the
+            kernel inputs), and 'work_bytes' (the largest work arrays).
+
+        products (:class:`collections.OrderedDict`): A mapping of product
+            name to a :obj:`dict` with the keys 'bytes_read', 'temp_bytes'
+            (the peak temporary memory, including the float64 copies and
+            the kernel work arrays), 'result_bytes', 'peak_bytes' (the peak
+            memory while computing the product with :meth:`compute`), and
+            'cost'.
+
+        peak_bytes (:obj:`int`): The peak memory for :meth:`compute`.
+
+        cost (:obj:`int`): The total kernel cost.
+
+    """
+    def __init__(self, wrfin, products, timeidx, method, squeeze, cache,
+                 meta, single):
+        self._wrfin = wrfin
+        self._products = products
+        self._single = single
+        self.timeidx = timeidx
+        self.method = method
+        self.squeeze = squeeze
+        self.cache = cache
+        self.meta = meta
+
+        self._files = OrderedDict()
+        self._var_pos = {}
+        self._reads = OrderedDict()
+        self._product_reads = OrderedDict()
+
+        self.reads = []
+        self.bytes_read = 0
+        self.bytes_per_file = OrderedDict()
+        self.kernels = []
+        self.products = OrderedDict()
+        self.peak_bytes = 0
+        self.cost = 0
+
+    def _add_read(self, planfile, storekey, var, product):
+        index = storekey[0]
+        if index not in self._files:
+            wrfnc = planfile._wrfnc
+            self._files[index] = _file_label(wrfnc, index)
+            self._var_pos[index] = {name: i for i, name
+                                    in enumerate(wrfnc.variables)}
+
+        entry = self._reads.get(storekey)
+        if entry is None:
+            slab = storekey[2]
+            shape = tuple((k[1] - k[0] + k[2] - (1 if k[2] > 0 else -1)) //
+                          k[2] for k in slab if isinstance(k, tuple))
+            shape = tuple(max(n, 0) for n in shape)
+            entry = {"file": self._files[index],
+                     "variable": storekey[1],
+                     "hyperslab": _slab_str(slab, var.shape),
+                     "shape": shape,
+                     "bytes": int(np.prod(shape)) * var.dtype.itemsize,
+                     "products": []}
+            self._reads[storekey] = entry
+
+        if product not in entry["products"]:
+            entry["products"].append(product)
+
+    def _read_order(self, storekey):
+        index, name, slab = storekey
+        return (index, self._var_pos[index].get(name, 0), _slab_order(slab))
+
+    def _make(self):
+        from .routines import getvar
+
+        counter = [0]
+
+        def make(wrfnc):
+            planfile = _PlanFile(wrfnc, counter[0])
+            counter[0] += 1
+            return planfile
+
+        wrapped = _wrap_input(self._wrfin, make)
+
+        prev = getattr(_local_plan, "recorder", None)
+        retained = 0
+        try:
+            for name, kwargs in viewitems(self._products):
+                recorder = _PlanRecorder(self, name)
+                _local_plan.recorder = recorder
+                try:
+                    result = getvar(wrapped, name, self.timeidx, self.method,
+                                    self.squeeze, self.cache, self.meta,
+                                    **kwargs)
+                    temp = max(recorder.trace.peak(), recorder.kernel_peak)
+                finally:
+                    recorder.trace.close()
+
+                self._product_reads[name] = sorted(recorder.reads,
+                                                   key=self._read_order)
+
+                result_bytes = nbytes(result)
+                cost = 0
+                for kernel, stats in viewitems(recorder.kernels):
+                    self.kernels.append({"product": name, "kernel": kernel,
+                                         "calls": stats[0],
+                                         "points": stats[1],
+                                         "cost": stats[2],
+                                         "upcast_bytes": stats[3],
+                                         "work_bytes": stats[4]})
+                    cost += stats[2]
+
+                self.products[name] = {"bytes_read": sum(
+                                           self._reads[key]["bytes"]
+                                           for key in recorder.reads),
+                                       "temp_bytes": temp,
+                                       "result_bytes": result_bytes,
+                                       "peak_bytes": 0,
+                                       "cost": cost}
+                self.cost += cost
+        finally:
+            _local_plan.recorder = prev
+
+        # The hyperslabs are read right before the first product that
+        # needs them and released after the last one
+        names = list(self._products)
+        for key in sorted(self._reads, key=self._read_order):
+            self.reads.append(self._reads[key])
+
+        for i, name in enumerate(names):
+            live = sum(entry["bytes"] for entry in self.reads
+                       if names.index(entry["products"][0]) <= i <=
+                       names.index(entry["products"][-1]))
+            stats = self.products[name]
+            stats["peak_bytes"] = retained + live + stats["temp_bytes"]
+            retained += stats["result_bytes"]
+            self.peak_bytes = max(self.peak_bytes, stats["peak_bytes"])
+
+        for entry in self.reads:
+            self.bytes_read += entry["bytes"]
+            self.bytes_per_file[entry["file"]] = (
+                self.bytes_per_file.get(entry["file"], 0) + entry["bytes"])
+
+    def compute(self):
+        """Compute the products, reading the variables in the planned order.
+
+        Each hyperslab is read once, right before the first product that
+        uses it, and released after the last product that uses it.
+
+        Returns:
+
+            :class:`xarray.DataArray` or :class:`numpy.ndarray`, or a
+            :class:`collections.OrderedDict`: The product if a single name
+            was planned.  Otherwise, a mapping of product name to product.
+
+        """
+        from .routines import getvar
+
+        store = {}
+        files = []
+
+        def make(wrfnc):
+            files.append(wrfnc)
+            return _PlanFile(wrfnc, len(files) - 1, store)
+
+        wrapped = _wrap_input(self._wrfin, make)
+
+        last_use = {}
+        for key, entry in viewitems(self._reads):
+            last_use.setdefault(entry["products"][-1], []).append(key)
+
+        results = OrderedDict()
+        for name, kwargs in viewitems(self._products):
+            for key in self._product_reads[name]:
+                if key not in store and name == self._reads[key][
+                        "products"][0]:
+                    index, varname, slab = key
+                    store[key] = (files[index].variables[varname]
+                                  [_slab_index(slab)])
+
+            results[name] = getvar(wrapped, name, self.timeidx, self.method,
+                                   self.squeeze, self.cache, self.meta,
+                                   **kwargs)
+
+            for key in last_use.get(name, ()):
+                store.pop(key, None)
+
+        if self._single:
+            return next(iter(viewvalues(results)))
+
+        return results
+
+    def table(self):
+        """Return the plan as a text table.
+
+        Returns:
+
+            :obj:`str`: The table.
+
+        """
+        mb = 2.**20
+        header = "{:<24} {:<12} {:<24} {:>10}  {}".format(
+            "file", "variable", "hyperslab", "read (MB)", "products")
+        lines = [header, "-" * len(header)]
+        for entry in self.reads:
+            lines.append("{:<24} {:<12} {:<24} {:>10.3f}  {}".format(
+                entry["file"][-24:], entry["variable"][:12],
+                entry["hyperslab"][:24], entry["bytes"] / mb,
+                ", ".join(entry["products"])))
+
+        header = "{:<24} {:<24} {:>8} {:>12} {:>10} {:>11} {:>10}".format(
+            "product", "kernel", "calls", "cost (MFLOP)", "upcast (MB)",
+            "work (MB)", "")
+        lines += ["", header.rstrip(), "-" * len(header.rstrip())]
+        for entry in self.kernels:
+            lines.append("{:<24} {:<24} {:>8} {:>12.3f} {:>10.3f} "
+                         "{:>11.3f}".format(entry["product"][:24],
+                                            entry["kernel"][:24],
+                                            entry["calls"],
+                                            entry["cost"] / 1.0e6,
+                                            entry["upcast_bytes"] / mb,
+                                            entry["work_bytes"] / mb))
+
+        header = "{:<24} {:>10} {:>10} {:>12} {:>10} {:>12}".format(
+            "product", "read (MB)", "temp (MB)", "result (MB)", "peak (MB)",
+            "cost (MFLOP)")
+        lines += ["", header, "-" * len(header)]
+        for name, stats in viewitems(self.products):
+            lines.append("{:<24} {:>10.3f} {:>10.3f} {:>12.3f} {:>10.3f} "
+                         "{:>12.3f}".format(name[:24],
+                                            stats["bytes_read"] / mb,
+                                            stats["temp_bytes"] / mb,
+                                            stats["result_bytes"] / mb,
+                                            stats["peak_bytes"] / mb,
+                                            stats["cost"] / 1.0e6))
+
+        lines += ["", "total read: {:.3f} MB, peak memory: {:.3f} MB, "
+                  "cost: {:.3f} MFLOP".format(self.bytes_read / mb,
+                                              self.peak_bytes / mb,
+                                              self.cost / 1.0e6)]
+
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.table()
+
+
+def plan(wrfin, names, timeidx=0, method="cat", squeeze=True, cache=None,
+         meta=True, **kwargs):
+    """Return the plan for computing one or more :meth:`wrf.getvar`
+    products, without reading any variable data or running any kernel.
+
+    The products are traced through the same routines that
+    :meth:`wrf.getvar` uses, with placeholder arrays in place of the
+    variable data.  The plan reports the raw variables and hyperslabs that
+    will be read, the bytes read from each file, the peak temporary memory
+    (including the float64 copies of the kernel inputs and the kernel work
+    arrays), and a kernel cost estimate.
+
+    The coordinate and time variables are read, since the metadata needs
+    them.  The array operations done in Python are also still done on the
+    placeholders, so making a plan needs about as much memory as the
+    temporaries it reports, but little time.
+
+    The plan can then be run with :meth:`wrf.Plan.compute`, which reads
+    each hyperslab once in the planned order and shares it between the
+    products.
+
+    Args:
+
+        wrfin (:class:`netCDF4.Dataset`, :class:`Nio.NioFile`, or an \
+            iterable): WRF-ARW NetCDF
+            data as a :class:`netCDF4.Dataset`, :class:`Nio.NioFile`
+            or an iterable sequence of the aforementioned types.
+
+        names (:obj:`str`, sequence, or mapping): A product name, a
+            sequence of product names, or a mapping of product name to a
+            :obj:`dict` of keyword arguments for that product.
+
+        timeidx (:obj:`int` or :data:`wrf.ALL_TIMES`, optional): The
+            desired time index. This value can be a positive integer,
+            negative integer, or
+            :data:`wrf.ALL_TIMES` (an alias for None) to return
+            all times in the file or sequence. The default is 0.
+
+        method (:obj:`str`, optional): The aggregation method to use for
+            sequences.  Must be either 'cat' or 'join'.
+            'cat' combines the data along the Time dimension.
+            'join' creates a new dimension for the file index.
+            The default is 'cat'.
+
+        squeeze (:obj:`bool`, optional): Set to False to prevent dimensions
+            with a size of 1 from being automatically removed from the shape
+            of the output. Default is True.
+
+        cache (:obj:`dict`, optional): A dictionary of (varname, ndarray)
+            that can be used to supply pre-extracted NetCDF variables to the
+            computational routines.  Default is None.
+
+        meta (:obj:`bool`, optional): Set to False to disable metadata and
+            return :class:`numpy.ndarray` instead of
+            :class:`xarray.DataArray`.  Default is True.
+
+        **kwargs: Optional keyword arguments used for every product.  The
+            keyword arguments in a *names* mapping take precedence.
+
+    Returns:
+
+        :class:`wrf.Plan`: The plan, which can be printed as a table or
+        run with :meth:`wrf.Plan.compute`.
+
+    Examples:
+
+        .. code-block:: python
+
+            from netCDF4 import Dataset
+            from wrf import plan
+
+            wrfnc = Dataset("wrfout_d02_2010-06-13_21:00:00")
+
+            p = plan(wrfnc, ["slp", "cape_2d", "tk"])
+            print(p.table())
+
+            if p.peak_bytes < 2**30:
+                results = p.compute()
+
+    """
+    single = isstr(names)
+    if single:
+        names = [names]
+
+    products = OrderedDict()
+    for name in names:
+        product_kwargs = dict(kwargs)
+        if is_mapping(names):
+            product_kwargs.update(names[name] or {})
+        products[name] = product_kwargs
+
+    result = Plan(wrfin, products, timeidx, method, squeeze, cache, meta,
+                  single)
+    result._make()
+
+    return result
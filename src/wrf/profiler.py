@@ -0,0 +1,371 @@
+from __future__ import (absolute_import, division, print_function)
+
+import json
+import os
+from threading import local, current_thread
+from collections import OrderedDict
+
+try:
+    from time import perf_counter as _clock
+except ImportError:  # Python 2
+    from timeit import default_timer as _clock
+
+import wrapt
+import numpy.ma as ma
+
+_local_profile = local()
+
+
+class _NullStage(object):
+    """The stage used when profiling is disabled.  It does nothing."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def add_bytes(self, read=0, alloc=0):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage(object):
+    """A timed region of a :class:`Profile`."""
+    __slots__ = ("profile", "name", "category", "path", "start",
+                 "child_time", "read", "alloc")
+
+    def __init__(self, profile, name, category):
+        self.profile = profile
+        self.name = name
+        self.category = category
+        self.child_time = 0.0
+        self.read = 0
+        self.alloc = 0
+
+    def __enter__(self):
+        stack = self.profile._stack
+        self.path = (stack[-1].path if stack else ()) + (self.name,)
+        self.profile._stats.setdefault(self.path, [0, 0.0, 0.0, 0, 0])
+        stack.append(self)
+        self.start = _clock()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        duration = _clock() - self.start
+        stack = self.profile._stack
+        stack.pop()
+        if stack:
+            stack[-1].child_time += duration
+
+        self.profile._record(self, duration)
+
+        return False
+
+    def add_bytes(self, read=0, alloc=0):
+        self.read += read
+        self.alloc += alloc
+
+
+def profile_stage(name, category="stage"):
+    """Return a context manager that times a stage of the active profile.
+
+    When no :class:`Profile` is active in the current thread, a shared
+    no-op object is returned, so instrumented code costs a single
+    attribute lookup.
+
+    Args:
+
+        name (:obj:`str`): The stage name.
+
+        category (:obj:`str`, optional): The stage category used for the
+            Chrome trace output.  Default is 'stage'.
+
+    Returns:
+
+        A context manager with an *add_bytes(read=0, alloc=0)* method.
+
+    """
+    prof = getattr(_local_profile, "profile", None)
+    if prof is None:
+        return _NULL_STAGE
+
+    return _Stage(prof, name, category)
+
+
+def profiling_enabled():
+    """Return True if a :class:`Profile` is active in the current thread."""
+    return getattr(_local_profile, "profile", None) is not None
+
+
+def nbytes(obj):
+    """Return the total bytes for an array or a sequence or mapping of
+    arrays.  Other objects count as 0 bytes."""
+    if isinstance(obj, dict):
+        return sum(nbytes(val) for val in obj.values())
+    if isinstance(obj, (tuple, list)):
+        return sum(nbytes(val) for val in obj)
+
+    return getattr(obj, "nbytes", 0)
+
+
+def masked_values(x, value, **kwargs):
+    """Profiled version of :meth:`numpy.ma.masked_values`."""
+    with profile_stage("masked_values") as stage:
+        result = ma.masked_values(x, value, **kwargs)
+
+        # The mask is nomask when nothing is masked
+        if stage is not _NULL_STAGE:
+            alloc = result.nbytes
+            if result.mask is not ma.nomask:
+                alloc += result.mask.nbytes
+            stage.add_bytes(alloc=alloc)
+
+    return result
+
+
+def profiled_metadata(decorator):
+    """Wrap a metadata decorator so its own work is timed as 'metadata'.
+
+    The wrapped function is timed as a 'compute' stage inside the
+    'metadata' stage, so the self time of the 'metadata' stage is the time
+    spent building the metadata.  When profiling is disabled, the call
+    goes through a single check to the undecorated stack, so there is no
+    timing layer around the wrapped function.
+
+    Args:
+
+        decorator: A decorator from :mod:`wrf.metadecorators`.
+
+    Returns:
+
+        A decorator with the same behavior as *decorator*.
+
+    """
+    @wrapt.decorator
+    def compute_wrapper(wrapped, instance, args, kwargs):
+        with profile_stage("compute"):
+            return wrapped(*args, **kwargs)
+
+    def apply(func):
+        profiled = decorator(compute_wrapper(func))
+
+        @wrapt.decorator
+        def meta_wrapper(wrapped, instance, args, kwargs):
+            if getattr(_local_profile, "profile", None) is None:
+                return wrapped(*args, **kwargs)
+
+            with profile_stage("metadata", "metadata"):
+                return profiled(*args, **kwargs)
+
+        return meta_wrapper(decorator(func))
+
+    return apply
+
+
+class Profile(object):
+    """Per-stage timings collected by :meth:`wrf.profile`.
+
+    Each stage is identified by its path from the outermost stage, e.g.
+    ('getvar:slp', 'metadata', 'compute', 'cast_type',
+    'extract_and_transpose', 'kernel:_slp').  For every path, the number
+    of calls, the total (inclusive) time, the self (exclusive) time, and
+    the bytes read and allocated are recorded.
+
+    The stages are:
+
+        - getvar:<product>: A :meth:`wrf.getvar` call.
+        - extract_vars: Reading variables from the NetCDF files.  The
+          bytes read are the sizes of the extracted arrays.
+        - metadata: Building the :class:`xarray.DataArray` metadata.
+        - compute: The diagnostic routine inside the metadata decorator.
+        - cast_type: Casting arguments to and from the Fortran type.  The
+          bytes allocated are the sizes of the cast copies.
+        - extract_and_transpose: Extracting and transposing arrays to
+          Fortran order.
+        - kernel:<name>: The compiled routine.
+        - masked_values: Creating masked arrays for missing values.
+
+    """
+    def __init__(self):
+        self._stack = []
+        self._stats = OrderedDict()
+        self._events = []
+        self._start = None
+        self._prev = None
+
+    def __enter__(self):
+        self._prev = getattr(_local_profile, "profile", None)
+        _local_profile.profile = self
+        self._start = _clock()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _local_profile.profile = self._prev
+        self._prev = None
+        return False
+
+    def _record(self, stage, duration):
+        stats = self._stats[stage.path]
+        stats[0] += 1
+        stats[1] += duration
+        stats[2] += duration - stage.child_time
+        stats[3] += stage.read
+        stats[4] += stage.alloc
+
+        self._events.append((stage.name, stage.category,
+                             stage.start - self._start, duration,
+                             current_thread().ident, stage.read,
+                             stage.alloc))
+
+    def stats(self):
+        """Return the aggregated statistics.
+
+        Returns:
+
+            :class:`collections.OrderedDict`: A mapping of stage path
+            (a :obj:`tuple` of stage names) to a :obj:`dict` with the
+            keys 'calls', 'total', 'self' (both in seconds), 'bytes_read',
+            and 'bytes_alloc'.  The paths are in the order first entered.
+
+        """
+        return OrderedDict((path, {"calls": vals[0], "total": vals[1],
+                                   "self": vals[2], "bytes_read": vals[3],
+                                   "bytes_alloc": vals[4]})
+                           for path, vals in self._stats.items())
+
+    def stage_totals(self):
+        """Return the statistics summed by stage name, ignoring nesting.
+
+        Kernel and product names are kept, so 'kernel:_slp' and
+        'kernel:_tk' are reported separately.
+
+        Returns:
+
+            :class:`collections.OrderedDict`: A mapping of stage name to a
+            :obj:`dict` with the same keys as :meth:`stats`.  The 'total'
+            time only counts the outermost call for recursive stages.
+
+        """
+        result = OrderedDict()
+        for path, vals in self._stats.items():
+            name = path[-1]
+            entry = result.setdefault(name, {"calls": 0, "total": 0.0,
+                                             "self": 0.0, "bytes_read": 0,
+                                             "bytes_alloc": 0})
+            entry["calls"] += vals[0]
+            if name not in path[:-1]:
+                entry["total"] += vals[1]
+            entry["self"] += vals[2]
+            entry["bytes_read"] += vals[3]
+            entry["bytes_alloc"] += vals[4]
+
+        return result
+
+    def table(self, nested=True):
+        """Return the statistics as a text table.
+
+        Args:
+
+            nested (:obj:`bool`, optional): Set to False to sum the stages
+                by name instead of showing the nesting.  Default is True.
+
+        Returns:
+
+            :obj:`str`: The table.
+
+        """
+        header = "{:<48} {:>8} {:>11} {:>11} {:>10} {:>10}".format(
+            "stage", "calls", "total (ms)", "self (ms)", "read (MB)",
+            "alloc (MB)")
+        lines = [header, "-" * len(header)]
+
+        if nested:
+            rows = [("  " * (len(path) - 1) + path[-1], vals)
+                    for path, vals in self.stats().items()]
+        else:
+            rows = list(self.stage_totals().items())
+
+        for name, vals in rows:
+            lines.append("{:<48} {:>8} {:>11.3f} {:>11.3f} {:>10.3f} "
+                         "{:>10.3f}".format(name[:48], vals["calls"],
+                                            vals["total"] * 1000.,
+                                            vals["self"] * 1000.,
+                                            vals["bytes_read"] / 2.**20,
+                                            vals["bytes_alloc"] / 2.**20))
+
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.table()
+
+    def chrome_trace(self, path=None):
+        """Return the stage events in the Chrome trace event format.
+
+        The result can be loaded in chrome://tracing or Perfetto.
+
+        Args:
+
+            path (:obj:`str`, optional): If set, the trace is also written
+                to this file as JSON.  Default is None.
+
+        Returns:
+
+            :obj:`dict`: The trace, with a 'traceEvents' list of complete
+            ('X') events.
+
+        """
+        pid = os.getpid()
+        events = [{"name": name, "cat": category, "ph": "X",
+                   "ts": start * 1.0e6, "dur": duration * 1.0e6,
+                   "pid": pid, "tid": tid,
+                   "args": {"bytes_read": read, "bytes_alloc": alloc}}
+                  for (name, category, start, duration, tid, read, alloc)
+                  in self._events]
+
+        trace = {"traceEvents": events, "displayTimeUnit": "ms"}
+
+        if path is not None:
+            with open(path, "w") as f:
+                json.dump(trace, f)
+
+        return trace
+
+
+def profile():
+    """Return a context manager that profiles the wrf-python routines.
+
+    While the context is active in the current thread, every
+    :meth:`wrf.getvar` call and the stages inside it (NetCDF reads, type
+    casts, transposes, compiled kernels, masking, and metadata) record
+    their wall time, bytes read, bytes allocated, and call counts.
+
+    Profiling is thread local; calls made from other threads are not
+    recorded.
+
+    Returns:
+
+        :class:`wrf.Profile`: The profile, which can be printed as a table
+        or exported with :meth:`wrf.Profile.chrome_trace`.
+
+    Examples:
+
+        .. code-block:: python
+
+            from netCDF4 import Dataset
+            from wrf import getvar, profile
+
+            wrfnc = Dataset("wrfout_d02_2010-06-13_21:00:00")
+
+            with profile() as p:
+                slp = getvar(wrfnc, "slp")
+                cape = getvar(wrfnc, "cape_2d")
+
+            print(p.table())
+            p.chrome_trace("wrf_trace.json")
+
+    """
+    return Profile()
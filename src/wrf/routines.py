@@ -1,10 +1,20 @@
 from __future__ import (absolute_import, division, print_function)
 
+from collections import deque, OrderedDict
+
+import numpy as np
+import numpy.ma as ma
+
+from .config import xarray_enabled
 from .util import (get_iterable, is_standard_wrf_var, extract_vars, viewkeys,
-                   get_id)
+                   get_id, is_mapping, is_multi_file, extract_dim,
+                   to_np)
+from .py3compat import viewitems, py3range, isstr
+from .profiler import profile_stage
+from .diskcache import disk_cache_key, load_disk_cache, store_disk_cache
 from .g_cape import (get_2dcape, get_3dcape, get_cape2d_only,
                      get_cin2d_only, get_lcl, get_lfc, get_3dcape_only,
-                     get_3dcin_only)
+                     get_3dcin_only, get_cape_parcels)
 from .g_ctt import get_ctt
 from .g_dbz import get_dbz, get_max_dbz
 from .g_dewpoint import get_dp, get_dp_2m
@@ -31,12 +41,14 @@ from .g_wind import (get_destag_wspd_wdir, get_destag_wspd_wdir10,
 from .g_times import get_times, get_xtimes
 from .g_cloudfrac import (get_cloudfrac, get_low_cloudfrac, get_mid_cloudfrac,
                           get_high_cloudfrac)
+from .g_precip import get_accum_precip, get_precip_interval
 
 
 # func is the function to call.  kargs are required arguments that should
 # not be altered by the user
 _FUNC_MAP = {"cape2d": get_2dcape,
              "cape3d": get_3dcape,
+             "cape_parcels": get_cape_parcels,
              "dbz": get_dbz,
              "maxdbz": get_max_dbz,
              "dp": get_dp,
@@ -97,11 +109,14 @@ _FUNC_MAP = {"cape2d": get_2dcape,
              "wdir10": get_destag_wdir10,
              "low_cloudfrac": get_low_cloudfrac,
              "mid_cloudfrac": get_mid_cloudfrac,
-             "high_cloudfrac": get_high_cloudfrac
+             "high_cloudfrac": get_high_cloudfrac,
+             "precip_accum": get_accum_precip,
+             "precip_interval": get_precip_interval
              }
 
 _VALID_KARGS = {"cape2d": ["missing"],
                 "cape3d": ["missing"],
+                "cape_parcels": ["missing", "parcels"],
                 "dbz": ["do_variant", "do_liqskin"],
                 "maxdbz": ["do_variant", "do_liqskin"],
                 "dp": ["units"],
@@ -166,6 +181,8 @@ _VALID_KARGS = {"cape2d": ["missing"],
                                   "mid_thresh", "high_thresh"],
                 "high_cloudfrac": ["vert_type", "low_thresh",
                                    "mid_thresh", "high_thresh"],
+                "precip_accum": ["bucket_mm"],
+                "precip_interval": ["bucket_mm", "missing"],
                 "default": []
                 }
 
@@ -351,5 +368,256 @@ def getvar(wrfin, varname, timeidx=0,
 
     _check_kargs(actual_var, kwargs)
 
-    return _FUNC_MAP[actual_var](wrfin, timeidx, method, squeeze, cache,
-                                 meta, _key, **kwargs)
+    diskkey = disk_cache_key(wrfin, actual_var, timeidx, method, squeeze,
+                             meta, kwargs)
+    with profile_stage("getvar:" + actual_var, "product"):
+        result = load_disk_cache(diskkey)
+        if result is not None:
+            return result
+
+        result = _FUNC_MAP[actual_var](wrfin, timeidx, method, squeeze,
+                                       cache, meta, _key, **kwargs)
+
+        store_disk_cache(diskkey, result)
+
+    return result
+
+
+class _Reducer(object):
+    """A running accumulator used by :meth:`reduce_getvar`.
+
+    The accumulator is folded one time step at a time so that only the
+    current field and the running state are held in memory.
+
+    """
+    def __init__(self, reducer):
+        self.reducer = reducer
+        self.state = None
+        self.index = None
+        self.count = 0
+
+    def update(self, field, idx):
+        if self.count == 0:
+            if self.reducer in ("mean", "sum"):
+                self.state = ma.array(field, dtype=np.float64, copy=True)
+            elif self.reducer in ("argmax", "argmin"):
+                self.state = ma.array(field, copy=True)
+                self.index = np.full(np.shape(field), idx, np.int64)
+            elif callable(self.reducer):
+                self.state = self.reducer(None, field)
+            else:
+                self.state = ma.array(field, copy=True)
+        elif self.reducer == "max":
+            self.state = ma.maximum(self.state, field)
+        elif self.reducer == "min":
+            self.state = ma.minimum(self.state, field)
+        elif self.reducer in ("mean", "sum"):
+            self.state += field
+        elif self.reducer in ("argmax", "argmin"):
+            if self.reducer == "argmax":
+                replace = ma.filled(field > self.state, False)
+            else:
+                replace = ma.filled(field < self.state, False)
+            self.state = ma.where(replace, field, self.state)
+            self.index[replace] = idx
+        else:
+            self.state = self.reducer(self.state, field)
+
+        self.count += 1
+
+    def result(self):
+        if self.reducer == "mean":
+            result = self.state / self.count
+        elif self.reducer in ("argmax", "argmin"):
+            result = self.index
+        else:
+            result = self.state
+
+        if isinstance(result, ma.MaskedArray) and not ma.is_masked(result):
+            return result.data
+
+        return result
+
+
+def _reduce_meta(template, result, reducer, window, times):
+    """Return a :class:`xarray.DataArray` for a reduction result.
+
+    The dimensions, coordinates, and attributes are taken from the
+    *template* :class:`xarray.DataArray` produced by :meth:`getvar` for a
+    single time step.  The time coordinates are dropped, or replaced by
+    the window end times when *window* is not None.
+
+    """
+    from xarray import DataArray
+
+    coords = OrderedDict((key, val) for key, val in viewitems(template.coords)
+                         if key not in ("Time", "XTIME"))
+    dims = template.dims
+    if window is not None:
+        dims = ("Time",) + dims
+        coords["Time"] = times
+
+    attrs = OrderedDict(template.attrs)
+    reducer_name = reducer if isstr(reducer) else reducer.__name__
+    attrs["reduction"] = reducer_name
+    if window is not None:
+        attrs["reduction_window"] = window
+    if reducer in ("argmax", "argmin"):
+        attrs["units"] = ""
+        attrs.pop("_FillValue", None)
+        attrs.pop("missing_value", None)
+
+    if isinstance(result, ma.MaskedArray):
+        attrs["_FillValue"] = result.fill_value
+        attrs["missing_value"] = result.fill_value
+
+    name = template.name
+    if name is not None:
+        name = "{}_{}".format(name, reducer_name)
+
+    return DataArray(result, name=name, dims=dims, coords=coords,
+                     attrs=attrs)
+
+
+def reduce_getvar(wrfin, varname, reducer="max", window=None, cache=None,
+                  meta=True, **kwargs):
+    """Return a temporal reduction of a diagnostic over all times.
+
+    The diagnostic is computed one time step at a time with :meth:`getvar`
+    and folded into a running accumulator, so the full time series is
+    never held in memory.  This is useful for products like the run
+    maximum reflectivity or the mean sea level pressure over a run.
+
+    Args:
+
+        wrfin (:class:`netCDF4.Dataset`, :class:`Nio.NioFile`, or an \
+            iterable): WRF-ARW NetCDF
+            data as a :class:`netCDF4.Dataset`, :class:`Nio.NioFile`
+            or an iterable sequence of the aforementioned types.  If a
+            mapping is used, a reduction is returned for each key.
+
+        varname (:obj:`str`) : The variable name.  See :meth:`getvar` for
+            the available diagnostics.
+
+        reducer (:obj:`str` or callable, optional): The reduction to
+            perform.  Must be one of 'max', 'min', 'mean', 'sum',
+            'argmax', or 'argmin'.  The 'argmax' and 'argmin' reducers
+            return the time index (counted from the start of the sequence)
+            where the extreme value first occurs.  A callable can also be
+            supplied with the signature *func(state, field)*, where *state*
+            is None for the first time step, and must return the new state.
+            Default is 'max'.
+
+        window (:obj:`int`, optional): The number of time steps in a
+            sliding window.  When set, the reduction is computed over each
+            window of consecutive time steps and the result gains a
+            leading Time dimension containing the time at the end of each
+            window.  Only *window* time steps are held in memory.  Default
+            is None, which reduces over all times.
+
+        cache (:obj:`dict`, optional): A dictionary of (varname, ndarray)
+            that can be used to supply pre-extracted NetCDF variables to the
+            computational routines.  Default is None.
+
+        meta (:obj:`bool`, optional): Set to False to disable metadata and
+            return :class:`numpy.ndarray` instead of
+            :class:`xarray.DataArray`.  Default is True.
+
+        **kwargs: Optional keyword arguments for the diagnostic.
+            See :meth:`getvar`.
+
+    Returns:
+
+        :class:`xarray.DataArray` or :class:`numpy.ndarray`: The reduced
+        diagnostic.  If xarray is enabled and the *meta* parameter is True,
+        then the result will be a :class:`xarray.DataArray` object with the
+        metadata from :meth:`getvar`.  Otherwise, the result will be a
+        :class:`numpy.ndarray` object with no metadata.
+
+    Raises:
+
+        :class:`ValueError`: Raised when an invalid reducer or window is
+            passed to the routine.
+
+    Examples:
+
+        .. code-block:: python
+
+            from netCDF4 import Dataset
+            from wrf import reduce_getvar
+
+            wrfin = [Dataset("wrfout_d02_2010-06-13_21:00:00"),
+                     Dataset("wrfout_d02_2010-06-14_00:00:00")]
+
+            # Maximum reflectivity over the run
+            mdbz_max = reduce_getvar(wrfin, "mdbz", "max")
+
+            # Maximum reflectivity over each sliding 6 step window
+            mdbz_6 = reduce_getvar(wrfin, "mdbz", "max", window=6)
+
+    """
+    if is_mapping(wrfin):
+        return OrderedDict((key, reduce_getvar(val, varname, reducer, window,
+                                               cache, meta, **kwargs))
+                           for key, val in viewitems(wrfin))
+
+    if not callable(reducer) and reducer not in ("max", "min", "mean", "sum",
+                                                 "argmax", "argmin"):
+        raise ValueError("'{}' is not a valid reducer".format(reducer))
+
+    if window is not None and int(window) < 1:
+        raise ValueError("'window' must be a positive integer")
+
+    wrfin = get_iterable(wrfin)
+    files = wrfin if is_multi_file(wrfin) else (wrfin,)
+
+    do_meta = meta and xarray_enabled()
+    template = None
+    accum = _Reducer(reducer) if window is None else None
+    fields = deque(maxlen=window)
+    results = []
+    times = []
+    globalidx = 0
+
+    for wrfnc in files:
+        for timeidx in py3range(extract_dim(wrfnc, "Time")):
+            var = getvar(wrfnc, varname, timeidx, cache=cache, meta=do_meta,
+                         **kwargs)
+
+            if do_meta and template is None:
+                template = var
+
+            field = to_np(var)
+
+            if window is None:
+                accum.update(field, globalidx)
+            else:
+                fields.append((globalidx, field))
+                if len(fields) == window:
+                    window_accum = _Reducer(reducer)
+                    for idx, windowfield in fields:
+                        window_accum.update(windowfield, idx)
+                    results.append(window_accum.result())
+                    if do_meta:
+                        times.append(var.coords["Time"].values)
+
+            globalidx += 1
+
+    if globalidx == 0:
+        raise ValueError("no times found in the input sequence")
+
+    if window is None:
+        result = accum.result()
+    else:
+        if not results:
+            raise ValueError("'window' is larger than the number of times "
+                             "({})".format(globalidx))
+        if any(isinstance(arr, ma.MaskedArray) for arr in results):
+            result = ma.stack(results)
+        else:
+            result = np.stack(results)
+
+    if not do_meta:
+        return result
+
+    return _reduce_meta(template, result, reducer, window, times)
@@ -4,13 +4,16 @@ import numpy as np
 
 import wrapt
 
-from .util import iter_left_indexes, to_np
+from .util import iter_left_indexes, to_np, _is_all_masked
 from .py3compat import py3range
-from .config import xarray_enabled
+from .config import _check_cancelled
 from .constants import default_fill
+from .profiler import masked_values
 
-if xarray_enabled():
+try:
     from xarray import DataArray
+except ImportError:
+    pass
 
 
 def uvmet_left_iter(alg_dtype=np.float64):
@@ -122,6 +125,8 @@ def uvmet_left_iter(alg_dtype=np.float64):
         output = np.empty(output_dims, orig_dtype)
 
         for left_idxs in iter_left_indexes(extra_dims):
+            _check_cancelled()
+
             left_and_slice_idxs = left_idxs + (slice(None),)
 
             if mode == 0:
@@ -147,13 +152,12 @@ def uvmet_left_iter(alg_dtype=np.float64):
             # Skip the possible empty/missing arrays for the join method
             skip_missing = False
             for arg in (new_u, new_v, new_lat, new_lon):
-                if isinstance(arg, np.ma.MaskedArray):
-                    if arg.mask.all():
-                        output[u_output_idxs] = uvmetmissing
-                        output[v_output_idxs] = uvmetmissing
+                if _is_all_masked(arg):
+                    output[u_output_idxs] = uvmetmissing
+                    output[v_output_idxs] = uvmetmissing
 
-                        skip_missing = True
-                        has_missing = True
+                    skip_missing = True
+                    has_missing = True
 
             if skip_missing:
                 continue
@@ -176,7 +180,101 @@ def uvmet_left_iter(alg_dtype=np.float64):
                             outview_array[v_view_idxs].astype(orig_dtype))
 
         if has_missing:
-            output = np.ma.masked_values(output, uvmetmissing)
+            output = masked_values(output, uvmetmissing)
+
+        return output
+
+    return func_wrapper
+
+
+def uvmet_rotate_left_iter(alg_dtype=np.float64):
+    """A decorator to handle iterating over the leftmost dimensions for the
+    uvmet rotation routine.
+
+    The rotation coefficients are either a fixed (2, ny, nx) array that
+    applies to every time and level, or include the same leftmost dimensions
+    as the winds for moving domains.  Everything to the right of the
+    coefficients' leftmost dimensions shares the same rotation, so it is
+    passed to the wrapped function as a single three-dimensional block
+    instead of looping over each time and level.
+
+    The two output arrays are allocated first as the 0 and 1 indexes of the
+    final output, and views of them are passed to the wrapped function.
+
+    Args:
+
+        alg_dtype (:class:`np.dtype` or :obj:`str`): The numpy data type used
+            in the wrapped function.
+
+    Returns:
+
+        :class:`numpy.ndarray`: The aggregated output array, whose leftmost
+        dimension is 2 (0=U or WSPD, 1=V or WDIR).
+
+    """
+    @wrapt.decorator
+    def func_wrapper(wrapped, instance, args, kwargs):
+        u = args[0]
+        v = args[1]
+        rot = args[2]
+        wspd_wdir = kwargs.get("wspd_wdir", False)
+
+        orig_dtype = u.dtype
+
+        if u.shape != v.shape:
+            raise ValueError("'u' and 'v' shape mismatch")
+
+        num_left_dims = rot.ndim - 3
+        left_dims = u.shape[0:num_left_dims]
+
+        if (rot.shape[0:num_left_dims] != left_dims or
+                rot.shape[-2:] != u.shape[-2:]):
+            raise ValueError("'rot' shape does not match 'u'")
+
+        has_missing = False
+        u_arr = to_np(u)
+        v_arr = to_np(v)
+
+        umissing = default_fill(np.float64)
+        if isinstance(u_arr, np.ma.MaskedArray):
+            has_missing = True
+            umissing = u_arr.fill_value
+
+        vmissing = default_fill(np.float64)
+        if isinstance(v_arr, np.ma.MaskedArray):
+            has_missing = True
+            vmissing = v_arr.fill_value
+
+        uvmetmissing = umissing
+
+        # The missing values are detected by value in the Fortran routine
+        if has_missing:
+            u_arr = np.ma.filled(u_arr, umissing)
+            v_arr = np.ma.filled(v_arr, vmissing)
+
+        rot_arr = np.ma.getdata(to_np(rot))
+
+        output = np.empty((2,) + u.shape, alg_dtype)
+        right_dims = (-1,) + u.shape[-2:]
+
+        for left_idxs in iter_left_indexes(left_dims):
+            _check_cancelled()
+
+            new_u = u_arr[left_idxs].reshape(right_dims)
+            new_v = v_arr[left_idxs].reshape(right_dims)
+            uview = output[(0,) + left_idxs].reshape(right_dims)
+            vview = output[(1,) + left_idxs].reshape(right_dims)
+
+            _ = wrapped(new_u, new_v, rot_arr[left_idxs],
+                        wspd_wdir=wspd_wdir, has_missing=has_missing,
+                        umissing=umissing, vmissing=vmissing,
+                        uvmetmissing=uvmetmissing, uview=uview, vview=vview)
+
+        if output.dtype != orig_dtype:
+            output = output.astype(orig_dtype)
+
+        if has_missing:
+            output = masked_values(output, uvmetmissing)
 
         return output
 
@@ -209,7 +307,9 @@ def cape_left_iter(alg_dtype=np.float64):
     """
     @wrapt.decorator
     def func_wrapper(wrapped, instance, args, kwargs):
-        # The cape calculations use an ascending vertical pressure coordinate
+        # The cape calculations use an ascending vertical pressure coordinate.
+        # Arrays in descending pressure order (WRF model order) are read in
+        # reverse by the Fortran routine, so no flipped copies are made.
 
         new_args = list(args)
         new_kwargs = dict(kwargs)
@@ -221,10 +321,8 @@ def cape_left_iter(alg_dtype=np.float64):
         ter = args[4]
         sfp = args[5]
         missing = args[6]
-        i3dflag = args[7]
         ter_follow = args[8]
 
-        is2d = i3dflag == 0
         # Note: This should still work with DataArrays
         is1d = np.isscalar(sfp) or np.size(sfp) == 1
 
@@ -237,35 +335,16 @@ def cape_left_iter(alg_dtype=np.float64):
         orig_dtype = p_hpa.dtype
 
         if not is1d:
-            # Need to order in ascending pressure order
-            flip = False
             bot_idxs = (0,) * p_hpa.ndim
             top_idxs = list(bot_idxs)
             top_idxs[-3] = -1
             top_idxs = tuple(top_idxs)
 
-            if p_hpa[bot_idxs] > p_hpa[top_idxs]:
-                flip = True
-                p_hpa = np.ascontiguousarray(p_hpa[..., ::-1, :, :])
-                tk = np.ascontiguousarray(tk[..., ::-1, :, :])
-                qv = np.ascontiguousarray(qv[..., ::-1, :, :])
-                ht = np.ascontiguousarray(ht[..., ::-1, :, :])
-                new_args[0] = p_hpa
-                new_args[1] = tk
-                new_args[2] = qv
-                new_args[3] = ht
+            bottom_up = 1 if p_hpa[bot_idxs] > p_hpa[top_idxs] else 0
 
             num_left_dims = p_hpa.ndim - 3
         else:
-            # Need to order in ascending pressure order
-            flip = False
-
-            if p_hpa[0] > p_hpa[-1]:
-                flip = True
-                p_hpa = np.ascontiguousarray(p_hpa[::-1])
-                tk = np.ascontiguousarray(tk[::-1])
-                qv = np.ascontiguousarray(qv[::-1])
-                ht = np.ascontiguousarray(ht[::-1])
+            bottom_up = 1 if p_hpa[0] > p_hpa[-1] else 0
 
             # Need to make 3D views for the fortran code.
             # Going to make these fortran ordered, since the f_contiguous and
@@ -280,6 +359,8 @@ def cape_left_iter(alg_dtype=np.float64):
 
             num_left_dims = 0
 
+        new_kwargs["bottom_up"] = bottom_up
+
         # No special left side iteration, build the output from the cape,cin
         # result
         if (num_left_dims == 0):
@@ -293,12 +374,8 @@ def cape_left_iter(alg_dtype=np.float64):
 
             output = np.empty(output_dims, orig_dtype)
 
-            if flip and not is2d:
-                output[0, :] = cape[::-1, :, :]
-                output[1, :] = cin[::-1, :, :]
-            else:
-                output[0, :] = cape[:]
-                output[1, :] = cin[:]
+            output[0, :] = cape[:]
+            output[1, :] = cin[:]
 
             return output
 
@@ -319,16 +396,14 @@ def cape_left_iter(alg_dtype=np.float64):
         output = np.empty(output_dims, orig_dtype)
 
         for left_idxs in iter_left_indexes(extra_dims):
+            _check_cancelled()
+
             left_and_slice_idxs = left_idxs + (slice(None),)
             cape_idxs = left_idxs + (0, slice(None))
             cin_idxs = left_idxs + (1, slice(None))
 
             cape_output_idxs = (0,) + left_idxs + (slice(None),)
             cin_output_idxs = (1,) + left_idxs + (slice(None),)
-            view_cape_reverse_idxs = left_idxs + (0, slice(None, None, -1),
-                                                  slice(None))
-            view_cin_reverse_idxs = left_idxs + (1, slice(None, None, -1),
-                                                 slice(None))
 
             new_args[0] = p_hpa[left_and_slice_idxs]
             new_args[1] = tk[left_and_slice_idxs]
@@ -344,16 +419,11 @@ def cape_left_iter(alg_dtype=np.float64):
             # supply the fill values here.
             skip_missing = False
             for arg in (new_args[0:6]):
-                if isinstance(arg, np.ma.MaskedArray):
-                    if arg.mask.all():
-                        if flip and not is2d:
-                            output[cape_output_idxs] = missing
-                            output[cin_output_idxs] = missing
-                        else:
-                            output[cape_output_idxs] = missing
-                            output[cin_output_idxs] = missing
+                if _is_all_masked(arg):
+                    output[cape_output_idxs] = missing
+                    output[cin_output_idxs] = missing
 
-                        skip_missing = True
+                    skip_missing = True
 
             if skip_missing:
                 continue
@@ -370,16 +440,10 @@ def cape_left_iter(alg_dtype=np.float64):
                     capeview.__array_interface__["data"][0]):
                 raise RuntimeError("output array was copied")
 
-            if flip and not is2d:
-                output[cape_output_idxs] = (
-                    outview_array[view_cape_reverse_idxs].astype(orig_dtype))
-                output[cin_output_idxs] = (
-                    outview_array[view_cin_reverse_idxs].astype(orig_dtype))
-            else:
-                output[cape_output_idxs] = (
-                    outview_array[cape_idxs].astype(orig_dtype))
-                output[cin_output_idxs] = (
-                    outview_array[cin_idxs].astype(orig_dtype))
+            output[cape_output_idxs] = (
+                outview_array[cape_idxs].astype(orig_dtype))
+            output[cin_output_idxs] = (
+                outview_array[cin_idxs].astype(orig_dtype))
 
         return output
 
@@ -456,6 +520,8 @@ def cloudfrac_left_iter(alg_dtype=np.float64):
         has_missing = False
         missing = default_fill(np.float64)
         for left_idxs in iter_left_indexes(extra_dims):
+            _check_cancelled()
+
             left_and_slice_idxs = left_idxs + (slice(None),)
             low_idxs = left_idxs + (0, slice(None))
             mid_idxs = left_idxs + (1, slice(None))
@@ -473,14 +539,13 @@ def cloudfrac_left_iter(alg_dtype=np.float64):
             # supply the fill values here.
             skip_missing = False
             for arg in (new_args[0:2]):
-                if isinstance(arg, np.ma.MaskedArray):
-                    if arg.mask.all():
-                        output[low_output_idxs] = missing
-                        output[mid_output_idxs] = missing
-                        output[high_output_idxs] = missing
+                if _is_all_masked(arg):
+                    output[low_output_idxs] = missing
+                    output[mid_output_idxs] = missing
+                    output[high_output_idxs] = missing
 
-                        skip_missing = True
-                        has_missing = True
+                    skip_missing = True
+                    has_missing = True
 
             if skip_missing:
                 continue
@@ -509,7 +574,7 @@ def cloudfrac_left_iter(alg_dtype=np.float64):
                 outview_array[high_idxs].astype(orig_dtype))
 
         if has_missing:
-            output = np.ma.masked_values(output, missing)
+            output = masked_values(output, missing)
 
         return output
 
@@ -566,6 +631,7 @@ def interplevel_left_iter(is2dlev, alg_dtype=np.float64):
         outview_array = np.empty(outdims, alg_dtype)
 
         for left_idxs in iter_left_indexes(extra_dims):
+            _check_cancelled()
 
             field_out_slice_idxs = left_idxs + (slice(None),)
 
@@ -592,6 +658,127 @@ def interplevel_left_iter(is2dlev, alg_dtype=np.float64):
     return func_wrapper
 
 
+def interpz3d_weights_left_iter(is2dlev):
+    """A decorator to handle iterating over the leftmost dimensions for the
+    vertical interpolation weight routines.
+
+    The wrapped function computes the lower index, upper index, and weight
+    arrays for a single three-dimensional vertical coordinate.  This decorator
+    allocates the three output arrays for all leftmost dimensions and passes
+    views of them to the wrapped function.
+
+    Args:
+
+        is2dlev (:obj:`bool`): Set to True if the desired levels are a
+            two-dimensional field (e.g. PBL height) rather than a
+            one-dimensional sequence of levels.
+
+    Returns:
+
+        :obj:`tuple`: The lower index, upper index, and weight arrays, which
+        include all extra leftmost dimensions found in the vertical
+        coordinate.
+
+    """
+    @wrapt.decorator
+    def func_wrapper(wrapped, instance, args, kwargs):
+        z = args[0]
+        levels = args[1]
+
+        num_left_dims = z.ndim - 3
+        left_dims = z.shape[0:num_left_dims]
+
+        if not is2dlev:
+            outdims = left_dims + levels.shape + z.shape[-2:]
+        else:
+            outdims = left_dims + z.shape[-2:]
+
+        k1 = np.empty(outdims, np.int32)
+        k2 = np.empty(outdims, np.int32)
+        weights = np.empty(outdims, np.float64)
+
+        for left_idxs in iter_left_indexes(left_dims):
+            _check_cancelled()
+
+            left_and_slice_idxs = left_idxs + (slice(None),)
+
+            new_z = z[left_and_slice_idxs]
+
+            if is2dlev and levels.ndim > 2:
+                new_levels = levels[left_and_slice_idxs]
+            else:
+                new_levels = levels
+
+            _ = wrapped(new_z, new_levels,
+                        k1view=k1[left_and_slice_idxs],
+                        k2view=k2[left_and_slice_idxs],
+                        wview=weights[left_and_slice_idxs])
+
+        return k1, k2, weights
+
+    return func_wrapper
+
+
+def smooth2d_left_iter(alg_dtype=np.float64):
+    """A decorator to handle the leftmost dimensions for the smoothing
+    routine.
+
+    Rather than iterating, the leftmost dimensions are combined in to a
+    single batch dimension, so the wrapped function smooths every
+    two-dimensional slice in one call.  Slices that are entirely masked
+    (e.g. padding from the join method) are set to the fill value.  A
+    two-dimensional field is returned with the same array type as the input.
+
+    Args:
+
+        alg_dtype (:class:`np.dtype` or :obj:`str`): The numpy data type used
+            in the wrapped function.
+
+    Returns:
+
+        :class:`numpy.ndarray`: The smoothed output array that includes all
+        extra leftmost dimensions.
+
+    """
+    @wrapt.decorator
+    def func_wrapper(wrapped, instance, args, kwargs):
+        new_args = list(args)
+
+        field = to_np(args[0])
+        orig_shape = field.shape
+        orig_dtype = field.dtype
+
+        new_args[0] = field.reshape((-1, ) + orig_shape[-2:])
+        nbatch = new_args[0].shape[0]
+
+        # No leftmost dimensions, so the output keeps the input type
+        if field.ndim == 2:
+            return wrapped(*new_args, **kwargs).reshape(orig_shape)
+
+        # Skip the possible empty/missing slices for the join method
+        all_masked = None
+        if np.ma.getmask(field) is not np.ma.nomask:
+            all_masked = field.mask.reshape((nbatch, -1)).all(axis=1)
+            if not all_masked.any():
+                all_masked = None
+
+        outview = np.empty(new_args[0].shape, alg_dtype)
+
+        _ = wrapped(*new_args, outview=outview, **kwargs)
+
+        if all_masked is not None:
+            outview[all_masked] = default_fill(np.float64)
+
+        output = outview.reshape(orig_shape).astype(orig_dtype)
+
+        if all_masked is not None:
+            output = masked_values(output, default_fill(np.float64))
+
+        return output
+
+    return func_wrapper
+
+
 def check_cape_args():
     """A decorator to check that the cape_3d arguments are valid.
 
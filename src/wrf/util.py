@@ -8,6 +8,7 @@ from itertools import product, tee
 from types import GeneratorType
 import datetime as dt
 from inspect import getmodule
+from weakref import WeakKeyDictionary
 
 try:
     from inspect import signature
@@ -21,7 +22,8 @@ except ImportError:
 
 # Needed for Python 3.4 to use apply_defaults
 try:
-    from inspect import _empty, _VAR_POSITIONAL, _VAR_KEYWORD
+    from inspect import (_empty, _VAR_POSITIONAL, _VAR_KEYWORD,
+                         _POSITIONAL_OR_KEYWORD)
 except ImportError:
     pass
 
@@ -35,10 +37,15 @@ from .cache import cache_item, get_cached_item
 from .geobnds import GeoBounds, NullGeoBounds
 from .coordpair import CoordPair
 from .projection import getproj
+from .profiler import profile_stage, nbytes
 
 
-if xarray_enabled():
+# Imported whenever xarray is installed, since xarray can be enabled after
+# this module is loaded
+try:
     from xarray import DataArray
+except ImportError:
+    pass
 
 
 _COORD_PAIR_MAP = {"XLAT": ("XLAT", "XLONG"),
@@ -62,6 +69,9 @@ _LON_COORDS = ("XLONG", "XLONG_M", "XLONG_U", "XLONG_V", "CLONG")
 
 _TIME_COORD_VARS = ("XTIME",)
 
+# Parcel type codes used by the dcapeparcels routine
+_CAPE_PARCELS = {"sb": 1, "ml": 2, "mu": 3}
+
 
 def is_time_coord_var(varname):
     """Return True if the input variable name is a time coordinate.
@@ -1211,7 +1221,7 @@ def _get_coord_names(wrfin, varname):
 
 
 def _build_data_array(wrfnc, varname, timeidx, is_moving_domain, is_multifile,
-                      _key):
+                      _key, read_data=True):
     """Return a :class:`xarray.DataArray` object for the desired variable in
     a single NetCDF file object.
 
@@ -1237,6 +1247,11 @@ def _build_data_array(wrfnc, varname, timeidx, is_moving_domain, is_multifile,
         _key (:obj:`int`, optional): Cache key for the coordinate variables.
             This is used for internal purposes only.  Default is None.
 
+        read_data (:obj:`bool`, optional): Set to False to skip reading the
+            variable data.  The array is then a read-only placeholder with
+            the variable's shape, so only the metadata can be used.
+            Default is True.
+
     Returns:
 
         :class:`xarray.DataArray`:  An array object that contains metadata.
@@ -1251,7 +1266,13 @@ def _build_data_array(wrfnc, varname, timeidx, is_moving_domain, is_multifile,
     multitime = is_multi_time_req(timeidx)
     time_idx_or_slice = timeidx if not multitime else slice(None)
     var = wrfnc.variables[varname]
-    if len(var.shape) > 1:
+    if not read_data:
+        # Zero-strided, so the shape comes from the header with no read
+        shape = tuple(var.shape)
+        if not multitime:
+            shape = shape[1:]
+        data = np.broadcast_to(np.zeros((), var.dtype), shape)
+    elif len(var.shape) > 1:
         data = var[time_idx_or_slice, :]
     else:
         data = var[time_idx_or_slice]
@@ -1798,6 +1819,77 @@ def _get_numfiles(wrfseq):
         return sum(1 for _ in wrf_iter)
 
 
+def _join_mask(outdata, valid_times, maxtimes, timeidx):
+    """Return the joined data as a masked array that masks the times past
+    the end of each file.
+
+    The mask is made from the number of valid times in each file.  If none
+    of the requested times are past the end of a file, no mask array is
+    made.
+
+    Args:
+
+        outdata (:class:`numpy.ndarray`): The joined data, with the file
+            and time as the two leftmost dimensions.
+
+        valid_times (:class:`numpy.ndarray`): The number of times in each
+            file.
+
+        maxtimes (:obj:`int`): The maximum number of times in a file.
+
+        timeidx (:obj:`int` or :data:`wrf.ALL_TIMES`): The requested time
+            index.
+
+    Returns:
+
+        :class:`numpy.ma.MaskedArray`: The masked joined data.
+
+    """
+    missing = np.arange(maxtimes) >= valid_times[:, np.newaxis]
+    if is_multi_time_req(timeidx):
+        missing = missing[:, 0:outdata.shape[1]]
+    else:
+        missing = missing[:, timeidx, np.newaxis]
+
+    fill = default_fill(outdata.dtype)
+    if not missing.any():
+        return ma.MaskedArray(outdata, copy=False, fill_value=fill)
+
+    with profile_stage("masked_values") as stage:
+        mask = np.empty(outdata.shape, np.bool_)
+        mask[...] = missing.reshape(missing.shape +
+                                    (1, ) * (outdata.ndim - 2))
+        stage.add_bytes(alloc=mask.nbytes)
+
+    return ma.MaskedArray(outdata, mask=mask, copy=False, fill_value=fill)
+
+
+def _is_all_masked(arr):
+    """Return True if *arr* is a masked array with every element masked.
+
+    The join method masks whole (file, time) slices, so the first element is
+    checked before the whole mask is searched.  Slices that are not padding
+    are then rejected without scanning the mask.
+
+    Args:
+
+        arr (:class:`numpy.ndarray`): An array.
+
+    Returns:
+
+        :obj:`bool`: True if every element is masked.
+
+    """
+    mask = ma.getmask(arr)
+    if mask is ma.nomask:
+        return False
+
+    if mask.size > 0 and not mask.flat[0]:
+        return False
+
+    return bool(mask.all())
+
+
 def _join_files(wrfseq, varname, timeidx, is_moving, meta, _key):
     """Return an array object from a sequence of files using the join
     method.
@@ -1810,6 +1902,11 @@ def _join_files(wrfseq, varname, timeidx, is_moving, meta, _key):
     arrays, but be careful when calling compiled routines outside of
     wrf-python.
 
+    The number of valid times is recorded for each file, so only the
+    padding is filled and the mask is made from these counts rather than
+    by searching the data for the fill value.  No mask is made when the
+    requested times contain no padding.
+
     In general, join is rarely used, so the concatenate method should be used
     for most cases.
 
@@ -1855,9 +1952,11 @@ def _join_files(wrfseq, varname, timeidx, is_moving, meta, _key):
     maxtimes = _find_max_time_size(wrfseq)
 
     time_idx_or_slice = timeidx if not multitime else slice(None)
-    file_times_less_than_max = False
     file_idx = 0
 
+    # The number of valid times in each file
+    valid_times = np.zeros(numfiles, np.int64)
+
     # wrfseq might be a generator
     wrf_iter = iter(wrfseq)
     wrfnc = next(wrf_iter)
@@ -1872,8 +1971,7 @@ def _join_files(wrfseq, varname, timeidx, is_moving, meta, _key):
     else:
         first_var = wrfnc.variables[varname][:]
 
-    if numtimes < maxtimes:
-        file_times_less_than_max = True
+    valid_times[file_idx] = numtimes
 
     # Out dimensions will be the number of files, maxtimes, then the
     # non-time shapes from the first variable
@@ -1881,12 +1979,13 @@ def _join_files(wrfseq, varname, timeidx, is_moving, meta, _key):
     outdims += [maxtimes]
     outdims += first_var.shape[1:]
 
-    # For join, always need to start with full masked values
-    outdata = np.full(outdims, default_fill(first_var.dtype), first_var.dtype)
+    # Only the times past the end of a file are filled with missing values
+    outdata = np.empty(outdims, first_var.dtype)
     if first_var.ndim > 1:
         outdata[file_idx, 0:numtimes, :] = first_var[:]
     else:
         outdata[file_idx, 0:numtimes] = first_var[:]
+    outdata[file_idx, numtimes:] = default_fill(outdata.dtype)
 
     # Create the secondary coordinate arrays
     if xarray_enabled() and meta:
@@ -1946,8 +2045,7 @@ def _join_files(wrfseq, varname, timeidx, is_moving, meta, _key):
             break
         else:
             numtimes = extract_dim(wrfnc, "Time")
-            if numtimes < maxtimes:
-                file_times_less_than_max = True
+            valid_times[file_idx] = numtimes
             outvar = wrfnc.variables[varname][:]
 
             if not multitime:
@@ -1957,6 +2055,7 @@ def _join_files(wrfseq, varname, timeidx, is_moving, meta, _key):
                 outdata[file_idx, 0:numtimes, :] = outvar[:]
             else:
                 outdata[file_idx, 0:numtimes] = outvar[:]
+            outdata[file_idx, numtimes:] = default_fill(outdata.dtype)
 
             if xarray_enabled() and meta:
                 # For join, the times are a function of fileidx
@@ -1981,11 +2080,15 @@ def _join_files(wrfseq, varname, timeidx, is_moving, meta, _key):
             # Need to update coords here
             file_idx += 1
 
+    if not multitime:
+        outdata = outdata[:, timeidx, :]
+        outdata = outdata[:, np.newaxis, :]
+
     # If any of the output files contain less than the max number of times,
     # then a mask array is needed to flag all the missing arrays with
     # missing values
-    if file_times_less_than_max:
-        outdata = np.ma.masked_values(outdata, default_fill(outdata.dtype))
+    if np.any(valid_times < maxtimes):
+        outdata = _join_mask(outdata, valid_times, maxtimes, timeidx)
 
     if xarray_enabled() and meta:
         # Cache the coords if applicable
@@ -2037,18 +2140,10 @@ def _join_files(wrfseq, varname, timeidx, is_moving, meta, _key):
                     outlons = outlons[:, np.newaxis, :]
                 outcoords[lonname] = outlatdims, outlons
 
-        if not multitime:
-            outdata = outdata[:, timeidx, :]
-            outdata = outdata[:, np.newaxis, :]
-
         outarr = DataArray(outdata, name=outname, coords=outcoords,
                            dims=outdimnames, attrs=outattrs)
 
     else:
-        if not multitime:
-            outdata = outdata[:, timeidx, :]
-            outdata = outdata[:, np.newaxis, :]
-
         outarr = outdata
 
     return outarr
@@ -2286,9 +2381,93 @@ def extract_vars(wrfin, timeidx, varnames, method="cat", squeeze=True,
     else:
         varlist = varnames
 
-    return {var: _extract_var(wrfin, var, timeidx, None,
-                              method, squeeze, cache, meta, _key)
-            for var in varlist}
+    with profile_stage("extract_vars", "io") as stage:
+        result = {var: _extract_var(wrfin, var, timeidx, None,
+                                    method, squeeze, cache, meta, _key)
+                  for var in varlist}
+        stage.add_bytes(read=nbytes(result))
+
+    return result
+
+
+def extract_var_meta(wrfin, timeidx, varname, method="cat", squeeze=True,
+                     cache=None, _key=None):
+    """Return an array object that only carries the metadata for a variable.
+
+    This is used by the metadata decorators, which only need the dimension
+    names, coordinates, and attributes from a variable.  For a single NetCDF
+    file object, the metadata is built from the variable header and the
+    coordinate cache, so none of the variable data is read.  The result is
+    then stored in the threadlocal cache under *_key*, so every product
+    computed for the same file and time index shares it.
+
+    For sequences, the variable is extracted with :meth:`wrf.extract_vars`.
+
+    Args:
+
+        wrfin (:class:`netCDF4.Dataset`, :class:`Nio.NioFile`, or an \
+            iterable): WRF-ARW NetCDF
+            data as a :class:`netCDF4.Dataset`, :class:`Nio.NioFile`
+            or an iterable sequence of the aforementioned types.
+
+        timeidx (:obj:`int` or :data:`wrf.ALL_TIMES`): The
+            desired time index. This value can be a positive integer,
+            negative integer, or
+            :data:`wrf.ALL_TIMES` (an alias for None) to return
+            all times in the file or sequence.
+
+        varname (:obj:`str`) : The variable name.
+
+        method (:obj:`str`, optional): The aggregation method to use for
+            sequences.  Must be either 'cat' or 'join'.
+            'cat' combines the data along the Time dimension.
+            'join' creates a new dimension for the file index.
+            The default is 'cat'.
+
+        squeeze (:obj:`bool`, optional): Set to False to prevent dimensions
+            with a size of 1 from being automatically removed from the shape
+            of the output. Default is True.
+
+        cache (:obj:`dict`, optional): A dictionary of (varname, ndarray)
+            that can be used to supply pre-extracted NetCDF variables to the
+            computational routines.  A :class:`xarray.DataArray` found here
+            is returned as is.  Default is None.
+
+        _key (:obj:`int`, optional): Cache key for the coordinate variables.
+            This is used for internal purposes only.  Default is None.
+
+    Returns:
+
+        :obj:`tuple`: A (var, has_data) pair, where var is a
+        :class:`xarray.DataArray` and has_data is True if var contains the
+        variable data.  Otherwise, the array data is a read-only placeholder
+        and must not be used.
+
+    """
+    # Only a cached variable with metadata can be used here
+    if cache is not None:
+        var = cache.get(varname)
+        if isinstance(var, DataArray):
+            return var, True
+
+    if is_multi_file(wrfin) or is_time_coord_var(varname):
+        var = extract_vars(wrfin, timeidx, varname, method, squeeze, cache,
+                           meta=True, _key=_key)[varname]
+        return var, True
+
+    meta_key = "meta:{}:{}:{}".format(varname, timeidx, squeeze)
+    var = get_cached_item(_key, meta_key)
+
+    if var is None:
+        is_moving = is_moving_domain(wrfin, varname, _key=_key)
+        var = _build_data_array(wrfin, varname, timeidx, is_moving, False,
+                                _key, read_data=False)
+        if squeeze:
+            var = var.squeeze()
+
+        cache_item(_key, meta_key, var)
+
+    return var, False
 
 
 def npbytes_to_str(var):
@@ -2740,6 +2919,17 @@ def from_args(func, argnames, *args, **kwargs):
         arglist = argnames
 
     result = OrderedDict()
+
+    if version_info > (3,):
+        # Bind the arguments once for all of the names
+        argspec = _get_argspec(func)
+        list_args = argspec.bind(args, kwargs)
+        for argname in arglist:
+            idx = argspec.index.get(argname)
+            result[argname] = list_args[idx] if idx is not None else None
+
+        return result
+
     for argname in arglist:
         arg_loc = arg_location(func, argname, args, kwargs)
 
@@ -2838,6 +3028,76 @@ def _apply_defaults(bound):
     bound.arguments = OrderedDict(new_arguments)
 
 
+class _ArgSpec(object):
+    """The parameters of a function signature, computed once per function.
+
+    The decorators look up arguments on every call, so building the
+    :class:`inspect.Signature` each time is a large part of the cost for
+    small arrays.
+
+    """
+    __slots__ = ("signature", "names", "index", "defaults", "simple",
+                 "__weakref__")
+
+    def __init__(self, func):
+        self.signature = signature(func)
+        params = list(self.signature.parameters.values())
+
+        self.names = tuple(param.name for param in params)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.defaults = tuple(param.default for param in params)
+
+        # Only plain positional-or-keyword arguments use the fast binding
+        self.simple = all(param.kind is _POSITIONAL_OR_KEYWORD
+                          for param in params)
+
+    def bind(self, args, kwargs):
+        """Return all of the argument values, including defaults, as a
+        list in signature order."""
+        if self.simple and len(args) <= len(self.names):
+            nargs = len(args)
+            outargs = list(args)
+            outargs.extend(self.defaults[nargs:])
+
+            for key, val in viewitems(kwargs):
+                idx = self.index.get(key)
+                if idx is None or idx < nargs:
+                    break  # Let Signature.bind raise the error
+                outargs[idx] = val
+            else:
+                if not any(arg is _empty for arg in outargs):
+                    return outargs
+
+        bound = self.signature.bind(*args, **kwargs)
+        try:
+            bound.apply_defaults()
+        except AttributeError:
+            _apply_defaults(bound)
+
+        return [x for x in bound.arguments.values()]
+
+
+_argspec_cache = WeakKeyDictionary()
+
+
+def _get_argspec(func):
+    """Return the cached :class:`_ArgSpec` for *func*."""
+    try:
+        return _argspec_cache[func]
+    except KeyError:
+        pass
+    except TypeError:  # Not weak referenceable
+        return _ArgSpec(func)
+
+    argspec = _ArgSpec(func)
+    try:
+        _argspec_cache[func] = argspec
+    except TypeError:
+        pass
+
+    return argspec
+
+
 def _args_to_list3(func, args, kwargs):
     """Return all of the function arguments, including defaults, as a list.
 
@@ -2863,14 +3123,7 @@ def _args_to_list3(func, args, kwargs):
         :obj:`list`: A list of all argument values, including defaults.
 
     """
-    sig = signature(func)
-    bound = sig.bind(*args, **kwargs)
-    try:
-        bound.apply_defaults()
-    except AttributeError:
-        _apply_defaults(bound)
-
-    return [x for x in bound.arguments.values()]
+    return _get_argspec(func).bind(args, kwargs)
 
 
 # Note:  Doesn't allow for **kwargs or *args
@@ -2975,14 +3228,13 @@ def _arg_location3(func, argname, args, kwargs):
         with the index for location of *argname*.
 
     """
-    sig = signature(func)
-    params = list(sig.parameters.keys())
+    argspec = _get_argspec(func)
 
-    list_args = _args_to_list3(func, args, kwargs)
+    list_args = argspec.bind(args, kwargs)
 
     try:
-        result_idx = params.index(argname)
-    except ValueError:
+        result_idx = argspec.index[argname]
+    except KeyError:
         return None
 
     return list_args, result_idx
@@ -3035,6 +3287,54 @@ def psafilepath():
     return os.path.join(os.path.dirname(__file__), "data", "psadilookup.dat")
 
 
+def _parcel_names(parcels):
+    """Return the validated CAPE parcel type names.
+
+    Args:
+
+        parcels (:obj:`str` or a sequence of :obj:`str`): The parcel type
+            name(s).  Must be 'sb' (surface based), 'ml' (mixed layer), or
+            'mu' (most unstable).
+
+    Returns:
+
+        :obj:`tuple`: The lower case parcel type names.
+
+    """
+    if isstr(parcels):
+        parcels = (parcels, )
+
+    names = tuple(parcel.lower() for parcel in parcels)
+
+    if not names:
+        raise ValueError("at least one parcel type is required")
+
+    for name in names:
+        if name not in _CAPE_PARCELS:
+            raise ValueError("'{}' is not a valid parcel type, must be "
+                             "'sb', 'ml', or 'mu'".format(name))
+
+    return names
+
+
+def _parcel_codes(parcels):
+    """Return the dcapeparcels type codes for the CAPE parcel type names.
+
+    Args:
+
+        parcels (:obj:`str` or a sequence of :obj:`str`): The parcel type
+            name(s).  Must be 'sb' (surface based), 'ml' (mixed layer), or
+            'mu' (most unstable).
+
+    Returns:
+
+        :class:`numpy.ndarray`: The parcel type codes.
+
+    """
+    return np.array([_CAPE_PARCELS[name] for name in _parcel_names(parcels)],
+                    np.int32)
+
+
 def get_filepath(obj):
     """Return the file path for the specified object.
 
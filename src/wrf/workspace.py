@@ -0,0 +1,176 @@
+from __future__ import (absolute_import, division, print_function)
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Lock
+
+import numpy as np
+
+# Default limit for the bytes held by the idle work arrays
+_DEFAULT_WORKSPACE_SIZE = 256 * 1024 * 1024
+
+
+class _Workspace(object):
+    """A pool of idle work arrays shared by every thread.
+
+    The arrays are keyed by (shape, dtype, order).  A borrowed array is
+    removed from the pool, so two threads never hold the same array.
+
+    """
+    def __init__(self, max_nbytes):
+        self.lock = Lock()
+        self.max_nbytes = max_nbytes
+        self.pool = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+
+    def take(self, key):
+        with self.lock:
+            arrays = self.pool.get(key)
+            if arrays:
+                arr = arrays.pop()
+                if not arrays:
+                    del self.pool[key]
+                self.nbytes -= arr.nbytes
+                self.hits += 1
+                return arr
+
+            self.misses += 1
+
+        shape, dtype, order = key
+        return np.empty(shape, dtype, order=order)
+
+    def _evict(self, nbytes):
+        """Drop the least recently returned arrays until *nbytes* more
+        fit under the limit.  The lock must be held."""
+        while self.pool and self.nbytes + nbytes > self.max_nbytes:
+            oldkey = next(iter(self.pool))
+            arrays = self.pool[oldkey]
+            self.nbytes -= arrays.pop(0).nbytes
+            if not arrays:
+                del self.pool[oldkey]
+            self.discarded += 1
+
+    def give(self, key, arr):
+        with self.lock:
+            if arr.nbytes > self.max_nbytes:
+                self.discarded += 1
+                return
+
+            self._evict(arr.nbytes)
+
+            arrays = self.pool.pop(key, [])
+            arrays.append(arr)
+            self.pool[key] = arrays
+            self.nbytes += arr.nbytes
+
+    def trim(self):
+        with self.lock:
+            self._evict(0)
+
+
+_workspace = _Workspace(_DEFAULT_WORKSPACE_SIZE)
+
+
+@contextmanager
+def scratch(shape, dtype=np.float64, order="F", count=1):
+    """Return a context manager that borrows work arrays from the workspace.
+
+    The arrays are uninitialized and are returned to the workspace when the
+    context exits, so they must not escape the context.  This is used by
+    the kernel wrappers for the Fortran work arrays, which would otherwise
+    be allocated for every call and left iteration slice.
+
+    Args:
+
+        shape (:obj:`tuple`): The array shape.
+
+        dtype (:class:`numpy.dtype`, optional): The array type.  Default is
+            :class:`numpy.float64`.
+
+        order (:obj:`str`, optional): The memory layout.  Default is 'F'.
+
+        count (:obj:`int`, optional): The number of arrays.  Default is 1.
+
+    Yields:
+
+        :obj:`list`: A list of *count* :class:`numpy.ndarray` objects.
+
+    """
+    key = (tuple(shape), np.dtype(dtype), order)
+    arrays = [_workspace.take(key) for _ in range(count)]
+    try:
+        yield arrays
+    finally:
+        for arr in arrays:
+            _workspace.give(key, arr)
+
+
+def set_workspace_size(nbytes):
+    """Set the maximum number of bytes held by the idle work arrays.
+
+    The compiled kernels borrow their work arrays from a workspace that is
+    shared by all threads.  Setting the size to 0 disables the reuse, so
+    the work arrays are allocated for every call.
+
+    Args:
+
+        nbytes (:obj:`int`): The maximum number of bytes.
+
+    Returns:
+
+        None
+
+    """
+    _workspace.max_nbytes = int(nbytes)
+    _workspace.trim()
+
+
+def get_workspace_size():
+    """Return the maximum number of bytes held by the idle work arrays.
+
+    Returns:
+
+        :obj:`int`: The maximum number of bytes.
+
+    """
+    return _workspace.max_nbytes
+
+
+def workspace_stats():
+    """Return the usage statistics for the kernel work arrays.
+
+    Returns:
+
+        :obj:`dict`: A mapping with the number of borrowed arrays that were
+        reused ('hits') or allocated ('misses'), the number of returned
+        arrays that were dropped to stay under the size limit
+        ('discarded'), and the number of idle arrays ('arrays') and their
+        bytes ('nbytes').
+
+    """
+    with _workspace.lock:
+        return {"hits": _workspace.hits,
+                "misses": _workspace.misses,
+                "discarded": _workspace.discarded,
+                "arrays": sum(len(arrays)
+                              for arrays in _workspace.pool.values()),
+                "nbytes": _workspace.nbytes}
+
+
+def clear_workspace():
+    """Release the idle work arrays and reset the statistics.
+
+    Returns:
+
+        None
+
+    """
+    with _workspace.lock:
+        _workspace.pool.clear()
+        _workspace.nbytes = 0
+        _workspace.hits = 0
+        _workspace.misses = 0
+        _workspace.discarded = 0
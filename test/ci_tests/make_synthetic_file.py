@@ -0,0 +1,578 @@
+"""Write synthetic WRF-ARW output files of any size.
+
+The fields are analytic but physically plausible: a hydrostatic standard
+atmosphere over a terrain ridge, a moist boundary layer, a warm-core
+vortex with a cloud and precipitation shield, and a westerly jet.  They
+are computed in blocks of rows, so grids far larger than memory (e.g.
+3000 x 3000) can be written.
+
+Example:
+
+    python make_synthetic_file.py -x 1000 -y 1000 -z 50 -t 6 -o big.nc
+
+"""
+from __future__ import print_function, division
+
+import argparse
+import datetime as dt
+
+import numpy as np
+from netCDF4 import Dataset
+
+G = 9.81
+RD = 287.0
+CP = 7.0 * RD / 2.0
+RE = 6370000.0
+OMEGA = 7.2921e-5
+P_TOP = 5000.0
+T_BASE = 300.0
+
+_COORDS = {"": "XLONG XLAT XTIME",
+           "X": "XLONG_U XLAT_U XTIME",
+           "Y": "XLONG_V XLAT_V XTIME",
+           "Z": "XLONG XLAT XTIME"}
+
+# name: (grid, is_3d, description, units)
+# grid is one of "M" (mass), "U", "V", or "W" (vertically staggered mass)
+_VARS = {
+    "XLAT": ("M", False, "LATITUDE, SOUTH IS NEGATIVE", "degree_north"),
+    "XLONG": ("M", False, "LONGITUDE, WEST IS NEGATIVE", "degree_east"),
+    "XLAT_U": ("U", False, "LATITUDE, SOUTH IS NEGATIVE", "degree_north"),
+    "XLONG_U": ("U", False, "LONGITUDE, WEST IS NEGATIVE", "degree_east"),
+    "XLAT_V": ("V", False, "LATITUDE, SOUTH IS NEGATIVE", "degree_north"),
+    "XLONG_V": ("V", False, "LONGITUDE, WEST IS NEGATIVE", "degree_east"),
+    "MAPFAC_M": ("M", False, "Map scale factor on mass grid", ""),
+    "MAPFAC_MX": ("M", False, "Map scale factor on mass grid, x direction",
+                  ""),
+    "MAPFAC_MY": ("M", False, "Map scale factor on mass grid, y direction",
+                  ""),
+    "MAPFAC_U": ("U", False, "Map scale factor on u-grid", ""),
+    "MAPFAC_V": ("V", False, "Map scale factor on v-grid", ""),
+    "F": ("M", False, "Coriolis sine latitude term", "s-1"),
+    "E": ("M", False, "Coriolis cosine latitude term", "s-1"),
+    "SINALPHA": ("M", False, "Local sine of map rotation", ""),
+    "COSALPHA": ("M", False, "Local cosine of map rotation", ""),
+    "HGT": ("M", False, "Terrain Height", "m"),
+    "MUB": ("M", False, "base state dry air mass in column", "Pa"),
+    "MU": ("M", False, "perturbation dry air mass in column", "Pa"),
+    "PSFC": ("M", False, "SFC PRESSURE", "Pa"),
+    "T2": ("M", False, "TEMP at 2 M", "K"),
+    "Q2": ("M", False, "QV at 2 M", "kg kg-1"),
+    "U10": ("M", False, "U at 10 M", "m s-1"),
+    "V10": ("M", False, "V at 10 M", "m s-1"),
+    "RAINC": ("M", False, "ACCUMULATED TOTAL CUMULUS PRECIPITATION", "mm"),
+    "RAINSH": ("M", False, "ACCUMULATED SHALLOW CUMULUS PRECIPITATION",
+               "mm"),
+    "RAINNC": ("M", False, "ACCUMULATED TOTAL GRID SCALE PRECIPITATION",
+               "mm"),
+    "I_RAINC": ("M", False, "BUCKET FOR RAINC", ""),
+    "I_RAINNC": ("M", False, "BUCKET FOR RAINNC", ""),
+    "P": ("M", True, "perturbation pressure", "Pa"),
+    "PB": ("M", True, "BASE STATE PRESSURE", "Pa"),
+    "T": ("M", True, "perturbation potential temperature (theta-t0)", "K"),
+    "QVAPOR": ("M", True, "Water vapor mixing ratio", "kg kg-1"),
+    "QCLOUD": ("M", True, "Cloud water mixing ratio", "kg kg-1"),
+    "QRAIN": ("M", True, "Rain water mixing ratio", "kg kg-1"),
+    "QICE": ("M", True, "Ice mixing ratio", "kg kg-1"),
+    "QSNOW": ("M", True, "Snow mixing ratio", "kg kg-1"),
+    "QGRAUP": ("M", True, "Graupel mixing ratio", "kg kg-1"),
+    "U": ("U", True, "x-wind component", "m s-1"),
+    "V": ("V", True, "y-wind component", "m s-1"),
+    "W": ("W", True, "z-wind component", "m s-1"),
+    "PH": ("W", True, "perturbation geopotential", "m2 s-2"),
+    "PHB": ("W", True, "base-state geopotential", "m2 s-2"),
+}
+
+_STAGGER = {"M": "", "U": "X", "V": "Y", "W": "Z"}
+
+
+class SyntheticGrid(object):
+    """The grid, projection, and storm parameters for a synthetic file.
+
+    Args:
+
+        nx (:obj:`int`): The number of mass points in the x direction.
+
+        ny (:obj:`int`): The number of mass points in the y direction.
+
+        nz (:obj:`int`): The number of mass levels.
+
+        ntimes (:obj:`int`): The number of output times.
+
+        dx (:obj:`float`, optional): The grid spacing in meters.
+
+        projection (:obj:`str`, optional): Either 'lambert' or 'mercator'.
+
+        drift (:obj:`tuple`, optional): The (x, y) motion of a moving
+            nest in grid points per output time.  Use (0, 0) for a fixed
+            domain.
+
+        interval (:obj:`int`, optional): The output interval in minutes.
+
+        bucket_mm (:obj:`float`, optional): The precipitation bucket size
+            in mm.  Use a value <= 0 to disable the bucket counters.
+
+    """
+    def __init__(self, nx, ny, nz, ntimes, dx=3000.0, projection="lambert",
+                 drift=(0, 0), interval=60, bucket_mm=-1.0,
+                 start=dt.datetime(2005, 8, 28)):
+        self.nx = nx
+        self.ny = ny
+        self.nz = nz
+        self.ntimes = ntimes
+        self.dx = float(dx)
+        self.projection = projection
+        self.drift = drift
+        self.interval = interval
+        self.bucket_mm = bucket_mm
+        self.start = start
+
+        self.cen_lat = 38.0
+        self.stand_lon = -98.0
+        self.truelat1 = 30.0
+        self.truelat2 = 60.0 if projection == "lambert" else 0.0
+        if projection == "mercator":
+            self.truelat1 = 0.0
+
+        # Vertical coordinate with more resolution near the surface
+        self.znw = 1.0 - (np.arange(nz + 1) / nz)**1.4
+        self.znu = 0.5 * (self.znw[1:] + self.znw[:-1])
+
+        # The horizontal scale of the storm and the terrain
+        self.scale = 0.15 * min(nx, ny) * self.dx
+
+    # Projection
+
+    def _cone(self):
+        phi1 = np.radians(self.truelat1)
+        phi2 = np.radians(self.truelat2)
+        if abs(self.truelat1 - self.truelat2) < 1e-6:
+            return np.sin(phi1)
+        return (np.log(np.cos(phi1) / np.cos(phi2)) /
+                np.log(np.tan(np.pi / 4 + phi2 / 2) /
+                       np.tan(np.pi / 4 + phi1 / 2)))
+
+    def latlon(self, x, y):
+        """Return (lat, lon, mapfac, alpha) for projected x, y (meters)
+        relative to the domain center."""
+        if self.projection == "mercator":
+            phi1 = np.radians(self.truelat1)
+            r = RE * np.cos(phi1)
+            y0 = r * np.log(np.tan(np.pi / 4 + np.radians(self.cen_lat) / 2))
+            lat = 2.0 * np.arctan(np.exp((y + y0) / r)) - np.pi / 2
+            lon = np.radians(self.stand_lon) + x / r
+            mapfac = np.cos(phi1) / np.cos(lat)
+            alpha = np.zeros_like(lat)
+        else:
+            n = self._cone()
+            phi1 = np.radians(self.truelat1)
+            f = np.cos(phi1) * np.tan(np.pi / 4 + phi1 / 2)**n / n
+            rho0 = RE * f / np.tan(np.pi / 4 +
+                                   np.radians(self.cen_lat) / 2)**n
+            rho = np.sqrt(x**2 + (rho0 - y)**2)
+            theta = np.arctan2(x, rho0 - y)
+            lat = 2.0 * np.arctan((RE * f / rho)**(1.0 / n)) - np.pi / 2
+            lon = np.radians(self.stand_lon) + theta / n
+            mapfac = n * rho / (RE * np.cos(lat))
+            alpha = theta
+
+        return np.degrees(lat), np.degrees(lon), mapfac, alpha
+
+    def center_offset(self, timeidx):
+        """Return the (x, y) offset of a moving nest in meters."""
+        return (self.drift[0] * timeidx * self.dx,
+                self.drift[1] * timeidx * self.dx)
+
+    def coords(self, grid, rows, timeidx):
+        """Return projected x, y (meters) for a block of rows."""
+        nx = self.nx + 1 if grid == "U" else self.nx
+        xoff = -0.5 if grid == "U" else 0.0
+        yoff = -0.5 if grid == "V" else 0.0
+
+        i = np.arange(nx) + xoff - (self.nx - 1) / 2
+        j = np.asarray(rows) + yoff - (self.ny - 1) / 2
+        x, y = np.meshgrid(i * self.dx, j * self.dx)
+
+        cx, cy = self.center_offset(timeidx)
+        return x + cx, y + cy
+
+    # Physical fields
+
+    def storm(self, x, y, timeidx):
+        """Return (dx, dy, r) from the storm center, which moves east."""
+        hours = timeidx * self.interval / 60.0
+        sx = 5.0 * 3600.0 * hours
+        sdx = x - sx
+        sdy = y
+        return sdx, sdy, np.sqrt(sdx**2 + sdy**2)
+
+    def surface(self, x, y, timeidx):
+        """Return the 2D surface fields for a block of points."""
+        out = {}
+        # A north-south ridge to the west of the center
+        ridge = np.exp(-((x + 0.8 * self.scale) / (0.4 * self.scale))**2)
+        out["HGT"] = 1500.0 * ridge * (1.0 + 0.2 * np.cos(y / self.scale))
+
+        psfc_base = 101325.0 * np.exp(-out["HGT"] / 8000.0)
+        _, _, r = self.storm(x, y, timeidx)
+        dpsfc = -2500.0 * np.exp(-(r / (0.5 * self.scale))**2)
+
+        out["MUB"] = psfc_base - P_TOP
+        out["MU"] = dpsfc
+        out["PSFC"] = psfc_base + dpsfc
+        out["cloud"] = np.exp(-(r / (0.7 * self.scale))**2)
+        return out
+
+    def column(self, sfc, levels):
+        """Return pressure, temperature, and moisture on *levels*."""
+        levels = levels[:, np.newaxis, np.newaxis]
+        pb = levels * sfc["MUB"] + P_TOP
+        p = levels * (sfc["MUB"] + sfc["MU"]) + P_TOP
+
+        # Standard atmosphere with a warm core in the storm
+        tk = np.maximum(288.15 * (p / 101325.0)**0.190263, 216.65)
+        warm = 4.0 * sfc["cloud"] * np.sin(np.pi * np.clip(
+            (1.0e5 - p) / 8.0e4, 0, 1))
+        tk += warm
+
+        rh = np.clip(0.9 * ((p - P_TOP) / (1.0e5 - P_TOP))**1.5 +
+                     0.1 * sfc["cloud"], 0.0, 1.0)
+        es = 611.2 * np.exp(17.67 * (tk - 273.15) / (tk - 29.65))
+        qv = rh * 0.622 * es / np.maximum(p - es, 1.0)
+
+        return p, pb, tk, qv
+
+    def heights(self, sfc, tk, qv, full):
+        """Integrate the hypsometric equation on the staggered levels."""
+        mu = sfc["MUB"] + (sfc["MU"] if full else 0.0)
+        pw = self.znw[:, np.newaxis, np.newaxis] * mu + P_TOP
+        tv = tk * (1.0 + 0.61 * qv)
+
+        z = np.empty(pw.shape)
+        z[0] = sfc["HGT"]
+        dz = RD * tv / G * np.log(pw[:-1] / pw[1:])
+        np.cumsum(dz, axis=0, out=z[1:])
+        z[1:] += sfc["HGT"]
+        return z
+
+    def winds(self, x, y, p, timeidx):
+        """Return the (u, v) wind for a block of points."""
+        sdx, sdy, r = self.storm(x, y, timeidx)
+        rm = 0.2 * self.scale
+        vt = 40.0 * (r / rm) * np.exp(1.0 - r / rm)
+        decay = np.clip((p - P_TOP) / (1.0e5 - P_TOP), 0, 1)
+        rsafe = np.maximum(r, 1.0)
+
+        jet = 5.0 + 30.0 * np.sin(np.pi * np.clip((1.0e5 - p) / 8.0e4,
+                                                  0, 1))
+        u = jet - vt * decay * sdy / rsafe
+        v = vt * decay * sdx / rsafe
+        return u, v
+
+    def hydrometeors(self, sfc, p, tk):
+        cloud = sfc["cloud"]
+        layer = np.clip(np.sin(np.pi * (8.5e4 - p) / 6.0e4), 0, None)
+        layer[p > 8.5e4] = 0.0
+        cold = tk < 258.15
+        out = {}
+        out["QCLOUD"] = 1.0e-3 * cloud * layer * ~cold
+        out["QICE"] = 2.0e-4 * cloud * layer * cold
+        out["QSNOW"] = 5.0e-4 * cloud * layer * cold
+        out["QGRAUP"] = 1.0e-4 * cloud * layer
+        out["QRAIN"] = 8.0e-4 * cloud * (p > 6.0e4) * (
+            1.0 - layer * cold)
+        return out
+
+    def fields(self, grid, rows, timeidx):
+        """Return every field on *grid* for a block of rows."""
+        x, y = self.coords(grid, rows, timeidx)
+        lat, lon, mapfac, alpha = self.latlon(x, y)
+        sfc = self.surface(x, y, timeidx)
+        out = {}
+
+        if grid == "U":
+            out["XLAT_U"] = lat
+            out["XLONG_U"] = lon
+            out["MAPFAC_U"] = mapfac
+            p, _, _, _ = self.column(sfc, self.znu)
+            out["U"] = self.winds(x, y, p, timeidx)[0]
+            return out
+
+        if grid == "V":
+            out["XLAT_V"] = lat
+            out["XLONG_V"] = lon
+            out["MAPFAC_V"] = mapfac
+            p, _, _, _ = self.column(sfc, self.znu)
+            out["V"] = self.winds(x, y, p, timeidx)[1]
+            return out
+
+        p, pb, tk, qv = self.column(sfc, self.znu)
+
+        if grid == "W":
+            _, _, tkb, qvb = self.column(dict(sfc, MU=0.0), self.znu)
+            zb = self.heights(sfc, tkb, 0.0 * qvb, False)
+            z = self.heights(sfc, tk, qv, True)
+            out["PHB"] = G * zb
+            out["PH"] = G * (z - zb)
+            wlev = np.sin(np.pi * (1.0 - self.znw))
+            wlev = wlev[:, np.newaxis, np.newaxis]
+            out["W"] = 0.5 * sfc["cloud"] * wlev
+            return out
+
+        theta = tk * (1.0e5 / p)**(RD / CP)
+        u, v = self.winds(x, y, p, timeidx)
+
+        out["XLAT"] = lat
+        out["XLONG"] = lon
+        out["MAPFAC_M"] = mapfac
+        out["MAPFAC_MX"] = mapfac
+        out["MAPFAC_MY"] = mapfac
+        out["F"] = 2.0 * OMEGA * np.sin(np.radians(lat))
+        out["E"] = 2.0 * OMEGA * np.cos(np.radians(lat))
+        out["SINALPHA"] = np.sin(alpha)
+        out["COSALPHA"] = np.cos(alpha)
+        out["HGT"] = sfc["HGT"]
+        out["MUB"] = sfc["MUB"]
+        out["MU"] = sfc["MU"]
+        out["PSFC"] = sfc["PSFC"]
+        out["T2"] = tk[0] + 0.5
+        out["Q2"] = qv[0]
+        out["U10"] = 0.7 * u[0]
+        out["V10"] = 0.7 * v[0]
+        out["P"] = p - pb
+        out["PB"] = pb
+        out["T"] = theta - T_BASE
+        out["QVAPOR"] = qv
+        out.update(self.hydrometeors(sfc, p, tk))
+
+        # Precipitation falls under the storm as it moves, so the totals
+        # are accumulated over the previous output times
+        hours = self.interval / 60.0
+        rain = np.zeros_like(sfc["cloud"])
+        for prev in range(1, timeidx + 1):
+            rain += self.surface(x, y, prev)["cloud"] * hours
+        rainc = 2.0 * rain
+        rainnc = 8.0 * rain
+        out["RAINSH"] = np.zeros_like(rainc)
+        if self.bucket_mm > 0:
+            out["I_RAINC"] = np.floor(rainc / self.bucket_mm)
+            out["I_RAINNC"] = np.floor(rainnc / self.bucket_mm)
+            rainc -= out["I_RAINC"] * self.bucket_mm
+            rainnc -= out["I_RAINNC"] * self.bucket_mm
+        out["RAINC"] = rainc
+        out["RAINNC"] = rainnc
+
+        return out
+
+    def global_attrs(self):
+        start = self.start.strftime("%Y-%m-%d_%H:%M:%S")
+        lat, lon, _, _ = self.latlon(np.zeros(1), np.zeros(1))
+        proj = 1 if self.projection == "lambert" else 3
+        projchar = "Lambert Conformal" if proj == 1 else "Mercator"
+        return {
+            "TITLE": " OUTPUT FROM WRF V4.0 MODEL (SYNTHETIC)",
+            "START_DATE": start,
+            "SIMULATION_START_DATE": start,
+            "WEST-EAST_GRID_DIMENSION": np.int32(self.nx + 1),
+            "SOUTH-NORTH_GRID_DIMENSION": np.int32(self.ny + 1),
+            "BOTTOM-TOP_GRID_DIMENSION": np.int32(self.nz + 1),
+            "DX": np.float32(self.dx),
+            "DY": np.float32(self.dx),
+            "GRIDTYPE": "C",
+            "HYPSOMETRIC_OPT": np.int32(2),
+            "USE_THETA_M": np.int32(0),
+            "BUCKET_MM": np.float32(self.bucket_mm),
+            "SIMULATION_INITIALIZATION_TYPE": "REAL-DATA CASE",
+            "WEST-EAST_PATCH_START_UNSTAG": np.int32(1),
+            "WEST-EAST_PATCH_END_UNSTAG": np.int32(self.nx),
+            "WEST-EAST_PATCH_START_STAG": np.int32(1),
+            "WEST-EAST_PATCH_END_STAG": np.int32(self.nx + 1),
+            "SOUTH-NORTH_PATCH_START_UNSTAG": np.int32(1),
+            "SOUTH-NORTH_PATCH_END_UNSTAG": np.int32(self.ny),
+            "SOUTH-NORTH_PATCH_START_STAG": np.int32(1),
+            "SOUTH-NORTH_PATCH_END_STAG": np.int32(self.ny + 1),
+            "BOTTOM-TOP_PATCH_START_UNSTAG": np.int32(1),
+            "BOTTOM-TOP_PATCH_END_UNSTAG": np.int32(self.nz),
+            "BOTTOM-TOP_PATCH_START_STAG": np.int32(1),
+            "BOTTOM-TOP_PATCH_END_STAG": np.int32(self.nz + 1),
+            "GRID_ID": np.int32(1 if self.drift == (0, 0) else 2),
+            "PARENT_ID": np.int32(0 if self.drift == (0, 0) else 1),
+            "I_PARENT_START": np.int32(1),
+            "J_PARENT_START": np.int32(1),
+            "PARENT_GRID_RATIO": np.int32(1 if self.drift == (0, 0)
+                                          else 3),
+            "CEN_LAT": np.float32(lat[0]),
+            "CEN_LON": np.float32(lon[0]),
+            "TRUELAT1": np.float32(self.truelat1),
+            "TRUELAT2": np.float32(self.truelat2),
+            "MOAD_CEN_LAT": np.float32(self.cen_lat),
+            "STAND_LON": np.float32(self.stand_lon),
+            "POLE_LAT": np.float32(90.0),
+            "POLE_LON": np.float32(0.0),
+            "GMT": np.float32(self.start.hour),
+            "JULYR": np.int32(self.start.year),
+            "JULDAY": np.int32(self.start.timetuple().tm_yday),
+            "MAP_PROJ": np.int32(proj),
+            "MAP_PROJ_CHAR": projchar,
+            "MMINLU": "USGS",
+            "NUM_LAND_CAT": np.int32(24),
+            "ISWATER": np.int32(16),
+        }
+
+
+def _dims(grid, is_3d):
+    horiz = {"M": ("south_north", "west_east"),
+             "U": ("south_north", "west_east_stag"),
+             "V": ("south_north_stag", "west_east"),
+             "W": ("south_north", "west_east")}[grid]
+    if not is_3d:
+        return ("Time",) + horiz
+
+    vert = "bottom_top_stag" if grid == "W" else "bottom_top"
+    return ("Time", vert) + horiz
+
+
+def make_synthetic_file(path, nx, ny, nz=40, ntimes=1, zlib=False,
+                        block_bytes=2**27, **kwargs):
+    """Write a synthetic WRF-ARW output file.
+
+    Args:
+
+        path (:obj:`str`): The output file path.
+
+        nx (:obj:`int`): The number of mass points in the x direction.
+
+        ny (:obj:`int`): The number of mass points in the y direction.
+
+        nz (:obj:`int`, optional): The number of mass levels.
+
+        ntimes (:obj:`int`, optional): The number of output times.
+
+        zlib (:obj:`bool`, optional): Set to True to compress the
+            variables.
+
+        block_bytes (:obj:`int`, optional): The approximate size of a
+            single 3D field block held in memory.
+
+        **kwargs: Additional arguments for :class:`SyntheticGrid`.
+
+    Returns:
+
+        :class:`SyntheticGrid`: The grid used to make the file.
+
+    """
+    grid = SyntheticGrid(nx, ny, nz, ntimes, **kwargs)
+
+    varnames = [name for name in sorted(_VARS)
+                if grid.bucket_mm > 0 or not name.startswith("I_RAIN")]
+
+    with Dataset(path, "w", format="NETCDF4") as outfile:
+        outfile.setncatts(grid.global_attrs())
+
+        outfile.createDimension("Time", None)
+        outfile.createDimension("DateStrLen", 19)
+        outfile.createDimension("west_east", nx)
+        outfile.createDimension("south_north", ny)
+        outfile.createDimension("bottom_top", nz)
+        outfile.createDimension("west_east_stag", nx + 1)
+        outfile.createDimension("south_north_stag", ny + 1)
+        outfile.createDimension("bottom_top_stag", nz + 1)
+
+        times = outfile.createVariable("Times", "S1", ("Time", "DateStrLen"))
+        start = grid.start.strftime("%Y-%m-%d %H:%M:%S")
+        xtime = outfile.createVariable("XTIME", "f4", ("Time",))
+        xtime.setncatts({"FieldType": np.int32(104), "MemoryOrder": "0  ",
+                         "description": "minutes since " + start,
+                         "units": "minutes since " + start,
+                         "stagger": ""})
+
+        for name, levels, desc in (("ZNU", "bottom_top",
+                                    "eta values on half (mass) levels"),
+                                   ("ZNW", "bottom_top_stag",
+                                    "eta values on full (w) levels")):
+            var = outfile.createVariable(name, "f4", ("Time", levels))
+            var.setncatts({"FieldType": np.int32(104),
+                           "MemoryOrder": "Z  ", "description": desc,
+                           "units": "", "stagger": "" if name == "ZNU"
+                           else "Z"})
+        ptop = outfile.createVariable("P_TOP", "f4", ("Time",))
+        ptop.setncatts({"FieldType": np.int32(104), "MemoryOrder": "0  ",
+                        "description": "PRESSURE TOP OF THE MODEL",
+                        "units": "Pa", "stagger": ""})
+
+        ncvars = {}
+        for name in varnames:
+            gridtype, is_3d, desc, units = _VARS[name]
+            var = outfile.createVariable(name, "f4", _dims(gridtype, is_3d),
+                                         zlib=zlib)
+            stagger = _STAGGER[gridtype]
+            coords = _COORDS[stagger]
+            if name.startswith("XLAT") or name.startswith("XLONG"):
+                coords = " ".join(coords.split()[:2])
+            var.setncatts({"FieldType": np.int32(104),
+                           "MemoryOrder": "XYZ" if is_3d else "XY ",
+                           "description": desc, "units": units,
+                           "stagger": stagger, "coordinates": coords})
+            ncvars[name] = var
+
+        rows_per_block = max(1, block_bytes // (8 * (nz + 1) * (nx + 1)))
+
+        for timeidx in range(ntimes):
+            valid = grid.start + dt.timedelta(minutes=grid.interval *
+                                              timeidx)
+            times[timeidx] = np.array(list(
+                valid.strftime("%Y-%m-%d_%H:%M:%S")), "S1")
+            xtime[timeidx] = grid.interval * timeidx
+            outfile.variables["ZNU"][timeidx] = grid.znu
+            outfile.variables["ZNW"][timeidx] = grid.znw
+            ptop[timeidx] = P_TOP
+
+            for gridtype in ("M", "U", "V", "W"):
+                nrows = ny + 1 if gridtype == "V" else ny
+                for j0 in range(0, nrows, rows_per_block):
+                    j1 = min(j0 + rows_per_block, nrows)
+                    fields = grid.fields(gridtype, range(j0, j1), timeidx)
+                    for name, values in fields.items():
+                        if name not in ncvars:
+                            continue
+                        ncvars[name][timeidx, ..., j0:j1, :] = values
+
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic WRF "
+                                     "output files for performance testing.")
+    parser.add_argument("-x", "--nx", type=int, default=100,
+                        help="number of mass points in x")
+    parser.add_argument("-y", "--ny", type=int, default=100,
+                        help="number of mass points in y")
+    parser.add_argument("-z", "--nz", type=int, default=40,
+                        help="number of mass levels")
+    parser.add_argument("-t", "--ntimes", type=int, default=1,
+                        help="number of output times")
+    parser.add_argument("--dx", type=float, default=3000.0,
+                        help="grid spacing in meters")
+    parser.add_argument("--interval", type=int, default=60,
+                        help="output interval in minutes")
+    parser.add_argument("--projection", choices=("lambert", "mercator"),
+                        default="lambert")
+    parser.add_argument("--drift", type=float, nargs=2, default=(0, 0),
+                        metavar=("DI", "DJ"),
+                        help="moving nest motion in grid points per time")
+    parser.add_argument("--bucket-mm", type=float, default=-1.0,
+                        help="precipitation bucket size in mm")
+    parser.add_argument("--zlib", action="store_true",
+                        help="compress the variables")
+    parser.add_argument("-o", "--output", default="wrfout_synthetic.nc",
+                        help="the output file")
+    opts = parser.parse_args()
+
+    make_synthetic_file(opts.output, opts.nx, opts.ny, opts.nz, opts.ntimes,
+                        zlib=opts.zlib, dx=opts.dx, interval=opts.interval,
+                        projection=opts.projection, drift=tuple(opts.drift),
+                        bucket_mm=opts.bucket_mm)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,17 @@ import numpy.ma as ma
 import os
 import sys
 import subprocess
+from collections import OrderedDict
 
-from wrf import (getvar, interplevel, interpline, vertcross, vinterp,
-                 disable_xarray, xarray_enabled, to_np,
+from wrf import (getvar, reduce_getvar, interplevel, interpline, vertcross,
+                 vinterp, disable_xarray, xarray_enabled, to_np,
+                 VerticalInterpolator,
                  xy_to_ll, ll_to_xy, xy_to_ll_proj, ll_to_xy_proj,
                  extract_global_attrs, viewitems, CoordPair,
-                 omp_get_num_procs, omp_set_num_threads)
+                 omp_get_num_procs, omp_set_num_threads, profile,
+                 omp_threads, calibrate_omp, get_omp_tuning,
+                 clear_omp_tuning, omp_get_max_threads, omp_get_schedule,
+                 omp_enabled, OMP_SCHED_GUIDED, plan)
 from wrf.util import is_multi_file
 
 TEST_FILE = "ci_test_file.nc"
@@ -22,6 +27,27 @@ if sys.version_info > (3,):
     xrange = range
 
 
+def _short_copy(wrfnc, numtimes):
+    """Return an in-memory copy of *wrfnc* with only the first *numtimes*
+    times."""
+    from netCDF4 import Dataset as NetCDF
+    from uuid import uuid4
+
+    # Diskless files that are still open can't share a name
+    short = NetCDF("short_{}.nc".format(uuid4().hex), "w", diskless=True)
+    short.setncatts({key: wrfnc.getncattr(key) for key in wrfnc.ncattrs()})
+    for name, dim in viewitems(wrfnc.dimensions):
+        short.createDimension(name,
+                              numtimes if name == "Time" else dim.size)
+    for name, var in viewitems(wrfnc.variables):
+        newvar = short.createVariable(name, var.dtype, var.dimensions)
+        newvar.setncatts({key: var.getncattr(key) for key in var.ncattrs()})
+        newvar[:] = (var[0:numtimes] if var.dimensions[0] == "Time"
+                     else var[:])
+
+    return short
+
+
 # Using helpful information at:
 # http://eli.thegreenplace.net/2014/04/02/dynamically-generating-python-test-cases
 def make_test(varname, wrf_in, referent, multi=False, repeat=3, pynio=False):
@@ -220,10 +246,845 @@ def make_latlon_test(testid, wrf_in, referent, single, multi=False, repeat=3,
 class WRFVarsTest(ut.TestCase):
     longMessage = True
 
+    def test_reduce_getvar(self):
+        from netCDF4 import Dataset as NetCDF
+
+        in_wrfnc = NetCDF(TEST_FILE)
+        wrfin = [in_wrfnc, in_wrfnc]
+        slp = to_np(getvar(wrfin, "slp", timeidx=None, meta=False))
+
+        for reducer, func in (("max", np.max), ("min", np.min),
+                              ("mean", np.mean), ("sum", np.sum),
+                              ("argmax", np.argmax)):
+            result = reduce_getvar(wrfin, "slp", reducer)
+            nt.assert_allclose(to_np(result), func(slp, axis=0), rtol=1e-6)
+            self.assertEqual(result.dims, ("south_north", "west_east"))
+
+        result = reduce_getvar(wrfin, "slp", "max", window=2)
+        ref = np.stack([slp[i:i+2].max(axis=0)
+                        for i in xrange(slp.shape[0] - 1)])
+        nt.assert_allclose(to_np(result), ref)
+        self.assertEqual(result.shape[0], slp.shape[0] - 1)
+
+    def test_precip(self):
+        from netCDF4 import Dataset as NetCDF
+
+        in_wrfnc = NetCDF(TEST_FILE)
+        wrfin = [in_wrfnc, in_wrfnc]
+        ref = (in_wrfnc.variables["RAINC"][:] +
+               in_wrfnc.variables["RAINNC"][:])
+        ref = np.concatenate((ref, ref))
+
+        accum = getvar(wrfin, "precip_accum", timeidx=None)
+        nt.assert_allclose(to_np(accum), ref)
+
+        interval = to_np(getvar(wrfin, "precip_interval", timeidx=None))
+        self.assertTrue(interval[0].mask.all())
+        nt.assert_allclose(interval[1:], ref[1:] - ref[:-1])
+
+        for timeidx in xrange(1, ref.shape[0]):
+            single = to_np(getvar(wrfin, "precip_interval", timeidx))
+            nt.assert_allclose(single, interval[timeidx])
+
+        # Joined files of different lengths, with an integer time index
+        wrfin = [in_wrfnc, _short_copy(in_wrfnc, 2)]
+        ntimes = in_wrfnc.dimensions["Time"].size
+        ref = ref[0:ntimes]
+
+        accum = to_np(getvar(wrfin, "precip_accum", 1, method="join"))
+        nt.assert_allclose(accum, [ref[1], ref[1]])
+
+        interval = to_np(getvar(wrfin, "precip_interval", 1, method="join"))
+        nt.assert_allclose(interval, [ref[1] - ref[0], ref[1] - ref[0]])
+
+        # A negative index is resolved against each file's own length
+        interval = to_np(getvar(wrfin, "precip_interval", -1,
+                                method="join"))
+        nt.assert_allclose(interval[0], ref[-1] - ref[-2])
+        nt.assert_allclose(interval[1], ref[1] - ref[0])
+
+        # The type is the same as the source fields for every time index
+        dtype = in_wrfnc.variables["RAINNC"].dtype
+        for method in ("cat", "join"):
+            for timeidx in (0, 1, -1, None):
+                for product in ("precip_accum", "precip_interval"):
+                    result = getvar(wrfin, product, timeidx, method=method)
+                    self.assertEqual(result.dtype, dtype,
+                                     (product, method, timeidx))
+
+    def test_synthetic_file(self):
+        import tempfile
+        import shutil
+        from netCDF4 import Dataset as NetCDF
+        from make_synthetic_file import make_synthetic_file
+        from wrf import is_moving_domain
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "wrfout_moving.nc")
+            make_synthetic_file(path, 30, 20, 10, 3, drift=(1, 0))
+            with NetCDF(path) as wrfnc:
+                self.assertTrue(is_moving_domain(wrfnc))
+
+            path = os.path.join(tmpdir, "wrfout_synthetic.nc")
+            make_synthetic_file(path, 30, 20, 10, 3, bucket_mm=1.0,
+                                block_bytes=2**12)
+
+            with NetCDF(path) as wrfnc:
+                self.assertFalse(is_moving_domain(wrfnc))
+
+                slp = to_np(getvar(wrfnc, "slp", timeidx=None))
+                self.assertEqual(slp.shape, (3, 20, 30))
+                self.assertTrue(np.all((slp > 950) & (slp < 1050)))
+
+                # The bucket counters make the totals non-decreasing
+                interval = to_np(getvar(wrfnc, "precip_interval",
+                                        timeidx=None))
+                self.assertTrue(np.all(interval[1:] >= 0))
+
+                for varname in ("cape_2d", "ctt", "mdbz", "uvmet10",
+                                "helicity"):
+                    getvar(wrfnc, varname, timeidx=None)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_profile(self):
+        import json
+        from netCDF4 import Dataset as NetCDF
+
+        in_wrfnc = NetCDF(TEST_FILE)
+
+        with profile() as prof:
+            ref = getvar(in_wrfnc, "slp", timeidx=None)
+            getvar(in_wrfnc, "ctt")
+
+        # Nothing is recorded outside of the context
+        getvar(in_wrfnc, "slp")
+
+        totals = prof.stage_totals()
+        for stage in ("getvar:slp", "getvar:ctt", "extract_vars",
+                      "cast_type", "extract_and_transpose", "kernel:_slp",
+                      "masked_values", "metadata", "compute"):
+            self.assertIn(stage, totals)
+
+        self.assertEqual(totals["getvar:slp"]["calls"], 1)
+        self.assertGreater(totals["extract_vars"]["bytes_read"], 0)
+        self.assertGreater(totals["cast_type"]["bytes_alloc"], 0)
+
+        stats = prof.stats()
+        for path, vals in viewitems(stats):
+            self.assertLessEqual(vals["self"], vals["total"] + 1e-9)
+            if len(path) > 1:
+                self.assertIn(path[:-1], stats)
+
+        trace = json.loads(json.dumps(prof.chrome_trace()))
+        self.assertEqual(len(trace["traceEvents"]),
+                         sum(vals["calls"] for vals in stats.values()))
+        self.assertTrue(all(event["ph"] == "X"
+                            for event in trace["traceEvents"]))
+        self.assertIn("getvar:slp", prof.table())
+
+        # Profiling does not change the results
+        nt.assert_allclose(to_np(ref), to_np(getvar(in_wrfnc, "slp",
+                                                    timeidx=None)))
+
+    def test_omp_tuning(self):
+        from netCDF4 import Dataset as NetCDF
+
+        in_wrfnc = NetCDF(TEST_FILE)
+        ref = to_np(getvar(in_wrfnc, "cape_2d"))
+
+        before = (omp_get_max_threads(), omp_get_schedule())
+        with omp_threads(2, OMP_SCHED_GUIDED, 4):
+            if omp_enabled():
+                self.assertEqual(omp_get_max_threads(), 2)
+                self.assertEqual(omp_get_schedule()[0], OMP_SCHED_GUIDED)
+            result = to_np(getvar(in_wrfnc, "cape_2d"))
+        self.assertEqual((omp_get_max_threads(), omp_get_schedule()),
+                         before)
+        nt.assert_allclose(result, ref)
+
+        try:
+            calibration = calibrate_omp(in_wrfnc,
+                                        products=("cape_2d", "slp"),
+                                        thread_counts=(1, 2), repeat=1)
+            self.assertIn("_cape", calibration)
+            self.assertEqual(len(calibration["_cape"]["times"]), 6)
+
+            table = get_omp_tuning()
+            self.assertEqual(table["_cape"][0][1],
+                             calibration["_cape"]["num_threads"])
+
+            # The tuned settings only apply while the kernel runs
+            result = to_np(getvar(in_wrfnc, "cape_2d"))
+            self.assertEqual((omp_get_max_threads(), omp_get_schedule()),
+                             before)
+            nt.assert_allclose(result, ref)
+        finally:
+            clear_omp_tuning()
+
+    def test_lazy_import(self):
+        code = ("import sys\n"
+                "import wrf\n"
+                "eager = [name for name in ('xarray', 'pkg_resources', "
+                "'wrf._wrffortran', 'wrf.routines') if name in sys.modules]\n"
+                "assert not eager, eager\n"
+                "assert wrf.getvar is wrf.routines.getvar\n"
+                "assert 'getvar' in dir(wrf)\n"
+                "wrf.disable_xarray()\n"
+                "assert not wrf.xarray_enabled()\n")
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(sys.path)
+        subprocess.check_call([sys.executable, "-c", code], env=env)
+
+        # Submodules first loaded with xarray disabled still build metadata
+        # once xarray is enabled
+        code = ("from netCDF4 import Dataset\n"
+                "import wrf\n"
+                "wrf.disable_xarray()\n"
+                "wrfnc = Dataset({!r})\n"
+                "wrf.getvar(wrfnc, 'slp')\n"
+                "wrf.enable_xarray()\n"
+                "assert type(wrf.getvar(wrfnc, 'slp')).__name__ == "
+                "'DataArray'\n"
+                "assert type(wrf.getvar(wrfnc, 'lat')).__name__ == "
+                "'DataArray'\n").format(os.path.abspath(TEST_FILE))
+        subprocess.check_call([sys.executable, "-c", code], env=env)
+
+    def test_arg_binding(self):
+        from wrf.util import from_args, args_to_list, arg_location
+
+        def func(a, b, c=3, meta=True, outview=None):
+            pass
+
+        self.assertEqual(args_to_list(func, (1, 2), {}),
+                         [1, 2, 3, True, None])
+        self.assertEqual(args_to_list(func, (1, ), {"b": 5, "meta": False}),
+                         [1, 5, 3, False, None])
+        self.assertEqual(arg_location(func, "meta", (1, 2, 4, False), {}),
+                         ([1, 2, 4, False, None], 3))
+        self.assertIsNone(arg_location(func, "units", (1, 2), {}))
+        self.assertEqual(dict(from_args(func, ("c", "units"), 1, 2)),
+                         {"c": 3, "units": None})
+
+        # Binding errors are the same as for a normal call
+        for args, kwargs in (((1, ), {}), ((1, 2), {"a": 1}),
+                             ((1, 2), {"bad": 1}), ((1, 2, 3, 4, 5, 6), {})):
+            self.assertRaises(TypeError, args_to_list, func, args, kwargs)
+
+        # Variable arguments still work
+        def varfunc(a, *args, **kwargs):
+            pass
+
+        self.assertEqual(args_to_list(varfunc, (1, 2, 3), {"x": 4}),
+                         [1, (2, 3), {"x": 4}])
+
+    def test_var_meta(self):
+        from netCDF4 import Dataset as NetCDF
+        from wrf import extract_vars, get_id, ALL_TIMES
+        from wrf.util import extract_var_meta
+
+        wrfnc = NetCDF(TEST_FILE)
+        _key = get_id(wrfnc)
+
+        for timeidx in (0, ALL_TIMES):
+            meta, has_data = extract_var_meta(wrfnc, timeidx, "T", _key=_key)
+            var = extract_vars(wrfnc, timeidx, "T")["T"]
+
+            self.assertFalse(has_data)
+            self.assertEqual(meta.dims, var.dims)
+            self.assertEqual(meta.shape, var.shape)
+            self.assertEqual(list(meta.coords), list(var.coords))
+            for name in var.coords:
+                nt.assert_array_equal(meta.coords[name].values,
+                                      var.coords[name].values)
+            self.assertEqual(str(meta.attrs), str(var.attrs))
+
+            # Shared by every product for the same file and time
+            again, _ = extract_var_meta(wrfnc, timeidx, "T", _key=_key)
+            self.assertIs(again, meta)
+
+        # A variable with metadata in the cache is used as is
+        meta, has_data = extract_var_meta(wrfnc, 0, "T", cache={"T": var})
+        self.assertTrue(has_data)
+        self.assertIs(meta, var)
+
+    def test_uvmet_rotation(self):
+        import tempfile
+        import shutil
+        from math import log, cos, tan, radians
+        from netCDF4 import Dataset as NetCDF
+        from make_synthetic_file import make_synthetic_file
+        from wrf import uvmet, destagger, ALL_TIMES
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            for drift in ((0, 0), (1, 0)):
+                path = os.path.join(tmpdir, "wrfout_{}.nc".format(drift[0]))
+                make_synthetic_file(path, 30, 20, 10, 3, drift=drift)
+
+                with NetCDF(path) as wrfnc:
+                    lat = wrfnc.variables["XLAT"][:]
+                    lon = wrfnc.variables["XLONG"][:]
+                    lat1 = radians(wrfnc.TRUELAT1)
+                    lat2 = radians(wrfnc.TRUELAT2)
+                    cone = ((log(cos(lat1)) - log(cos(lat2))) /
+                            (log(tan(radians(45.) - abs(lat1/2.))) -
+                             log(tan(radians(45.) - abs(lat2/2.)))))
+
+                    u = destagger(wrfnc.variables["U"][:], -1)
+                    v = destagger(wrfnc.variables["V"][:], -2)
+                    ref = uvmet(u, v, lat, lon, wrfnc.STAND_LON, cone,
+                                meta=False)
+
+                    # Repeated calls use the cached rotation
+                    for _ in range(2):
+                        result = getvar(wrfnc, "uvmet", ALL_TIMES,
+                                        meta=False)
+                        nt.assert_allclose(to_np(result), ref, rtol=1e-5,
+                                           atol=1e-5)
+
+                    result = getvar(wrfnc, "uvmet", 1, meta=False)
+                    nt.assert_allclose(to_np(result), ref[:, 1],
+                                       rtol=1e-5, atol=1e-5)
+
+                    ref10 = uvmet(wrfnc.variables["U10"][:],
+                                  wrfnc.variables["V10"][:], lat, lon,
+                                  wrfnc.STAND_LON, cone, meta=False)
+                    result = getvar(wrfnc, "uvmet10", ALL_TIMES, meta=False)
+                    nt.assert_allclose(to_np(result), ref10, rtol=1e-5,
+                                       atol=1e-5)
+
+                    wspd_wdir = to_np(getvar(wrfnc, "uvmet_wspd_wdir",
+                                             ALL_TIMES, meta=False))
+                    nt.assert_allclose(wspd_wdir[0], np.hypot(ref[0], ref[1]),
+                                       rtol=1e-5, atol=1e-5)
+                    wdir = np.mod(270. - np.degrees(np.arctan2(ref[1],
+                                                               ref[0])),
+                                  360.)
+                    nt.assert_allclose(np.cos(np.radians(wspd_wdir[1])),
+                                       np.cos(np.radians(wdir)), atol=1e-4)
+
+                    wspd10 = to_np(getvar(wrfnc, "uvmet10_wspd", ALL_TIMES,
+                                          meta=False, units="kt"))
+                    nt.assert_allclose(wspd10,
+                                       np.hypot(ref10[0], ref10[1])*1.94384,
+                                       rtol=1e-4, atol=1e-4)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_helicity_layers(self):
+        from netCDF4 import Dataset as NetCDF
+        from wrf import ALL_TIMES
+
+        in_wrfnc = NetCDF(TEST_FILE)
+
+        srh = getvar(in_wrfnc, "helicity", ALL_TIMES, top=[1000., 3000.])
+        self.assertEqual(srh.dims[-3], "layer")
+        nt.assert_array_equal(srh.coords["top"].values, [1000., 3000.])
+        for i, top in enumerate((1000., 3000.)):
+            single = getvar(in_wrfnc, "helicity", ALL_TIMES, top=top)
+            nt.assert_array_equal(to_np(srh)[..., i, :, :], to_np(single))
+
+        bottoms = [2000., 0.]
+        tops = [5000., 3000.]
+        uh = getvar(in_wrfnc, "updraft_helicity", ALL_TIMES, bottom=bottoms,
+                    top=tops, meta=False)
+        for i, (bottom, top) in enumerate(zip(bottoms, tops)):
+            single = getvar(in_wrfnc, "updraft_helicity", ALL_TIMES,
+                            bottom=bottom, top=top, meta=False)
+            nt.assert_array_equal(uh[..., i, :, :], single)
+
+        self.assertRaises(ValueError, getvar, in_wrfnc, "updraft_helicity",
+                          bottom=[0., 1000.], top=[3000., 4000., 5000.])
+
+    def test_vertical_order(self):
+        from netCDF4 import Dataset as NetCDF
+        from wrf import cape_3d, ctt, cloudfrac
+
+        in_wrfnc = NetCDF(TEST_FILE)
+
+        p = getvar(in_wrfnc, "pressure", meta=False)
+        tk = getvar(in_wrfnc, "tk", meta=False)
+        qv = getvar(in_wrfnc, "QVAPOR", meta=False)
+        qc = getvar(in_wrfnc, "QCLOUD", meta=False)
+        z = getvar(in_wrfnc, "z", meta=False)
+        ter = getvar(in_wrfnc, "ter", meta=False)
+        psfc = getvar(in_wrfnc, "PSFC", meta=False) * .01
+        rh = getvar(in_wrfnc, "rh", meta=False)
+
+        # Reversing the levels must only reverse the per-level output
+        fwd = cape_3d(p, tk, qv, z, ter, psfc, True, meta=False)
+        rev = cape_3d(p[::-1], tk[::-1], qv[::-1], z[::-1], ter, psfc, True,
+                      meta=False)
+        nt.assert_array_equal(to_np(rev), to_np(fwd)[:, ::-1])
+
+        fwd = ctt(p, tk, qv, qc, z, ter, meta=False)
+        rev = ctt(p[::-1], tk[::-1], qv[::-1], qc[::-1], z[::-1], ter,
+                  meta=False)
+        nt.assert_allclose(to_np(rev), to_np(fwd))
+
+        fwd = cloudfrac(p, rh, 0, 970., 800., 450., meta=False)
+        rev = cloudfrac(p[::-1], rh[::-1], 0, 970., 800., 450., meta=False)
+        nt.assert_array_equal(to_np(rev), to_np(fwd))
+
+    def test_cape_parcels(self):
+        from netCDF4 import Dataset as NetCDF
+        from wrf import cape_parcels
+
+        in_wrfnc = NetCDF(TEST_FILE)
+
+        result = getvar(in_wrfnc, "cape_parcels")
+        ter = getvar(in_wrfnc, "ter")
+        self.assertEqual(result.dims[0:2], ("cape_cin_lcl_lfc", "parcel"))
+        self.assertEqual(result.shape, (4, 3) + ter.shape)
+        self.assertEqual(list(to_np(result.coords["parcel"])),
+                         ["sb", "ml", "mu"])
+
+        # Each parcel type does not depend on the others that are requested
+        mu = getvar(in_wrfnc, "cape_parcels", parcels="mu", meta=False)
+        nt.assert_array_equal(to_np(mu)[:, 0], to_np(result)[:, 2])
+
+        # The surface based parcel differs from the lowest level of cape_3d
+        # only by the LCL height formula
+        cape_3d = to_np(getvar(in_wrfnc, "cape_3d"))
+        nt.assert_allclose(to_np(result)[0:2, 0], cape_3d[0:2, 0], atol=10.)
+
+        # The raw computation accepts either vertical order
+        p = getvar(in_wrfnc, "pressure", meta=False)
+        tk = getvar(in_wrfnc, "tk", meta=False)
+        qv = getvar(in_wrfnc, "QVAPOR", meta=False)
+        z = getvar(in_wrfnc, "z", meta=False)
+        psfc = getvar(in_wrfnc, "PSFC", meta=False) * .01
+        rev = cape_parcels(p[::-1], tk[::-1], qv[::-1], z[::-1], to_np(ter),
+                           psfc, True, parcels=("ml", "sb"), meta=False)
+        nt.assert_allclose(to_np(rev)[:, ::-1], to_np(result)[:, 0:2],
+                           rtol=1e-5)
+
+        self.assertRaises(ValueError, getvar, in_wrfnc, "cape_parcels",
+                          parcels="lowest")
+
+    def test_smooth2d(self):
+        from netCDF4 import Dataset as NetCDF
+        from wrf import smooth2d, ALL_TIMES
+
+        in_wrfnc = NetCDF(TEST_FILE)
+        tk = getvar(in_wrfnc, "tk", timeidx=ALL_TIMES, meta=False)
+
+        # The batched slices match smoothing each slice on its own
+        result = smooth2d(tk, 5, 1.5, meta=False)
+        nt.assert_array_equal(result[1, 3],
+                              smooth2d(tk[1, 3], 5, 1.5, meta=False))
+
+        closed = smooth2d(tk, 5, 1.5, method="closed_form", meta=False)
+        nt.assert_allclose(closed, result, rtol=1e-10)
+
+        self.assertRaises(ValueError, smooth2d, tk, 5, method="fft")
+
+    def test_fused_kernels(self):
+        from netCDF4 import Dataset as NetCDF
+        from wrf import ALL_TIMES, destagger, extract_vars, Constants
+        from wrf.extension import (_full_pressure, _full_theta,
+                                   _height_from_geopotential)
+
+        in_wrfnc = NetCDF(TEST_FILE)
+        ncvars = extract_vars(in_wrfnc, ALL_TIMES, ("P", "PB", "T", "PH",
+                                                    "PHB"), meta=False)
+        p = ncvars["P"]
+        pb = ncvars["PB"]
+        ph = ncvars["PH"]
+        phb = ncvars["PHB"]
+
+        # The single precision kernels match numpy exactly
+        nt.assert_array_equal(_full_pressure(p, pb), p + pb)
+        nt.assert_array_equal(_full_pressure(p, pb, .01), (p + pb) * .01)
+        nt.assert_array_equal(_full_theta(ncvars["T"]),
+                              ncvars["T"] + Constants.T_BASE)
+        nt.assert_array_equal(_height_from_geopotential(ph, phb, False),
+                              (ph + phb) / Constants.G)
+        nt.assert_array_equal(_height_from_geopotential(ph, phb),
+                              destagger(ph + phb, -3) / Constants.G)
+
+        # Sliced views are not contiguous
+        nt.assert_array_equal(_full_pressure(p[:, 1], pb[:, 1]),
+                              p[:, 1] + pb[:, 1])
+        nt.assert_array_equal(_full_theta(ncvars["T"][..., 1:]),
+                              ncvars["T"][..., 1:] + Constants.T_BASE)
+
+        # Mixed precision inputs are computed in double precision
+        full_p = _full_pressure(p, pb.astype(np.float64))
+        self.assertEqual(full_p.dtype, np.float64)
+        nt.assert_array_equal(full_p, p + pb.astype(np.float64))
+
+        # The output can be written in place
+        expected = p + pb
+        _full_pressure(p, pb, outview=p)
+        nt.assert_array_equal(p, expected)
+
+    def test_ens_getvar(self):
+        from netCDF4 import Dataset as NetCDF
+        from wrf import ens_getvar
+        from wrf.ensemble import _EnsembleStats
+
+        # The streaming statistics match numpy on the stacked members
+        fields = np.random.RandomState(0).rand(7, 4, 6, 5) * 10.
+        stats = ("mean", "std", "min", "max", "prob>5", "p10", "p50",
+                 "p95")
+        accum = _EnsembleStats(stats, fields.shape[0])
+        for field in fields:
+            accum.update(field)
+        result = accum.results()
+        nt.assert_allclose(result["mean"], np.mean(fields, axis=0))
+        nt.assert_allclose(result["std"], np.std(fields, axis=0))
+        nt.assert_array_equal(result["min"], np.min(fields, axis=0))
+        nt.assert_array_equal(result["max"], np.max(fields, axis=0))
+        nt.assert_allclose(result["prob>5"], np.mean(fields > 5, axis=0))
+        for q in (10, 50, 95):
+            nt.assert_allclose(result["p{}".format(q)],
+                               np.percentile(fields, q, axis=0))
+
+        in_wrfnc = NetCDF(TEST_FILE)
+        slp = to_np(getvar(in_wrfnc, "slp"))
+        members = [in_wrfnc, TEST_FILE]
+        result = ens_getvar(members, "slp", stats=("mean", "std", "p90",
+                                                   "prob>1000"),
+                            radius=2)
+        nt.assert_allclose(to_np(result["mean"]), slp, rtol=1e-6)
+        nt.assert_array_equal(to_np(result["std"]), 0)
+        self.assertEqual(result["p90"].dims, ("south_north", "west_east"))
+        self.assertEqual(result["prob>1000"].attrs["units"], "")
+
+        # The neighborhood probability is at least the point probability
+        point = ens_getvar(members, "slp", stats=("prob>1000", ), meta=False)
+        self.assertTrue(np.all(to_np(result["prob>1000"]) >=
+                               point["prob>1000"]))
+
+        result = ens_getvar([TEST_FILE] * 3, "slp", stats=("p50", ),
+                            processes=2, meta=False)
+        nt.assert_allclose(result["p50"], slp, rtol=1e-6)
+
+        self.assertRaises(ValueError, ens_getvar, members, "slp",
+                          stats=("mode", ))
+        self.assertRaises(ValueError, ens_getvar, members, "slp",
+                          processes=2)
+
+    def test_join_ragged(self):
+        from netCDF4 import Dataset as NetCDF
+        from wrf import ALL_TIMES
+
+        in_wrfnc = NetCDF(TEST_FILE)
+        short = _short_copy(in_wrfnc, 2)
+
+        wrfin = [in_wrfnc, short]
+        p = getvar(wrfin, "P", timeidx=ALL_TIMES, method="join", meta=False)
+        self.assertTrue(np.all(p.mask[1, 2:]))
+        self.assertFalse(np.any(p.mask[:, 0:2]))
+        self.assertFalse(np.any(p.mask[0]))
+
+        # The first time has no padding, so nothing is masked
+        p = getvar(wrfin, "P", timeidx=0, method="join", meta=False)
+        self.assertFalse(ma.is_masked(p))
+
+        slp = getvar(wrfin, "slp", timeidx=ALL_TIMES, method="join")
+        ref = to_np(getvar(in_wrfnc, "slp", timeidx=ALL_TIMES))
+        nt.assert_allclose(to_np(slp)[1, 0:2], ref[0:2])
+        self.assertTrue(np.all(ma.getmaskarray(to_np(slp))[1, 2:]))
+
+        # The padded results match the unpadded ones exactly
+        cape = to_np(getvar(wrfin, "cape_2d", timeidx=ALL_TIMES,
+                            method="join", meta=False))
+        ref = to_np(getvar(short, "cape_2d", timeidx=ALL_TIMES, meta=False))
+        nt.assert_array_equal(ma.getdata(cape)[:, 1, 0:2], ref)
+
+    def test_memoize(self):
+        import tempfile
+        import shutil
+        from netCDF4 import Dataset as NetCDF
+        from wrf import set_memo_size, get_memo_size, enable_xarray
+
+        memo_size = get_memo_size()
+
+        # A new sequence, so nothing is memoized by the other tests
+        in_wrfnc = [NetCDF(TEST_FILE)]
+
+        # The sibling products share one cape_2d computation
+        with profile() as prof:
+            lcl = getvar(in_wrfnc, "lcl")
+            lfc = getvar(in_wrfnc, "lfc")
+            cape_2d = getvar(in_wrfnc, "cape_2d")
+        self.assertEqual(prof.stage_totals()["kernel:_cape"]["calls"], 1)
+        nt.assert_array_equal(to_np(lcl), to_np(cape_2d)[2])
+        nt.assert_array_equal(to_np(lfc), to_np(cape_2d)[3])
+
+        # Callers get copies of the memoized result
+        lcl[:] = 0
+        nt.assert_array_equal(to_np(getvar(in_wrfnc, "lcl")),
+                              to_np(cape_2d)[2])
+
+        # Different arguments are computed separately
+        with profile() as prof:
+            wspd = getvar(in_wrfnc, "uvmet_wspd", units="kt")
+        calls = prof.stage_totals()["kernel:_wspd"]["calls"]
+        with profile() as prof:
+            wdir = getvar(in_wrfnc, "uvmet_wdir", units="kt")
+            wspd_ms = getvar(in_wrfnc, "uvmet_wspd")
+        self.assertEqual(prof.stage_totals()["kernel:_wspd"]["calls"], calls)
+        nt.assert_allclose(to_np(wspd), to_np(wspd_ms) * 1.94384449, 1e-5)
+        nt.assert_array_equal(to_np(wdir),
+                              to_np(getvar(in_wrfnc, "uvmet_wspd_wdir"))[1])
+
+        set_memo_size(0)
+        try:
+            with profile() as prof:
+                getvar(in_wrfnc, "lcl")
+                getvar(in_wrfnc, "lfc")
+        finally:
+            set_memo_size(memo_size)
+        self.assertEqual(prof.stage_totals()["kernel:_cape"]["calls"], 2)
+
+        # The result type follows the xarray setting
+        in_wrfnc = [NetCDF(TEST_FILE)]
+        disable_xarray()
+        try:
+            raw = getvar(in_wrfnc, "cape_2d")
+        finally:
+            enable_xarray()
+        self.assertFalse(hasattr(raw, "dims"))
+        self.assertTrue(hasattr(getvar(in_wrfnc, "cape_2d"), "dims"))
+        self.assertTrue(hasattr(getvar(in_wrfnc, "lcl"), "attrs"))
+
+        # A file changed and reopened at the same path is computed again
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "wrfout_memo.nc")
+            shutil.copy(TEST_FILE, path)
+            wrfnc = NetCDF(path)
+            getvar(wrfnc, "cape_2d", 0)
+            wrfnc.close()
+
+            wrfnc = NetCDF(path, "a")
+            wrfnc.variables["T"][:] += 5.0
+            wrfnc.close()
+
+            wrfnc = NetCDF(path)
+            cape_2d = getvar(wrfnc, "cape_2d", 0)
+            set_memo_size(0)
+            try:
+                ref = getvar(wrfnc, "cape_2d", 0)
+            finally:
+                set_memo_size(memo_size)
+            nt.assert_array_equal(to_np(cape_2d), to_np(ref))
+            wrfnc.close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_workspace(self):
+        from netCDF4 import Dataset as NetCDF
+        from wrf import (ALL_TIMES, clear_workspace, workspace_stats,
+                         set_workspace_size, get_workspace_size)
+
+        in_wrfnc = [NetCDF(TEST_FILE)]
+        ntimes = in_wrfnc[0].dimensions["Time"].size
+
+        # The work arrays are allocated once and reused for each time
+        clear_workspace()
+        getvar(in_wrfnc, "cape_3d", ALL_TIMES)
+        stats = workspace_stats()
+        self.assertEqual(stats["misses"], 5)
+        self.assertEqual(stats["hits"], 5 * (ntimes - 1))
+        self.assertEqual(stats["arrays"], 5)
+
+        size = get_workspace_size()
+        try:
+            set_workspace_size(0)
+            self.assertEqual(workspace_stats()["nbytes"], 0)
+            ctt = getvar(in_wrfnc, "ctt", ALL_TIMES)
+            self.assertEqual(workspace_stats()["arrays"], 0)
+        finally:
+            set_workspace_size(size)
+
+        nt.assert_array_equal(to_np(getvar(in_wrfnc, "ctt", ALL_TIMES)),
+                              to_np(ctt))
+        clear_workspace()
+
+    def test_plan(self):
+        from netCDF4 import Dataset as NetCDF
+
+        in_wrfnc = NetCDF(TEST_FILE)
+
+        # No kernel runs while planning
+        with profile() as prof:
+            p = plan(in_wrfnc, ["cape_2d", "tk", "slp"])
+        self.assertFalse([stage for stage in prof.stage_totals()
+                          if stage.startswith("kernel:")])
+
+        reads = {entry["variable"]: entry for entry in p.reads}
+        for varname in ("T", "P", "PB", "QVAPOR"):
+            self.assertEqual(reads[varname]["bytes"],
+                             in_wrfnc.variables[varname][0].nbytes)
+        self.assertEqual(reads["T"]["products"], ["cape_2d", "tk", "slp"])
+        self.assertEqual(p.bytes_read,
+                         sum(entry["bytes"] for entry in p.reads))
+        self.assertEqual(sum(p.bytes_per_file.values()), p.bytes_read)
+
+        # The float64 copies and the _cape work arrays are included
+        cape = [entry for entry in p.kernels if entry["kernel"] == "_cape"]
+        self.assertEqual(len(cape), 1)
+        self.assertGreater(cape[0]["upcast_bytes"], 0)
+        self.assertGreater(cape[0]["work_bytes"], 0)
+        self.assertGreater(p.products["cape_2d"]["temp_bytes"],
+                           cape[0]["work_bytes"])
+        self.assertGreater(p.cost, 0)
+        self.assertIn("_cape", p.table())
+
+        results = p.compute()
+        self.assertEqual(list(results), ["cape_2d", "tk", "slp"])
+        for name, result in viewitems(results):
+            ref = getvar(in_wrfnc, name)
+            self.assertEqual(result.dims, ref.dims)
+            nt.assert_allclose(to_np(result), to_np(ref))
+
+        result = plan(in_wrfnc, {"slp": {"units": "hPa"}},
+                      timeidx=None).compute()
+        nt.assert_allclose(to_np(result["slp"]),
+                           to_np(getvar(in_wrfnc, "slp", timeidx=None,
+                                        units="hPa")))
+
+    @ut.skipIf(sys.version_info < (3, 5), "needs asyncio")
+    def test_async(self):
+        import asyncio
+        from threading import Event
+        from netCDF4 import Dataset as NetCDF
+        from wrf import (agetvar, agetvars, aextract_vars, enable_xarray,
+                         set_memo_size, get_memo_size, ALL_TIMES)
+        from wrf.config import _set_cancel_event, _RequestCancelled
+        import wrf.g_cape
+
+        in_wrfnc = NetCDF(TEST_FILE)
+
+        async def requests():
+            disable_xarray()
+            try:
+                raw = await agetvar(in_wrfnc, "slp")
+            finally:
+                enable_xarray()
+            self.assertFalse(hasattr(raw, "dims"))
+
+            # Identical requests share one computation.  Memoization is
+            # disabled so that only the coalescing can skip the kernel.
+            calls = []
+            cape_kernel = wrf.g_cape._cape
+
+            def counted_cape(*args, **kwargs):
+                calls.append(None)
+                return cape_kernel(*args, **kwargs)
+
+            wrf.g_cape._cape = counted_cape
+            memo_size = get_memo_size()
+            set_memo_size(0)
+            try:
+                first, second = await asyncio.gather(
+                    agetvar(in_wrfnc, "cape_2d"),
+                    agetvar(in_wrfnc, "cape_2d"))
+            finally:
+                set_memo_size(memo_size)
+                wrf.g_cape._cape = cape_kernel
+
+            self.assertEqual(len(calls), 1)
+            self.assertIsNot(first, second)
+            self.assertTrue(np.shares_memory(to_np(first), to_np(second)))
+
+            products = await agetvars(in_wrfnc, {"slp": {"units": "hPa"},
+                                                 "tk": None})
+            ncvars = await aextract_vars(in_wrfnc, 0, ("T", "P"))
+
+            return raw, first, products, ncvars
+
+        loop = asyncio.new_event_loop()
+        try:
+            raw, cape, products, ncvars = loop.run_until_complete(
+                requests())
+        finally:
+            loop.close()
+
+        nt.assert_allclose(raw, to_np(getvar(in_wrfnc, "slp")))
+        nt.assert_allclose(to_np(cape), to_np(getvar(in_wrfnc, "cape_2d")))
+        self.assertEqual(list(products), ["slp", "tk"])
+        nt.assert_allclose(to_np(products["slp"]),
+                           to_np(getvar(in_wrfnc, "slp", units="hPa")))
+        self.assertEqual(sorted(ncvars), ["P", "T"])
+
+        # A cancelled request stops between the left iteration slices
+        event = Event()
+        event.set()
+        _set_cancel_event(event)
+        try:
+            self.assertRaises(_RequestCancelled, getvar, in_wrfnc, "slp",
+                              ALL_TIMES)
+        finally:
+            _set_cancel_event(None)
+
 
 class WRFInterpTest(ut.TestCase):
     longMessage = True
 
+    def test_vertical_interpolator(self):
+        from netCDF4 import Dataset as NetCDF
+
+        in_wrfnc = NetCDF(TEST_FILE)
+        p = getvar(in_wrfnc, "pressure")
+        hts = getvar(in_wrfnc, "z")
+        tc = getvar(in_wrfnc, "tc")
+        levels = [850, 700, 500, 300]
+
+        interp = VerticalInterpolator(p, levels)
+
+        for field in (hts, tc):
+            nt.assert_array_equal(to_np(interp(field)),
+                                  to_np(interplevel(field, p, levels)))
+
+        # Two-dimensional levels
+        lev2d = np.full(hts.shape[-2:], 1500.0)
+        interp = VerticalInterpolator(hts, lev2d)
+        nt.assert_array_equal(to_np(interp(tc)),
+                              to_np(interplevel(tc, hts, lev2d)))
+
+        # Single time product fields are only equal to the field's precision
+        uvmet = getvar(in_wrfnc, "uvmet")
+        interp = VerticalInterpolator(p, levels)
+        result = interp(uvmet)
+        self.assertEqual(result.dtype, uvmet.dtype)
+        nt.assert_allclose(to_np(result),
+                           to_np(interplevel(uvmet, p, levels)), rtol=1e-5)
+
+    def test_vinterp_multi_field(self):
+        from netCDF4 import Dataset as NetCDF
+
+        in_wrfnc = NetCDF(TEST_FILE)
+        tk = getvar(in_wrfnc, "tk")
+        ua = getvar(in_wrfnc, "ua")
+        levels = [290, 300, 310]
+
+        result = vinterp(in_wrfnc, {"tk": tk, "ua": ua}, "theta", levels,
+                         extrapolate=True, field_type={"tk": "tk"})
+
+        for key, field, field_type in (("tk", tk, "tk"), ("ua", ua, None)):
+            single = vinterp(in_wrfnc, field, "theta", levels,
+                             extrapolate=True, field_type=field_type)
+            nt.assert_array_equal(to_np(result[key]), to_np(single))
+
+        # A sequence of types is matched to the mapping's keys in order
+        fields = OrderedDict((("tk", to_np(tk)), ("ua", to_np(ua))))
+        result = vinterp(in_wrfnc, fields, "theta", levels,
+                         extrapolate=True, field_type=["tk", "none"])
+
+        self.assertEqual(result["tk"].name, "tk")
+        self.assertEqual(result["ua"].name, "none")
+        nt.assert_array_equal(to_np(result["tk"]),
+                              to_np(vinterp(in_wrfnc, tk, "theta", levels,
+                                            extrapolate=True,
+                                            field_type="tk")))
+
 
 class WRFLatLonTest(ut.TestCase):
     longMessage = True
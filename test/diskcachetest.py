@@ -0,0 +1,104 @@
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import os
+import shutil
+import tempfile
+
+import unittest as ut
+import numpy.testing as nt
+
+from netCDF4 import Dataset
+
+from wrf import (getvar, to_np, enable_disk_cache, disable_disk_cache,
+                 clear_disk_cache)
+from wrf.cache import _swap_cache
+from wrf.diskcache import (_list_keys, _entry_size, disk_cache_key,
+                           store_disk_cache, load_disk_cache)
+
+TEST_FILE = os.path.join(os.path.dirname(__file__), "ci_tests",
+                         "ci_test_file.nc")
+
+
+class DiskCacheTest(ut.TestCase):
+    longMessage = True
+
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp()
+        enable_disk_cache(self.cachedir)
+        self.wrfnc = Dataset(TEST_FILE)
+
+        # Start with an empty threadlocal cache and restore it afterwards,
+        # since the other test modules check the main thread's cache
+        self.saved_cache = _swap_cache(None)
+
+    def tearDown(self):
+        _swap_cache(self.saved_cache)
+        disable_disk_cache()
+        self.wrfnc.close()
+        shutil.rmtree(self.cachedir)
+
+    def test_round_trip(self):
+        for meta in (True, False):
+            for varname, kwargs in (("slp", {}),
+                                    ("ctt", {"fill_nocloud": True}),
+                                    ("cape_2d", {})):
+                ref = getvar(self.wrfnc, varname, timeidx=None, meta=meta,
+                             **kwargs)
+                cached = getvar(self.wrfnc, varname, timeidx=None,
+                                meta=meta, **kwargs)
+
+                nt.assert_array_equal(to_np(cached), to_np(ref))
+                if meta:
+                    self.assertEqual(cached.dims, ref.dims)
+                    self.assertEqual(cached.attrs["units"],
+                                     ref.attrs["units"])
+
+        self.assertEqual(len(_list_keys()), 6)
+
+        # Different keyword arguments get a different entry
+        getvar(self.wrfnc, "slp", timeidx=None, units="hPa")
+        self.assertEqual(len(_list_keys()), 7)
+
+        clear_disk_cache()
+        self.assertEqual(len(_list_keys()), 0)
+
+    def test_eviction(self):
+        getvar(self.wrfnc, "slp", timeidx=0)
+        oldkey = _list_keys()[0]
+
+        # Make the first entry the least recently used
+        os.utime(os.path.join(self.cachedir, oldkey + ".pkl"), (0, 0))
+
+        enable_disk_cache(self.cachedir,
+                          max_bytes=int(1.5 * _entry_size(oldkey)))
+        getvar(self.wrfnc, "slp", timeidx=1)
+
+        keys = _list_keys()
+        self.assertEqual(len(keys), 1)
+        self.assertNotEqual(keys[0], oldkey)
+
+    def test_concurrent_store(self):
+        from threading import Thread
+
+        slp = getvar(self.wrfnc, "slp", timeidx=None, meta=False)
+        clear_disk_cache()
+        key = disk_cache_key(self.wrfnc, "slp", None, "cat", True, False,
+                             {})
+
+        # Threads storing the same entry leave one complete entry
+        threads = [Thread(target=store_disk_cache, args=(key, slp))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        nt.assert_array_equal(to_np(load_disk_cache(key)), to_np(slp))
+        self.assertEqual(_list_keys(), [key])
+        self.assertFalse([name for name in os.listdir(self.cachedir)
+                          if name.endswith(".tmp")])
+
+
+if __name__ == "__main__":
+    ut.main()